@@ -39,6 +39,28 @@ def create_app(config_name=None):
     CORS(app)
     Migrate(app, db)
     
+    # 初始化运行时指标
+    from app.utils.metrics import init_metrics
+    init_metrics(app, db)
+    
+    # 初始化缓存
+    from app.utils.cache import cache
+    cache.init_app(app)
+    
+    # 初始化实时推送和排队叫号，使用Redis时在多个worker间共享
+    from app.utils.sse import broker
+    broker.init_app(app, cache.redis)
+    from app.services.call_queue import call_queue
+    call_queue.init_app(app, cache.redis)
+    from app.services.checkin import checkin_service
+    checkin_service.init_app(app)
+    from app.services.follow_up import follow_up_queue
+    follow_up_queue.init_app(app, cache.redis)
+    
+    # 初始化按需性能分析
+    from app.utils.profiler import init_profiler
+    init_profiler(app)
+    
     # 注册蓝图
     from app.views.auth import auth as auth_blueprint
     app.register_blueprint(auth_blueprint, url_prefix='/auth')
@@ -52,4 +74,14 @@ def create_app(config_name=None):
     from app.views.consultant import consultant as consultant_blueprint
     app.register_blueprint(consultant_blueprint, url_prefix='/consultant')
     
+    from app.views.admin import admin as admin_blueprint
+    app.register_blueprint(admin_blueprint, url_prefix='/admin')
+    
+    from app.api import api_bp
+    app.register_blueprint(api_bp, url_prefix='/api')
+    
+    # 注册命令行命令
+    from app.commands import register_commands
+    register_commands(app)
+    
     return app 
\ No newline at end of file
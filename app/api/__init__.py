@@ -5,4 +5,4 @@ from flask import Blueprint
 
 api_bp = Blueprint('api', __name__)
 
-from app.api import users, clients, consultants, stores, treatments, messages, knowledge, authentication 
\ No newline at end of file
+from app.api import users, clients, consultants, stores, doctors, schedule, queue, checkin, calendar, segments, predictions, follow_ups, commissions, revenue, treatments, messages, knowledge, authentication 
\ No newline at end of file
@@ -28,6 +28,10 @@ def token_required(f):
             if auth_header.startswith('Bearer '):
                 token = auth_header.split(' ')[1]
         
+        # 浏览器EventSource无法设置请求头，SSE请求允许通过查询参数传递token
+        if not token and request.method == 'GET' and request.accept_mimetypes.best == 'text/event-stream':
+            token = request.args.get('access_token')
+        
         if not token:
             return jsonify({'message': '缺少认证令牌！', 'code': 401}), 401
         
@@ -0,0 +1,81 @@
+"""
+预约日历API
+"""
+from datetime import date
+from flask import request, g, current_app
+from app.models import Consultant, Doctor, Store
+from app.api import api_bp
+from app.utils.response import success_response, error_response
+from app.api.authentication import token_required
+from app.services.calendar import get_calendar, resolve_range, OWNER_COLUMNS, VIEWS
+
+OWNER_MODELS = {
+    'consultant': Consultant,
+    'doctor': Doctor,
+    'store': Store
+}
+
+
+@api_bp.route('/calendar', methods=['GET'])
+@token_required
+def get_appointment_calendar():
+    """
+    获取预约日历
+    
+    查询参数：owner为consultant/doctor/store（默认consultant）；id为所有者ID（咨询师默认本人）；
+    view为day/week/month（默认month），date为范围内任意一天（默认今天）；
+    也可直接传start、end（不含）日期；status为预约状态
+    
+    @return {tuple} - (JSON响应, 状态码)
+    """
+    role = g.current_user.role
+    if role not in ['admin', 'consultant', 'fulltime_consultant']:
+        return error_response("无权限访问", status_code=403)
+    
+    owner_type = request.args.get('owner', 'consultant')
+    if owner_type not in OWNER_COLUMNS:
+        return error_response("无效的日历类型", status_code=400)
+    
+    owner_id = request.args.get('id', type=int)
+    own_profile = Consultant.query.filter_by(user_id=g.current_user.id).first()
+    if owner_type == 'consultant' and owner_id is None and own_profile:
+        owner_id = own_profile.id
+    if owner_id is None:
+        return error_response("请指定日历所有者", status_code=400)
+    
+    # 咨询师只能查看本人和所在门店的日历
+    if role != 'admin':
+        if owner_type == 'consultant' and (not own_profile or own_profile.id != owner_id):
+            return error_response("无权限访问", status_code=403)
+        if owner_type == 'store' and (not own_profile or own_profile.store_id != owner_id):
+            return error_response("无权限访问", status_code=403)
+    
+    if OWNER_MODELS[owner_type].query.get(owner_id) is None:
+        return error_response("日历所有者不存在", status_code=404)
+    
+    # 解析日期范围
+    try:
+        if request.args.get('start') and request.args.get('end'):
+            start_date = date.fromisoformat(request.args['start'])
+            end_date = date.fromisoformat(request.args['end'])
+        else:
+            view = request.args.get('view', 'month')
+            if view not in VIEWS:
+                return error_response("无效的日历视图", status_code=400)
+            anchor = date.fromisoformat(request.args['date']) if request.args.get('date') else date.today()
+            start_date, end_date = resolve_range(view, anchor)
+    except ValueError:
+        return error_response("日期格式应为YYYY-MM-DD", status_code=400)
+    
+    max_days = current_app.config.get('CALENDAR_MAX_RANGE_DAYS', 42)
+    if end_date <= start_date or (end_date - start_date).days > max_days:
+        return error_response(f"日期范围无效，最多查询{max_days}天", status_code=400)
+    
+    calendar = get_calendar(owner_type, owner_id, start_date, end_date,
+                            status=request.args.get('status'),
+                            limit=current_app.config.get('CALENDAR_MAX_EVENTS', 500))
+    
+    return success_response(
+        data=calendar,
+        message="获取预约日历成功"
+    )
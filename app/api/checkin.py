@@ -0,0 +1,79 @@
+"""
+到店签到与实时通知相关API
+"""
+from flask import request, g
+from app.models import Store, Client, Consultant
+from app.api import api_bp
+from app.utils.response import success_response, error_response
+from app.utils.sse import broker
+from app.api.authentication import token_required
+from app.services.call_queue import call_queue
+from app.services.checkin import checkin_service, checkin_channel, user_channel
+
+CONSULTANT_ROLES = ['consultant', 'fulltime_consultant']
+
+
+@api_bp.route('/stores/<int:store_id>/check-in', methods=['POST'])
+@token_required
+def store_check_in(store_id):
+    """
+    客户扫描门店二维码签到，实时通知门店和相关咨询师
+
+    请求参数 take_number=true 时同时取排队号
+
+    @param {int} store_id - 门店ID
+    @return {tuple} - (JSON响应, 状态码)
+    """
+    if g.current_user.role != 'client':
+        return error_response("只有客户可以签到", status_code=403)
+
+    store = Store.query.get_or_404(store_id)
+    if store.status != 'active':
+        return error_response("门店暂停营业", status_code=400)
+
+    client = Client.query.filter_by(user_id=g.current_user.id).first()
+    if not client:
+        return error_response("客户资料不存在", status_code=400)
+
+    name = client.name or g.current_user.username
+    data = request.get_json(silent=True) or {}
+
+    result = {
+        'store_id': store_id,
+        'accepted': checkin_service.submit(store_id, client.id, name)
+    }
+    if data.get('take_number'):
+        result['ticket'] = call_queue.check_in(store_id, name, client_id=client.id)
+
+    return success_response(
+        data=result,
+        message="签到成功" if result['accepted'] else "已签到",
+        status_code=202
+    )
+
+
+@api_bp.route('/notifications/stream', methods=['GET'])
+@token_required
+def stream_notifications():
+    """
+    订阅当前用户的实时通知（SSE）
+
+    咨询师收到本人客户的签到；所属门店的咨询师同时收到门店签到。
+    管理员可通过 store_id 参数订阅指定门店的签到。浏览器EventSource可用
+    access_token 查询参数传递token。
+
+    @return {Response} - SSE流式响应
+    """
+    channels = [user_channel(g.current_user.id)]
+
+    if g.current_user.role in CONSULTANT_ROLES:
+        consultant = Consultant.query.filter_by(user_id=g.current_user.id).first()
+        if consultant and consultant.store_id:
+            channels.append(checkin_channel(consultant.store_id))
+    elif g.current_user.role == 'admin':
+        store_id = request.args.get('store_id', type=int)
+        if store_id:
+            Store.query.get_or_404(store_id)
+            channels.append(checkin_channel(store_id))
+
+    return broker.response(channels)
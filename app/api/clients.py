@@ -6,14 +6,28 @@ from app import db
 from app.models import Client, User, Consultant
 from app.api import api_bp
 from app.api.authentication import token_required
+from app.services.client_import import ClientImporter, iter_upload
+from app.services.clients import list_clients, search_clients, filter_clients, parse_client_filters
+from app.services.assignment import assign_clients, sweep_orphans
+from app.services.claims import claim_client, claim_clients, get_claim_summary
+from app.utils.exceptions import APIException
+from app.utils.export import export_response
 from datetime import datetime
 import json
 
+# 导出的客户字段
+CLIENT_EXPORT_COLUMNS = (Client.id, Client.name, Client.gender, Client.birth_date, Client.contact_info,
+                         Client.address, Client.tags, Client.assigned_consultant_id, Client.is_orphan,
+                         Client.last_contact, Client.created_at)
+
 @api_bp.route('/clients', methods=['GET'])
 @token_required
 def get_clients():
     """
-    获取客户列表
+    获取客户列表（键集分页）
+    
+    查询参数：is_orphan、status、tags、segment、last_contact_from、last_contact_to、
+    search、sort、cursor（上一页返回的next_cursor）、limit
     
     @return {json} - 客户列表数据
     """
@@ -33,24 +47,109 @@ def get_clients():
                 'code': 404
             }), 404
         
-        clients = Client.query.filter_by(assigned_consultant_id=consultant.id).all()
+        query = Client.query.filter_by(assigned_consultant_id=consultant.id)
     else:
         # 管理员可以查看所有客户
-        clients = Client.query.all()
+        query = Client.query
     
-    # 处理查询参数
-    is_orphan = request.args.get('is_orphan')
-    if is_orphan:
-        is_orphan = is_orphan.lower() == 'true'
-        clients = [client for client in clients if client.is_orphan == is_orphan]
+    # 数据库端过滤并键集分页
+    try:
+        clients, next_cursor = list_clients(query, request.args)
+    except APIException as e:
+        return jsonify({
+            'message': e.message,
+            'code': e.status_code
+        }), e.status_code
     
     # 返回结果
     return jsonify({
         'message': '获取客户列表成功',
         'code': 200,
-        'data': [client.to_dict() for client in clients]
+        'data': [client.to_dict() for client in clients],
+        'pagination': {
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        }
+    }), 200
+
+@api_bp.route('/clients/search', methods=['GET'])
+@token_required
+def search_clients_typeahead():
+    """
+    客户快速查找（输入联想），支持手机号前几位/后几位、姓名和拼音首字母
+    
+    查询参数：q 搜索词，limit 返回数量（默认10，最多20）
+    
+    @return {json} - 匹配的客户列表
+    """
+    if g.current_user.role not in ['consultant', 'fulltime_consultant', 'admin']:
+        return jsonify({
+            'message': '没有权限访问该资源',
+            'code': 403
+        }), 403
+    
+    consultant_id = None
+    if g.current_user.role in ['consultant', 'fulltime_consultant']:
+        consultant = Consultant.query.filter_by(user_id=g.current_user.id).first()
+        if not consultant:
+            return jsonify({
+                'message': '咨询师信息不存在',
+                'code': 404
+            }), 404
+        consultant_id = consultant.id
+    
+    clients = search_clients(request.args.get('q', ''), consultant_id, request.args.get('limit', 10, type=int))
+    
+    return jsonify({
+        'message': '查找客户成功',
+        'code': 200,
+        'data': [{
+            'id': client.id,
+            'name': client.name,
+            'contact_info': client.contact_info,
+            'is_orphan': client.is_orphan,
+            'assigned_consultant_id': client.assigned_consultant_id
+        } for client in clients]
     }), 200
 
+@api_bp.route('/clients/export', methods=['GET'])
+@token_required
+def export_clients():
+    """
+    流式导出客户（按ID升序，不分页）
+    
+    查询参数：format（csv/ndjson，默认csv），以及与客户列表相同的过滤条件 is_orphan、status、
+    tags、segment、last_contact_from、last_contact_to、search
+    
+    @return {Response} - CSV或NDJSON文件（分块传输）
+    """
+    if g.current_user.role not in ['consultant', 'fulltime_consultant', 'admin']:
+        return jsonify({
+            'message': '没有权限访问该资源',
+            'code': 403
+        }), 403
+    
+    # 咨询师只能导出自己的客户
+    query = Client.query
+    if g.current_user.role in ['consultant', 'fulltime_consultant']:
+        consultant = Consultant.query.filter_by(user_id=g.current_user.id).first()
+        if not consultant:
+            return jsonify({
+                'message': '咨询师信息不存在',
+                'code': 404
+            }), 404
+        query = query.filter_by(assigned_consultant_id=consultant.id)
+    
+    try:
+        query = filter_clients(query, **parse_client_filters(request.args))
+        return export_response(query.with_entities(*CLIENT_EXPORT_COLUMNS).order_by(Client.id).statement,
+                               request.args.get('format', 'csv'), 'clients')
+    except APIException as e:
+        return jsonify({
+            'message': e.message,
+            'code': e.status_code
+        }), e.status_code
+
 @api_bp.route('/clients/<int:client_id>', methods=['GET'])
 @token_required
 def get_client(client_id):
@@ -122,12 +221,8 @@ def create_client():
                         'code': 400,
                         'data': existing_client.to_dict()
                     }), 400
-                elif existing_client.is_orphan:
-                    # 如果是"孤儿客户"，可以认领
-                    existing_client.assigned_consultant_id = consultant.id
-                    existing_client.is_orphan = False
-                    existing_client.last_contact = datetime.utcnow()
-                    db.session.commit()
+                elif existing_client.is_orphan and claim_client(existing_client.id, consultant.id):
+                    # 如果是"孤儿客户"，可以认领（并发认领时只有一人成功）
                     return jsonify({
                         'message': '成功认领孤儿客户',
                         'code': 200,
@@ -324,13 +419,182 @@ def check_orphan_clients():
             'code': 403
         }), 403
     
-    # 执行孤儿客户检查
-    orphan_count = Client.check_orphan_status()
+    # 执行孤儿客户检查，随后自动重新分配
+    result = sweep_orphans()
     
     return jsonify({
         'message': '孤儿客户状态检查完成',
         'code': 200,
-        'data': {
-            'orphan_count': orphan_count
-        }
-    }), 200 
\ No newline at end of file
+        'data': result
+    }), 200 
+
+@api_bp.route('/clients/assign', methods=['POST'])
+@token_required
+def assign_clients_api():
+    """
+    为孤儿客户和未分配咨询师的客户自动分配咨询师
+    
+    请求体可选 client_ids，只分配指定客户
+    
+    @return {json} - 分配结果
+    """
+    if g.current_user.role != 'admin':
+        return jsonify({
+            'message': '没有权限执行该操作',
+            'code': 403
+        }), 403
+    
+    data = request.get_json(silent=True) or {}
+    client_ids = data.get('client_ids')
+    if client_ids is not None and not (isinstance(client_ids, list) and all(isinstance(i, int) for i in client_ids)):
+        return jsonify({
+            'message': 'client_ids应为客户ID列表',
+            'code': 400
+        }), 400
+    
+    result = assign_clients(client_ids)
+    
+    return jsonify({
+        'message': f"已分配{result['assigned']}位客户",
+        'code': 200,
+        'data': result
+    }), 200
+
+@api_bp.route('/clients/claim', methods=['POST'])
+@token_required
+def claim_clients_api():
+    """
+    批量认领孤儿客户
+
+    请求体 client_ids 为客户ID列表；并发认领同一客户时只有一位咨询师成功，
+    其余客户在 failed 中返回
+
+    @return {json} - 认领结果
+    """
+    if g.current_user.role not in ['consultant', 'fulltime_consultant']:
+        return jsonify({
+            'message': '没有权限执行该操作',
+            'code': 403
+        }), 403
+
+    consultant = Consultant.query.filter_by(user_id=g.current_user.id).first()
+    if not consultant:
+        return jsonify({
+            'message': '请先完成咨询师认证',
+            'code': 400
+        }), 400
+
+    data = request.get_json(silent=True) or {}
+    client_ids = data.get('client_ids')
+    if not (isinstance(client_ids, list) and client_ids and all(isinstance(i, int) for i in client_ids)):
+        return jsonify({
+            'message': 'client_ids应为客户ID列表',
+            'code': 400
+        }), 400
+
+    try:
+        result = claim_clients(client_ids, consultant.id)
+    except APIException as e:
+        return jsonify({
+            'message': e.message,
+            'code': e.status_code
+        }), e.status_code
+
+    return jsonify({
+        'message': f"成功认领{len(result['claimed'])}位孤儿客户",
+        'code': 200,
+        'data': result
+    }), 200
+
+@api_bp.route('/clients/claims/summary', methods=['GET'])
+@token_required
+def get_claim_summary_api():
+    """
+    咨询师的孤儿客户认领次数和费用合计
+
+    查询参数：start、end（YYYY-MM-DD，end不含当天），管理员可通过 consultant_id 指定咨询师
+
+    @return {json} - 认领汇总
+    """
+    if g.current_user.role == 'admin':
+        consultant_id = request.args.get('consultant_id', type=int)
+    elif g.current_user.role in ['consultant', 'fulltime_consultant']:
+        consultant = Consultant.query.filter_by(user_id=g.current_user.id).first()
+        consultant_id = consultant.id if consultant else None
+    else:
+        consultant_id = None
+    if consultant_id is None:
+        return jsonify({
+            'message': '没有权限执行该操作',
+            'code': 403
+        }), 403
+
+    try:
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d') if request.args.get('start') else None
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d') if request.args.get('end') else None
+    except ValueError:
+        return jsonify({
+            'message': '日期格式应为YYYY-MM-DD',
+            'code': 400
+        }), 400
+
+    return jsonify({
+        'message': '获取认领汇总成功',
+        'code': 200,
+        'data': get_claim_summary(consultant_id, start, end)
+    }), 200
+
+@api_bp.route('/clients/import', methods=['POST'])
+@token_required
+def import_clients():
+    """
+    从CSV/XLSX批量导入客户
+    
+    表单字段 file 为上传文件（表头需包含姓名和手机号列）；咨询师导入的客户归属本人，
+    管理员可通过 assigned_consultant_id 指定归属咨询师
+    
+    @return {json} - 导入汇总和逐行结果
+    """
+    if g.current_user.role not in ['consultant', 'fulltime_consultant', 'admin']:
+        return jsonify({
+            'message': '没有权限执行该操作',
+            'code': 403
+        }), 403
+    
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return jsonify({
+            'message': '请上传导入文件',
+            'code': 400
+        }), 400
+    
+    if g.current_user.role == 'admin':
+        consultant_id = request.form.get('assigned_consultant_id', type=int)
+        if consultant_id and not Consultant.query.get(consultant_id):
+            return jsonify({
+                'message': '咨询师不存在',
+                'code': 400
+            }), 400
+    else:
+        consultant = Consultant.query.filter_by(user_id=g.current_user.id).first()
+        if not consultant:
+            return jsonify({
+                'message': '请先完成咨询师认证',
+                'code': 400
+            }), 400
+        consultant_id = consultant.id
+    
+    try:
+        importer = ClientImporter(consultant_id)
+        report = importer.run(iter_upload(upload, max_rows=importer.max_rows))
+    except APIException as e:
+        return jsonify({
+            'message': e.message,
+            'code': e.status_code
+        }), e.status_code
+    
+    return jsonify({
+        'message': '客户导入完成',
+        'code': 200,
+        'data': report
+    }), 200
@@ -0,0 +1,111 @@
+"""
+提成流水与月度结算API
+"""
+from flask import request, g, Response
+from app.models import Consultant
+from app.api import api_bp
+from app.utils.response import success_response, error_response
+from app.utils.exceptions import APIException
+from app.api.authentication import token_required
+from app.services.commission import list_entries, generate_statements, statement_rows, export_statements_csv, \
+    parse_month
+
+CONSULTANT_ROLES = ['consultant', 'fulltime_consultant']
+
+
+def _scope_consultant_id():
+    # 咨询师只能查看本人数据；管理员可通过consultant_id指定，不指定表示全部
+    if g.current_user.role in CONSULTANT_ROLES:
+        consultant = Consultant.query.filter_by(user_id=g.current_user.id).first()
+        return (consultant.id, None) if consultant else (None, error_response("咨询师信息不存在", status_code=404))
+    if g.current_user.role == 'admin':
+        return request.args.get('consultant_id', type=int), None
+    return None, error_response("无权限访问", status_code=403)
+
+
+@api_bp.route('/commissions/entries', methods=['GET'])
+@token_required
+def get_commission_entries():
+    """
+    获取提成流水（按记账时间倒序，键集分页）
+
+    查询参数：month（YYYY-MM）、cursor、limit；管理员需指定consultant_id
+
+    @return {tuple} - (JSON响应, 状态码)
+    """
+    consultant_id, error = _scope_consultant_id()
+    if error:
+        return error
+    if consultant_id is None:
+        return error_response("请指定咨询师", status_code=400)
+
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    try:
+        entries, next_cursor = list_entries(consultant_id, request.args.get('month'), request.args.get('cursor'), limit)
+    except APIException as e:
+        return error_response(e.message, status_code=e.status_code)
+
+    return success_response(
+        data={
+            'items': [entry.to_dict() for entry in entries],
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        },
+        message="获取提成流水成功"
+    )
+
+
+@api_bp.route('/commissions/statements', methods=['GET'])
+@token_required
+def get_commission_statements():
+    """
+    获取某月提成结算单
+
+    查询参数：month（YYYY-MM，默认当月）、format（json/csv）；咨询师只能查看本人结算单
+
+    @return {tuple} - (JSON响应, 状态码)；format=csv 时返回CSV文件
+    """
+    consultant_id, error = _scope_consultant_id()
+    if error:
+        return error
+
+    try:
+        month = parse_month(request.args.get('month'))
+    except APIException as e:
+        return error_response(e.message, status_code=e.status_code)
+
+    if request.args.get('format') == 'csv':
+        return Response(export_statements_csv(month, consultant_id), mimetype='text/csv',
+                        headers={'Content-Disposition': f'attachment; filename=commission-{month}.csv'})
+
+    fields = ['month', 'consultant_id', 'username', 'type', 'entry_count', 'claim_amount', 'consumption_amount',
+              'total_amount']
+    return success_response(
+        data=[dict(zip(fields, row)) for row in statement_rows(month, consultant_id)],
+        message="获取结算单成功"
+    )
+
+
+@api_bp.route('/commissions/statements/generate', methods=['POST'])
+@token_required
+def generate_commission_statements():
+    """
+    生成（或重新生成）某月全部咨询师的提成结算单
+
+    请求体可选 month（YYYY-MM，默认当月）
+
+    @return {tuple} - (JSON响应, 状态码)
+    """
+    if g.current_user.role != 'admin':
+        return error_response("无权限操作", status_code=403)
+
+    data = request.get_json(silent=True) or {}
+    try:
+        result = generate_statements(data.get('month'))
+    except APIException as e:
+        return error_response(e.message, status_code=e.status_code)
+
+    return success_response(
+        data=result,
+        message=f"已生成{result['statement_count']}份结算单"
+    )
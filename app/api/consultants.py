@@ -4,9 +4,13 @@
 from flask import request, g
 from app import db
 from app.models import User, Consultant, Client, Message
+from app.models.stats import get_consultant_counts
+from app.models.hierarchy import is_descendant
+from app.services.team import team_clients_query, get_team_performance
+from app.services.clients import list_clients
 from app.api import api_bp
 from app.utils.response import success_response, error_response, paginated_response
-from app.utils.exceptions import NotFoundException, ForbiddenException, ValidationException
+from app.utils.exceptions import NotFoundException, ForbiddenException, ValidationException, APIException
 from app.utils.validators import validate_required_fields
 from app.api.authentication import token_required
 from datetime import datetime, timedelta
@@ -156,27 +160,13 @@ def get_consultant_stats(consultant_id):
     
     # 获取时间范围
     days = request.args.get('days', 30, type=int)
-    start_date = datetime.utcnow() - timedelta(days=days)
-    
-    # 统计数据
-    total_clients = consultant.clients.count()
-    active_clients = consultant.clients.filter(Client.last_contact >= start_date).count()
-    orphan_clients = consultant.clients.filter_by(is_orphan=True).count()
-    
-    # 获取最近的消息统计
-    recent_messages = Message.query.filter(
-        Message.sender_id == consultant.user_id,
-        Message.created_at >= start_date
-    ).count()
-    
-    stats = {
-        'total_clients': total_clients,
-        'active_clients': active_clients,
-        'orphan_clients': orphan_clients,
-        'recent_messages': recent_messages,
+    
+    # 读取增量维护的咨询师汇总
+    stats = get_consultant_counts(consultant.id, days)
+    stats.update({
         'rating': consultant.rating,
         'period': f"最近{days}天"
-    }
+    })
     
     return success_response(
         data=stats,
@@ -208,7 +198,11 @@ def update_supervisor(consultant_id):
     if not supervisor or supervisor.type != 'fulltime':
         return error_response("无效的指导老师", status_code=400)
     
-    # 更新指导老师
+    # 指导老师不能是本人或本人的下级（否则形成环）
+    if is_descendant(supervisor.id, consultant.id):
+        return error_response("指导老师不能是本人或其下级", status_code=400)
+    
+    # 更新指导老师（闭包表随提交一起维护）
     consultant.supervisor_id = supervisor.id
     consultant.updated_at = datetime.utcnow()
     
@@ -217,4 +211,64 @@ def update_supervisor(consultant_id):
     return success_response(
         data=consultant.to_dict(),
         message="更新指导老师成功"
-    ) 
\ No newline at end of file
+    ) 
+
+def _can_view_team(consultant):
+    # 管理员、本人或其上级可以查看团队
+    if g.current_user.role == 'admin':
+        return True
+    viewer = Consultant.query.filter_by(user_id=g.current_user.id).first()
+    return viewer is not None and is_descendant(consultant.id, viewer.id)
+
+@api_bp.route('/consultants/<int:consultant_id>/team', methods=['GET'])
+@token_required
+def get_team(consultant_id):
+    """
+    获取咨询师团队（本人及全部下级）的成员业绩
+    
+    查询参数：days 统计天数（默认30）
+    
+    @param {int} consultant_id - 咨询师ID
+    @return {tuple} - (JSON响应, 状态码)
+    """
+    consultant = Consultant.query.get_or_404(consultant_id)
+    
+    if not _can_view_team(consultant):
+        return error_response("无权限访问", status_code=403)
+    
+    days = request.args.get('days', 30, type=int)
+    
+    return success_response(
+        data=get_team_performance(consultant.id, days),
+        message="获取团队业绩成功"
+    )
+
+@api_bp.route('/consultants/<int:consultant_id>/team/clients', methods=['GET'])
+@token_required
+def get_team_clients(consultant_id):
+    """
+    获取咨询师团队全部成员的客户列表（键集分页）
+    
+    查询参数同 GET /clients：is_orphan、status、tags、segment、search、sort、cursor、limit
+    
+    @param {int} consultant_id - 咨询师ID
+    @return {tuple} - (JSON响应, 状态码)
+    """
+    consultant = Consultant.query.get_or_404(consultant_id)
+    
+    if not _can_view_team(consultant):
+        return error_response("无权限访问", status_code=403)
+    
+    try:
+        clients, next_cursor = list_clients(team_clients_query(consultant.id), request.args)
+    except APIException as e:
+        return error_response(e.message, status_code=e.status_code)
+    
+    return success_response(
+        data={
+            'items': [client.to_dict() for client in clients],
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        },
+        message="获取团队客户列表成功"
+    )
@@ -9,6 +9,9 @@ from app.utils.response import success_response, error_response, paginated_respo
 from app.utils.exceptions import NotFoundException, ForbiddenException, ValidationException
 from app.utils.validators import validate_required_fields
 from app.api.authentication import token_required
+from app.utils.sse import broker
+from app.services.call_queue import queue_channel, doctor_board
+from app.services.ratings import get_aggregate
 from datetime import datetime, timedelta
 import json
 
@@ -102,6 +105,7 @@ def create_doctor():
         bio=data.get('bio'),
         avatar=data.get('avatar'),
         store_id=data['store_id'],
+        working_hours=data.get('working_hours'),
         status='available'
     )
     
@@ -142,6 +146,7 @@ def update_doctor(doctor_id):
     doctor.specialty = data['specialty']
     doctor.bio = data.get('bio')
     doctor.avatar = data.get('avatar')
+    doctor.working_hours = data.get('working_hours')
     doctor.updated_at = datetime.utcnow()
     
     db.session.commit()
@@ -177,6 +182,10 @@ def update_doctor_status(doctor_id):
     
     db.session.commit()
     
+    # 推送到门店候诊大屏
+    if doctor.store_id:
+        broker.publish(queue_channel(doctor.store_id), 'doctors', doctor_board(doctor.store_id))
+    
     return success_response(
         data=doctor.to_dict(),
         message="更新医生状态成功"
@@ -204,21 +213,13 @@ def get_doctor_stats(doctor_id):
         Treatment.created_at >= start_date
     ).count()
     
-    # 计算平均评分
-    treatments_with_rating = Treatment.query.filter(
-        Treatment.doctor_id == doctor_id,
-        Treatment.rating.isnot(None)
-    ).all()
-    
-    avg_rating = sum(t.rating for t in treatments_with_rating) / len(treatments_with_rating) if treatments_with_rating else 0
-    
+    # 评分取自评分汇总
     stats = {
         'total_treatments': total_treatments,
         'recent_treatments': recent_treatments,
-        'avg_rating': round(avg_rating, 1),
-        'rating_count': len(treatments_with_rating),
         'period': f"最近{days}天"
     }
+    stats.update(get_aggregate('doctor', doctor_id))
     
     return success_response(
         data=stats,
@@ -0,0 +1,41 @@
+"""
+智能跟单提醒API
+"""
+from flask import request, g
+from app.models import Consultant
+from app.api import api_bp
+from app.utils.response import success_response, error_response
+from app.api.authentication import token_required
+from app.services.follow_up import get_follow_ups
+
+CONSULTANT_ROLES = ['consultant', 'fulltime_consultant']
+
+
+@api_bp.route('/follow-ups', methods=['GET'])
+@token_required
+def get_follow_up_list():
+    """
+    获取最应优先跟进的客户（越久未联系、情绪越负面越靠前）
+    
+    查询参数：limit（默认20，最多100）；管理员需指定consultant_id
+    
+    @return {tuple} - (JSON响应, 状态码)
+    """
+    if g.current_user.role in CONSULTANT_ROLES:
+        consultant = Consultant.query.filter_by(user_id=g.current_user.id).first()
+        if not consultant:
+            return error_response("咨询师信息不存在", status_code=404)
+        consultant_id = consultant.id
+    elif g.current_user.role == 'admin':
+        consultant_id = request.args.get('consultant_id', type=int)
+        if consultant_id is None:
+            return error_response("请指定咨询师", status_code=400)
+    else:
+        return error_response("无权限访问", status_code=403)
+    
+    follow_ups = get_follow_ups(consultant_id, request.args.get('limit', 20, type=int))
+    
+    return success_response(
+        data=[dict(item, client=item['client'].to_dict()) for item in follow_ups],
+        message="获取跟进提醒成功"
+    )
@@ -3,15 +3,22 @@
 """
 from flask import request, g
 from app import db
-from app.models import Message, GroupMessage, User, Client, Consultant
+from app.models import Message, GroupMessage, User, Client, Consultant, ClientSegment, SEGMENT_LABELS
 from app.api import api_bp
 from app.utils.response import success_response, error_response, paginated_response
-from app.utils.exceptions import NotFoundException, ForbiddenException, ValidationException
+from app.utils.exceptions import NotFoundException, ForbiddenException, ValidationException, APIException
 from app.utils.validators import validate_required_fields
 from app.api.authentication import token_required
+from app.services.follow_up import follow_up_queue
+from app.utils.ai_helper import DeepSeekAI
+from app.utils.export import export_response
 from datetime import datetime
 import json
 
+# 导出的消息字段
+MESSAGE_EXPORT_COLUMNS = (Message.id, Message.sender_id, Message.receiver_id, Message.msg_type, Message.content,
+                          Message.attachment_url, Message.is_read, Message.sentiment_score, Message.created_at)
+
 @api_bp.route('/messages', methods=['GET'])
 @token_required
 def get_messages():
@@ -50,6 +57,39 @@ def get_messages():
         message="获取消息列表成功"
     )
 
+@api_bp.route('/messages/export', methods=['GET'])
+@token_required
+def export_messages():
+    """
+    流式导出消息（按ID升序，不分页）
+    
+    查询参数：format（csv/ndjson，默认csv）、sender_id、receiver_id、is_read（true/false）；
+    管理员可导出全部消息，其他用户只能导出本人收发的消息
+    
+    @return {Response} - CSV或NDJSON文件（分块传输）
+    """
+    query = Message.query
+    if g.current_user.role != 'admin':
+        query = query.filter(
+            (Message.sender_id == g.current_user.id) | (Message.receiver_id == g.current_user.id)
+        )
+    
+    sender_id = request.args.get('sender_id', type=int)
+    receiver_id = request.args.get('receiver_id', type=int)
+    is_read = request.args.get('is_read')
+    if sender_id:
+        query = query.filter(Message.sender_id == sender_id)
+    if receiver_id:
+        query = query.filter(Message.receiver_id == receiver_id)
+    if is_read:
+        query = query.filter(Message.is_read == (is_read.lower() == 'true'))
+    
+    try:
+        return export_response(query.with_entities(*MESSAGE_EXPORT_COLUMNS).order_by(Message.id).statement,
+                               request.args.get('format', 'csv'), 'messages')
+    except APIException as e:
+        return error_response(e.message, status_code=e.status_code)
+
 @api_bp.route('/messages/<int:message_id>', methods=['GET'])
 @token_required
 def get_message(message_id):
@@ -105,6 +145,19 @@ def send_message():
     )
     
     db.session.add(new_message)
+    
+    # 客户发来的消息更新情绪指数；咨询师发给自己客户的消息记为一次联系
+    if g.current_user.role == 'client':
+        client = Client.query.filter_by(user_id=g.current_user.id).first()
+        if client:
+            new_message.sentiment_score = DeepSeekAI().analyze_sentiment(data['content'])
+            follow_up_queue.record_sentiment(client, new_message.sentiment_score)
+    elif g.current_user.role in ['consultant', 'fulltime_consultant']:
+        consultant = Consultant.query.filter_by(user_id=g.current_user.id).first()
+        client = Client.query.filter_by(user_id=receiver.id).first()
+        if consultant and client and client.assigned_consultant_id == consultant.id:
+            client.last_contact = datetime.utcnow()
+    
     db.session.commit()
     
     return success_response(
@@ -214,6 +267,16 @@ def send_group_message():
         receivers = Client.query.filter(Client.tags.like(f'%{tags[0]}%'))
         for tag in tags[1:]:
             receivers = receivers.union(Client.query.filter(Client.tags.like(f'%{tag}%')))
+    elif data['target_type'] == 'segment':
+        # target_tags为逗号分隔的RFM分群，咨询师只能发给自己的客户
+        segments = [segment.strip() for segment in (data.get('target_tags') or '').split(',') if segment.strip()]
+        if not segments or any(segment not in SEGMENT_LABELS for segment in segments):
+            return error_response("无效的客户分群", status_code=400)
+        receivers = Client.query.filter(Client.segment.has(ClientSegment.segment.in_(segments)))
+        if g.current_user.role != 'admin':
+            consultant = Consultant.query.filter_by(user_id=g.current_user.id).first()
+            receivers = receivers.filter(Client.assigned_consultant_id == (consultant.id if consultant else None))
+        receivers = receivers.all()
     else:
         return error_response("无效的目标类型", status_code=400)
     
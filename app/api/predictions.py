@@ -0,0 +1,99 @@
+"""
+下次就诊预测相关API
+"""
+from flask import request, g
+from app.models import Client, Consultant, VisitPrediction
+from app.api import api_bp
+from app.utils.response import success_response, error_response
+from app.api.authentication import token_required
+from app.services.prediction import predict_visits, due_predictions, follow_up_message
+
+CONSULTANT_ROLES = ['consultant', 'fulltime_consultant']
+
+
+def _prediction_data(prediction):
+    data = prediction.to_dict()
+    data['client_name'] = prediction.client.name
+    data['message'] = follow_up_message(prediction)
+    return data
+
+
+@api_bp.route('/predictions/due', methods=['GET'])
+@token_required
+def get_due_predictions():
+    """
+    获取预测近期到访、尚未预约的客户及回访文案；咨询师只查询自己的客户
+    
+    查询参数：days（默认14天，含已逾期）、cursor、limit
+    
+    @return {tuple} - (JSON响应, 状态码)
+    """
+    if g.current_user.role in CONSULTANT_ROLES:
+        consultant = Consultant.query.filter_by(user_id=g.current_user.id).first()
+        if not consultant:
+            return error_response("咨询师信息不存在", status_code=404)
+        consultant_id = consultant.id
+    elif g.current_user.role == 'admin':
+        consultant_id = request.args.get('consultant_id', type=int)
+    else:
+        return error_response("无权限访问", status_code=403)
+    
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    predictions, next_cursor = due_predictions(
+        consultant_id, request.args.get('days', type=int), request.args.get('cursor'), limit
+    )
+    
+    return success_response(
+        data={
+            'items': [_prediction_data(prediction) for prediction in predictions],
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        },
+        message="获取待回访客户成功"
+    )
+
+
+@api_bp.route('/clients/<int:client_id>/next-visit', methods=['GET'])
+@token_required
+def get_client_next_visit(client_id):
+    """
+    获取单个客户的下次就诊预测和回访文案
+    
+    @param {int} client_id - 客户ID
+    @return {tuple} - (JSON响应, 状态码)
+    """
+    client = Client.query.get_or_404(client_id)
+    
+    if g.current_user.role in CONSULTANT_ROLES:
+        consultant = Consultant.query.filter_by(user_id=g.current_user.id).first()
+        if not consultant or client.assigned_consultant_id != consultant.id:
+            return error_response("无权限访问", status_code=403)
+    elif g.current_user.role != 'admin':
+        return error_response("无权限访问", status_code=403)
+    
+    prediction = VisitPrediction.query.get(client_id)
+    
+    return success_response(
+        data=_prediction_data(prediction) if prediction else None,
+        message="获取下次就诊预测成功" if prediction else "该客户暂无就诊预测"
+    )
+
+
+@api_bp.route('/predictions/compute', methods=['POST'])
+@token_required
+def compute_predictions():
+    """
+    重新计算全部客户的下次就诊预测（管理员）；retrain=false时沿用最近一次训练的模型
+    
+    @return {tuple} - (JSON响应, 状态码)
+    """
+    if g.current_user.role != 'admin':
+        return error_response("无权限操作", status_code=403)
+    
+    data = request.get_json(silent=True) or {}
+    result = predict_visits(retrain=data.get('retrain', True) is not False)
+    
+    return success_response(
+        data=result,
+        message="下次就诊预测计算完成"
+    )
@@ -0,0 +1,195 @@
+"""
+排队叫号相关API
+"""
+from flask import request, g
+from app.models import Store, Client, Doctor
+from app.api import api_bp
+from app.utils.response import success_response, error_response
+from app.utils.exceptions import APIException
+from app.utils.sse import broker
+from app.api.authentication import token_required
+from app.services.call_queue import call_queue, queue_channel, doctor_board
+
+STAFF_ROLES = ['admin', 'consultant', 'fulltime_consultant']
+
+
+def _board(store_id):
+    board = call_queue.public_view(call_queue.get_state(store_id))
+    board['doctors'] = doctor_board(store_id)
+    return board
+
+
+@api_bp.route('/stores/<int:store_id>/queue', methods=['GET'])
+def get_store_queue(store_id):
+    """
+    获取门店叫号队列和医生状态（候诊大屏使用，无需登录，姓名已脱敏）
+    
+    @param {int} store_id - 门店ID
+    @return {tuple} - (JSON响应, 状态码)
+    """
+    Store.query.get_or_404(store_id)
+    
+    return success_response(
+        data=_board(store_id),
+        message="获取叫号队列成功"
+    )
+
+
+@api_bp.route('/stores/<int:store_id>/queue/stream', methods=['GET'])
+def stream_store_queue(store_id):
+    """
+    订阅门店叫号队列的实时推送（SSE）
+    
+    事件：queue 队列变化；call 叫号/重呼；doctors 医生状态变化
+    
+    @param {int} store_id - 门店ID
+    @return {Response} - SSE流式响应
+    """
+    Store.query.get_or_404(store_id)
+    board = _board(store_id)
+    doctors = board.pop('doctors')
+    
+    return broker.response([queue_channel(store_id)], [('queue', board), ('doctors', doctors)])
+
+
+@api_bp.route('/stores/<int:store_id>/queue/check-in', methods=['POST'])
+@token_required
+def queue_check_in(store_id):
+    """
+    签到取号；客户为本人取号，工作人员可为指定客户或现场客户取号
+    
+    @param {int} store_id - 门店ID
+    @return {tuple} - (JSON响应, 状态码)
+    """
+    Store.query.get_or_404(store_id)
+    data = request.get_json(silent=True) or {}
+    
+    if g.current_user.role == 'client':
+        client = Client.query.filter_by(user_id=g.current_user.id).first()
+        if not client:
+            return error_response("客户资料不存在", status_code=400)
+        client_id, name = client.id, client.name or g.current_user.username
+    elif g.current_user.role in STAFF_ROLES:
+        client_id = data.get('client_id')
+        name = data.get('name')
+        if client_id:
+            client = Client.query.get(client_id)
+            if not client:
+                return error_response("客户不存在", status_code=400)
+            name = client.name
+        if not name:
+            return error_response("请提供客户或姓名", status_code=400)
+    else:
+        return error_response("无权限操作", status_code=403)
+    
+    doctor_id = data.get('doctor_id')
+    if doctor_id and not Doctor.query.filter_by(id=doctor_id, store_id=store_id).first():
+        return error_response("医生不存在", status_code=400)
+    
+    ticket = call_queue.check_in(store_id, name, client_id=client_id, doctor_id=doctor_id)
+    
+    return success_response(
+        data=ticket,
+        message="取号成功",
+        status_code=201
+    )
+
+
+@api_bp.route('/stores/<int:store_id>/queue/tickets/<int:number>', methods=['GET'])
+@token_required
+def get_queue_ticket(store_id, number):
+    """
+    查询号码状态和前面等候人数
+    
+    @param {int} store_id - 门店ID
+    @param {int} number - 号码
+    @return {tuple} - (JSON响应, 状态码)
+    """
+    state = call_queue.get_state(store_id)
+    ticket = state['tickets'].get(str(number))
+    if ticket is None:
+        return error_response("号码不存在", status_code=404)
+    
+    if g.current_user.role == 'client':
+        client = Client.query.filter_by(user_id=g.current_user.id).first()
+        if not client or client.id != ticket['client_id']:
+            return error_response("无权限访问", status_code=403)
+    
+    ahead = state['waiting'].index(number) if number in state['waiting'] else 0
+    return success_response(
+        data=dict(ticket, ahead=ahead),
+        message="获取号码状态成功"
+    )
+
+
+@api_bp.route('/stores/<int:store_id>/queue/next', methods=['POST'])
+@token_required
+def queue_call_next(store_id):
+    """
+    医生叫下一个号
+    
+    @param {int} store_id - 门店ID
+    @return {tuple} - (JSON响应, 状态码)
+    """
+    if g.current_user.role not in STAFF_ROLES:
+        return error_response("无权限操作", status_code=403)
+    
+    data = request.get_json(silent=True) or {}
+    doctor = Doctor.query.filter_by(id=data.get('doctor_id'), store_id=store_id).first()
+    if not doctor:
+        return error_response("医生不存在", status_code=400)
+    
+    ticket = call_queue.call_next(store_id, doctor.id)
+    
+    return success_response(
+        data=ticket,
+        message="叫号成功" if ticket else "当前无人等候"
+    )
+
+
+@api_bp.route('/stores/<int:store_id>/queue/<int:number>/skip', methods=['POST'])
+@token_required
+def queue_skip(store_id, number):
+    """
+    过号
+    
+    @param {int} store_id - 门店ID
+    @param {int} number - 号码
+    @return {tuple} - (JSON响应, 状态码)
+    """
+    if g.current_user.role not in STAFF_ROLES:
+        return error_response("无权限操作", status_code=403)
+    
+    try:
+        ticket = call_queue.skip(store_id, number)
+    except APIException as e:
+        return error_response(e.message, e.errors, e.status_code)
+    
+    return success_response(
+        data=ticket,
+        message="已过号"
+    )
+
+
+@api_bp.route('/stores/<int:store_id>/queue/<int:number>/recall', methods=['POST'])
+@token_required
+def queue_recall(store_id, number):
+    """
+    重呼号码
+    
+    @param {int} store_id - 门店ID
+    @param {int} number - 号码
+    @return {tuple} - (JSON响应, 状态码)
+    """
+    if g.current_user.role not in STAFF_ROLES:
+        return error_response("无权限操作", status_code=403)
+    
+    try:
+        ticket = call_queue.recall(store_id, number)
+    except APIException as e:
+        return error_response(e.message, e.errors, e.status_code)
+    
+    return success_response(
+        data=ticket,
+        message="已重呼"
+    )
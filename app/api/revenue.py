@@ -0,0 +1,54 @@
+"""
+营收统计API
+"""
+from flask import request, g
+from app.models import Consultant
+from app.api import api_bp
+from app.utils.response import success_response, error_response
+from app.utils.exceptions import APIException
+from app.api.authentication import token_required
+from app.services.revenue import get_revenue_report, parse_date_range
+
+CONSULTANT_ROLES = ['consultant', 'fulltime_consultant']
+
+
+@api_bp.route('/revenue', methods=['GET'])
+@token_required
+def get_revenue():
+    """
+    获取营收统计（读取按天的营收汇总表）
+
+    查询参数：start、end（YYYY-MM-DD，含，默认最近30天）、period（day/week/month/quarter）、
+    group_by（逗号分隔的 store/doctor/consultant/type）、store_id、doctor_id、consultant_id、type；
+    咨询师只能查看本人负责的营收
+
+    @return {tuple} - (JSON响应, 状态码)
+    """
+    consultant_id = request.args.get('consultant_id', type=int)
+    if g.current_user.role in CONSULTANT_ROLES:
+        consultant = Consultant.query.filter_by(user_id=g.current_user.id).first()
+        if not consultant:
+            return error_response("咨询师信息不存在", status_code=404)
+        consultant_id = consultant.id
+    elif g.current_user.role != 'admin':
+        return error_response("无权限访问", status_code=403)
+
+    group_by = [name.strip() for name in request.args.get('group_by', '').split(',') if name.strip()]
+    try:
+        start, end = parse_date_range(request.args.get('start'), request.args.get('end'))
+        report = get_revenue_report(
+            start, end,
+            period=request.args.get('period', 'day'),
+            group_by=group_by,
+            store_id=request.args.get('store_id', type=int),
+            doctor_id=request.args.get('doctor_id', type=int),
+            consultant_id=consultant_id,
+            treatment_type=request.args.get('type')
+        )
+    except APIException as e:
+        return error_response(e.message, status_code=e.status_code)
+
+    return success_response(
+        data=report,
+        message="获取营收统计成功"
+    )
@@ -0,0 +1,86 @@
+"""
+预约排班相关API
+"""
+from datetime import date, timedelta
+from flask import request, current_app
+from app.models import Store, Doctor
+from app.api import api_bp
+from app.utils.response import success_response, error_response
+from app.api.authentication import token_required
+from app.services.scheduling import find_free_slots
+
+
+def _parse_range_args():
+    """
+    解析空闲时段查询的日期范围和时长参数
+
+    @return {tuple} - (开始日期, 结束日期, 时长分钟, 错误信息)
+    """
+    try:
+        start_date = date.fromisoformat(request.args['start_date']) if request.args.get('start_date') else date.today()
+        end_date = date.fromisoformat(request.args['end_date']) if request.args.get('end_date') else start_date
+    except ValueError:
+        return None, None, None, "日期格式应为YYYY-MM-DD"
+
+    max_days = current_app.config.get('SCHEDULE_MAX_RANGE_DAYS', 31)
+    if end_date < start_date or end_date - start_date >= timedelta(days=max_days):
+        return None, None, None, f"日期范围无效，最多查询{max_days}天"
+
+    duration = request.args.get('duration', current_app.config.get('SCHEDULE_DEFAULT_DURATION', 30), type=int)
+    if not duration or duration <= 0 or duration > 8 * 60:
+        return None, None, None, "无效的预约时长"
+    return start_date, end_date, duration, None
+
+
+@api_bp.route('/stores/<int:store_id>/free-slots', methods=['GET'])
+@token_required
+def get_store_free_slots(store_id):
+    """
+    获取门店医生的可预约时段
+    
+    查询参数：start_date、end_date为日期范围（默认今天）；duration为预约时长（分钟）；
+    doctor_id、specialty可筛选医生
+    
+    @param {int} store_id - 门店ID
+    @return {tuple} - (JSON响应, 状态码)
+    """
+    store = Store.query.get_or_404(store_id)
+    
+    start_date, end_date, duration, error_msg = _parse_range_args()
+    if error_msg:
+        return error_response(error_msg, status_code=400)
+    
+    query = Doctor.query.filter(Doctor.store_id == store_id, Doctor.status != 'off_duty')
+    doctor_id = request.args.get('doctor_id', type=int)
+    specialty = request.args.get('specialty')
+    if doctor_id:
+        query = query.filter(Doctor.id == doctor_id)
+    if specialty:
+        query = query.filter(Doctor.specialty.like(f'%{specialty}%'))
+    
+    return success_response(
+        data=find_free_slots(store, query.all(), start_date, end_date, duration),
+        message="获取可预约时段成功"
+    )
+
+
+@api_bp.route('/doctors/<int:doctor_id>/free-slots', methods=['GET'])
+@token_required
+def get_doctor_free_slots(doctor_id):
+    """
+    获取医生的可预约时段
+    
+    @param {int} doctor_id - 医生ID
+    @return {tuple} - (JSON响应, 状态码)
+    """
+    doctor = Doctor.query.get_or_404(doctor_id)
+    store = Store.query.get_or_404(doctor.store_id)
+    
+    start_date, end_date, duration, error_msg = _parse_range_args()
+    if error_msg:
+        return error_response(error_msg, status_code=400)
+    
+    return success_response(
+        data=find_free_slots(store, [doctor], start_date, end_date, duration)[0],
+        message="获取可预约时段成功"
+    )
@@ -0,0 +1,81 @@
+"""
+客户RFM分群相关API
+"""
+from flask import request, g
+from app.models import Client, Consultant, ClientSegment
+from app.api import api_bp
+from app.utils.response import success_response, error_response
+from app.api.authentication import token_required
+from app.services.segmentation import compute_segments, get_segment_summary
+
+CONSULTANT_ROLES = ['consultant', 'fulltime_consultant']
+
+
+@api_bp.route('/segments', methods=['GET'])
+@token_required
+def get_segments():
+    """
+    获取各RFM分群的客户数量；咨询师只统计自己的客户
+    
+    @return {tuple} - (JSON响应, 状态码)
+    """
+    if g.current_user.role in CONSULTANT_ROLES:
+        consultant = Consultant.query.filter_by(user_id=g.current_user.id).first()
+        if not consultant:
+            return error_response("咨询师信息不存在", status_code=404)
+        consultant_id = consultant.id
+    elif g.current_user.role == 'admin':
+        consultant_id = request.args.get('consultant_id', type=int)
+    else:
+        return error_response("无权限访问", status_code=403)
+    
+    return success_response(
+        data=get_segment_summary(consultant_id),
+        message="获取客户分群成功"
+    )
+
+
+@api_bp.route('/clients/<int:client_id>/segment', methods=['GET'])
+@token_required
+def get_client_segment(client_id):
+    """
+    获取单个客户的RFM指标和分群
+    
+    @param {int} client_id - 客户ID
+    @return {tuple} - (JSON响应, 状态码)
+    """
+    client = Client.query.get_or_404(client_id)
+    
+    if g.current_user.role in CONSULTANT_ROLES:
+        consultant = Consultant.query.filter_by(user_id=g.current_user.id).first()
+        if not consultant or client.assigned_consultant_id != consultant.id:
+            return error_response("无权限访问", status_code=403)
+    elif g.current_user.role != 'admin':
+        return error_response("无权限访问", status_code=403)
+    
+    segment = ClientSegment.query.get(client_id)
+    
+    return success_response(
+        data=segment.to_dict() if segment else None,
+        message="获取客户分群成功" if segment else "该客户暂无分群"
+    )
+
+
+@api_bp.route('/segments/compute', methods=['POST'])
+@token_required
+def compute_client_segments():
+    """
+    重新计算客户分群（管理员）；full=true时全量计算并重新确定分档阈值
+    
+    @return {tuple} - (JSON响应, 状态码)
+    """
+    if g.current_user.role != 'admin':
+        return error_response("无权限操作", status_code=403)
+    
+    data = request.get_json(silent=True) or {}
+    result = compute_segments(full=bool(data.get('full')))
+    
+    return success_response(
+        data=result,
+        message="客户分群计算完成"
+    )
@@ -1,7 +1,7 @@
 """
 门店相关API
 """
-from flask import request, g
+from flask import request, g, abort, current_app
 from app import db
 from app.models import Store, Doctor, Consultant
 from app.api import api_bp
@@ -9,6 +9,8 @@ from app.utils.response import success_response, error_response, paginated_respo
 from app.utils.exceptions import NotFoundException, ForbiddenException, ValidationException
 from app.utils.validators import validate_required_fields
 from app.api.authentication import token_required
+from app.services.catalog import get_store_detail
+from app.services.geo import find_nearby_stores
 from datetime import datetime
 import json
 
@@ -45,6 +47,38 @@ def get_stores():
         message="获取门店列表成功"
     )
 
+@api_bp.route('/stores/nearby', methods=['GET'])
+@token_required
+def get_nearby_stores():
+    """
+    获取距离最近的门店
+    
+    查询参数：lat、lng为必填的经纬度；k为返回数量（默认5，最多50）；radius为最大距离（公里）；
+    specialty为专长领域；open_now=1时只返回当前营业中的门店
+    
+    @return {tuple} - (JSON响应, 状态码)
+    """
+    lat = request.args.get('lat', type=float)
+    lng = request.args.get('lng', type=float)
+    if lat is None or lng is None or not -90 <= lat <= 90 or not -180 <= lng <= 180:
+        return error_response("请提供有效的经纬度", status_code=400)
+    
+    k = min(max(request.args.get('k', 5, type=int), 1), 50)
+    radius = request.args.get('radius', type=float)
+    specialty = request.args.get('specialty')
+    open_now = request.args.get('open_now', '').lower() in ('1', 'true', 'yes')
+    
+    stores = find_nearby_stores(
+        lat, lng, k=k, radius_km=radius, specialty=specialty, open_now=open_now,
+        cell_degrees=current_app.config.get('GEO_INDEX_CELL_DEGREES', 0.1),
+        refresh_seconds=current_app.config.get('GEO_INDEX_REFRESH_SECONDS', 60)
+    )
+    
+    return success_response(
+        data=stores,
+        message="获取附近门店成功"
+    )
+
 @api_bp.route('/stores/<int:store_id>', methods=['GET'])
 @token_required
 def get_store(store_id):
@@ -54,15 +88,10 @@ def get_store(store_id):
     @param {int} store_id - 门店ID
     @return {tuple} - (JSON响应, 状态码)
     """
-    store = Store.query.get_or_404(store_id)
-    
-    # 获取门店的医生和咨询师信息
-    doctors = Doctor.query.filter_by(store_id=store_id).all()
-    consultants = Consultant.query.filter_by(store_id=store_id).all()
-    
-    store_data = store.to_dict()
-    store_data['doctors'] = [doctor.to_dict() for doctor in doctors]
-    store_data['consultants'] = [consultant.to_dict() for consultant in consultants]
+    # 门店详情（含医生和咨询师信息）走缓存，门店/医生/咨询师变更时按标签失效
+    store_data = get_store_detail(store_id)
+    if store_data is None:
+        abort(404)
     
     return success_response(
         data=store_data,
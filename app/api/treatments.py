@@ -1,17 +1,27 @@
 """
 治疗记录相关API
 """
-from flask import request, g
+from flask import request, g, current_app
 from app import db
 from app.models import Treatment, Client, Doctor, Store, Consultant
 from app.api import api_bp
 from app.utils.response import success_response, error_response, paginated_response
-from app.utils.exceptions import NotFoundException, ForbiddenException, ValidationException
+from app.utils.exceptions import NotFoundException, ForbiddenException, ValidationException, APIException
 from app.utils.validators import validate_required_fields
 from app.api.authentication import token_required
+from app.services import scheduling
+from app.services.ratings import submit_rating
+from app.services.commission import record_payment_commission
+from app.utils.export import export_response
 from datetime import datetime
 import json
 
+# 导出的治疗记录字段
+TREATMENT_EXPORT_COLUMNS = (Treatment.id, Treatment.external_id, Treatment.client_id, Treatment.store_id,
+                            Treatment.doctor_id, Treatment.consultant_id, Treatment.type, Treatment.fee,
+                            Treatment.paid_amount, Treatment.payment_status, Treatment.status,
+                            Treatment.appointment_date, Treatment.duration_minutes, Treatment.created_at)
+
 @api_bp.route('/treatments', methods=['GET'])
 @token_required
 def get_treatments():
@@ -54,6 +64,44 @@ def get_treatments():
         message="获取治疗记录列表成功"
     )
 
+@api_bp.route('/treatments/export', methods=['GET'])
+@token_required
+def export_treatments():
+    """
+    流式导出治疗记录（按ID升序，不分页）
+    
+    查询参数：format（csv/ndjson，默认csv），以及与列表相同的过滤条件 client_id、doctor_id、
+    store_id、status、type；咨询师只能导出本人负责或名下客户的治疗记录
+    
+    @return {Response} - CSV或NDJSON文件（分块传输）
+    """
+    query = Treatment.query
+    if g.current_user.role in ['consultant', 'fulltime_consultant']:
+        consultant = Consultant.query.filter_by(user_id=g.current_user.id).first()
+        if not consultant:
+            return error_response("咨询师信息不存在", status_code=404)
+        query = query.filter(db.or_(
+            Treatment.consultant_id == consultant.id,
+            Treatment.client_id.in_(db.select(Client.id).where(Client.assigned_consultant_id == consultant.id))
+        ))
+    elif g.current_user.role != 'admin':
+        return error_response("无权限访问", status_code=403)
+    
+    for name in ('client_id', 'doctor_id', 'store_id'):
+        value = request.args.get(name, type=int)
+        if value:
+            query = query.filter(getattr(Treatment, name) == value)
+    if request.args.get('status'):
+        query = query.filter(Treatment.status == request.args['status'])
+    if request.args.get('type'):
+        query = query.filter(Treatment.type == request.args['type'])
+    
+    try:
+        return export_response(query.with_entities(*TREATMENT_EXPORT_COLUMNS).order_by(Treatment.id).statement,
+                               request.args.get('format', 'csv'), 'treatments')
+    except APIException as e:
+        return error_response(e.message, status_code=e.status_code)
+
 @api_bp.route('/treatments/<int:treatment_id>', methods=['GET'])
 @token_required
 def get_treatment(treatment_id):
@@ -106,6 +154,10 @@ def create_treatment():
     if not store:
         return error_response("门店不存在", status_code=400)
     
+    duration = data.get('duration_minutes', current_app.config.get('SCHEDULE_DEFAULT_DURATION', 30))
+    if not isinstance(duration, int) or duration <= 0 or duration > 8 * 60:
+        return error_response("无效的预约时长", status_code=400)
+    
     # 创建新治疗记录
     new_treatment = Treatment(
         client_id=data['client_id'],
@@ -115,11 +167,21 @@ def create_treatment():
         description=data.get('description'),
         fee=data.get('fee'),
         appointment_date=datetime.fromisoformat(data['appointment_date']),
+        duration_minutes=duration,
         status='scheduled',
         consultant_id=g.current_user.id if g.current_user.role in ['consultant', 'fulltime_consultant'] else None
     )
     
     db.session.add(new_treatment)
+    db.session.flush()
+    
+    # 占用医生时段，时段冲突时整个预约回滚
+    try:
+        scheduling.reserve(new_treatment)
+    except APIException as e:
+        db.session.rollback()
+        return error_response(e.message, e.errors, e.status_code)
+    
     db.session.commit()
     
     return success_response(
@@ -150,13 +212,28 @@ def update_treatment(treatment_id):
     if not is_valid:
         return error_response(error_msg, status_code=400)
     
+    duration = data.get('duration_minutes', treatment.duration_minutes)
+    if not isinstance(duration, int) or duration <= 0 or duration > 8 * 60:
+        return error_response("无效的预约时长", status_code=400)
+    
     # 更新治疗记录
+    appointment_date = datetime.fromisoformat(data['appointment_date'])
+    time_changed = appointment_date != treatment.appointment_date or duration != treatment.duration_minutes
     treatment.type = data['type']
     treatment.description = data.get('description')
     treatment.fee = data.get('fee')
-    treatment.appointment_date = datetime.fromisoformat(data['appointment_date'])
+    treatment.appointment_date = appointment_date
+    treatment.duration_minutes = duration
     treatment.updated_at = datetime.utcnow()
     
+    # 改期后重新占用医生时段
+    if time_changed:
+        try:
+            scheduling.reschedule(treatment)
+        except APIException as e:
+            db.session.rollback()
+            return error_response(e.message, e.errors, e.status_code)
+    
     db.session.commit()
     
     return success_response(
@@ -184,10 +261,20 @@ def update_treatment_status(treatment_id):
     if 'status' not in data or data['status'] not in ['scheduled', 'in_progress', 'completed', 'cancelled']:
         return error_response("无效的状态值", status_code=400)
     
-    # 更新治疗记录状态
+    # 更新治疗记录状态，取消时释放医生时段，恢复时重新占用
+    previous_status = treatment.status
     treatment.status = data['status']
     treatment.updated_at = datetime.utcnow()
     
+    try:
+        if data['status'] == 'cancelled' and previous_status != 'cancelled':
+            scheduling.release(treatment)
+        elif previous_status == 'cancelled' and data['status'] != 'cancelled':
+            scheduling.reserve(treatment)
+    except APIException as e:
+        db.session.rollback()
+        return error_response(e.message, e.errors, e.status_code)
+    
     db.session.commit()
     
     return success_response(
@@ -226,6 +313,9 @@ def update_treatment_payment(treatment_id):
     
     treatment.updated_at = datetime.utcnow()
     
+    # 按实收金额变化追加客户消费提成流水，与支付信息一起提交
+    record_payment_commission(treatment)
+    
     db.session.commit()
     
     return success_response(
@@ -253,23 +343,16 @@ def rate_treatment(treatment_id):
     if 'rating' not in data or not isinstance(data['rating'], (int, float)) or data['rating'] < 1 or data['rating'] > 5:
         return error_response("无效的评分", status_code=400)
     
-    # 更新评分
-    treatment.rating = data['rating']
-    treatment.updated_at = datetime.utcnow()
-    
-    # 更新医生的平均评分
-    doctor = treatment.doctor
-    treatments_with_rating = Treatment.query.filter(
-        Treatment.doctor_id == doctor.id,
-        Treatment.rating.isnot(None)
-    ).all()
-    
-    doctor.rating = sum(t.rating for t in treatments_with_rating) / len(treatments_with_rating)
-    doctor.rating_count = len(treatments_with_rating)
+    # 写入评价，并增量更新医生、咨询师、门店的评分汇总
+    try:
+        rating = submit_rating(treatment, data['rating'], data.get('comment'))
+    except APIException as e:
+        db.session.rollback()
+        return error_response(e.message, e.errors, e.status_code)
     
     db.session.commit()
     
     return success_response(
-        data=treatment.to_dict(),
+        data=rating.to_dict(),
         message="评价成功"
     ) 
\ No newline at end of file
@@ -7,6 +7,12 @@ from app.models import User
 from app.api import api_bp
 from app.api.authentication import token_required
 from app.utils.validators import validate_email, validate_phone, validate_password
+from app.utils.export import export_response
+from app.utils.exceptions import APIException
+
+# 导出的用户字段（不含密码哈希）
+USER_EXPORT_COLUMNS = (User.id, User.username, User.email, User.phone, User.role, User.is_active, User.is_verified,
+                       User.created_at)
 
 @api_bp.route('/users', methods=['GET'])
 @token_required
@@ -14,6 +20,8 @@ def get_users():
     """
     获取用户列表 (仅管理员)
     
+    一次返回全部匹配的用户，用户量大时请使用 /users/export 流式导出
+    
     @return {json} - 用户列表数据
     """
     # 检查权限，只有管理员可以查看所有用户
@@ -45,6 +53,37 @@ def get_users():
         'data': [user.to_dict() for user in users]
     }), 200
 
+@api_bp.route('/users/export', methods=['GET'])
+@token_required
+def export_users():
+    """
+    流式导出用户 (仅管理员，按ID升序，不分页)
+    
+    查询参数：format（csv/ndjson，默认csv）、role、is_active
+    
+    @return {Response} - CSV或NDJSON文件（分块传输）
+    """
+    if g.current_user.role != 'admin':
+        return jsonify({
+            'message': '没有权限访问该资源',
+            'code': 403
+        }), 403
+    
+    query = User.query
+    if request.args.get('role'):
+        query = query.filter(User.role == request.args['role'])
+    if request.args.get('is_active') is not None:
+        query = query.filter(User.is_active == (request.args['is_active'].lower() == 'true'))
+    
+    try:
+        return export_response(query.with_entities(*USER_EXPORT_COLUMNS).order_by(User.id).statement,
+                               request.args.get('format', 'csv'), 'users')
+    except APIException as e:
+        return jsonify({
+            'message': e.message,
+            'code': e.status_code
+        }), e.status_code
+
 @api_bp.route('/users/<int:user_id>', methods=['GET'])
 @token_required
 def get_user(user_id):
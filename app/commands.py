@@ -0,0 +1,202 @@
+"""
+命令行工具，通过 flask <命令> 执行
+"""
+import click
+
+
+def register_commands(app):
+    """
+    注册命令行命令
+
+    @param {Flask} app - Flask应用实例
+    """
+    @app.cli.command('rebuild-rollups')
+    def rebuild_rollups_command():
+        """根据明细表全量重建统计汇总表"""
+        from app.models.stats import rebuild_rollups
+        from app.utils.cache import cache
+        result = rebuild_rollups()
+        cache.invalidate_tags('dashboard')
+        for table, rows in result.items():
+            click.echo(f'{table}: {rows} 行')
+    
+    @app.cli.command('reconcile-consultant-counters')
+    def reconcile_consultant_counters_command():
+        """根据客户表和消息表重算咨询师汇总（建议每天执行）"""
+        from app.models.stats import reconcile_consultant_counters
+        from app.utils.cache import cache
+        result = reconcile_consultant_counters()
+        cache.invalidate_tags('dashboard')
+        click.echo(f"咨询师: {result['consultant_counters']}，按天活动: {result['consultant_daily_activity']} 行，"
+                   f"修正: {result['corrected']}")
+    
+    @app.cli.command('rebuild-consultant-closure')
+    def rebuild_consultant_closure_command():
+        """根据指导关系全量重建咨询师闭包表"""
+        from app.models.hierarchy import rebuild_closure
+        click.echo(f'闭包表: {rebuild_closure()} 行')
+    
+    @app.cli.command('sync-appointment-slots')
+    def sync_appointment_slots_command():
+        """为已有的未来预约补充医生时段占用"""
+        from app.services.scheduling import backfill_reservations
+        result = backfill_reservations()
+        click.echo(f"已占用: {result['reserved']} 个预约")
+        for conflict in result['conflicts']:
+            click.echo(f"冲突: 治疗记录 {conflict['treatment_id']} - {conflict['reason']}")
+    
+    @app.cli.command('rebuild-rating-aggregates')
+    def rebuild_rating_aggregates_command():
+        """根据评价明细全量重建评分汇总"""
+        from app.services.ratings import rebuild_aggregates
+        result = rebuild_aggregates()
+        for subject_type, rows in result.items():
+            click.echo(f'{subject_type}: {rows} 行')
+    
+    @app.cli.command('rebuild-client-search')
+    def rebuild_client_search_command():
+        """重新计算客户的手机号倒序和拼音首字母搜索键"""
+        from app.services.clients import rebuild_search_keys
+        click.echo(f'已更新: {rebuild_search_keys()} 个客户')
+    
+    @app.cli.command('compute-rfm')
+    @click.option('--full', is_flag=True, help='全量计算并重新确定分档阈值')
+    def compute_rfm_command(full):
+        """计算客户RFM分群（默认只重算有新治疗记录的客户）"""
+        from app.services.segmentation import compute_segments
+        result = compute_segments(full=full)
+        click.echo(f"{result['mode']}: 已更新 {result['client_count']} 个客户")
+    
+    @app.cli.command('predict-visits')
+    @click.option('--no-retrain', is_flag=True, help='沿用最近一次训练的模型，只重新评分')
+    def predict_visits_command(no_retrain):
+        """训练下次就诊预测模型并为全部客户评分（建议每晚执行）"""
+        from app.services.prediction import predict_visits
+        result = predict_visits(retrain=not no_retrain)
+        click.echo(f"模型 {result['model_id']}: {result['treatment_count']} 条治疗记录，"
+                   f"已预测 {result['client_count']} 个客户")
+    
+    @app.cli.command('settle-commissions')
+    @click.option('--month', default=None, help='结算月份（YYYY-MM），默认上月')
+    def settle_commissions_command(month):
+        """补记认领对价提成并生成月度提成结算单（建议每月初执行）"""
+        from datetime import date, timedelta
+        from app.services.commission import generate_statements
+        if month is None:
+            month = (date.today().replace(day=1) - timedelta(days=1)).strftime('%Y-%m')
+        result = generate_statements(month)
+        click.echo(f"{result['month']}: 补记认领提成 {result['claim_entries']} 条，"
+                   f"结算单 {result['statement_count']} 份，合计 {result['total_amount']}")
+    
+    @app.cli.command('sync-finance')
+    @click.option('--source', default=None, help='数据源（file/database），默认取 FINANCE_SYNC_SOURCE')
+    @click.option('--max-batches', default=None, type=int, help='最多同步的批数，默认同步到没有新记录为止')
+    def sync_finance_command(source, max_batches):
+        """从财务系统增量同步消费记录（可重复执行，中断后从上次提交的位置继续）"""
+        from app.services.finance_sync import sync_finance, make_source
+        config = dict(app.config, FINANCE_SYNC_SOURCE=source) if source else app.config
+        result = sync_finance(make_source(config), max_batches)
+        click.echo(f"{result['source']}: {result['batches']} 批，新增 {result['inserted']}，更新 {result['updated']}，"
+                   f"未变化 {result['unchanged']}，无效 {result['invalid']}，未匹配客户 {result['unmatched']}，"
+                   f"同步至 {result['watermark']}")
+    
+    @app.cli.command('sweep-orphans')
+    @click.option('--no-assign', is_flag=True, help='只标记孤儿客户，不自动重新分配')
+    def sweep_orphans_command(no_assign):
+        """标记超期未联系的孤儿客户并自动重新分配"""
+        from app.models import Client
+        from app.services.assignment import sweep_orphans
+        if no_assign:
+            click.echo(f'新增孤儿客户: {Client.check_orphan_status()}')
+            return
+        result = sweep_orphans()
+        click.echo(f"新增孤儿客户: {result['orphan_count']}")
+        if result['assignment']:
+            click.echo(f"已分配: {result['assignment']['assigned']} / {result['assignment']['candidates']}")
+    
+    @app.cli.command('bench-claims')
+    @click.option('--clients', default=2000, help='孤儿客户数')
+    @click.option('--claimers', default=16, help='并发认领的咨询师数（每人一个线程）')
+    @click.option('--batch', default=1, help='每次认领的客户数')
+    def bench_claims_command(clients, claimers, batch):
+        """孤儿客户并发认领压测：所有咨询师同时认领同一批客户，检查没有重复认领（仅限测试配置）"""
+        import random
+        import threading
+        import time
+        from sqlalchemy import func
+        from app import db
+        from app.models import User, Client, Consultant, ClientClaim, ConsultantCounter
+        from app.services.claims import claim_clients
+        if not app.config.get('TESTING'):
+            raise click.ClickException('压测会写入测试数据，只能在测试配置下运行（FLASK_CONFIG=testing）')
+
+        # 准备数据：原咨询师名下的孤儿客户和参与认领的咨询师
+        tag = f'bench{int(time.time())}'
+        consultant_ids = []
+        for index in range(claimers + 1):
+            user = User(username=f'{tag}_c{index}', role='consultant')
+            db.session.add(user)
+            db.session.flush()
+            consultant = Consultant(user_id=user.id, type='parttime', verified=True)
+            db.session.add(consultant)
+            db.session.flush()
+            consultant_ids.append(consultant.id)
+        former_id, consultant_ids = consultant_ids[0], consultant_ids[1:]
+        orphans = [Client(name=f'{tag}_{index}', assigned_consultant_id=former_id, is_orphan=True)
+                   for index in range(clients)]
+        db.session.add_all(orphans)
+        db.session.commit()
+        client_ids = [client.id for client in orphans]
+        db.session.remove()
+
+        won, errors = {}, []
+        start_barrier = threading.Barrier(claimers)
+
+        def claimer(consultant_id):
+            order = list(client_ids)
+            random.shuffle(order)
+            mine = []
+            with app.app_context():
+                start_barrier.wait()
+                try:
+                    for start in range(0, len(order), batch):
+                        mine.extend(claim_clients(order[start:start + batch], consultant_id)['claimed'])
+                except Exception as e:
+                    errors.append(repr(e))
+                finally:
+                    db.session.remove()
+            won[consultant_id] = mine
+
+        threads = [threading.Thread(target=claimer, args=(consultant_id,)) for consultant_id in consultant_ids]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        # 校验：每个客户恰好被认领一次，归属与胜者一致，咨询师汇总与认领数一致
+        winners = {}
+        for consultant_id, ids in won.items():
+            for client_id in ids:
+                winners.setdefault(client_id, []).append(consultant_id)
+        duplicated = [client_id for client_id, owners in winners.items() if len(owners) > 1]
+        owners = dict(db.session.query(Client.id, Client.assigned_consultant_id).filter(Client.id.in_(client_ids)))
+        mismatched = [client_id for client_id, ids in winners.items() if owners.get(client_id) != ids[0]]
+        claim_rows = db.session.query(func.count(ClientClaim.id)).filter(ClientClaim.client_id.in_(client_ids)).scalar()
+        counters = dict(db.session.query(ConsultantCounter.consultant_id, ConsultantCounter.client_count).filter(
+            ConsultantCounter.consultant_id.in_(consultant_ids)
+        ))
+        counter_errors = [consultant_id for consultant_id in consultant_ids
+                          if counters.get(consultant_id, 0) != len(won.get(consultant_id, []))]
+
+        attempts = clients * claimers
+        click.echo(f'{claimers} 个线程，每次认领 {batch} 个，耗时 {elapsed:.2f}s')
+        click.echo(f'认领成功 {len(winners)} / {clients}，尝试 {attempts} 次（{attempts / elapsed:.0f} 次/秒），'
+                   f'成功 {len(winners) / elapsed:.0f} 个/秒')
+        click.echo(f'重复认领: {len(duplicated)}，归属不一致: {len(mismatched)}，认领记录: {claim_rows}，'
+                   f'汇总不一致: {len(counter_errors)}，异常: {len(errors)}')
+        for error in errors[:5]:
+            click.echo(error)
+        if duplicated or mismatched or claim_rows != len(winners) or len(winners) != clients or counter_errors or errors:
+            raise click.ClickException('压测校验失败')
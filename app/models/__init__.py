@@ -10,4 +10,16 @@ from app.models.store import Store
 from app.models.doctor import Doctor
 from app.models.treatment import Treatment
 from app.models.message import Message, GroupMessage
-from app.models.knowledge import KnowledgeArticle, KnowledgeQA 
\ No newline at end of file
+from app.models.knowledge import KnowledgeArticle, KnowledgeQA 
+from app.models.stats import MonthlySignupRollup, TreatmentTypeRollup, ConsultantCounter, ConsultantDailyActivity, \
+    DailyRevenueRollup
+from app.models.schedule import AppointmentSlot
+from app.models.queue import QueueSnapshot
+from app.models.rating import Rating, RatingAggregate
+from app.models.checkin import CheckIn
+from app.models.segment import ClientSegment, SegmentRun, SEGMENT_LABELS
+from app.models.prediction import PredictionModel, VisitPrediction
+from app.models.claim import ClientClaim
+from app.models.hierarchy import ConsultantClosure
+from app.models.commission import CommissionEntry, CommissionStatement
+from app.models.finance import FinanceSyncState
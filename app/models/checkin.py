@@ -0,0 +1,38 @@
+from datetime import datetime
+from app import db
+
+
+class CheckIn(db.Model):
+    """
+    到店签到记录
+
+    @property id - 记录ID
+    @property client_id - 客户ID
+    @property store_id - 门店ID
+    @property checked_in_at - 签到时间
+    @property notified_at - 推送完成时间
+    @property notified_users - 已通知的用户ID（逗号分隔）
+    """
+    __tablename__ = 'check_ins'
+    __table_args__ = (
+        db.Index('ix_check_ins_store_checked_in', 'store_id', 'checked_in_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    client_id = db.Column(db.Integer, db.ForeignKey('clients.id'), index=True)
+    store_id = db.Column(db.Integer, db.ForeignKey('stores.id'), nullable=False)
+    checked_in_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    notified_at = db.Column(db.DateTime)
+    notified_users = db.Column(db.String(256))
+
+    def __repr__(self):
+        return f'<CheckIn Client {self.client_id} at Store {self.store_id}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'client_id': self.client_id,
+            'store_id': self.store_id,
+            'checked_in_at': self.checked_in_at.isoformat() if self.checked_in_at else None,
+            'notified_at': self.notified_at.isoformat() if self.notified_at else None
+        }
@@ -0,0 +1,42 @@
+from datetime import datetime
+from app import db
+
+
+class ClientClaim(db.Model):
+    """
+    孤儿客户认领记录
+
+    @property id - 记录ID
+    @property client_id - 客户ID
+    @property consultant_id - 认领的咨询师ID
+    @property previous_consultant_id - 认领前的咨询师ID
+    @property fee - 认领费用（0表示免费认领）
+    @property source - 认领来源（manual/batch/import）
+    @property claimed_at - 认领时间
+    """
+    __tablename__ = 'client_claims'
+    __table_args__ = (
+        db.Index('ix_client_claims_consultant_claimed', 'consultant_id', 'claimed_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    client_id = db.Column(db.Integer, db.ForeignKey('clients.id', ondelete='CASCADE'), nullable=False, index=True)
+    consultant_id = db.Column(db.Integer, db.ForeignKey('consultants.id', ondelete='CASCADE'), nullable=False)
+    previous_consultant_id = db.Column(db.Integer, db.ForeignKey('consultants.id', ondelete='SET NULL'))
+    fee = db.Column(db.Float, nullable=False, default=0)
+    source = db.Column(db.String(16), nullable=False, default='manual')
+    claimed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ClientClaim Client {self.client_id} by Consultant {self.consultant_id}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'client_id': self.client_id,
+            'consultant_id': self.consultant_id,
+            'previous_consultant_id': self.previous_consultant_id,
+            'fee': self.fee,
+            'source': self.source,
+            'claimed_at': self.claimed_at.isoformat() if self.claimed_at else None
+        }
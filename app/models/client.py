@@ -1,6 +1,9 @@
 from datetime import datetime
 from app import db
 from app.models.user import User
+from sqlalchemy import event, inspect
+from app.utils.cache import invalidate_on_commit
+from app.utils.search import reverse_phone, pinyin_initials
 
 class Client(db.Model):
     """
@@ -13,10 +16,27 @@ class Client(db.Model):
     @property age - 年龄
     @property address - 地址
     @property contact_info - 联系方式
+    @property phone_reversed - 倒序手机号（按后几位查找）
+    @property name_initials - 姓名拼音首字母
+    @property sentiment_ema - 客户消息情感分数的指数移动平均
     @property created_at - 创建时间
     @property updated_at - 更新时间
     """
     __tablename__ = 'clients'
+    __table_args__ = (
+        # 客户列表按归属/孤儿状态过滤，按最后联系时间键集分页
+        db.Index('ix_clients_consultant_last_contact', 'assigned_consultant_id', 'last_contact'),
+        db.Index('ix_clients_orphan_last_contact', 'is_orphan', 'last_contact'),
+        db.Index('ix_clients_last_contact', 'last_contact'),
+        # 快速查找：手机号前缀/后缀、姓名前缀、拼音首字母前缀
+        db.Index('ix_clients_contact_info', 'contact_info'),
+        db.Index('ix_clients_phone_reversed', 'phone_reversed'),
+        db.Index('ix_clients_name', 'name'),
+        db.Index('ix_clients_name_initials', 'name_initials'),
+    )
+    
+    # 最近多少天内联系过视为活跃客户
+    ACTIVE_DAYS = 30
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
@@ -26,6 +46,10 @@ class Client(db.Model):
     address = db.Column(db.String(256))
     contact_info = db.Column(db.String(128))
     
+    # 搜索键，写入时由事件维护
+    phone_reversed = db.Column(db.String(20))
+    name_initials = db.Column(db.String(64))
+    
     # 客户标签，逗号分隔
     tags = db.Column(db.String(256))
     
@@ -35,6 +59,9 @@ class Client(db.Model):
     # 最后一次与咨询师沟通的时间
     last_contact = db.Column(db.DateTime)
     
+    # 客户消息情感分数的指数移动平均（-1.0 到 1.0），用于跟进优先级
+    sentiment_ema = db.Column(db.Float)
+    
     # 创建和更新时间
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -47,6 +74,15 @@ class Client(db.Model):
     def __repr__(self):
         return f'<Client {self.name}>'
     
+    @property
+    def status(self):
+        """活跃状态：未成为孤儿且最近ACTIVE_DAYS天内联系过为active，否则为inactive"""
+        from datetime import timedelta
+        threshold = datetime.utcnow() - timedelta(days=self.ACTIVE_DAYS)
+        if not self.is_orphan and self.last_contact and self.last_contact >= threshold:
+            return 'active'
+        return 'inactive'
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -58,7 +94,9 @@ class Client(db.Model):
             'contact_info': self.contact_info,
             'tags': self.tags,
             'is_orphan': self.is_orphan,
+            'status': self.status,
             'last_contact': self.last_contact.isoformat() if self.last_contact else None,
+            'sentiment_ema': self.sentiment_ema,
             'assigned_consultant_id': self.assigned_consultant_id,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
@@ -80,4 +118,18 @@ class Client(db.Model):
             client.is_orphan = True
             
         db.session.commit()
-        return len(orphan_clients) 
\ No newline at end of file
+        return len(orphan_clients) 
+
+
+invalidate_on_commit(Client, lambda client: [f'client:{client.id}'])
+
+
+@event.listens_for(Client, 'before_insert')
+@event.listens_for(Client, 'before_update')
+def _update_search_keys(mapper, connection, target):
+    # 只在姓名或联系方式变化时重新计算
+    attrs = inspect(target).attrs
+    if attrs.contact_info.history.has_changes():
+        target.phone_reversed = (reverse_phone(target.contact_info) or '')[:20] or None
+    if attrs.name.history.has_changes():
+        target.name_initials = pinyin_initials(target.name)
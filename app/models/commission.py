@@ -0,0 +1,102 @@
+from datetime import datetime
+from app import db
+
+
+class CommissionEntry(db.Model):
+    """
+    提成流水（只追加，不修改；冲正以负金额的新流水记录）
+
+    @property id - 流水ID
+    @property consultant_id - 获得提成的咨询师ID（客户无所属咨询师期间的实收变化为空，只记基数不计提成）
+    @property kind - 提成类型（claim: 孤儿客户认领对价提成, consumption: 客户消费提成）
+    @property source_type - 来源类型（client_claim/treatment）
+    @property source_id - 来源记录ID
+    @property sequence - 同一来源的第几条流水，与来源一起唯一，保证重复触发不会重复记账
+    @property client_id - 客户ID
+    @property base_amount - 计提基数（认领费用或本次实收金额变化）
+    @property rate - 提成比例
+    @property amount - 提成金额
+    @property month - 记账月份（YYYY-MM）
+    @property created_at - 记账时间
+    """
+    __tablename__ = 'commission_entries'
+    __table_args__ = (
+        db.UniqueConstraint('source_type', 'source_id', 'sequence', name='uq_commission_entries_source'),
+        db.Index('ix_commission_entries_consultant_month', 'consultant_id', 'month'),
+        db.Index('ix_commission_entries_month', 'month'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    consultant_id = db.Column(db.Integer, db.ForeignKey('consultants.id'))
+    kind = db.Column(db.String(16), nullable=False)
+    source_type = db.Column(db.String(16), nullable=False)
+    source_id = db.Column(db.Integer, nullable=False)
+    sequence = db.Column(db.Integer, nullable=False, default=0)
+    client_id = db.Column(db.Integer, db.ForeignKey('clients.id', ondelete='SET NULL'))
+    base_amount = db.Column(db.Float, nullable=False, default=0)
+    rate = db.Column(db.Float, nullable=False, default=0)
+    amount = db.Column(db.Float, nullable=False, default=0)
+    month = db.Column(db.String(7), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CommissionEntry {self.kind} {self.amount} to Consultant {self.consultant_id}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'consultant_id': self.consultant_id,
+            'kind': self.kind,
+            'source_type': self.source_type,
+            'source_id': self.source_id,
+            'client_id': self.client_id,
+            'base_amount': self.base_amount,
+            'rate': self.rate,
+            'amount': self.amount,
+            'month': self.month,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class CommissionStatement(db.Model):
+    """
+    咨询师月度提成结算单（由结算任务按提成流水汇总生成）
+
+    @property id - 结算单ID
+    @property consultant_id - 咨询师ID
+    @property month - 结算月份（YYYY-MM）
+    @property entry_count - 流水条数
+    @property claim_amount - 认领对价提成合计
+    @property consumption_amount - 客户消费提成合计
+    @property total_amount - 提成合计
+    @property generated_at - 生成时间
+    """
+    __tablename__ = 'commission_statements'
+    __table_args__ = (
+        db.UniqueConstraint('consultant_id', 'month', name='uq_commission_statements_consultant_month'),
+        db.Index('ix_commission_statements_month', 'month'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    consultant_id = db.Column(db.Integer, db.ForeignKey('consultants.id'), nullable=False)
+    month = db.Column(db.String(7), nullable=False)
+    entry_count = db.Column(db.Integer, nullable=False, default=0)
+    claim_amount = db.Column(db.Float, nullable=False, default=0)
+    consumption_amount = db.Column(db.Float, nullable=False, default=0)
+    total_amount = db.Column(db.Float, nullable=False, default=0)
+    generated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CommissionStatement Consultant {self.consultant_id} {self.month}: {self.total_amount}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'consultant_id': self.consultant_id,
+            'month': self.month,
+            'entry_count': self.entry_count,
+            'claim_amount': self.claim_amount,
+            'consumption_amount': self.consumption_amount,
+            'total_amount': self.total_amount,
+            'generated_at': self.generated_at.isoformat() if self.generated_at else None
+        }
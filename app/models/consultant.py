@@ -1,5 +1,6 @@
 from datetime import datetime
 from app import db
+from app.utils.cache import invalidate_on_commit, attribute_values
 from app.models.user import User
 
 class Consultant(db.Model):
@@ -86,4 +87,9 @@ class Consultant(db.Model):
             'experience': self.experience,
             'supervisor_id': self.supervisor_id,
             'created_at': self.created_at.isoformat() if self.created_at else None
-        } 
\ No newline at end of file
+        } 
+
+# 咨询师变更后失效所属门店（含调出的原门店）及管理后台统计的缓存
+invalidate_on_commit(Consultant, lambda consultant: ['dashboard', 'consultants'] + [
+    f'store:{store_id}' for store_id in attribute_values(consultant, 'store_id')
+], track=('store_id',))
@@ -1,5 +1,6 @@
 from datetime import datetime
 from app import db
+from app.utils.cache import invalidate_on_commit, attribute_values
 
 class Doctor(db.Model):
     """
@@ -11,6 +12,7 @@ class Doctor(db.Model):
     @property specialty - 专业领域
     @property bio - 个人简介
     @property store_id - 所属门店ID
+    @property working_hours - 出诊时间（格式同门店营业时间，为空表示随门店营业时间）
     @property created_at - 创建时间
     @property updated_at - 更新时间
     """
@@ -27,6 +29,9 @@ class Doctor(db.Model):
     store_id = db.Column(db.Integer, db.ForeignKey('stores.id'))
     store = db.relationship('Store', backref=db.backref('doctors', lazy='dynamic'))
     
+    # 出诊时间
+    working_hours = db.Column(db.Text)
+    
     # 创建和更新时间
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -50,8 +55,14 @@ class Doctor(db.Model):
             'bio': self.bio,
             'avatar': self.avatar,
             'store_id': self.store_id,
+            'working_hours': self.working_hours,
             'status': self.status,
             'rating': self.rating,
             'rating_count': self.rating_count,
             'created_at': self.created_at.isoformat() if self.created_at else None
-        } 
\ No newline at end of file
+        } 
+
+# 医生变更后失效所属门店（含调出的原门店）的缓存
+invalidate_on_commit(Doctor, lambda doctor: ['doctors'] + [
+    f'store:{store_id}' for store_id in attribute_values(doctor, 'store_id')
+], track=('store_id',))
@@ -0,0 +1,45 @@
+from app import db
+
+
+class FinanceSyncState(db.Model):
+    """
+    财务系统同步进度（高水位）
+
+    @property source - 数据源名称
+    @property watermark_at - 已同步到的最后一条记录的更新时间
+    @property watermark_id - 已同步到的最后一条记录的外部ID（更新时间相同时的次序）
+    @property total_rows - 累计处理的记录数
+    @property last_run_at - 最近一次同步时间
+    @property last_status - 最近一次同步结果（success/failed）
+    @property last_error - 最近一次失败的错误信息
+    """
+    __tablename__ = 'finance_sync_state'
+
+    source = db.Column(db.String(32), primary_key=True)
+    watermark_at = db.Column(db.DateTime)
+    watermark_id = db.Column(db.String(64))
+    total_rows = db.Column(db.Integer, nullable=False, default=0)
+    last_run_at = db.Column(db.DateTime)
+    last_status = db.Column(db.String(16))
+    last_error = db.Column(db.Text)
+
+    def __repr__(self):
+        return f'<FinanceSyncState {self.source} @ {self.watermark_at}>'
+
+    @property
+    def watermark(self):
+        """同步游标 (更新时间, 外部ID)，从未同步时为None"""
+        if self.watermark_at is None:
+            return None
+        return self.watermark_at, self.watermark_id or ''
+
+    def to_dict(self):
+        return {
+            'source': self.source,
+            'watermark_at': self.watermark_at.isoformat() if self.watermark_at else None,
+            'watermark_id': self.watermark_id,
+            'total_rows': self.total_rows,
+            'last_run_at': self.last_run_at.isoformat() if self.last_run_at else None,
+            'last_status': self.last_status,
+            'last_error': self.last_error
+        }
@@ -0,0 +1,151 @@
+"""
+咨询师指导关系闭包表
+
+Consultant.supervisor_id 构成一棵树。闭包表为每对 (上级, 下级) 存一行，含自身
+（深度0），"某人团队的全部成员"或"某人的全部上级"都是一次走索引的连接查询，
+不再逐层递归。闭包表由咨询师的插入、修改指导老师和删除事件在同一事务中维护：
+修改指导老师时把整棵子树从原上级链上摘下，再接到新上级链上。
+"""
+from sqlalchemy import event, inspect, select, insert, delete, literal, true
+from app import db
+from app.models.consultant import Consultant
+
+
+class ConsultantClosure(db.Model):
+    """
+    咨询师上下级闭包
+
+    @property ancestor_id - 上级咨询师ID（含自身）
+    @property descendant_id - 下级咨询师ID（含自身）
+    @property depth - 层级差（0为自身，1为直接下级）
+    """
+    __tablename__ = 'consultant_closure'
+    __table_args__ = (
+        db.Index('ix_consultant_closure_descendant_depth', 'descendant_id', 'depth'),
+    )
+
+    ancestor_id = db.Column(db.Integer, db.ForeignKey('consultants.id', ondelete='CASCADE'), primary_key=True)
+    descendant_id = db.Column(db.Integer, db.ForeignKey('consultants.id', ondelete='CASCADE'), primary_key=True)
+    depth = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ConsultantClosure {self.ancestor_id} -> {self.descendant_id} ({self.depth})>'
+
+
+def _subtree_ids(connection, consultant_id):
+    table = ConsultantClosure.__table__
+    return [row[0] for row in connection.execute(
+        select(table.c.descendant_id).where(table.c.ancestor_id == consultant_id)
+    )]
+
+
+def attach_subtree(connection, consultant_id, supervisor_id):
+    """
+    把以consultant_id为根的子树接到supervisor_id的上级链上
+
+    @param {Connection} connection - 数据库连接
+    @param {int} consultant_id - 子树根咨询师ID
+    @param {int} supervisor_id - 新的指导老师ID
+    """
+    table = ConsultantClosure.__table__
+    ancestors = table.alias('ancestors')
+    subtree = table.alias('subtree')
+    connection.execute(insert(table).from_select(
+        ['ancestor_id', 'descendant_id', 'depth'],
+        # 新上级链 × 子树的全部组合
+        select(ancestors.c.ancestor_id, subtree.c.descendant_id, ancestors.c.depth + subtree.c.depth + 1).select_from(
+            ancestors.join(subtree, true())
+        ).where(ancestors.c.descendant_id == supervisor_id, subtree.c.ancestor_id == consultant_id)
+    ))
+
+
+def detach_subtree(connection, consultant_id):
+    """
+    把以consultant_id为根的子树从原上级链上摘下（保留子树内部关系）
+
+    @param {Connection} connection - 数据库连接
+    @param {int} consultant_id - 子树根咨询师ID
+    """
+    table = ConsultantClosure.__table__
+    # 先读出子树（MySQL不允许在DELETE的子查询中引用目标表）
+    subtree = _subtree_ids(connection, consultant_id)
+    for start in range(0, len(subtree), 1000):
+        connection.execute(delete(table).where(
+            table.c.descendant_id.in_(subtree[start:start + 1000]),
+            table.c.ancestor_id.notin_(subtree)
+        ))
+
+
+def is_descendant(consultant_id, ancestor_id):
+    """
+    判断consultant_id是否为ancestor_id本人或其下级
+
+    @param {int} consultant_id - 咨询师ID
+    @param {int} ancestor_id - 上级咨询师ID
+    @return {bool} - 是否为下级
+    """
+    return db.session.query(ConsultantClosure.depth).filter_by(
+        ancestor_id=ancestor_id, descendant_id=consultant_id
+    ).first() is not None
+
+
+def rebuild_closure():
+    """
+    根据 supervisor_id 全量重建闭包表（每层一条INSERT ... SELECT）
+
+    @return {int} - 闭包表行数
+    """
+    table = ConsultantClosure.__table__
+    consultants = Consultant.__table__
+    db.session.execute(delete(table))
+    db.session.execute(insert(table).from_select(
+        ['ancestor_id', 'descendant_id', 'depth'], select(consultants.c.id, consultants.c.id, literal(0))
+    ))
+    total = db.session.query(Consultant.id).count()
+    depth = 0
+    # 数据中存在环时，沿环回到上级本人即停止
+    while depth < total:
+        inserted = db.session.execute(insert(table).from_select(
+            ['ancestor_id', 'descendant_id', 'depth'],
+            select(table.c.ancestor_id, consultants.c.id, literal(depth + 1)).where(
+                consultants.c.supervisor_id == table.c.descendant_id,
+                consultants.c.id != table.c.ancestor_id,
+                table.c.depth == depth
+            )
+        )).rowcount
+        if not inserted:
+            break
+        depth += 1
+    db.session.commit()
+    return db.session.query(ConsultantClosure).count()
+
+
+@event.listens_for(Consultant, 'after_insert')
+def _consultant_inserted(mapper, connection, target):
+    connection.execute(insert(ConsultantClosure.__table__).values(
+        ancestor_id=target.id, descendant_id=target.id, depth=0
+    ))
+    if target.supervisor_id is not None:
+        attach_subtree(connection, target.id, target.supervisor_id)
+
+
+@event.listens_for(Consultant, 'after_update')
+def _consultant_updated(mapper, connection, target):
+    if not inspect(target).attrs.supervisor_id.history.has_changes():
+        return
+    detach_subtree(connection, target.id)
+    if target.supervisor_id is not None:
+        attach_subtree(connection, target.id, target.supervisor_id)
+
+
+@event.listens_for(Consultant, 'after_delete')
+def _consultant_deleted(mapper, connection, target):
+    table = ConsultantClosure.__table__
+    # 下级的 supervisor_id 仍指向被删除的咨询师，其子树作为独立的树保留
+    for subordinate_id, in connection.execute(
+        select(table.c.descendant_id).where(table.c.ancestor_id == target.id, table.c.depth == 1)
+    ).fetchall():
+        detach_subtree(connection, subordinate_id)
+    connection.execute(delete(table).where(
+        (table.c.ancestor_id == target.id) | (table.c.descendant_id == target.id)
+    ))
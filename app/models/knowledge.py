@@ -1,5 +1,6 @@
 from datetime import datetime
 from app import db
+from app.utils.cache import invalidate_on_commit
 
 class KnowledgeArticle(db.Model):
     """
@@ -107,4 +108,8 @@ class KnowledgeQA(db.Model):
             'status': self.status,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        } 
\ No newline at end of file
+        } 
+
+# 知识库内容变更后失效知识库及管理后台统计的缓存
+invalidate_on_commit(KnowledgeArticle, lambda article: ['knowledge', 'dashboard'])
+invalidate_on_commit(KnowledgeQA, lambda qa: ['knowledge', 'dashboard'])
@@ -62,8 +62,8 @@ class GroupMessage(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # 消息发送的目标组
-    target_type = db.Column(db.String(20))  # all_clients, tagged_clients
-    target_tags = db.Column(db.String(256))  # 如果是tagged_clients，存储目标标签
+    target_type = db.Column(db.String(20))  # all_clients, tagged_clients, segment
+    target_tags = db.Column(db.String(256))  # tagged_clients存储目标标签，segment存储目标RFM分群
     
     # 附件
     attachment_url = db.Column(db.String(256))
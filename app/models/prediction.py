@@ -0,0 +1,76 @@
+import json
+from datetime import datetime
+from app import db
+
+
+class PredictionModel(db.Model):
+    """
+    下次就诊预测模型（离线训练的参数）
+
+    @property id - 模型ID
+    @property trained_at - 训练时间
+    @property treatment_count - 训练使用的治疗记录数
+    @property params - 模型参数（JSON：治疗类型、类型转移概率、各类型就诊间隔和费用中位数）
+    """
+    __tablename__ = 'prediction_models'
+
+    id = db.Column(db.Integer, primary_key=True)
+    trained_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    treatment_count = db.Column(db.Integer, default=0)
+    params = db.Column(db.Text, nullable=False)
+
+    def __repr__(self):
+        return f'<PredictionModel {self.id}>'
+
+    def get_params(self):
+        return json.loads(self.params)
+
+
+class VisitPrediction(db.Model):
+    """
+    客户下次就诊预测（批量评分结果，每个客户一行）
+
+    @property client_id - 客户ID
+    @property last_visit - 最近一次就诊时间
+    @property last_type - 最近一次治疗类型
+    @property visit_count - 历史就诊次数
+    @property predicted_type - 预测的下次治疗类型
+    @property predicted_date - 预测的下次就诊日期
+    @property interval_days - 预测的就诊间隔（天）
+    @property expected_fee - 预计消费金额
+    @property confidence - 治疗类型预测的概率
+    @property model_id - 使用的模型ID
+    @property scored_at - 评分时间
+    """
+    __tablename__ = 'visit_predictions'
+
+    client_id = db.Column(db.Integer, db.ForeignKey('clients.id', ondelete='CASCADE'), primary_key=True)
+    last_visit = db.Column(db.DateTime)
+    last_type = db.Column(db.String(64))
+    visit_count = db.Column(db.Integer, nullable=False, default=0)
+    predicted_type = db.Column(db.String(64))
+    predicted_date = db.Column(db.Date, index=True)
+    interval_days = db.Column(db.Float)
+    expected_fee = db.Column(db.Float)
+    confidence = db.Column(db.Float)
+    model_id = db.Column(db.Integer, db.ForeignKey('prediction_models.id', ondelete='SET NULL'))
+    scored_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    client = db.relationship('Client', backref=db.backref('visit_prediction', uselist=False, passive_deletes=True))
+
+    def __repr__(self):
+        return f'<VisitPrediction {self.client_id}: {self.predicted_type} {self.predicted_date}>'
+
+    def to_dict(self):
+        return {
+            'client_id': self.client_id,
+            'last_visit': self.last_visit.isoformat() if self.last_visit else None,
+            'last_type': self.last_type,
+            'visit_count': self.visit_count,
+            'predicted_type': self.predicted_type,
+            'predicted_date': self.predicted_date.isoformat() if self.predicted_date else None,
+            'interval_days': round(self.interval_days, 1) if self.interval_days is not None else None,
+            'expected_fee': self.expected_fee,
+            'confidence': round(self.confidence, 3) if self.confidence is not None else None,
+            'scored_at': self.scored_at.isoformat() if self.scored_at else None
+        }
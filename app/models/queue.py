@@ -0,0 +1,27 @@
+from datetime import datetime
+from app import db
+
+
+class QueueSnapshot(db.Model):
+    """
+    门店叫号队列快照，进程内队列定期写入，重启后据此恢复
+
+    @property id - 快照ID
+    @property store_id - 门店ID
+    @property queue_date - 队列日期
+    @property state - 队列状态（JSON）
+    @property updated_at - 更新时间
+    """
+    __tablename__ = 'queue_snapshots'
+    __table_args__ = (
+        db.UniqueConstraint('store_id', 'queue_date', name='uq_queue_snapshot_store_date'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    store_id = db.Column(db.Integer, db.ForeignKey('stores.id'), nullable=False)
+    queue_date = db.Column(db.Date, nullable=False)
+    state = db.Column(db.Text, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<QueueSnapshot store {self.store_id} {self.queue_date}>'
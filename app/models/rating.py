@@ -0,0 +1,72 @@
+from datetime import datetime
+from app import db
+
+
+class Rating(db.Model):
+    """
+    治疗评价模型，每条治疗记录最多一条评价
+
+    @property id - 评价ID
+    @property treatment_id - 治疗记录ID
+    @property client_id - 客户ID
+    @property doctor_id - 医生ID
+    @property consultant_id - 咨询师ID
+    @property store_id - 门店ID
+    @property score - 评分（1-5）
+    @property comment - 评价内容
+    @property created_at - 创建时间
+    @property updated_at - 更新时间
+    """
+    __tablename__ = 'ratings'
+
+    id = db.Column(db.Integer, primary_key=True)
+    treatment_id = db.Column(db.Integer, db.ForeignKey('treatments.id'), nullable=False, unique=True)
+    client_id = db.Column(db.Integer, db.ForeignKey('clients.id'))
+    doctor_id = db.Column(db.Integer, db.ForeignKey('doctors.id'), index=True)
+    consultant_id = db.Column(db.Integer, db.ForeignKey('consultants.id'), index=True)
+    store_id = db.Column(db.Integer, db.ForeignKey('stores.id'), index=True)
+    score = db.Column(db.Float, nullable=False)
+    comment = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    treatment = db.relationship('Treatment', backref=db.backref('rating', uselist=False))
+
+    def __repr__(self):
+        return f'<Rating {self.score} for Treatment {self.treatment_id}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'treatment_id': self.treatment_id,
+            'client_id': self.client_id,
+            'doctor_id': self.doctor_id,
+            'consultant_id': self.consultant_id,
+            'store_id': self.store_id,
+            'score': self.score,
+            'comment': self.comment,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class RatingAggregate(db.Model):
+    """
+    评分汇总，按评价对象（医生/咨询师/门店）累计评价数和总分
+
+    @property subject_type - 对象类型（doctor/consultant/store）
+    @property subject_id - 对象ID
+    @property count - 评价数
+    @property total - 评分总和
+    @property updated_at - 更新时间
+    """
+    __tablename__ = 'rating_aggregates'
+
+    subject_type = db.Column(db.String(20), primary_key=True)
+    subject_id = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<RatingAggregate {self.subject_type}:{self.subject_id} {self.count}>'
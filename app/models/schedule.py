@@ -0,0 +1,31 @@
+from datetime import datetime
+from app import db
+
+
+class AppointmentSlot(db.Model):
+    """
+    预约时段占用记录，每行占用某位医生（或咨询师）的一个时间格
+
+    (resource_type, resource_id, slot_start) 唯一，并发预约同一时段时由数据库保证只有一方成功
+
+    @property id - 记录ID
+    @property resource_type - 资源类型（doctor/consultant）
+    @property resource_id - 医生或咨询师ID
+    @property slot_start - 时间格开始时间
+    @property treatment_id - 关联的治疗记录ID
+    @property created_at - 创建时间
+    """
+    __tablename__ = 'appointment_slots'
+    __table_args__ = (
+        db.UniqueConstraint('resource_type', 'resource_id', 'slot_start', name='uq_appointment_slot'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    resource_type = db.Column(db.String(20), nullable=False, default='doctor')
+    resource_id = db.Column(db.Integer, nullable=False)
+    slot_start = db.Column(db.DateTime, nullable=False)
+    treatment_id = db.Column(db.Integer, db.ForeignKey('treatments.id', ondelete='CASCADE'), index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<AppointmentSlot {self.resource_type}:{self.resource_id} {self.slot_start}>'
@@ -0,0 +1,102 @@
+import json
+from datetime import datetime
+from app import db
+
+# RFM分群（R/F/M各自以中位档为界分高低，共8类）
+SEGMENT_LABELS = {
+    'important_value': '重要价值客户',
+    'important_develop': '重要发展客户',
+    'important_retain': '重要保持客户',
+    'important_recover': '重要挽留客户',
+    'general_value': '一般价值客户',
+    'general_develop': '一般发展客户',
+    'general_retain': '一般保持客户',
+    'general_recover': '一般挽留客户'
+}
+
+
+class ClientSegment(db.Model):
+    """
+    客户RFM分群结果（由批处理任务物化，每个客户一行）
+
+    @property client_id - 客户ID
+    @property last_visit - 最近一次完成治疗的时间
+    @property recency_days - 计算时距最近一次治疗的天数
+    @property frequency - 完成治疗次数
+    @property monetary - 累计实付金额
+    @property r_score - 最近度评分（1-5，越近越高）
+    @property f_score - 频率评分（1-5）
+    @property m_score - 金额评分（1-5）
+    @property segment - 分群
+    @property computed_at - 计算时间
+    """
+    __tablename__ = 'client_segments'
+
+    client_id = db.Column(db.Integer, db.ForeignKey('clients.id', ondelete='CASCADE'), primary_key=True)
+    last_visit = db.Column(db.DateTime)
+    recency_days = db.Column(db.Integer)
+    frequency = db.Column(db.Integer, nullable=False, default=0)
+    monetary = db.Column(db.Float, nullable=False, default=0)
+    r_score = db.Column(db.SmallInteger, nullable=False)
+    f_score = db.Column(db.SmallInteger, nullable=False)
+    m_score = db.Column(db.SmallInteger, nullable=False)
+    segment = db.Column(db.String(32), nullable=False, index=True)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    client = db.relationship('Client', backref=db.backref('segment', uselist=False, passive_deletes=True))
+
+    def __repr__(self):
+        return f'<ClientSegment {self.client_id}: {self.segment}>'
+
+    def to_dict(self):
+        return {
+            'client_id': self.client_id,
+            'last_visit': self.last_visit.isoformat() if self.last_visit else None,
+            'recency_days': self.recency_days,
+            'frequency': self.frequency,
+            'monetary': self.monetary,
+            'r_score': self.r_score,
+            'f_score': self.f_score,
+            'm_score': self.m_score,
+            'rfm': f'{self.r_score}{self.f_score}{self.m_score}',
+            'segment': self.segment,
+            'segment_label': SEGMENT_LABELS.get(self.segment, self.segment),
+            'computed_at': self.computed_at.isoformat() if self.computed_at else None
+        }
+
+
+class SegmentRun(db.Model):
+    """
+    RFM计算批次，记录分档阈值供增量计算沿用
+
+    @property id - 批次ID
+    @property mode - 计算方式（full/incremental）
+    @property started_at - 开始时间（下一次增量计算的起点）
+    @property finished_at - 完成时间
+    @property client_count - 本次更新的客户数
+    @property thresholds - 分档阈值（JSON）
+    """
+    __tablename__ = 'segment_runs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    mode = db.Column(db.String(20), nullable=False)
+    started_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime)
+    client_count = db.Column(db.Integer, default=0)
+    thresholds = db.Column(db.Text)
+
+    def __repr__(self):
+        return f'<SegmentRun {self.id} {self.mode}>'
+
+    def get_thresholds(self):
+        return json.loads(self.thresholds) if self.thresholds else None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'mode': self.mode,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'client_count': self.client_count,
+            'thresholds': self.get_thresholds()
+        }
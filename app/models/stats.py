@@ -0,0 +1,495 @@
+from datetime import datetime, date, timedelta
+from sqlalchemy import event, inspect, select, insert, func, or_
+from sqlalchemy.orm import object_session
+from app import db
+from app.models.user import User
+from app.models.client import Client
+from app.models.consultant import Consultant
+from app.models.message import Message
+from app.models.treatment import Treatment
+from app.utils.sql import upsert_increment, month_expr
+
+# 治疗类型为空时在汇总表中使用的键
+UNKNOWN_TREATMENT_TYPE = ''
+# 门店、医生、咨询师为空时在营收汇总表中使用的键
+UNKNOWN_DIMENSION_ID = 0
+
+
+class MonthlySignupRollup(db.Model):
+    """
+    用户月度注册数汇总
+
+    @property month - 月份（YYYY-MM）
+    @property count - 注册人数
+    """
+    __tablename__ = 'monthly_signup_rollups'
+
+    month = db.Column(db.String(7), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<MonthlySignupRollup {self.month}: {self.count}>'
+
+
+class TreatmentTypeRollup(db.Model):
+    """
+    治疗类型数量汇总
+
+    @property type - 治疗类型
+    @property count - 治疗记录数
+    """
+    __tablename__ = 'treatment_type_rollups'
+
+    type = db.Column(db.String(64), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<TreatmentTypeRollup {self.type}: {self.count}>'
+
+
+class ConsultantCounter(db.Model):
+    """
+    咨询师客户数汇总
+
+    @property consultant_id - 咨询师ID
+    @property client_count - 名下客户总数（含孤儿客户）
+    @property orphan_count - 名下孤儿客户数
+    @property reconciled_at - 最近一次对账时间
+    """
+    __tablename__ = 'consultant_counters'
+
+    consultant_id = db.Column(db.Integer, db.ForeignKey('consultants.id', ondelete='CASCADE'), primary_key=True)
+    client_count = db.Column(db.Integer, nullable=False, default=0, index=True)
+    orphan_count = db.Column(db.Integer, nullable=False, default=0)
+    reconciled_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<ConsultantCounter {self.consultant_id}: {self.client_count}>'
+
+
+class ConsultantDailyActivity(db.Model):
+    """
+    咨询师按天的活动汇总
+
+    @property consultant_id - 咨询师ID
+    @property day - 日期
+    @property contact_count - 名下最后联系时间在当天的客户数
+    @property message_count - 当天发送的消息数
+    """
+    __tablename__ = 'consultant_daily_activity'
+
+    consultant_id = db.Column(db.Integer, db.ForeignKey('consultants.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    contact_count = db.Column(db.Integer, nullable=False, default=0)
+    message_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ConsultantDailyActivity {self.consultant_id} {self.day}>'
+
+
+class DailyRevenueRollup(db.Model):
+    """
+    按天的营收汇总（门店 × 医生 × 咨询师 × 治疗类型 × 日期），不含已取消的治疗
+
+    @property day - 日期（预约日期，没有预约日期时取创建日期）
+    @property store_id - 门店ID，为空时为0
+    @property doctor_id - 医生ID，为空时为0
+    @property consultant_id - 负责咨询师ID，为空时为0
+    @property type - 治疗类型，为空时为空字符串
+    @property treatment_count - 治疗记录数
+    @property fee_amount - 应收金额合计
+    @property paid_amount - 实收金额合计
+    """
+    __tablename__ = 'daily_revenue_rollups'
+    __table_args__ = (
+        # 管理看板按门店、医生或咨询师 + 日期范围查询
+        db.Index('ix_daily_revenue_rollups_store_day', 'store_id', 'day'),
+        db.Index('ix_daily_revenue_rollups_doctor_day', 'doctor_id', 'day'),
+        db.Index('ix_daily_revenue_rollups_consultant_day', 'consultant_id', 'day'),
+    )
+
+    day = db.Column(db.Date, primary_key=True)
+    store_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    doctor_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    consultant_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    type = db.Column(db.String(64), primary_key=True)
+    treatment_count = db.Column(db.Integer, nullable=False, default=0)
+    fee_amount = db.Column(db.Float, nullable=False, default=0)
+    paid_amount = db.Column(db.Float, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DailyRevenueRollup {self.day} store={self.store_id}: {self.paid_amount}>'
+
+
+def _signup_month(user):
+    return (user.created_at or datetime.utcnow()).strftime('%Y-%m')
+
+
+def _bump_signup(connection, month, delta):
+    upsert_increment(connection, MonthlySignupRollup.__table__, {'month': month}, {'count': delta})
+
+
+def _bump_treatment_type(connection, treatment_type, delta):
+    upsert_increment(connection, TreatmentTypeRollup.__table__,
+                     {'type': treatment_type or UNKNOWN_TREATMENT_TYPE}, {'count': delta})
+
+
+def record_bulk_signups(connection, count, created_at=None):
+    """
+    批量插入用户（绕过ORM事件）后补记注册汇总，需与插入在同一事务中调用
+
+    @param {Connection} connection - 数据库连接
+    @param {int} count - 新增用户数
+    @param {datetime} created_at - 注册时间，默认当前时间
+    """
+    if count:
+        _bump_signup(connection, (created_at or datetime.utcnow()).strftime('%Y-%m'), count)
+
+
+def record_bulk_treatment_types(connection, deltas):
+    """
+    批量写入治疗记录（绕过ORM事件）后补记治疗类型汇总，需与写入在同一事务中调用
+
+    @param {Connection} connection - 数据库连接
+    @param {dict} deltas - 治疗类型 -> 数量变化
+    """
+    for treatment_type, delta in deltas.items():
+        if delta:
+            _bump_treatment_type(connection, treatment_type, delta)
+
+
+def revenue_state(store_id, doctor_id, consultant_id, treatment_type, status, appointment_date, created_at, fee,
+                  paid_amount):
+    """
+    治疗记录对营收汇总的贡献
+
+    @return {tuple|None} - ((日期, 门店ID, 医生ID, 咨询师ID, 类型), (1, 应收, 实收))，已取消的治疗为None
+    """
+    if status == 'cancelled':
+        return None
+    moment = appointment_date or created_at or datetime.utcnow()
+    key = (moment.date() if isinstance(moment, datetime) else moment, store_id or UNKNOWN_DIMENSION_ID,
+           doctor_id or UNKNOWN_DIMENSION_ID, consultant_id or UNKNOWN_DIMENSION_ID,
+           treatment_type or UNKNOWN_TREATMENT_TYPE)
+    return key, (1, fee or 0, paid_amount or 0)
+
+
+def apply_revenue_changes(connection, changes):
+    """
+    按治疗记录的变化增量更新营收汇总，需与治疗写入在同一事务中调用
+    （批量写入绕过ORM事件时显式调用）
+
+    @param {Connection} connection - 数据库连接
+    @param {list} changes - [(变更前贡献, 变更后贡献)]，贡献为 revenue_state 的返回值
+    """
+    deltas = {}
+    for before, after in changes:
+        for state, sign in ((before, -1), (after, 1)):
+            if state is None:
+                continue
+            key, (count, fee, paid) = state
+            total = deltas.get(key, (0, 0, 0))
+            deltas[key] = (total[0] + sign * count, total[1] + sign * fee, total[2] + sign * paid)
+
+    for (day, store_id, doctor_id, consultant_id, treatment_type), (count, fee, paid) in deltas.items():
+        if count or fee or paid:
+            upsert_increment(connection, DailyRevenueRollup.__table__, {
+                'day': day, 'store_id': store_id, 'doctor_id': doctor_id, 'consultant_id': consultant_id,
+                'type': treatment_type
+            }, {'treatment_count': count, 'fee_amount': round(fee, 2), 'paid_amount': round(paid, 2)})
+
+
+REVENUE_ATTRIBUTES = ('store_id', 'doctor_id', 'consultant_id', 'type', 'status', 'appointment_date', 'fee',
+                      'paid_amount')
+
+
+def _treatment_revenue(attrs, target, previous=False):
+    values = {name: _previous(attrs, name, getattr(target, name)) if previous else getattr(target, name)
+              for name in REVENUE_ATTRIBUTES}
+    return revenue_state(values['store_id'], values['doctor_id'], values['consultant_id'], values['type'],
+                         values['status'], values['appointment_date'], target.created_at, values['fee'],
+                         values['paid_amount'])
+
+
+# 汇总表在业务写入的同一事务中增量维护，与明细数据一同提交或回滚
+@event.listens_for(User, 'after_insert')
+def _user_inserted(mapper, connection, target):
+    _bump_signup(connection, _signup_month(target), 1)
+
+
+@event.listens_for(User, 'after_delete')
+def _user_deleted(mapper, connection, target):
+    _bump_signup(connection, _signup_month(target), -1)
+
+
+# 修改前加载旧值（active_history），保证营收汇总扣减的是变更前的贡献
+for _name in REVENUE_ATTRIBUTES:
+    event.listen(getattr(Treatment, _name), 'set', lambda target, value, oldvalue, initiator: None, active_history=True)
+
+
+@event.listens_for(Treatment, 'after_insert')
+def _treatment_inserted(mapper, connection, target):
+    _bump_treatment_type(connection, target.type, 1)
+    apply_revenue_changes(connection, [(None, _treatment_revenue(inspect(target).attrs, target))])
+
+
+@event.listens_for(Treatment, 'after_update')
+def _treatment_updated(mapper, connection, target):
+    attrs = inspect(target).attrs
+    history = attrs.type.history
+    if history.has_changes():
+        for old_type in history.deleted:
+            _bump_treatment_type(connection, old_type, -1)
+        for new_type in history.added:
+            _bump_treatment_type(connection, new_type, 1)
+
+    if any(attrs[name].history.has_changes() for name in REVENUE_ATTRIBUTES):
+        before = _treatment_revenue(attrs, target, previous=True)
+        after = _treatment_revenue(attrs, target)
+        if before != after:
+            apply_revenue_changes(connection, [(before, after)])
+
+
+@event.listens_for(Treatment, 'after_delete')
+def _treatment_deleted(mapper, connection, target):
+    _bump_treatment_type(connection, target.type, -1)
+    apply_revenue_changes(connection, [(_treatment_revenue(inspect(target).attrs, target), None)])
+
+
+def _client_state(consultant_id, is_orphan, last_contact):
+    # 客户对咨询师汇总的贡献：(咨询师ID, 是否孤儿, 最后联系日期)，未分配时为None
+    if consultant_id is None:
+        return None
+    return consultant_id, bool(is_orphan), last_contact.date() if last_contact else None
+
+
+def apply_client_changes(connection, changes):
+    """
+    按客户归属、孤儿状态和最后联系时间的变化增量更新咨询师汇总，需与客户写入在同一事务中调用
+    （批量写入绕过ORM事件时显式调用）
+
+    @param {Connection} connection - 数据库连接
+    @param {list} changes - [(变更前状态, 变更后状态)]，状态为 (咨询师ID, 是否孤儿, 最后联系时间) 或None
+    """
+    counters, contacts = {}, {}
+    for before, after in changes:
+        for state, sign in ((before, -1), (after, 1)):
+            if state is None or state[0] is None:
+                continue
+            consultant_id, is_orphan, last_contact = state
+            clients, orphans = counters.get(consultant_id, (0, 0))
+            counters[consultant_id] = (clients + sign, orphans + sign * bool(is_orphan))
+            if last_contact:
+                key = (consultant_id, last_contact.date() if isinstance(last_contact, datetime) else last_contact)
+                contacts[key] = contacts.get(key, 0) + sign
+
+    for consultant_id, (clients, orphans) in counters.items():
+        if clients or orphans:
+            upsert_increment(connection, ConsultantCounter.__table__, {'consultant_id': consultant_id},
+                             {'client_count': clients, 'orphan_count': orphans})
+    for (consultant_id, day), delta in contacts.items():
+        if delta:
+            upsert_increment(connection, ConsultantDailyActivity.__table__,
+                             {'consultant_id': consultant_id, 'day': day}, {'contact_count': delta, 'message_count': 0})
+
+
+def _previous(attrs, name, current):
+    history = attrs[name].history
+    if not history.has_changes():
+        return current
+    return history.deleted[0] if history.deleted else None
+
+
+# 修改前加载旧值（active_history），保证变更前状态准确
+for _attribute in (Client.assigned_consultant_id, Client.is_orphan, Client.last_contact):
+    event.listen(_attribute, 'set', lambda target, value, oldvalue, initiator: None, active_history=True)
+
+
+@event.listens_for(Client, 'after_insert')
+def _client_inserted(mapper, connection, target):
+    apply_client_changes(connection, [(None, _client_state(
+        target.assigned_consultant_id, target.is_orphan, target.last_contact))])
+
+
+@event.listens_for(Client, 'after_update')
+def _client_updated(mapper, connection, target):
+    attrs = inspect(target).attrs
+    if not any(attrs[name].history.has_changes() for name in ('assigned_consultant_id', 'is_orphan', 'last_contact')):
+        return
+    before = _client_state(
+        _previous(attrs, 'assigned_consultant_id', target.assigned_consultant_id),
+        _previous(attrs, 'is_orphan', target.is_orphan),
+        _previous(attrs, 'last_contact', target.last_contact)
+    )
+    after = _client_state(target.assigned_consultant_id, target.is_orphan, target.last_contact)
+    if before != after:
+        apply_client_changes(connection, [(before, after)])
+
+
+@event.listens_for(Client, 'after_delete')
+def _client_deleted(mapper, connection, target):
+    apply_client_changes(connection, [(_client_state(
+        target.assigned_consultant_id, target.is_orphan, target.last_contact), None)])
+
+
+@event.listens_for(Consultant, 'after_insert')
+def _consultant_inserted(mapper, connection, target):
+    # 排行榜只读汇总表，新咨询师也需要一行
+    upsert_increment(connection, ConsultantCounter.__table__, {'consultant_id': target.id},
+                     {'client_count': 0, 'orphan_count': 0})
+
+
+@event.listens_for(Message, 'after_insert')
+def _message_inserted(mapper, connection, target):
+    if target.sender_id is None:
+        return
+    # 同一事务内按发送者缓存咨询师ID（群发时不重复查询）
+    session = object_session(target)
+    lookup = session.info.setdefault('consultant_by_user', {}) if session is not None else {}
+    if target.sender_id not in lookup:
+        lookup[target.sender_id] = connection.execute(
+            select(Consultant.id).where(Consultant.user_id == target.sender_id)
+        ).scalar()
+    consultant_id = lookup[target.sender_id]
+    if consultant_id is not None:
+        upsert_increment(connection, ConsultantDailyActivity.__table__,
+                         {'consultant_id': consultant_id, 'day': (target.created_at or datetime.utcnow()).date()},
+                         {'contact_count': 0, 'message_count': 1})
+
+
+def get_consultant_counts(consultant_id, days=30):
+    """
+    读取咨询师汇总：客户数、孤儿数，以及最近days天（按自然日）的活跃客户数和发送消息数
+
+    @param {int} consultant_id - 咨询师ID
+    @param {int} days - 统计天数
+    @return {dict} - {'total_clients', 'orphan_clients', 'active_clients', 'recent_messages', 'week_messages'}
+    """
+    counter = db.session.get(ConsultantCounter, consultant_id)
+    today = datetime.utcnow().date()
+    week_start = today - timedelta(days=today.weekday())
+    start_day = (datetime.utcnow() - timedelta(days=days)).date()
+    day = ConsultantDailyActivity.day
+
+    def total(column, since):
+        return func.coalesce(func.sum(db.case((day >= since, column), else_=0)), 0)
+
+    active, messages, week_messages = db.session.query(
+        total(ConsultantDailyActivity.contact_count, start_day),
+        total(ConsultantDailyActivity.message_count, start_day),
+        total(ConsultantDailyActivity.message_count, week_start)
+    ).filter(
+        ConsultantDailyActivity.consultant_id == consultant_id,
+        day >= min(start_day, week_start)
+    ).one()
+    return {
+        'total_clients': counter.client_count if counter else 0,
+        'orphan_clients': counter.orphan_count if counter else 0,
+        'active_clients': int(active),
+        'recent_messages': int(messages),
+        'week_messages': int(week_messages)
+    }
+
+
+def _as_date(value):
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def reconcile_consultant_counters():
+    """
+    根据客户表和消息表全量重算咨询师汇总（定期执行，修正批量写入或并发造成的偏差）
+
+    @return {dict} - {'consultant_counters': 行数, 'consultant_daily_activity': 行数, 'corrected': 有偏差的咨询师数}
+    """
+    now = datetime.utcnow()
+    consultant_ids = [consultant_id for consultant_id, in db.session.query(Consultant.id)]
+    counts = {consultant_id: (total, int(orphans or 0)) for consultant_id, total, orphans in db.session.query(
+        Client.assigned_consultant_id, func.count(Client.id), func.sum(db.case((Client.is_orphan == True, 1), else_=0))
+    ).filter(Client.assigned_consultant_id.isnot(None)).group_by(Client.assigned_consultant_id)}
+
+    contact_day = func.date(Client.last_contact)
+    activity = {}
+    for consultant_id, day, count in db.session.query(
+        Client.assigned_consultant_id, contact_day, func.count(Client.id)
+    ).filter(Client.assigned_consultant_id.isnot(None), Client.last_contact.isnot(None)).group_by(
+        Client.assigned_consultant_id, contact_day
+    ):
+        activity[(consultant_id, _as_date(day))] = [count, 0]
+    message_day = func.date(Message.created_at)
+    for consultant_id, day, count in db.session.query(
+        Consultant.id, message_day, func.count(Message.id)
+    ).join(Message, Message.sender_id == Consultant.user_id).filter(Message.created_at.isnot(None)).group_by(
+        Consultant.id, message_day
+    ):
+        activity.setdefault((consultant_id, _as_date(day)), [0, 0])[1] = count
+
+    existing = {row.consultant_id: (row.client_count, row.orphan_count) for row in ConsultantCounter.query}
+    corrected = sum(1 for consultant_id in consultant_ids
+                    if existing.get(consultant_id) != counts.get(consultant_id, (0, 0)))
+
+    ConsultantCounter.query.delete()
+    ConsultantDailyActivity.query.delete()
+    db.session.add_all([ConsultantCounter(
+        consultant_id=consultant_id,
+        client_count=counts.get(consultant_id, (0, 0))[0],
+        orphan_count=counts.get(consultant_id, (0, 0))[1],
+        reconciled_at=now
+    ) for consultant_id in consultant_ids])
+    db.session.add_all([ConsultantDailyActivity(consultant_id=consultant_id, day=day, contact_count=contacts,
+                                                message_count=messages)
+                        for (consultant_id, day), (contacts, messages) in activity.items()])
+    db.session.commit()
+
+    return {'consultant_counters': len(consultant_ids), 'consultant_daily_activity': len(activity),
+            'corrected': corrected}
+
+
+def _revenue_source():
+    day = func.date(func.coalesce(Treatment.appointment_date, Treatment.created_at))
+    dimensions = [
+        day,
+        func.coalesce(Treatment.store_id, UNKNOWN_DIMENSION_ID),
+        func.coalesce(Treatment.doctor_id, UNKNOWN_DIMENSION_ID),
+        func.coalesce(Treatment.consultant_id, UNKNOWN_DIMENSION_ID),
+        func.coalesce(Treatment.type, UNKNOWN_TREATMENT_TYPE)
+    ]
+    return select(
+        *dimensions, func.count(Treatment.id), func.round(func.coalesce(func.sum(Treatment.fee), 0), 2),
+        func.round(func.coalesce(func.sum(Treatment.paid_amount), 0), 2)
+    ).where(
+        or_(Treatment.status.is_(None), Treatment.status != 'cancelled'), day.isnot(None)
+    ).group_by(*dimensions)
+
+
+def rebuild_rollups():
+    """
+    根据明细表全量重建汇总表（首次上线或数据修复时使用）
+
+    @return {dict} - 重建后各汇总表的行数
+    """
+    dialect = db.engine.dialect.name
+    month = month_expr(User.created_at, dialect).label('month')
+    signup_rows = db.session.query(month, db.func.count(User.id)).group_by(month).all()
+    type_rows = db.session.query(Treatment.type, db.func.count(Treatment.id)).group_by(Treatment.type).all()
+
+    MonthlySignupRollup.query.delete()
+    TreatmentTypeRollup.query.delete()
+    DailyRevenueRollup.query.delete()
+
+    type_counts = {}
+    for treatment_type, count in type_rows:
+        key = treatment_type or UNKNOWN_TREATMENT_TYPE
+        type_counts[key] = type_counts.get(key, 0) + count
+
+    db.session.add_all([MonthlySignupRollup(month=m, count=c) for m, c in signup_rows if m])
+    db.session.add_all([TreatmentTypeRollup(type=t, count=c) for t, c in type_counts.items()])
+    db.session.flush()
+    # 营收汇总行数多，直接用一条 INSERT ... SELECT ... GROUP BY 在数据库内重建
+    revenue_rows = db.session.execute(insert(DailyRevenueRollup.__table__).from_select(
+        ['day', 'store_id', 'doctor_id', 'consultant_id', 'type', 'treatment_count', 'fee_amount', 'paid_amount'],
+        _revenue_source()
+    )).rowcount
+    db.session.commit()
+
+    return {'monthly_signup_rollups': len(signup_rows), 'treatment_type_rollups': len(type_counts),
+            'daily_revenue_rollups': revenue_rows}
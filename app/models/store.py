@@ -1,5 +1,6 @@
 from datetime import datetime
 from app import db
+from app.utils.cache import invalidate_on_commit
 
 class Store(db.Model):
     """
@@ -60,4 +61,7 @@ class Store(db.Model):
             'specialties': self.specialties,
             'status': self.status,
             'created_at': self.created_at.isoformat() if self.created_at else None
-        } 
\ No newline at end of file
+        } 
+
+# 门店变更后失效门店相关缓存
+invalidate_on_commit(Store, lambda store: ['stores', f'store:{store.id}'])
@@ -1,5 +1,6 @@
 from datetime import datetime
 from app import db
+from app.utils.cache import invalidate_on_commit, attribute_values
 
 class Treatment(db.Model):
     """
@@ -14,10 +15,20 @@ class Treatment(db.Model):
     @property fee - 治疗费用
     @property status - 治疗状态
     @property appointment_date - 预约日期
+    @property duration_minutes - 预约时长（分钟）
+    @property external_id - 财务系统中的消费记录ID（由财务同步写入）
     @property created_at - 创建时间
     @property updated_at - 更新时间
     """
     __tablename__ = 'treatments'
+    __table_args__ = (
+        # 日历按所有者 + 预约时间范围查询
+        db.Index('ix_treatments_consultant_appointment', 'consultant_id', 'appointment_date'),
+        db.Index('ix_treatments_doctor_appointment', 'doctor_id', 'appointment_date'),
+        db.Index('ix_treatments_store_appointment', 'store_id', 'appointment_date'),
+        # 增量批处理按更新时间找出变化的记录
+        db.Index('ix_treatments_updated_at', 'updated_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     client_id = db.Column(db.Integer, db.ForeignKey('clients.id'))
@@ -38,6 +49,7 @@ class Treatment(db.Model):
     
     # 预约信息
     appointment_date = db.Column(db.DateTime)
+    duration_minutes = db.Column(db.Integer, default=30)
     
     # 创建和更新时间
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -47,6 +59,9 @@ class Treatment(db.Model):
     store = db.relationship('Store', backref=db.backref('treatments', lazy='dynamic'))
     doctor = db.relationship('Doctor', backref=db.backref('treatments', lazy='dynamic'))
     
+    # 财务系统同步的消费记录ID，同步时按此幂等更新
+    external_id = db.Column(db.String(64), unique=True, index=True)
+    
     # 记录负责该订单的咨询师信息
     consultant_id = db.Column(db.Integer, db.ForeignKey('consultants.id'))
     consultant = db.relationship('Consultant', backref=db.backref('handled_treatments', lazy='dynamic'),
@@ -69,5 +84,12 @@ class Treatment(db.Model):
             'paid_amount': self.paid_amount,
             'status': self.status,
             'appointment_date': self.appointment_date.isoformat() if self.appointment_date else None,
+            'duration_minutes': self.duration_minutes,
+            'external_id': self.external_id,
             'created_at': self.created_at.isoformat() if self.created_at else None
-        } 
\ No newline at end of file
+        } 
+
+
+invalidate_on_commit(Treatment, lambda treatment: [
+    f'bookings:store:{store_id}' for store_id in attribute_values(treatment, 'store_id')
+], track=('store_id',))
@@ -0,0 +1,3 @@
+"""
+业务服务模块初始化文件
+"""
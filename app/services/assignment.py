@@ -0,0 +1,226 @@
+"""
+客户自动分配服务
+
+为孤儿客户和未分配咨询师的新客户批量分配咨询师。候选咨询师按以下几项加权打分：
+- 专长匹配：咨询师专长（Consultant.specialties）覆盖客户兴趣标签（Client.tags）的比例
+- 门店距离：客户常去门店（最近一次治疗或签到的门店）与全职咨询师所在门店的距离
+- 评分：咨询师的贝叶斯平均评分
+- 负载：当前客户数相对平均负载的惩罚，随分配过程实时累加
+
+均衡分配：每个咨询师的容量上限为分配后平均负载的 (1 + ASSIGNMENT_LOAD_SLACK) 倍，
+专长偏好最明确的客户优先挑选，每个客户在仍有容量的咨询师中取得分最高者。打分对
+全部咨询师向量化计算，一次分配数千客户只需一次读取。写入时逐行按读取到的状态做条件
+更新（与孤儿认领相同），期间已被认领或修改的客户跳过。孤儿客户不会分回原咨询师。
+"""
+import math
+from collections import Counter
+from datetime import datetime
+import numpy as np
+from flask import current_app
+from sqlalchemy import update, bindparam, func, or_
+from app import db
+from app.models import Client, Consultant, User, Treatment, CheckIn, Store
+from app.models.stats import ConsultantCounter, apply_client_changes
+from app.services.geo import haversine_km
+from app.services.follow_up import follow_up_queue
+from app.utils.cache import cache
+
+WRITE_BATCH_SIZE = 1000
+
+
+def _split(value):
+    return {item.strip() for item in (value or '').replace('，', ',').split(',') if item.strip()}
+
+
+def _load_consultants():
+    # 已认证且账户有效的咨询师及其当前（非孤儿）客户数
+    consultants = db.session.query(Consultant.id, Consultant.specialties, Consultant.rating, Consultant.store_id).join(
+        User, User.id == Consultant.user_id
+    ).filter(Consultant.verified == True, User.is_active == True).order_by(Consultant.id).all()
+    loads = {consultant_id: clients - orphans for consultant_id, clients, orphans in db.session.query(
+        ConsultantCounter.consultant_id, ConsultantCounter.client_count, ConsultantCounter.orphan_count
+    )}
+    return consultants, loads
+
+
+def _home_stores(client_ids):
+    # 客户常去门店：最近一次治疗的门店，没有治疗记录时取最近一次签到的门店
+    homes, seen = {}, {}
+    for start in range(0, len(client_ids), WRITE_BATCH_SIZE):
+        chunk = client_ids[start:start + WRITE_BATCH_SIZE]
+        visit_time = func.coalesce(Treatment.appointment_date, Treatment.created_at)
+        for client_id, store_id, visited_at in db.session.query(Treatment.client_id, Treatment.store_id, visit_time).filter(
+            Treatment.client_id.in_(chunk), Treatment.store_id.isnot(None)
+        ):
+            if visited_at and (client_id not in seen or visited_at > seen[client_id]):
+                homes[client_id], seen[client_id] = store_id, visited_at
+        for client_id, store_id, checked_in_at in db.session.query(CheckIn.client_id, CheckIn.store_id, CheckIn.checked_in_at).filter(
+            CheckIn.client_id.in_([client_id for client_id in chunk if client_id not in homes])
+        ):
+            if client_id not in seen or checked_in_at > seen[client_id]:
+                homes[client_id], seen[client_id] = store_id, checked_in_at
+    return homes
+
+
+def _proximity_matrix(home_store_ids, consultant_store_ids):
+    # 门店距离得分 1 / (1 + 距离/ASSIGNMENT_DISTANCE_SCALE_KM)，任一方无门店时为0
+    scale = current_app.config.get('ASSIGNMENT_DISTANCE_SCALE_KM', 10)
+    store_ids = {store_id for store_id in list(home_store_ids) + list(consultant_store_ids) if store_id}
+    locations = {store_id: (lat, lng) for store_id, lat, lng in db.session.query(
+        Store.id, Store.latitude, Store.longitude
+    ).filter(Store.id.in_(store_ids), Store.latitude.isnot(None), Store.longitude.isnot(None))} if store_ids else {}
+
+    scores = {}
+    for home in set(home_store_ids):
+        row = np.zeros(len(consultant_store_ids))
+        for index, store_id in enumerate(consultant_store_ids):
+            if not home or not store_id:
+                continue
+            if home == store_id:
+                row[index] = 1.0
+            elif home in locations and store_id in locations:
+                row[index] = 1 / (1 + haversine_km(*locations[home], *locations[store_id]) / scale)
+        scores[home] = row
+    return scores
+
+
+def plan_assignments(clients, consultants, loads, home_stores):
+    """
+    计算分配方案（不写数据库）
+
+    @param {list} clients - [(客户ID, 兴趣标签字符串, 原咨询师ID)]
+    @param {list} consultants - [(咨询师ID, 专长字符串, 评分, 门店ID)]
+    @param {dict} loads - 咨询师ID -> 当前客户数
+    @param {dict} home_stores - 客户ID -> 常去门店ID
+    @return {dict} - 客户ID -> 咨询师ID（没有可分配的咨询师时不包含该客户）
+    """
+    if not clients or not consultants:
+        return {}
+    config = current_app.config
+    weights = np.array([
+        config.get('ASSIGNMENT_SPECIALTY_WEIGHT', 3.0),
+        config.get('ASSIGNMENT_PROXIMITY_WEIGHT', 2.0),
+        config.get('ASSIGNMENT_RATING_WEIGHT', 1.0)
+    ])
+    load_weight = config.get('ASSIGNMENT_LOAD_WEIGHT', 2.0)
+    slack = config.get('ASSIGNMENT_LOAD_SLACK', 0.1)
+
+    consultant_ids = [row[0] for row in consultants]
+    index_of = {consultant_id: index for index, consultant_id in enumerate(consultant_ids)}
+    specialties = sorted({item for row in consultants for item in _split(row[1])})
+    specialty_index = {item: index for index, item in enumerate(specialties)}
+    specialty_matrix = np.zeros((len(consultants), max(len(specialties), 1)))
+    for index, row in enumerate(consultants):
+        for item in _split(row[1]):
+            specialty_matrix[index, specialty_index[item]] = 1.0
+    ratings = np.clip((np.array([row[2] if row[2] is not None else 5.0 for row in consultants]) - 1) / 4, 0, 1)
+    proximity = _proximity_matrix([home_stores.get(row[0]) for row in clients], [row[3] for row in consultants])
+
+    load = np.array([loads.get(consultant_id, 0) for consultant_id in consultant_ids], dtype=np.float64)
+    average = (load.sum() + len(clients)) / len(consultants)
+    capacity = np.maximum(math.ceil(average * (1 + slack)) - load, 0)
+    if capacity.sum() < len(clients):
+        # 现有负载已严重不均时，放宽容量保证全部客户都能分配
+        capacity += math.ceil((len(clients) - capacity.sum()) / len(consultants))
+
+    # 每个客户对各咨询师的匹配得分（不含负载），专长偏好最明确的客户先挑选
+    base_scores = []
+    for client_id, tags, _ in clients:
+        interests = [specialty_index[item] for item in _split(tags) if item in specialty_index]
+        specialty = specialty_matrix[:, interests].mean(axis=1) if interests else np.zeros(len(consultants))
+        near = proximity[home_stores.get(client_id)]
+        base_scores.append(weights[0] * specialty + weights[1] * near + weights[2] * ratings)
+    order = sorted(range(len(clients)), key=lambda i: -(base_scores[i].max() - base_scores[i].mean()))
+
+    plan = {}
+    for i in order:
+        client_id, _, previous = clients[i]
+        scores = base_scores[i] - load_weight * load / max(average, 1)
+        scores[capacity <= 0] = -np.inf
+        if previous in index_of:
+            scores[index_of[previous]] = -np.inf
+        best = int(scores.argmax())
+        if not np.isfinite(scores[best]):
+            continue
+        plan[client_id] = consultant_ids[best]
+        load[best] += 1
+        capacity[best] -= 1
+    return plan
+
+
+def assign_clients(client_ids=None):
+    """
+    为孤儿客户和未分配咨询师的客户批量分配咨询师
+
+    @param {list} client_ids - 只分配这些客户，为空表示全部待分配客户
+    @return {dict} - {'candidates': 待分配数, 'assigned': 已分配数, 'by_consultant': {咨询师ID: 数量}}
+    """
+    query = db.session.query(Client.id, Client.tags, Client.assigned_consultant_id, Client.is_orphan,
+                             Client.last_contact).filter(
+        or_(Client.is_orphan == True, Client.assigned_consultant_id.is_(None))
+    )
+    if client_ids is not None:
+        query = query.filter(Client.id.in_(client_ids))
+    rows = query.order_by(Client.id).all()
+    clients = [(client_id, tags, previous) for client_id, tags, previous, _, _ in rows]
+    consultants, loads = _load_consultants()
+    plan = plan_assignments(clients, consultants, loads, _home_stores([row[0] for row in clients]))
+
+    updated = {}
+    if plan:
+        now = datetime.utcnow()
+        table = Client.__table__
+        # 只更新读取后仍未变化的待分配客户，避免覆盖期间的认领或人工分配
+        statement = update(table).where(
+            table.c.id == bindparam('client_id'),
+            or_(table.c.is_orphan == True, table.c.assigned_consultant_id.is_(None)),
+            table.c.is_orphan == bindparam('old_is_orphan'),
+            table.c.assigned_consultant_id.is_not_distinct_from(bindparam('old_consultant_id')),
+            table.c.last_contact.is_not_distinct_from(bindparam('old_last_contact'))
+        ).values(assigned_consultant_id=bindparam('consultant_id'), is_orphan=False, last_contact=now, updated_at=now)
+        changes = []
+        try:
+            connection = db.session.connection()
+            for client_id, _, previous, is_orphan, last_contact in rows:
+                if client_id not in plan:
+                    continue
+                result = connection.execute(statement, {
+                    'client_id': client_id,
+                    'consultant_id': plan[client_id],
+                    'old_is_orphan': is_orphan,
+                    'old_consultant_id': previous,
+                    'old_last_contact': last_contact
+                })
+                if result.rowcount == 1:
+                    updated[client_id] = plan[client_id]
+                    changes.append(((previous, is_orphan, last_contact), (plan[client_id], False, now)))
+            apply_client_changes(connection, changes)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    if updated:
+        # 批量更新不触发ORM事件，咨询师汇总随更新一起提交，缓存和跟进优先级在这里失效
+        previous = {client_id: consultant_id for client_id, _, consultant_id in clients}
+        cache.invalidate_tags('dashboard', *[f'client:{client_id}' for client_id in updated])
+        follow_up_queue.invalidate(*set(updated.values()) | {previous[client_id] for client_id in updated})
+
+    return {
+        'candidates': len(clients),
+        'assigned': len(updated),
+        'by_consultant': dict(Counter(updated.values()))
+    }
+
+
+def sweep_orphans():
+    """
+    标记超期未联系的孤儿客户，按配置随后自动重新分配
+
+    @return {dict} - {'orphan_count': 新增孤儿数, 'assignment': 分配结果或None}
+    """
+    orphan_count = Client.check_orphan_status()
+    assignment = None
+    if current_app.config.get('ASSIGNMENT_AFTER_ORPHAN_SWEEP', True):
+        assignment = assign_clients()
+    return {'orphan_count': orphan_count, 'assignment': assignment}
@@ -0,0 +1,128 @@
+"""
+预约日历服务
+
+按咨询师/医生/门店和日期范围查询预约，只使用半开区间 [开始, 结束) 比较
+appointment_date，可以直接利用 (所有者ID, appointment_date) 复合索引；
+一次查询同时得到事件列表和按天汇总的数量。
+"""
+from datetime import datetime, date, timedelta, time as dt_time
+from sqlalchemy import func
+from app import db
+from app.models import Treatment, Client
+
+OWNER_COLUMNS = {
+    'consultant': Treatment.consultant_id,
+    'doctor': Treatment.doctor_id,
+    'store': Treatment.store_id
+}
+
+VIEWS = ('day', 'week', 'month')
+
+
+def resolve_range(view, anchor):
+    """
+    计算日/周/月视图的日期范围（周一为一周开始）
+
+    @param {string} view - 视图（day/week/month）
+    @param {date} anchor - 范围内的任意一天
+    @return {tuple} - (开始日期, 结束日期)，结束日期不含
+    """
+    if view == 'day':
+        start = anchor
+        end = anchor + timedelta(days=1)
+    elif view == 'week':
+        start = anchor - timedelta(days=anchor.weekday())
+        end = start + timedelta(days=7)
+    elif view == 'month':
+        start = anchor.replace(day=1)
+        end = (start + timedelta(days=32)).replace(day=1)
+    else:
+        raise ValueError(f'unknown calendar view: {view}')
+    return start, end
+
+
+def get_calendar(owner_type, owner_id, start_date, end_date, status=None, limit=500):
+    """
+    查询日历范围内的预约和每日数量
+
+    @param {string} owner_type - 所有者类型（consultant/doctor/store）
+    @param {int} owner_id - 所有者ID
+    @param {date} start_date - 开始日期（含）
+    @param {date} end_date - 结束日期（不含）
+    @param {string} status - 预约状态筛选
+    @param {int} limit - 返回事件数上限
+    @return {dict} - 每日数量、事件列表及是否截断
+    """
+    owner_column = OWNER_COLUMNS[owner_type]
+    start = datetime.combine(start_date, dt_time())
+    end = datetime.combine(end_date, dt_time())
+
+    criteria = [owner_column == owner_id, Treatment.appointment_date >= start, Treatment.appointment_date < end]
+    if status:
+        criteria.append(Treatment.status == status)
+
+    rows = db.session.query(
+        Treatment.id, Treatment.client_id, Client.name.label('client_name'), Treatment.consultant_id,
+        Treatment.doctor_id, Treatment.store_id, Treatment.type, Treatment.status,
+        Treatment.appointment_date, Treatment.duration_minutes
+    ).outerjoin(Client, Client.id == Treatment.client_id).filter(*criteria).order_by(
+        Treatment.appointment_date, Treatment.id
+    ).limit(limit + 1).all()
+
+    truncated = len(rows) > limit
+    rows = rows[:limit]
+
+    days = {}
+    day = start_date
+    while day < end_date:
+        days[day] = {'date': day.isoformat(), 'count': 0, 'by_status': {}}
+        day += timedelta(days=1)
+
+    if truncated:
+        # 事件超过上限时，每日数量改由聚合查询得到，保证月视图的计数完整
+        day_column = func.date(Treatment.appointment_date).label('day')
+        for day_value, status_value, count in db.session.query(
+                day_column, Treatment.status, func.count(Treatment.id)
+        ).filter(*criteria).group_by(day_column, Treatment.status).all():
+            bucket = days.get(_as_date(day_value))
+            if bucket is not None:
+                bucket['count'] += count
+                bucket['by_status'][status_value] = bucket['by_status'].get(status_value, 0) + count
+    else:
+        for row in rows:
+            bucket = days[row.appointment_date.date()]
+            bucket['count'] += 1
+            bucket['by_status'][row.status] = bucket['by_status'].get(row.status, 0) + 1
+
+    events = []
+    for row in rows:
+        duration = row.duration_minutes or 30
+        events.append({
+            'id': row.id,
+            'client_id': row.client_id,
+            'client_name': row.client_name,
+            'consultant_id': row.consultant_id,
+            'doctor_id': row.doctor_id,
+            'store_id': row.store_id,
+            'type': row.type,
+            'status': row.status,
+            'start': row.appointment_date.isoformat(),
+            'end': (row.appointment_date + timedelta(minutes=duration)).isoformat(),
+            'duration_minutes': duration
+        })
+
+    return {
+        'start': start_date.isoformat(),
+        'end': end_date.isoformat(),
+        'days': list(days.values()),
+        'events': events,
+        'truncated': truncated
+    }
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
@@ -0,0 +1,398 @@
+"""
+门店排队叫号服务
+
+每个门店每天一份队列状态，保存在内存中（使用Redis时为Redis，多个worker共享），
+签到、叫号、过号、重呼都不写数据库，高峰期不会争抢数据库热点行。后台线程定期把
+有变化的队列写入 queue_snapshots 表，进程或Redis重启后从快照恢复（最多丢失一个
+快照间隔内的操作）。
+
+队列每次变化后通过SSE推送到候诊大屏和客户端页面。
+"""
+import os
+import copy
+import json
+import time
+import atexit
+import logging
+import threading
+from datetime import datetime, date
+from app import db
+from app.models import QueueSnapshot
+from app.utils.sql import upsert_increment
+from app.services.catalog import get_store_detail
+from app.utils.sse import broker
+from app.utils.exceptions import BadRequestException, NotFoundException
+
+logger = logging.getLogger(__name__)
+
+
+def queue_channel(store_id):
+    """
+    门店叫号队列的SSE频道
+
+    @param {int} store_id - 门店ID
+    @return {string} - 频道名称
+    """
+    return f'store:{store_id}:queue'
+
+
+def mask_name(name):
+    """
+    隐藏姓名，仅保留首字（候诊大屏公开展示用）
+
+    @param {string} name - 姓名
+    @return {string} - 脱敏后的姓名
+    """
+    if not name:
+        return ''
+    return name[0] + '*' * min(len(name) - 1, 2) if len(name) > 1 else name
+
+
+def doctor_board(store_id):
+    """
+    门店医生的实时状态（候诊大屏展示）
+
+    @param {int} store_id - 门店ID
+    @return {list} - 医生状态列表
+    """
+    store_data = get_store_detail(store_id) or {'doctors': []}
+    return [{
+        'id': doctor['id'],
+        'name': doctor['name'],
+        'title': doctor['title'],
+        'specialty': doctor['specialty'],
+        'status': doctor['status']
+    } for doctor in store_data['doctors']]
+
+
+def _empty_state(store_id, queue_date):
+    return {
+        'store_id': store_id,
+        'date': queue_date.isoformat(),
+        'last_number': 0,
+        'tickets': {},
+        'waiting': [],
+        'serving': {},
+        'version': 0
+    }
+
+
+class MemoryQueueBackend:
+    """
+    进程内队列存储（单进程部署和测试使用）
+    """
+    def __init__(self):
+        self._states = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get(self, key):
+        state = self._states.get(key)
+        return copy.deepcopy(state) if state is not None else None
+
+    def update(self, key, mutate, initial):
+        """
+        原子地修改队列状态
+
+        @param {string} key - 队列key
+        @param {function} mutate - 修改函数，接收状态字典并返回结果
+        @param {function} initial - 状态不存在时生成初始状态
+        @return {tuple} - (新状态, 修改函数的返回值)
+        """
+        with self._key_lock(key):
+            state = copy.deepcopy(self._states.get(key)) or initial()
+            result = mutate(state)
+            state['version'] += 1
+            self._states[key] = state
+            return copy.deepcopy(state), result
+
+
+class RedisQueueBackend:
+    """
+    Redis队列存储，以WATCH/MULTI乐观锁保证同一门店的并发修改互不覆盖
+
+    @param {Redis} client - Redis客户端
+    @param {string} prefix - key前缀
+    @param {int} ttl - 状态过期时间（秒）
+    """
+    def __init__(self, client, prefix='yayi:queue:', ttl=2 * 86400):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return json.loads(raw) if raw else None
+
+    def update(self, key, mutate, initial):
+        import redis
+        redis_key = self.prefix + key
+        while True:
+            with self.client.pipeline() as pipe:
+                try:
+                    pipe.watch(redis_key)
+                    raw = pipe.get(redis_key)
+                    state = json.loads(raw) if raw else initial()
+                    result = mutate(state)
+                    state['version'] += 1
+                    pipe.multi()
+                    pipe.set(redis_key, json.dumps(state, ensure_ascii=False), ex=self.ttl)
+                    pipe.execute()
+                    return state, result
+                except redis.WatchError:
+                    continue
+
+
+class CallQueueService:
+    """
+    排队叫号服务
+    """
+    def __init__(self):
+        self.app = None
+        self.backend = MemoryQueueBackend()
+        self.snapshot_interval = 5
+        self._dirty = set()
+        self._dirty_lock = threading.Lock()
+        self._flusher_pid = None
+
+    def init_app(self, app, redis_client=None):
+        """
+        初始化叫号服务
+
+        @param {Flask} app - Flask应用实例
+        @param {Redis} redis_client - Redis客户端，为空时使用进程内存储
+        """
+        self.app = app
+        self.snapshot_interval = app.config.get('QUEUE_SNAPSHOT_INTERVAL', 5)
+        if redis_client is not None:
+            self.backend = RedisQueueBackend(redis_client, prefix=app.config.get('QUEUE_KEY_PREFIX', 'yayi:queue:'))
+        else:
+            self.backend = MemoryQueueBackend()
+        app.extensions['call_queue'] = self
+
+    # 快照
+    def _ensure_flusher(self):
+        if self._flusher_pid == os.getpid():
+            return
+        with self._dirty_lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+            self._dirty = set()
+        threading.Thread(target=self._flush_loop, name='queue-snapshot', daemon=True).start()
+        atexit.register(self.flush)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.snapshot_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"写入叫号队列快照失败: {str(e)}")
+
+    def flush(self):
+        """
+        把有变化的队列写入快照表
+        """
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, set()
+        if not dirty or self.app is None:
+            return
+
+        with self.app.app_context():
+            try:
+                for store_id, queue_date in dirty:
+                    state = self.backend.get(self._key(store_id, queue_date))
+                    if state is None:
+                        continue
+                    upsert_increment(
+                        db.session.connection(), QueueSnapshot.__table__,
+                        {'store_id': store_id, 'queue_date': queue_date}, {},
+                        {'state': json.dumps(state, ensure_ascii=False), 'updated_at': datetime.utcnow()}
+                    )
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                with self._dirty_lock:
+                    self._dirty |= dirty
+                raise
+
+    def _key(self, store_id, queue_date):
+        return f'{store_id}:{queue_date.isoformat()}'
+
+    def _initial_state(self, store_id, queue_date):
+        snapshot = QueueSnapshot.query.filter_by(store_id=store_id, queue_date=queue_date).first()
+        if snapshot is not None:
+            return json.loads(snapshot.state)
+        return _empty_state(store_id, queue_date)
+
+    def _update(self, store_id, mutate):
+        self._ensure_flusher()
+        queue_date = date.today()
+        state, result = self.backend.update(
+            self._key(store_id, queue_date), mutate, lambda: self._initial_state(store_id, queue_date)
+        )
+        with self._dirty_lock:
+            self._dirty.add((store_id, queue_date))
+        broker.publish(queue_channel(store_id), 'queue', self.public_view(state))
+        return state, result
+
+    def get_state(self, store_id):
+        """
+        获取门店当天的队列状态
+
+        @param {int} store_id - 门店ID
+        @return {dict} - 队列状态
+        """
+        queue_date = date.today()
+        state = self.backend.get(self._key(store_id, queue_date))
+        if state is None:
+            state = self._initial_state(store_id, queue_date)
+        return state
+
+    # 队列操作
+    def check_in(self, store_id, name, client_id=None, doctor_id=None):
+        """
+        签到取号；同一客户已在排队时返回原号码
+
+        @param {int} store_id - 门店ID
+        @param {string} name - 客户姓名
+        @param {int} client_id - 客户ID
+        @param {int} doctor_id - 指定医生ID
+        @return {dict} - 号码信息
+        """
+        def mutate(state):
+            if client_id is not None:
+                for number in state['waiting']:
+                    ticket = state['tickets'][str(number)]
+                    if ticket['client_id'] == client_id:
+                        return ticket
+            state['last_number'] += 1
+            number = state['last_number']
+            ticket = {
+                'number': number,
+                'client_id': client_id,
+                'name': name,
+                'doctor_id': doctor_id,
+                'status': 'waiting',
+                'checked_in_at': datetime.now().isoformat(timespec='seconds'),
+                'called_at': None,
+                'called_doctor_id': None
+            }
+            state['tickets'][str(number)] = ticket
+            state['waiting'].append(number)
+            return ticket
+
+        state, ticket = self._update(store_id, mutate)
+        return dict(ticket, ahead=state['waiting'].index(ticket['number']))
+
+    def call_next(self, store_id, doctor_id):
+        """
+        医生叫下一个号，当前正在就诊的号码视为完成
+
+        @param {int} store_id - 门店ID
+        @param {int} doctor_id - 医生ID
+        @return {dict|None} - 被叫到的号码，无人等候时为None
+        """
+        def mutate(state):
+            current = state['serving'].pop(str(doctor_id), None)
+            if current is not None:
+                state['tickets'][str(current)]['status'] = 'done'
+
+            for position, number in enumerate(state['waiting']):
+                ticket = state['tickets'][str(number)]
+                if ticket['doctor_id'] in (None, doctor_id):
+                    del state['waiting'][position]
+                    ticket['status'] = 'called'
+                    ticket['called_at'] = datetime.now().isoformat(timespec='seconds')
+                    ticket['called_doctor_id'] = doctor_id
+                    state['serving'][str(doctor_id)] = number
+                    return ticket
+            return None
+
+        ticket = self._update(store_id, mutate)[1]
+        if ticket is not None:
+            broker.publish(queue_channel(store_id), 'call', self._public_ticket(ticket))
+        return ticket
+
+    def skip(self, store_id, number):
+        """
+        过号：被叫号码未到场，暂时移出
+
+        @param {int} store_id - 门店ID
+        @param {int} number - 号码
+        @return {dict} - 号码信息
+        """
+        def mutate(state):
+            ticket = state['tickets'].get(str(number))
+            if ticket is None:
+                raise NotFoundException("号码不存在")
+            if ticket['status'] == 'called':
+                state['serving'].pop(str(ticket['called_doctor_id']), None)
+            elif ticket['status'] == 'waiting':
+                state['waiting'].remove(number)
+            else:
+                raise BadRequestException("该号码无法过号")
+            ticket['status'] = 'skipped'
+            return ticket
+
+        return self._update(store_id, mutate)[1]
+
+    def recall(self, store_id, number):
+        """
+        重呼：已叫号码再次广播；过号的号码重新排到队首
+
+        @param {int} store_id - 门店ID
+        @param {int} number - 号码
+        @return {dict} - 号码信息
+        """
+        def mutate(state):
+            ticket = state['tickets'].get(str(number))
+            if ticket is None:
+                raise NotFoundException("号码不存在")
+            if ticket['status'] == 'skipped':
+                ticket['status'] = 'waiting'
+                ticket['called_doctor_id'] = None
+                state['waiting'].insert(0, number)
+            elif ticket['status'] != 'called':
+                raise BadRequestException("该号码无法重呼")
+            return ticket
+
+        ticket = self._update(store_id, mutate)[1]
+        if ticket['status'] == 'called':
+            broker.publish(queue_channel(store_id), 'call', self._public_ticket(ticket))
+        return ticket
+
+    # 展示
+    def _public_ticket(self, ticket):
+        return {
+            'number': ticket['number'],
+            'name': mask_name(ticket['name']),
+            'status': ticket['status'],
+            'doctor_id': ticket['called_doctor_id'] or ticket['doctor_id']
+        }
+
+    def public_view(self, state):
+        """
+        候诊大屏展示的队列信息（姓名脱敏）
+
+        @param {dict} state - 队列状态
+        @return {dict} - 展示数据
+        """
+        tickets = state['tickets']
+        return {
+            'store_id': state['store_id'],
+            'date': state['date'],
+            'version': state['version'],
+            'waiting_count': len(state['waiting']),
+            'waiting': [self._public_ticket(tickets[str(number)]) for number in state['waiting'][:20]],
+            'serving': {doctor_id: self._public_ticket(tickets[str(number)])
+                        for doctor_id, number in state['serving'].items()}
+        }
+
+
+call_queue = CallQueueService()
@@ -0,0 +1,50 @@
+"""
+门店、医生、知识库等公共数据的缓存读取服务
+"""
+from app.models import Store, Doctor, Consultant, KnowledgeArticle, KnowledgeQA
+from app.utils.cache import cache
+
+
+@cache.cached(ttl=600, key_prefix='catalog:active_stores', tags=['stores'])
+def get_active_stores():
+    """
+    获取所有营业中的门店
+
+    @return {list} - 门店字典列表
+    """
+    return [store.to_dict() for store in Store.query.filter_by(status='active').all()]
+
+
+@cache.cached(ttl=600, key_prefix='catalog:store_detail', tags=lambda store_id: [f'store:{store_id}'])
+def get_store_detail(store_id):
+    """
+    获取门店详情（含医生和咨询师）
+
+    @param {int} store_id - 门店ID
+    @return {dict|None} - 门店详情，门店不存在时返回None
+    """
+    store = Store.query.get(store_id)
+    if not store:
+        return None
+
+    doctors = Doctor.query.filter_by(store_id=store_id).all()
+    consultants = Consultant.query.filter_by(store_id=store_id).all()
+
+    store_data = store.to_dict()
+    store_data['doctors'] = [doctor.to_dict() for doctor in doctors]
+    store_data['consultants'] = [consultant.to_dict() for consultant in consultants]
+    return store_data
+
+
+@cache.cached(ttl=300, key_prefix='catalog:approved_knowledge', tags=['knowledge'])
+def get_approved_knowledge():
+    """
+    获取已审核通过的知识库文章和问答
+
+    @return {tuple} - (文章字典列表, 问答字典列表)
+    """
+    articles = KnowledgeArticle.query.filter_by(status='approved').order_by(
+        KnowledgeArticle.created_at.desc()).all()
+    qa_list = KnowledgeQA.query.filter_by(status='approved').order_by(
+        KnowledgeQA.use_count.desc()).all()
+    return [article.to_dict() for article in articles], [qa.to_dict() for qa in qa_list]
@@ -0,0 +1,328 @@
+"""
+到店签到推送服务
+
+客户扫描门店二维码签到后，需要实时通知门店、客户绑定的兼职咨询师和当天预约的
+全职咨询师。签到请求只做校验和入队即返回，高峰期不阻塞在数据库写入上；后台线程
+批量取出签到，按缓存的路由索引找出需要通知的咨询师，先批量写入 check_ins 表，写入
+成功后再经SSE推送。单条签到的路由查询或推送失败只影响该条；写入失败的签到退避后
+单独成批重试，不阻塞新签到；进程内队列满时退化为在请求内直接处理，签到不会丢失。
+
+路由索引：
+- 门店当天预约索引（客户ID -> 预约的咨询师ID），预约变更后按门店失效
+- 客户绑定的咨询师，客户资料变更后失效
+- 咨询师ID -> 用户ID，咨询师变更后失效
+"""
+import os
+import time
+import heapq
+import queue
+import itertools
+import atexit
+import logging
+import threading
+from datetime import datetime, date, timedelta, time as dt_time
+from flask import current_app
+from app import db
+from app.models import CheckIn, Client, Consultant, Treatment
+from app.utils.cache import cache
+from app.utils.sse import broker
+from app.utils.exceptions import DatabaseException
+from app.utils.metrics import set_queue_depth, observe_notify_latency
+
+logger = logging.getLogger(__name__)
+
+
+def checkin_channel(store_id):
+    """
+    门店签到的SSE频道（门店前台、店内咨询师订阅）
+
+    @param {int} store_id - 门店ID
+    @return {string} - 频道名称
+    """
+    return f'store:{store_id}:checkins'
+
+
+def user_channel(user_id):
+    """
+    用户个人通知的SSE频道
+
+    @param {int} user_id - 用户ID
+    @return {string} - 频道名称
+    """
+    return f'user:{user_id}:notifications'
+
+
+def _index_ttl():
+    return current_app.config.get('CHECKIN_INDEX_TTL', 300)
+
+
+def _store_bookings(store_id, day):
+    # 门店当天未完成预约的索引，键为字符串以便Redis缓存序列化
+    def loader():
+        start = datetime.combine(day, dt_time())
+        rows = db.session.query(Treatment.client_id, Treatment.consultant_id).filter(
+            Treatment.store_id == store_id,
+            Treatment.status == 'scheduled',
+            Treatment.consultant_id.isnot(None),
+            Treatment.appointment_date >= start,
+            Treatment.appointment_date < start + timedelta(days=1)
+        ).all()
+        index = {}
+        for client_id, consultant_id in rows:
+            consultants = index.setdefault(str(client_id), [])
+            if consultant_id not in consultants:
+                consultants.append(consultant_id)
+        return index
+
+    return cache.get_or_set(f'checkin:bookings:{store_id}:{day.isoformat()}', loader,
+                            ttl=_index_ttl(), tags=[f'bookings:store:{store_id}'])
+
+
+def _assigned_consultant(client_id):
+    def loader():
+        row = db.session.query(Client.assigned_consultant_id).filter(Client.id == client_id).first()
+        return {'consultant_id': row[0] if row else None}
+
+    return cache.get_or_set(f'checkin:client:{client_id}', loader,
+                            ttl=_index_ttl(), tags=[f'client:{client_id}'])['consultant_id']
+
+
+def _consultant_users():
+    def loader():
+        rows = db.session.query(Consultant.id, Consultant.user_id).filter(Consultant.user_id.isnot(None)).all()
+        return {str(consultant_id): user_id for consultant_id, user_id in rows}
+
+    return cache.get_or_set('checkin:consultant_users', loader, ttl=_index_ttl(), tags=['consultants'])
+
+
+def resolve_recipients(store_id, client_id, day=None):
+    """
+    查找签到需要通知的咨询师
+
+    @param {int} store_id - 门店ID
+    @param {int} client_id - 客户ID
+    @param {date} day - 签到日期，默认今天
+    @return {list} - [{'consultant_id', 'user_id', 'reason'}]，reason为assigned/booked
+    """
+    if client_id is None:
+        return []
+
+    reasons = {}
+    assigned = _assigned_consultant(client_id)
+    if assigned:
+        reasons[assigned] = 'assigned'
+    for consultant_id in _store_bookings(store_id, day or date.today()).get(str(client_id), ()):
+        reasons.setdefault(consultant_id, 'booked')
+
+    users = _consultant_users()
+    return [{'consultant_id': consultant_id, 'user_id': users[str(consultant_id)], 'reason': reason}
+            for consultant_id, reason in reasons.items() if str(consultant_id) in users]
+
+
+class CheckInService:
+    """
+    签到入队与推送服务
+    """
+    def __init__(self):
+        self.app = None
+        self.batch_size = 200
+        self._queue = queue.Queue(maxsize=10000)
+        self._lock = threading.Lock()
+        self._worker_pid = None
+        # 待重试的签到：(下次尝试时间, 序号, 签到)，只由后台线程读写，不阻塞新签到
+        self._retries = []
+        self._retry_seq = itertools.count()
+
+    def init_app(self, app):
+        """
+        初始化签到服务
+
+        @param {Flask} app - Flask应用实例
+        """
+        self.app = app
+        self.batch_size = app.config.get('CHECKIN_BATCH_SIZE', 200)
+        self._queue = queue.Queue(maxsize=app.config.get('CHECKIN_QUEUE_MAXSIZE', 10000))
+        app.extensions['checkin'] = self
+
+    def _ensure_worker(self):
+        # 后台线程按进程启动（gunicorn预加载后fork出的worker需要各自启动）
+        if self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker_pid == os.getpid():
+                return
+            self._worker_pid = os.getpid()
+            self._queue = queue.Queue(maxsize=self._queue.maxsize)
+            self._retries = []
+        threading.Thread(target=self._work_loop, name='checkin-notify', daemon=True).start()
+        atexit.register(self.drain)
+
+    def submit(self, store_id, client_id, name):
+        """
+        提交一次签到；正常情况下立即返回，由后台线程推送和落库
+
+        @param {int} store_id - 门店ID
+        @param {int} client_id - 客户ID
+        @param {string} name - 客户姓名
+        @return {bool} - 是否为新签到（去重时间内重复扫码返回False）
+        """
+        dedup_seconds = current_app.config.get('CHECKIN_DEDUP_SECONDS', 60)
+        if client_id is not None and dedup_seconds:
+            # SET NX 原子去重，同时到达的两次扫码只有一次通过
+            try:
+                if not cache.backend.add(f'checkin:recent:{store_id}:{client_id}', 1, dedup_seconds):
+                    return False
+            except Exception as e:
+                logger.error(f"签到去重失败: {str(e)}")
+
+        item = {
+            'store_id': store_id,
+            'client_id': client_id,
+            'name': name,
+            'checked_in_at': datetime.now(),
+            'received_at': time.time()
+        }
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            logger.warning("签到队列已满，在请求内直接处理")
+            if self.process([item]):
+                if client_id is not None and dedup_seconds:
+                    cache.delete(f'checkin:recent:{store_id}:{client_id}')
+                raise DatabaseException("签到保存失败，请稍后重试")
+        set_queue_depth('checkin', self._queue.qsize())
+        return True
+
+    def _work_loop(self):
+        while True:
+            timeout = max(self._retries[0][0] - time.time(), 0) if self._retries else None
+            batch = []
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                pass
+            while batch and len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            set_queue_depth('checkin', self._queue.qsize())
+            if batch:
+                self._process_batch(batch)
+
+            # 到期的重试单独成批处理，反复失败的签到不拖慢新签到
+            now, due = time.time(), []
+            while self._retries and self._retries[0][0] <= now and len(due) < self.batch_size:
+                due.append(heapq.heappop(self._retries)[2])
+            if due:
+                self._process_batch(due)
+
+    def _process_batch(self, batch):
+        try:
+            with self.app.app_context():
+                failed = self.process(batch)
+        except Exception as e:
+            logger.error(f"处理签到推送失败: {str(e)}")
+            failed = batch
+        if failed:
+            self._schedule_retry(failed)
+
+    def _schedule_retry(self, items):
+        # 写入失败的签到按重试次数退避后再试，超过次数后记录完整内容以便人工补录
+        max_attempts = self.app.config.get('CHECKIN_SAVE_ATTEMPTS', 10)
+        now = time.time()
+        for item in items:
+            item['attempts'] = item.get('attempts', 0) + 1
+            if item['attempts'] >= max_attempts:
+                logger.error(f"签到多次保存失败，已放弃: {item}")
+            elif len(self._retries) >= self._queue.maxsize:
+                logger.error(f"待重试签到过多，无法重试: {item}")
+            else:
+                heapq.heappush(self._retries, (now + min(2 ** item['attempts'], 30), next(self._retry_seq), item))
+
+    def drain(self):
+        """
+        处理队列中剩余的签到（进程退出前调用）
+        """
+        batch = [item for _, _, item in self._retries]
+        self._retries = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch and self.app is not None:
+            with self.app.app_context():
+                for item in self.process(batch):
+                    logger.error(f"进程退出前签到保存失败: {item}")
+
+    def _save(self, rows):
+        # 整批写入失败时逐条重试，返回仍写入失败的行号
+        try:
+            db.session.execute(CheckIn.__table__.insert(), rows)
+            db.session.commit()
+            return []
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"批量保存签到失败，逐条重试: {str(e)}")
+
+        failed = []
+        for index, row in enumerate(rows):
+            try:
+                db.session.execute(CheckIn.__table__.insert(), [row])
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"保存签到失败: {str(e)}")
+                failed.append(index)
+        return failed
+
+    def _publish(self, item, recipients):
+        payload = {
+            'store_id': item['store_id'],
+            'client_id': item['client_id'],
+            'name': item['name'],
+            'checked_in_at': item['checked_in_at'].isoformat(timespec='seconds')
+        }
+        broker.publish(checkin_channel(item['store_id']), 'checkin', payload)
+        for recipient in recipients:
+            broker.publish(user_channel(recipient['user_id']), 'checkin', dict(payload, reason=recipient['reason']))
+        observe_notify_latency('checkin', time.time() - item['received_at'])
+
+    def process(self, batch):
+        """
+        保存并推送一批签到：先写入 check_ins 表，写入成功的签到再推送
+
+        @param {list} batch - 签到列表
+        @return {list} - 保存失败的签到（由调用方安排重试）
+        """
+        recipients_list, rows = [], []
+        for item in batch:
+            try:
+                recipients = resolve_recipients(item['store_id'], item['client_id'], item['checked_in_at'].date())
+            except Exception as e:
+                # 路由索引不可用时仍保存签到并推送到门店频道
+                logger.error(f"查询签到通知对象失败: {str(e)}")
+                recipients = []
+            recipients_list.append(recipients)
+            rows.append({
+                'client_id': item['client_id'],
+                'store_id': item['store_id'],
+                'checked_in_at': item['checked_in_at'],
+                'notified_at': datetime.now(),
+                'notified_users': ','.join(str(recipient['user_id']) for recipient in recipients)[:256]
+            })
+
+        failed = set(self._save(rows))
+        for index, item in enumerate(batch):
+            if index in failed:
+                continue
+            try:
+                self._publish(item, recipients_list[index])
+            except Exception as e:
+                logger.error(f"推送签到失败: {str(e)}")
+        return [batch[index] for index in sorted(failed)]
+
+
+checkin_service = CheckInService()
@@ -0,0 +1,183 @@
+"""
+孤儿客户认领服务
+
+认领是一条条件更新（比较并交换）：
+
+    UPDATE clients SET assigned_consultant_id = :咨询师, is_orphan = false, last_contact = :now
+    WHERE id = :客户 AND is_orphan = true
+      AND assigned_consultant_id <=> :读取到的原咨询师 AND last_contact <=> :读取到的最后联系时间
+
+受影响行数为1即认领成功。多个咨询师同时认领同一客户时，数据库行锁使这些更新串行
+执行，后到者重新判断条件时客户已不是孤儿，只有一个认领者胜出，不需要先加锁读取。
+条件中带上读取到的原状态，胜者变更前的状态与读取值一致，咨询师汇总据此在同一事务
+中增量更新；读取后状态被改动但仍是孤儿的客户用加锁读取重新读取后重试。
+
+批量认领在一个事务中按客户ID升序逐条更新（固定加锁顺序，并发的批量认领不会互相
+死锁），认领记录（含认领费用）随更新一起提交。
+"""
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import update, insert, bindparam, func
+from app import db
+from app.models import Client, ClientClaim
+from app.models.stats import apply_client_changes
+from app.services.follow_up import follow_up_queue
+from app.services.commission import record_claim_commissions
+from app.utils.cache import cache
+from app.utils.exceptions import BadRequestException
+
+MAX_RETRIES = 3
+
+
+def _claim_statement(consultant_id, now):
+    table = Client.__table__
+    return update(table).where(
+        table.c.id == bindparam('client_id'),
+        table.c.is_orphan == True,
+        table.c.assigned_consultant_id.is_not_distinct_from(bindparam('old_consultant_id')),
+        table.c.last_contact.is_not_distinct_from(bindparam('old_last_contact'))
+    ).values(assigned_consultant_id=consultant_id, is_orphan=False, last_contact=now, updated_at=now)
+
+
+def _read_orphans(client_ids, locking=False):
+    # 重试时用加锁读取，读到最新提交的状态而不是事务快照
+    query = db.session.query(Client.id, Client.assigned_consultant_id, Client.last_contact, Client.sentiment_ema).filter(
+        Client.id.in_(client_ids), Client.is_orphan == True
+    )
+    if locking:
+        query = query.with_for_update()
+    return {client_id: (consultant_id, last_contact, sentiment_ema)
+            for client_id, consultant_id, last_contact, sentiment_ema in query}
+
+
+def claim_orphans(client_ids, consultant_id, fee=0, source='batch', now=None):
+    """
+    在当前事务中认领孤儿客户（不提交），同时更新咨询师汇总、写入认领记录和认领对价提成
+
+    @param {list} client_ids - 客户ID
+    @param {int} consultant_id - 认领的咨询师ID
+    @param {float} fee - 每个客户的认领费用
+    @param {string} source - 认领来源
+    @param {datetime} now - 认领时间
+    @return {dict} - 认领成功的 {客户ID: (原咨询师ID, 跟进优先级键)}
+    """
+    now = now or datetime.utcnow()
+    connection = db.session.connection()
+    statement = _claim_statement(consultant_id, now)
+    won, changes = {}, []
+    pending = sorted(set(client_ids))
+    for attempt in range(MAX_RETRIES):
+        if not pending:
+            break
+        states = _read_orphans(pending, locking=attempt > 0)
+        retry = []
+        for client_id in pending:
+            if client_id not in states:
+                # 已不是孤儿或不存在
+                continue
+            old_consultant_id, old_last_contact, sentiment_ema = states[client_id]
+            result = connection.execute(statement, {
+                'client_id': client_id,
+                'old_consultant_id': old_consultant_id,
+                'old_last_contact': old_last_contact
+            })
+            if result.rowcount == 1:
+                won[client_id] = (old_consultant_id, follow_up_queue.priority_key(now, sentiment_ema))
+                changes.append(((old_consultant_id, True, old_last_contact), (consultant_id, False, now)))
+            else:
+                retry.append(client_id)
+        pending = retry
+
+    if won:
+        apply_client_changes(connection, changes)
+        connection.execute(insert(ClientClaim.__table__), [{
+            'client_id': client_id,
+            'consultant_id': consultant_id,
+            'previous_consultant_id': old_consultant_id,
+            'fee': fee,
+            'source': source,
+            'claimed_at': now
+        } for client_id, (old_consultant_id, _) in won.items()])
+        # 付费认领的对价提成随认领一起记账
+        if fee:
+            record_claim_commissions(connection, list(won), now)
+    return won
+
+
+def after_claims_committed(won, consultant_id):
+    """
+    认领提交后失效缓存并更新跟进优先级（条件更新不触发ORM事件）
+
+    @param {dict} won - claim_orphans的返回值
+    @param {int} consultant_id - 认领的咨询师ID
+    """
+    if not won:
+        return
+    cache.invalidate_tags('dashboard', *[f'client:{client_id}' for client_id in won])
+    follow_up_queue.apply({client_id: (old_consultant_id, consultant_id, key)
+                           for client_id, (old_consultant_id, key) in won.items()})
+
+
+def claim_clients(client_ids, consultant_id, fee=None, source='batch'):
+    """
+    批量认领孤儿客户
+
+    @param {list} client_ids - 客户ID
+    @param {int} consultant_id - 认领的咨询师ID
+    @param {float} fee - 每个客户的认领费用，为空时使用 ORPHAN_CLAIM_FEE
+    @param {string} source - 认领来源
+    @return {dict} - {'claimed': 认领成功的客户ID, 'failed': 未认领成功的客户ID, 'fee_total': 费用合计}
+    """
+    client_ids = sorted(set(client_ids))
+    max_batch = current_app.config.get('ORPHAN_CLAIM_MAX_BATCH', 500)
+    if len(client_ids) > max_batch:
+        raise BadRequestException(f"单次最多认领{max_batch}位客户")
+    if fee is None:
+        fee = current_app.config.get('ORPHAN_CLAIM_FEE', 0)
+
+    try:
+        won = claim_orphans(client_ids, consultant_id, fee, source)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    after_claims_committed(won, consultant_id)
+
+    return {
+        'claimed': sorted(won),
+        'failed': [client_id for client_id in client_ids if client_id not in won],
+        'fee_total': fee * len(won)
+    }
+
+
+def claim_client(client_id, consultant_id, fee=None, source='manual'):
+    """
+    认领单个孤儿客户
+
+    @param {int} client_id - 客户ID
+    @param {int} consultant_id - 认领的咨询师ID
+    @param {float} fee - 认领费用，为空时使用 ORPHAN_CLAIM_FEE
+    @param {string} source - 认领来源
+    @return {bool} - 是否认领成功（客户已被他人认领或不是孤儿时为False）
+    """
+    return bool(claim_clients([client_id], consultant_id, fee, source)['claimed'])
+
+
+def get_claim_summary(consultant_id, start=None, end=None):
+    """
+    咨询师的认领次数和费用合计
+
+    @param {int} consultant_id - 咨询师ID
+    @param {datetime} start - 开始时间（含）
+    @param {datetime} end - 结束时间（不含）
+    @return {dict} - {'claim_count': 认领次数, 'fee_total': 费用合计}
+    """
+    query = db.session.query(func.count(ClientClaim.id), func.coalesce(func.sum(ClientClaim.fee), 0)).filter(
+        ClientClaim.consultant_id == consultant_id
+    )
+    if start:
+        query = query.filter(ClientClaim.claimed_at >= start)
+    if end:
+        query = query.filter(ClientClaim.claimed_at < end)
+    count, total = query.one()
+    return {'claim_count': count, 'fee_total': float(total)}
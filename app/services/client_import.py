@@ -0,0 +1,342 @@
+"""
+客户批量导入服务
+
+从CSV/XLSX逐行流式读取，按 CLIENT_IMPORT_CHUNK_SIZE 分块处理：每块用一次IN查询
+找出已注册的手机号及其客户资料，新用户和客户资料分别用一条多行INSERT写入，
+每块单独提交。默认密码在每次导入时只计算一次哈希，所有新用户共用。
+行数上限（CLIENT_IMPORT_MAX_ROWS）在导入前先读一遍文件检查，超出时不写入任何数据。
+
+批量INSERT不触发ORM事件，注册汇总、咨询师汇总、搜索键、缓存和跟进优先级的失效在这里
+显式维护。
+"""
+import io
+import csv
+import itertools
+from datetime import datetime, date
+from flask import current_app
+from sqlalchemy import or_, insert
+from werkzeug.security import generate_password_hash
+from app import db
+from app.models import User, Client
+from app.models.stats import record_bulk_signups, apply_client_changes
+from app.utils.cache import cache
+from app.services.follow_up import follow_up_queue
+from app.services.claims import claim_orphans
+from app.utils.validators import normalize_phone
+from app.utils.search import reverse_phone, pinyin_initials
+from app.utils.exceptions import BadRequestException
+
+# 表头别名（支持中英文表头）
+HEADER_ALIASES = {
+    'name': ('name', '姓名', '客户姓名'),
+    'phone': ('phone', 'contact_info', '手机号', '手机', '电话'),
+    'gender': ('gender', '性别'),
+    'birth_date': ('birth_date', '出生日期', '生日'),
+    'address': ('address', '地址'),
+    'tags': ('tags', '标签')
+}
+
+
+def _header_map(header):
+    aliases = {alias.lower(): field for field, names in HEADER_ALIASES.items() for alias in names}
+    mapping = {}
+    for position, title in enumerate(header):
+        field = aliases.get(str(title or '').strip().lower())
+        if field and field not in mapping:
+            mapping[field] = position
+    if 'name' not in mapping or 'phone' not in mapping:
+        raise BadRequestException("文件缺少姓名或手机号列")
+    return mapping
+
+
+def _iter_records(rows):
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        raise BadRequestException("文件为空")
+    mapping = _header_map(header)
+    # 行号与表格一致（表头为第1行）
+    for row_number, values in enumerate(rows, start=2):
+        if not any(value not in (None, '') for value in values):
+            continue
+        yield row_number, {field: values[position] if position < len(values) else None
+                           for field, position in mapping.items()}
+
+
+def iter_csv(stream):
+    """
+    流式读取CSV（UTF-8，兼容Excel导出的BOM）
+
+    @param {file} stream - 二进制文件流
+    @return {generator} - (行号, 字段字典)
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        yield from _iter_records(csv.reader(text))
+    finally:
+        # 读完后不关闭原始文件流，便于重新读取
+        text.detach()
+
+
+def iter_xlsx(stream):
+    """
+    以只读模式流式读取XLSX第一个工作表
+
+    @param {file} stream - 二进制文件流
+    @return {generator} - (行号, 字段字典)
+    """
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise BadRequestException("服务器未安装openpyxl，暂不支持XLSX导入")
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    return _iter_records(workbook.worksheets[0].iter_rows(values_only=True))
+
+
+def iter_upload(file_storage, max_rows=None):
+    """
+    按文件扩展名选择读取方式
+
+    @param {FileStorage} file_storage - 上传的文件
+    @param {int} max_rows - 数据行数上限，指定时先读一遍文件计数，超出则在导入前拒绝
+    @return {generator} - (行号, 字段字典)
+    """
+    filename = (file_storage.filename or '').lower()
+    if filename.endswith('.csv'):
+        reader = iter_csv
+    elif filename.endswith('.xlsx'):
+        reader = iter_xlsx
+    else:
+        raise BadRequestException("仅支持CSV或XLSX文件")
+
+    if max_rows is not None:
+        records = reader(file_storage.stream)
+        try:
+            count = sum(1 for _ in itertools.islice(records, max_rows + 1))
+        finally:
+            records.close()
+        if count > max_rows:
+            raise BadRequestException(f"单次最多导入{max_rows}行")
+        file_storage.stream.seek(0)
+    return reader(file_storage.stream)
+
+
+def _text(value, max_length):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value[:max_length] or None
+
+
+def _parse_birth_date(value):
+    if value in (None, ''):
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value).strip().replace('/', '-').replace('.', '-')
+    return datetime.strptime(text, '%Y-%m-%d').date()
+
+
+class ClientImporter:
+    """
+    客户批量导入
+
+    @param {int} consultant_id - 导入客户归属的咨询师ID，为空表示不分配
+    @param {bool} claim_orphans - 是否认领已存在的孤儿客户
+    """
+    def __init__(self, consultant_id=None, claim_orphans=True):
+        self.consultant_id = consultant_id
+        self.claim_orphans = claim_orphans and consultant_id is not None
+        self.chunk_size = current_app.config.get('CLIENT_IMPORT_CHUNK_SIZE', 1000)
+        self.max_rows = current_app.config.get('CLIENT_IMPORT_MAX_ROWS', 100000)
+        self.password_hash = generate_password_hash(
+            current_app.config.get('CLIENT_IMPORT_DEFAULT_PASSWORD', '123456'), method='pbkdf2:sha256'
+        )
+        self.seen_phones = set()
+        self.results = []
+        self.summary = {'total': 0, 'created': 0, 'linked': 0, 'claimed': 0,
+                        'skipped': 0, 'invalid': 0, 'failed': 0, 'unprocessed': 0}
+
+    def _result(self, row_number, phone, status, client_id=None, message=None):
+        self.results.append({'row': row_number, 'phone': phone, 'status': status,
+                             'client_id': client_id, 'message': message})
+        self.summary[status] += 1
+
+    def run(self, records):
+        """
+        执行导入
+
+        @param {iterable} records - (行号, 字段字典)序列，应先用 iter_upload(max_rows=...) 检查行数
+        @return {dict} - {'summary': 各状态数量（超出行数上限的行计入unprocessed）, 'rows': 逐行结果}
+        """
+        chunk = []
+        for row_number, record in records:
+            self.summary['total'] += 1
+            if self.summary['total'] > self.max_rows:
+                # 未预先检查行数时，之前的块已提交，剩余行不再处理并在汇总中注明
+                self.summary['unprocessed'] = 1 + sum(1 for _ in records)
+                self.summary['total'] += self.summary['unprocessed'] - 1
+                break
+
+            row = self._validate(row_number, record)
+            if row is not None:
+                chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                self._process_chunk(chunk)
+                chunk = []
+        if chunk:
+            self._process_chunk(chunk)
+
+        self.results.sort(key=lambda result: result['row'])
+        return {'summary': self.summary, 'rows': self.results}
+
+    def _validate(self, row_number, record):
+        raw_phone = record.get('phone')
+        phone = normalize_phone(raw_phone)
+        name = _text(record.get('name'), 64)
+        if not name:
+            self._result(row_number, raw_phone and str(raw_phone), 'invalid', message='姓名为必填项')
+            return None
+        if phone is None:
+            self._result(row_number, raw_phone and str(raw_phone), 'invalid', message='手机号格式不正确')
+            return None
+        if phone in self.seen_phones:
+            self._result(row_number, phone, 'skipped', message='文件中手机号重复')
+            return None
+        try:
+            birth_date = _parse_birth_date(record.get('birth_date'))
+        except ValueError:
+            self._result(row_number, phone, 'invalid', message='出生日期格式不正确')
+            return None
+
+        self.seen_phones.add(phone)
+        return {
+            'row': row_number,
+            'phone': phone,
+            'name': name,
+            'gender': _text(record.get('gender'), 10),
+            'birth_date': birth_date,
+            'address': _text(record.get('address'), 256),
+            'tags': _text(record.get('tags'), 256)
+        }
+
+    def _process_chunk(self, chunk):
+        mark, summary = len(self.results), dict(self.summary)
+        try:
+            invalidate = self._write_chunk(chunk)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"客户导入写入失败: {str(e)}")
+            # 整块回滚，撤销本块已记录的结果后统一标记为失败
+            del self.results[mark:]
+            self.summary = summary
+            for row in chunk:
+                self._result(row['row'], row['phone'], 'failed', message='写入失败，请重试')
+            return
+        if invalidate:
+            cache.invalidate_tags(*invalidate)
+            # 批量写入不触发ORM事件，跟进优先级重新加载
+            follow_up_queue.invalidate(self.consultant_id)
+
+    def _write_chunk(self, chunk):
+        phones = [row['phone'] for row in chunk]
+        usernames = [f'client_{phone}' for phone in phones]
+        existing = db.session.query(User.id, User.phone, User.username).filter(
+            or_(User.phone.in_(phones), User.username.in_(usernames))
+        ).all()
+        user_by_phone = {phone: user_id for user_id, phone, _ in existing if phone}
+        taken_usernames = {username for _, _, username in existing}
+
+        clients_by_user = {}
+        if user_by_phone:
+            for client_id, user_id, consultant_id, is_orphan in db.session.query(
+                Client.id, Client.user_id, Client.assigned_consultant_id, Client.is_orphan
+            ).filter(Client.user_id.in_(list(user_by_phone.values()))):
+                clients_by_user[user_id] = (client_id, consultant_id, is_orphan)
+
+        now = datetime.utcnow()
+        new_users, to_link, claims, counter_changes = [], [], [], []
+        for row in chunk:
+            user_id = user_by_phone.get(row['phone'])
+            if user_id is None:
+                if f"client_{row['phone']}" in taken_usernames:
+                    self._result(row['row'], row['phone'], 'invalid', message='用户名已被占用')
+                    continue
+                new_users.append(row)
+                continue
+
+            if user_id not in clients_by_user:
+                to_link.append((row, user_id))
+                continue
+
+            client_id, consultant_id, is_orphan = clients_by_user[user_id]
+            if self.consultant_id is not None and consultant_id == self.consultant_id:
+                self._result(row['row'], row['phone'], 'skipped', client_id, '该客户已在您的客户列表中')
+            elif self.claim_orphans and is_orphan:
+                claims.append((row, client_id))
+            else:
+                self._result(row['row'], row['phone'], 'skipped', client_id, '客户已存在')
+
+        if new_users:
+            db.session.execute(insert(User.__table__), [{
+                'username': f"client_{row['phone']}",
+                'phone': row['phone'],
+                'password_hash': self.password_hash,
+                'role': 'client',
+                'is_active': True,
+                'is_verified': False,
+                'created_at': now,
+                'updated_at': now
+            } for row in new_users])
+            new_ids = dict(db.session.query(User.phone, User.id).filter(
+                User.phone.in_([row['phone'] for row in new_users])
+            ).all())
+            to_link.extend((row, new_ids[row['phone']]) for row in new_users)
+            record_bulk_signups(db.session.connection(), len(new_users), now)
+
+        if to_link:
+            db.session.execute(insert(Client.__table__), [{
+                'user_id': user_id,
+                'name': row['name'],
+                'gender': row['gender'],
+                'birth_date': row['birth_date'],
+                'address': row['address'],
+                'contact_info': row['phone'],
+                'phone_reversed': reverse_phone(row['phone']),
+                'name_initials': pinyin_initials(row['name']),
+                'tags': row['tags'],
+                'is_orphan': False,
+                'assigned_consultant_id': self.consultant_id,
+                'last_contact': now,
+                'created_at': now,
+                'updated_at': now
+            } for row, user_id in to_link])
+            client_ids = dict(db.session.query(Client.user_id, Client.id).filter(
+                Client.user_id.in_([user_id for _, user_id in to_link])
+            ).all())
+            counter_changes.extend((None, (self.consultant_id, False, now)) for _ in to_link)
+            new_phones = {row['phone'] for row in new_users}
+            for row, user_id in to_link:
+                status = 'created' if row['phone'] in new_phones else 'linked'
+                self._result(row['row'], row['phone'], status, client_ids.get(user_id))
+
+        claimed = {}
+        if claims:
+            # 条件更新认领，期间被其他咨询师认领的客户跳过
+            claimed = claim_orphans([client_id for _, client_id in claims], self.consultant_id,
+                                    current_app.config.get('ORPHAN_CLAIM_FEE', 0), source='import', now=now)
+            for row, client_id in claims:
+                if client_id in claimed:
+                    self._result(row['row'], row['phone'], 'claimed', client_id)
+                else:
+                    self._result(row['row'], row['phone'], 'skipped', client_id, '客户已被其他咨询师认领')
+
+        apply_client_changes(db.session.connection(), counter_changes)
+
+        invalidate = [f'client:{client_id}' for client_id in claimed]
+        if to_link or claimed:
+            invalidate.append('dashboard')
+        return invalidate
@@ -0,0 +1,232 @@
+"""
+客户列表查询服务
+
+过滤条件全部在数据库端执行，结果按键集分页返回（见 app.utils.pagination）。
+咨询师的列表走 (assigned_consultant_id, last_contact) 索引，孤儿客户列表走
+(is_orphan, last_contact) 索引。
+
+快速查找（typeahead）在全部客户中只使用可走索引的前缀匹配：手机号前缀、倒序
+手机号前缀（即后几位）、姓名前缀、拼音首字母前缀；限定在咨询师自己的客户范围内
+时才额外做姓名子串匹配。
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import or_, and_, update, bindparam
+from app import db
+from app.models import Client, ClientSegment, SEGMENT_LABELS
+from app.utils.search import classify_query, reverse_phone, pinyin_initials
+from app.utils.pagination import keyset_paginate, parse_sort
+from app.utils.exceptions import BadRequestException
+
+# 可排序字段
+CLIENT_SORT_COLUMNS = {
+    'last_contact': Client.last_contact,
+    'created_at': Client.created_at,
+    'name': Client.name,
+    'id': Client.id
+}
+DEFAULT_CLIENT_SORT = '-last_contact'
+MAX_PAGE_SIZE = 100
+MAX_SEARCH_RESULTS = 20
+
+
+def _parse_bool(value):
+    if value is None or value == '':
+        return None
+    return value.lower() in ('true', '1', 'yes')
+
+
+def _parse_date(value, name):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise BadRequestException(f"{name}格式应为YYYY-MM-DD")
+
+
+def parse_client_filters(args):
+    """
+    从查询参数解析客户过滤条件
+
+    @param {MultiDict} args - 查询参数
+    @return {dict} - 过滤条件
+    """
+    status = args.get('status') or None
+    if status not in (None, 'active', 'inactive'):
+        raise BadRequestException("status只能为active或inactive")
+    tags = [tag.strip() for tag in (args.get('tags') or '').split(',') if tag.strip()]
+    segments = [segment.strip() for segment in (args.get('segment') or '').split(',') if segment.strip()]
+    unknown = [segment for segment in segments if segment not in SEGMENT_LABELS]
+    if unknown:
+        raise BadRequestException(f"未知的客户分群: {','.join(unknown)}")
+
+    return {
+        'is_orphan': _parse_bool(args.get('is_orphan')),
+        'status': status,
+        'tags': tags,
+        'segments': segments,
+        'contact_from': _parse_date(args.get('last_contact_from'), 'last_contact_from'),
+        'contact_to': _parse_date(args.get('last_contact_to'), 'last_contact_to'),
+        'search': (args.get('search') or '').strip()
+    }
+
+
+def filter_clients(query, is_orphan=None, status=None, tags=(), segments=(), contact_from=None, contact_to=None,
+                   search=''):
+    """
+    为客户查询添加过滤条件
+
+    @param {Query} query - 客户查询
+    @param {bool} is_orphan - 是否孤儿客户
+    @param {string} status - 活跃状态（active/inactive），规则同Client.status
+    @param {list} tags - 标签，需全部包含
+    @param {list} segments - RFM分群，满足其一即可
+    @param {datetime} contact_from - 最后联系时间下限（含）
+    @param {datetime} contact_to - 最后联系日期上限（含当天）
+    @param {string} search - 手机号片段、姓名或拼音首字母
+    @return {Query} - 过滤后的查询
+    """
+    if is_orphan is not None:
+        query = query.filter(Client.is_orphan == is_orphan)
+
+    if status:
+        threshold = datetime.utcnow() - timedelta(days=Client.ACTIVE_DAYS)
+        if status == 'active':
+            query = query.filter(Client.is_orphan == False, Client.last_contact >= threshold)
+        else:
+            query = query.filter(or_(Client.is_orphan == True, Client.last_contact < threshold,
+                                     Client.last_contact.is_(None)))
+
+    for tag in tags:
+        query = query.filter(Client.tags.like(f'%{tag}%'))
+
+    if segments:
+        query = query.filter(Client.segment.has(ClientSegment.segment.in_(segments)))
+
+    if contact_from:
+        query = query.filter(Client.last_contact >= contact_from)
+    if contact_to:
+        query = query.filter(Client.last_contact < contact_to + timedelta(days=1))
+
+    if search:
+        query = query.filter(or_(*(condition for _, condition in search_conditions(search, substring=True))))
+
+    return query
+
+
+def list_clients(query, args, default_limit=20):
+    """
+    按查询参数过滤、排序并分页客户列表
+
+    查询参数：is_orphan、status、tags、segment、last_contact_from、last_contact_to、
+    search、sort（如 -last_contact、name）、cursor、limit
+
+    @param {Query} query - 已限定可见范围的客户查询
+    @param {MultiDict} args - 查询参数
+    @param {int} default_limit - 默认每页条数
+    @return {tuple} - (客户列表, 下一页游标或None)
+    """
+    query = filter_clients(query, **parse_client_filters(args))
+    column, descending = parse_sort(args.get('sort'), CLIENT_SORT_COLUMNS, DEFAULT_CLIENT_SORT)
+    limit = min(max(args.get('limit', default_limit, type=int), 1), MAX_PAGE_SIZE)
+    return keyset_paginate(query, column, Client.id, descending, args.get('cursor'), limit)
+
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _prefix_match(column, prefix):
+    # 显式的范围条件保证走索引（SQLite的LIKE默认不区分大小写，不会使用索引）
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return and_(column >= prefix, column < upper, column.like(f'{_escape_like(prefix)}%', escape='\\'))
+
+
+def search_conditions(keyword, substring=False):
+    """
+    按搜索词类型生成匹配条件（各条件之间为或的关系）
+
+    @param {string} keyword - 搜索词
+    @param {bool} substring - 是否允许姓名子串匹配（无法使用索引，仅用于已限定范围的查询）
+    @return {list} - [(索引列, 条件)]
+    """
+    kind = classify_query(keyword)
+    if kind == 'phone':
+        digits = keyword.replace(' ', '').replace('-', '')
+        return [(Client.contact_info, _prefix_match(Client.contact_info, digits)),
+                (Client.phone_reversed, _prefix_match(Client.phone_reversed, digits[::-1]))]
+
+    keyword = keyword.strip()
+    conditions = []
+    if kind == 'initials':
+        initials = keyword.lower().replace(' ', '')
+        conditions.append((Client.name_initials, _prefix_match(Client.name_initials, initials)))
+    if substring:
+        conditions.append((Client.name, Client.name.like(f'%{_escape_like(keyword)}%', escape='\\')))
+    else:
+        conditions.append((Client.name, _prefix_match(Client.name, keyword)))
+    return conditions
+
+
+def search_clients(keyword, consultant_id=None, limit=10):
+    """
+    客户快速查找（输入联想）
+
+    全部客户范围内：每个匹配条件单独查询，按其索引列顺序取前limit条，不需要排序
+    整个匹配集，结果按条件顺序合并去重。
+    咨询师范围内：沿 (assigned_consultant_id, last_contact) 索引从最近联系的客户
+    开始扫描，找到limit条即停止。
+
+    @param {string} keyword - 搜索词（手机号片段、姓名或拼音首字母）
+    @param {int} consultant_id - 只在该咨询师的客户中查找，为空表示全部客户
+    @param {int} limit - 返回数量
+    @return {list} - 客户列表
+    """
+    keyword = (keyword or '').strip()
+    if not keyword:
+        return []
+    limit = min(max(limit, 1), MAX_SEARCH_RESULTS)
+
+    if consultant_id is not None:
+        conditions = [condition for _, condition in search_conditions(keyword, substring=True)]
+        return Client.query.filter(Client.assigned_consultant_id == consultant_id, or_(*conditions)).order_by(
+            Client.last_contact.desc(), Client.id.desc()
+        ).limit(limit).all()
+
+    results, seen = [], set()
+    for column, condition in search_conditions(keyword):
+        for client in Client.query.filter(condition).order_by(column, Client.id).limit(limit):
+            if client.id not in seen:
+                seen.add(client.id)
+                results.append(client)
+        if len(results) >= limit:
+            break
+    return results[:limit]
+
+
+def rebuild_search_keys(batch_size=1000):
+    """
+    重新计算全部客户的搜索键（上线快速查找或更换拼音规则后执行）
+
+    @param {int} batch_size - 每批更新的行数
+    @return {int} - 更新的客户数
+    """
+    statement = update(Client.__table__).where(Client.__table__.c.id == bindparam('client_id')).values(
+        phone_reversed=bindparam('phone_reversed'), name_initials=bindparam('name_initials')
+    )
+    total, last_id = 0, 0
+    while True:
+        rows = db.session.query(Client.id, Client.name, Client.contact_info).filter(
+            Client.id > last_id
+        ).order_by(Client.id).limit(batch_size).all()
+        if not rows:
+            break
+        db.session.execute(statement, [{
+            'client_id': client_id,
+            'phone_reversed': (reverse_phone(contact_info) or '')[:20] or None,
+            'name_initials': pinyin_initials(name)
+        } for client_id, name, contact_info in rows])
+        db.session.commit()
+        total += len(rows)
+        last_id = rows[-1][0]
+    return total
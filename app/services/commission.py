@@ -0,0 +1,254 @@
+"""
+提成记账与月度结算
+
+提成流水只追加不修改，每条流水以 (来源类型, 来源ID, 序号) 唯一：
+- 认领对价提成：孤儿客户被付费认领时，认领费用的 COMMISSION_CLAIM_RATE 归原兼职
+  咨询师。认领时随认领记录一起记账，结算前再用一条 INSERT ... SELECT 补记遗漏的
+  认领（已记账的认领被唯一键和反连接排除，重复执行不会重复记账）。
+- 客户消费提成：更新治疗实收金额时，按实收金额相对已记账基数的变化追加流水。实收
+  增加归客户当前所属咨询师，比例按咨询师类型取 COMMISSION_CONSUMPTION_RATES；客户
+  没有所属咨询师时记一条不归属任何人的流水（只记基数，不计提成），之后的咨询师不会
+  因此多得或被扣。实收减少时按流水从新到旧，冲正原获得提成的咨询师及其原比例。
+  同一治疗的并发更新先锁定治疗记录，依次记账。
+
+月度结算单由一条 INSERT ... SELECT ... GROUP BY 按咨询师汇总当月流水生成，
+可重复执行（先删除该月结算单再生成）。
+"""
+import io
+import csv
+import re
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import select, insert, delete, func, literal, and_, case
+from app import db
+from app.models import Client, Consultant, User, Treatment, ClientClaim, CommissionEntry, CommissionStatement
+from app.utils.sql import month_expr
+from app.utils.pagination import keyset_paginate
+from app.utils.exceptions import BadRequestException
+
+MONTH_PATTERN = re.compile(r'^\d{4}-(0[1-9]|1[0-2])$')
+
+
+def parse_month(value):
+    """
+    校验月份参数
+
+    @param {string} value - 月份（YYYY-MM），为空时取当月
+    @return {string} - 月份
+    """
+    if not value:
+        return datetime.utcnow().strftime('%Y-%m')
+    if not MONTH_PATTERN.match(value):
+        raise BadRequestException("month格式应为YYYY-MM")
+    return value
+
+
+def record_claim_commissions(connection=None, client_ids=None, claimed_at=None):
+    """
+    为尚未记账的付费认领补记认领对价提成（原咨询师为兼职时）
+
+    @param {Connection} connection - 数据库连接，为空时使用当前会话的连接
+    @param {list} client_ids - 只处理这些客户的认领，为空表示全部
+    @param {datetime} claimed_at - 只处理该时间的认领
+    @return {int} - 新增流水数
+    """
+    connection = connection or db.session.connection()
+    rate = current_app.config.get('COMMISSION_CLAIM_RATE', 0.10)
+    claims = ClientClaim.__table__
+    consultants = Consultant.__table__
+    entries = CommissionEntry.__table__
+
+    conditions = [consultants.c.type == 'parttime', claims.c.fee > 0, entries.c.id.is_(None)]
+    if client_ids is not None:
+        conditions.append(claims.c.client_id.in_(client_ids))
+    if claimed_at is not None:
+        conditions.append(claims.c.claimed_at == claimed_at)
+
+    source = select(
+        claims.c.previous_consultant_id, literal('claim'), literal('client_claim'), claims.c.id, literal(0),
+        claims.c.client_id, claims.c.fee, literal(rate), func.round(claims.c.fee * rate, 2),
+        month_expr(claims.c.claimed_at, connection.dialect.name), literal(datetime.utcnow())
+    ).select_from(
+        claims.join(consultants, consultants.c.id == claims.c.previous_consultant_id).outerjoin(
+            entries, and_(entries.c.source_type == 'client_claim', entries.c.source_id == claims.c.id)
+        )
+    ).where(*conditions)
+    return connection.execute(insert(entries).from_select(
+        ['consultant_id', 'kind', 'source_type', 'source_id', 'sequence', 'client_id', 'base_amount', 'rate',
+         'amount', 'month', 'created_at'],
+        source
+    )).rowcount
+
+
+def record_payment_commissions(treatment_ids, now=None):
+    """
+    在当前事务中按治疗实收金额相对已记账基数的变化批量追加客户消费提成流水（不提交）
+
+    调用方需保证这些治疗记录在本事务中已被锁定（已更新或已加锁读取）。
+
+    @param {list} treatment_ids - 治疗记录ID
+    @param {datetime} now - 记账时间
+    @return {int} - 新增流水数
+    """
+    now = now or datetime.utcnow()
+    rates = current_app.config.get('COMMISSION_CONSUMPTION_RATES', {})
+    treatment_ids = list(treatment_ids)
+    rows = []
+
+    def entry(treatment_id, client_id, sequence, consultant_id, base, rate):
+        return {
+            'consultant_id': consultant_id,
+            'kind': 'consumption',
+            'source_type': 'treatment',
+            'source_id': treatment_id,
+            'sequence': sequence,
+            'client_id': client_id,
+            'base_amount': base,
+            'rate': rate,
+            'amount': round(base * rate, 2),
+            'month': now.strftime('%Y-%m'),
+            'created_at': now
+        }
+
+    for start in range(0, len(treatment_ids), 1000):
+        chunk = treatment_ids[start:start + 1000]
+        # 已记账基数按 (咨询师, 比例) 分组，按最近一次记账从新到旧排列，冲正时依次扣减
+        sequences, credited = {}, {}
+        for source_id, consultant_id, rate, count, base, last_id in db.session.query(
+            CommissionEntry.source_id, CommissionEntry.consultant_id, CommissionEntry.rate,
+            func.count(CommissionEntry.id), func.sum(CommissionEntry.base_amount), func.max(CommissionEntry.id)
+        ).filter(CommissionEntry.source_type == 'treatment', CommissionEntry.source_id.in_(chunk)).group_by(
+            CommissionEntry.source_id, CommissionEntry.consultant_id, CommissionEntry.rate
+        ):
+            sequences[source_id] = sequences.get(source_id, 0) + count
+            credited.setdefault(source_id, []).append((last_id, consultant_id, rate, round(float(base or 0), 2)))
+
+        # 实收增加归客户当前所属（非孤儿）咨询师
+        for treatment_id, client_id, paid_amount, consultant_id, consultant_type in db.session.query(
+            Treatment.id, Treatment.client_id, Treatment.paid_amount, Consultant.id, Consultant.type
+        ).outerjoin(Client, Client.id == Treatment.client_id).outerjoin(
+            Consultant, and_(Consultant.id == Client.assigned_consultant_id, Client.is_orphan == False)
+        ).filter(Treatment.id.in_(chunk)):
+            groups = sorted(credited.get(treatment_id, []), reverse=True)
+            sequence = sequences.get(treatment_id, 0)
+            delta = round((paid_amount or 0) - sum(base for _, _, _, base in groups), 2)
+            if delta > 0:
+                rate = rates.get(consultant_type, 0.0) if consultant_id is not None else 0.0
+                rows.append(entry(treatment_id, client_id, sequence, consultant_id, delta, rate))
+                continue
+            for _, credited_consultant_id, rate, base in groups:
+                if delta >= 0:
+                    break
+                reversal = round(min(-delta, base), 2)
+                if reversal <= 0:
+                    continue
+                rows.append(entry(treatment_id, client_id, sequence, credited_consultant_id, -reversal, rate))
+                sequence += 1
+                delta = round(delta + reversal, 2)
+    if rows:
+        db.session.execute(insert(CommissionEntry.__table__), rows)
+    return len(rows)
+
+
+def record_payment_commission(treatment, now=None):
+    """
+    在当前事务中按单个治疗实收金额的变化追加客户消费提成流水（不提交）
+
+    @param {Treatment} treatment - 已更新实收金额的治疗记录
+    @param {datetime} now - 记账时间
+    @return {int} - 新增流水数（实收金额未变化时为0）
+    """
+    # 锁定治疗记录（同时写入本次修改），同一治疗的并发支付更新依次计算序号和基数
+    db.session.query(Treatment.id).filter(Treatment.id == treatment.id).with_for_update().one()
+    return record_payment_commissions([treatment.id], now)
+
+
+def generate_statements(month):
+    """
+    生成（或重新生成）某月全部咨询师的提成结算单
+
+    @param {string} month - 月份（YYYY-MM）
+    @return {dict} - {'month', 'claim_entries': 补记的认领流水数, 'statement_count', 'total_amount'}
+    """
+    month = parse_month(month)
+    entries = CommissionEntry.__table__
+    statements = CommissionStatement.__table__
+    try:
+        backfilled = record_claim_commissions()
+        db.session.execute(delete(statements).where(statements.c.month == month))
+        db.session.execute(insert(statements).from_select(
+            ['consultant_id', 'month', 'entry_count', 'claim_amount', 'consumption_amount', 'total_amount',
+             'generated_at'],
+            select(
+                entries.c.consultant_id, literal(month), func.count(entries.c.id),
+                func.sum(case((entries.c.kind == 'claim', entries.c.amount), else_=0)),
+                func.sum(case((entries.c.kind == 'consumption', entries.c.amount), else_=0)),
+                func.sum(entries.c.amount), literal(datetime.utcnow())
+            ).where(entries.c.month == month, entries.c.consultant_id.isnot(None)).group_by(entries.c.consultant_id)
+        ))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    count, total = db.session.query(
+        func.count(CommissionStatement.id), func.coalesce(func.sum(CommissionStatement.total_amount), 0)
+    ).filter(CommissionStatement.month == month).one()
+    return {'month': month, 'claim_entries': backfilled, 'statement_count': count,
+            'total_amount': round(float(total), 2)}
+
+
+def list_entries(consultant_id, month=None, cursor=None, limit=20):
+    """
+    咨询师的提成流水（按ID倒序键集分页）
+
+    @param {int} consultant_id - 咨询师ID
+    @param {string} month - 只看该月份
+    @param {string} cursor - 上一页返回的游标
+    @param {int} limit - 每页条数
+    @return {tuple} - (流水列表, 下一页游标或None)
+    """
+    query = CommissionEntry.query.filter(CommissionEntry.consultant_id == consultant_id)
+    if month:
+        query = query.filter(CommissionEntry.month == parse_month(month))
+    return keyset_paginate(query, CommissionEntry.id, CommissionEntry.id, True, cursor, limit)
+
+
+STATEMENT_CSV_HEADER = ['结算月份', '咨询师ID', '用户名', '咨询师类型', '流水条数', '认领对价提成', '客户消费提成', '提成合计']
+
+
+def statement_rows(month, consultant_id=None):
+    """
+    某月结算单明细（含咨询师信息），按咨询师ID排序
+
+    @param {string} month - 月份（YYYY-MM）
+    @param {int} consultant_id - 只看该咨询师，为空表示全部
+    @return {list} - [(月份, 咨询师ID, 用户名, 类型, 条数, 认领提成, 消费提成, 合计)]
+    """
+    query = db.session.query(
+        CommissionStatement.month, CommissionStatement.consultant_id, User.username, Consultant.type,
+        CommissionStatement.entry_count, CommissionStatement.claim_amount, CommissionStatement.consumption_amount,
+        CommissionStatement.total_amount
+    ).join(Consultant, Consultant.id == CommissionStatement.consultant_id).outerjoin(
+        User, User.id == Consultant.user_id
+    ).filter(CommissionStatement.month == parse_month(month))
+    if consultant_id is not None:
+        query = query.filter(CommissionStatement.consultant_id == consultant_id)
+    return query.order_by(CommissionStatement.consultant_id).all()
+
+
+def export_statements_csv(month, consultant_id=None):
+    """
+    导出某月结算单为CSV（带BOM，Excel可直接打开）
+
+    @param {string} month - 月份（YYYY-MM）
+    @param {int} consultant_id - 只导出该咨询师，为空表示全部
+    @return {string} - CSV文本
+    """
+    output = io.StringIO()
+    output.write('\ufeff')
+    writer = csv.writer(output)
+    writer.writerow(STATEMENT_CSV_HEADER)
+    for row in statement_rows(month, consultant_id):
+        writer.writerow([value if value is not None else '' for value in row])
+    return output.getvalue()
@@ -0,0 +1,86 @@
+"""
+管理后台统计服务
+
+首页各项计数合并为一条SQL（标量子查询）并短时缓存；统计页的月度注册、治疗类型分布
+和咨询师客户数排行读取增量维护的汇总表，耗时不再随明细表增长。
+"""
+from flask import current_app
+from sqlalchemy import select, func
+from app import db
+from app.models import (User, Client, Consultant, Store, KnowledgeArticle, KnowledgeQA,
+                        MonthlySignupRollup, TreatmentTypeRollup, ConsultantCounter)
+from app.utils.cache import cache
+
+DASHBOARD_TAG = 'dashboard'
+
+
+def _count(model, *criteria):
+    return select(func.count()).select_from(model).where(*criteria).scalar_subquery()
+
+
+def _load_snapshot():
+    stmt = select(
+        _count(User).label('user_count'),
+        _count(Client).label('client_count'),
+        _count(Consultant).label('consultant_count'),
+        _count(Store).label('store_count'),
+        _count(Consultant, Consultant.verified == False).label('pending_consultants'),
+        _count(KnowledgeArticle, KnowledgeArticle.status == 'pending').label('pending_articles'),
+        _count(KnowledgeQA, KnowledgeQA.status == 'pending').label('pending_qa'),
+        _count(Client, Client.is_orphan == True).label('orphan_clients')
+    )
+    return dict(db.session.execute(stmt).one()._mapping)
+
+
+def get_dashboard_snapshot():
+    """
+    获取管理后台首页统计数据
+
+    @return {dict} - 用户、客户、咨询师、门店、待审核及孤儿客户数量
+    """
+    ttl = current_app.config.get('DASHBOARD_CACHE_TTL', 30)
+    return cache.get_or_set('dashboard:snapshot', _load_snapshot, ttl, [DASHBOARD_TAG])
+
+
+def _load_consultant_ranking(limit):
+    # 按汇总表的客户数排序，走 client_count 索引
+    rows = db.session.query(
+        Consultant.id,
+        User.username,
+        ConsultantCounter.client_count
+    ).select_from(ConsultantCounter).join(Consultant, Consultant.id == ConsultantCounter.consultant_id).join(
+        User, User.id == Consultant.user_id
+    ).order_by(ConsultantCounter.client_count.desc()).limit(limit).all()
+    return [{'id': row.id, 'username': row.username, 'client_count': row.client_count} for row in rows]
+
+
+def get_consultant_ranking(limit=10):
+    """
+    获取客户数最多的咨询师排行
+
+    @param {int} limit - 返回数量
+    @return {list} - 咨询师排行列表
+    """
+    ttl = current_app.config.get('DASHBOARD_CACHE_TTL', 30)
+    return cache.get_or_set(f'dashboard:consultant_ranking:{limit}',
+                            lambda: _load_consultant_ranking(limit), ttl, [DASHBOARD_TAG])
+
+
+def get_signup_stats():
+    """
+    获取月度用户注册统计
+
+    @return {list} - 按月份升序的汇总记录
+    """
+    return MonthlySignupRollup.query.filter(MonthlySignupRollup.count > 0).order_by(
+        MonthlySignupRollup.month).all()
+
+
+def get_treatment_type_stats():
+    """
+    获取治疗类型分布统计
+
+    @return {list} - 按数量降序的汇总记录
+    """
+    return TreatmentTypeRollup.query.filter(TreatmentTypeRollup.count > 0).order_by(
+        TreatmentTypeRollup.count.desc()).all()
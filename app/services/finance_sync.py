@@ -0,0 +1,368 @@
+"""
+财务系统消费数据同步
+
+从诊所财务系统增量拉取消费记录（金额、项目、时间），按外部ID幂等写入 Treatment：
+- 数据源可插拔：目录投递的CSV/NDJSON文件（FileDropSource），或可直连的数据库表
+  （DatabaseSource，测试时可用本地SQLite代替财务库），由 FINANCE_SYNC_SOURCE 选择。
+- 高水位游标：按 (更新时间, 外部ID) 排序拉取，每批写入与游标推进在同一事务中提交，
+  中断后从上次提交的位置继续。
+- 每批一次IN查询找出已同步的记录，新记录一条多行INSERT，有变化的记录一次批量
+  UPDATE，没有变化的记录不写，重复同步同一批数据不产生任何写入。
+- 拉取或写入失败时按指数退避重试 FINANCE_SYNC_MAX_RETRIES 次，每批的处理数和耗时
+  记入运行时指标。
+
+批量写入不触发ORM事件，治疗类型和营收汇总、客户消费提成和预约缓存的失效在这里显式维护。
+新记录的负责咨询师取客户当前所属的咨询师。
+"""
+import os
+import csv
+import json
+import time
+import bisect
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import create_engine, MetaData, Table, select, insert, update, bindparam, or_, and_
+from app import db
+from app.models import Treatment, Client, FinanceSyncState
+from app.models.stats import record_bulk_treatment_types, apply_revenue_changes, revenue_state
+from app.services.commission import record_payment_commissions
+from app.utils.cache import cache
+from app.utils.metrics import observe_sync_batch, observe_sync_retry
+from app.utils.validators import normalize_phone
+
+# 同步写入的治疗字段
+SYNCED_FIELDS = ('client_id', 'store_id', 'doctor_id', 'type', 'fee', 'paid_amount', 'payment_status', 'status',
+                 'appointment_date')
+VALID_STATUSES = ('scheduled', 'in_progress', 'completed', 'cancelled')
+
+
+def _parse_time(value):
+    if isinstance(value, datetime) or value is None:
+        return value
+    value = str(value).strip()
+    for pattern in ('%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%d %H:%M:%S.%f'):
+        try:
+            return datetime.strptime(value, pattern)
+        except ValueError:
+            continue
+    raise ValueError(f'无法解析时间: {value}')
+
+
+def _parse_int(value):
+    return int(value) if value not in (None, '') else None
+
+
+def _parse_amount(value):
+    return round(float(value), 2) if value not in (None, '') else 0.0
+
+
+def parse_record(raw):
+    """
+    把数据源的原始记录规范化为同步记录
+
+    @param {dict} raw - 原始记录，字段：external_id、store_id、client_phone、doctor_id、item、amount、
+                        paid_amount、status、consumed_at、updated_at
+    @return {dict} - 规范化后的记录
+    """
+    external_id = str(raw.get('external_id') or '').strip()
+    if not external_id or len(external_id) > 64:
+        raise ValueError('外部ID为空或过长')
+    updated_at = _parse_time(raw.get('updated_at'))
+    if updated_at is None:
+        raise ValueError('缺少更新时间')
+    status = raw.get('status') or 'completed'
+    if status not in VALID_STATUSES:
+        raise ValueError(f'未知的治疗状态: {status}')
+    return {
+        'external_id': external_id,
+        'updated_at': updated_at,
+        'store_id': _parse_int(raw.get('store_id')),
+        'doctor_id': _parse_int(raw.get('doctor_id')),
+        'client_phone': normalize_phone(raw.get('client_phone')),
+        'type': (str(raw.get('item') or '').strip() or None),
+        'fee': _parse_amount(raw.get('amount')),
+        'paid_amount': _parse_amount(raw.get('paid_amount')),
+        'status': status,
+        'appointment_date': _parse_time(raw.get('consumed_at')) or updated_at
+    }
+
+
+class FileDropSource:
+    """
+    目录投递的文件数据源：财务系统把导出的 .csv（带表头）或 .ndjson（每行一个JSON对象）
+    文件放入目录，按 (更新时间, 外部ID) 排序后读取游标之后的记录
+
+    @param {string} directory - 投递目录
+    """
+    name = 'file'
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._keys = None
+        self._records = None
+
+    def _read(self):
+        if not os.path.isdir(self.directory):
+            return
+        for filename in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, filename)
+            if filename.endswith('.csv'):
+                with open(path, newline='', encoding='utf-8-sig') as f:
+                    yield from csv.DictReader(f)
+            elif filename.endswith('.ndjson'):
+                with open(path, encoding='utf-8') as f:
+                    for line in f:
+                        if line.strip():
+                            yield json.loads(line)
+
+    def _load(self):
+        # 每次同步只读取并排序一次，之后按游标二分定位
+        records = []
+        for raw in self._read():
+            try:
+                key = (_parse_time(raw.get('updated_at')), str(raw.get('external_id') or ''))
+            except ValueError as e:
+                current_app.logger.warning(f"财务记录无法排序，已跳过 {raw.get('external_id')}: {str(e)}")
+                continue
+            if key[0] is not None:
+                records.append((key, raw))
+        records.sort(key=lambda item: item[0])
+        self._keys = [key for key, _ in records]
+        self._records = [raw for _, raw in records]
+
+    def fetch(self, watermark, limit):
+        """
+        读取游标之后的记录
+
+        @param {tuple} watermark - (更新时间, 外部ID)，为空表示从头开始
+        @param {int} limit - 最多返回的记录数
+        @return {list} - 原始记录，按 (更新时间, 外部ID) 升序
+        """
+        if self._records is None:
+            self._load()
+        start = bisect.bisect_right(self._keys, watermark) if watermark is not None else 0
+        return self._records[start:start + limit]
+
+
+class DatabaseSource:
+    """
+    数据库表数据源：直接按游标分页读取财务库中的消费记录表
+
+    @param {string} url - 财务库连接串（测试时可为本地SQLite）
+    @param {string} table_name - 消费记录表名，列名与 parse_record 的字段一致
+    """
+    name = 'database'
+
+    def __init__(self, url, table_name='finance_records'):
+        self.engine = create_engine(url)
+        self.table = Table(table_name, MetaData(), autoload_with=self.engine)
+
+    def fetch(self, watermark, limit):
+        """
+        读取游标之后的记录（走 (updated_at, external_id) 索引的键集分页）
+
+        @param {tuple} watermark - (更新时间, 外部ID)，为空表示从头开始
+        @param {int} limit - 最多返回的记录数
+        @return {list} - 原始记录，按 (更新时间, 外部ID) 升序
+        """
+        columns = self.table.c
+        query = select(self.table).order_by(columns.updated_at, columns.external_id).limit(limit)
+        if watermark is not None:
+            updated_at, external_id = watermark
+            query = query.where(or_(columns.updated_at > updated_at,
+                                    and_(columns.updated_at == updated_at, columns.external_id > external_id)))
+        with self.engine.connect() as connection:
+            return [dict(row._mapping) for row in connection.execute(query)]
+
+
+def make_source(config):
+    """
+    按配置创建数据源
+
+    @param {Config} config - 应用配置
+    @return {object} - 数据源（提供 name 属性和 fetch(watermark, limit) 方法）
+    """
+    kind = config.get('FINANCE_SYNC_SOURCE', 'file')
+    if kind == 'file':
+        return FileDropSource(config.get('FINANCE_SYNC_DIR') or os.path.join(current_app.instance_path, 'finance'))
+    if kind == 'database':
+        if not config.get('FINANCE_SYNC_DATABASE_URL'):
+            raise ValueError('未配置 FINANCE_SYNC_DATABASE_URL')
+        return DatabaseSource(config['FINANCE_SYNC_DATABASE_URL'], config.get('FINANCE_SYNC_TABLE', 'finance_records'))
+    raise ValueError(f'未知的财务同步数据源: {kind}')
+
+
+def _payment_status(fee, paid_amount):
+    if paid_amount >= fee and paid_amount > 0:
+        return 'paid'
+    if paid_amount > 0:
+        return 'partial'
+    return 'unpaid'
+
+
+def _retry(source_name, action):
+    # 指数退避重试，重试前回滚未提交的写入
+    retries = current_app.config.get('FINANCE_SYNC_MAX_RETRIES', 3)
+    backoff = current_app.config.get('FINANCE_SYNC_BACKOFF_SECONDS', 1.0)
+    for attempt in range(retries + 1):
+        try:
+            return action()
+        except Exception as e:
+            db.session.rollback()
+            if attempt == retries:
+                raise
+            observe_sync_retry(source_name)
+            current_app.logger.warning(f"财务同步失败，{backoff * 2 ** attempt:.1f}秒后重试: {str(e)}")
+            time.sleep(backoff * 2 ** attempt)
+
+
+def _revenue(values, consultant_id, created_at):
+    return revenue_state(values['store_id'], values['doctor_id'], consultant_id, values['type'], values['status'],
+                         values['appointment_date'], created_at, values['fee'], values['paid_amount'])
+
+
+def apply_batch(records, state, now=None):
+    """
+    在当前事务中写入一批同步记录并推进游标（不提交）
+
+    @param {list} records - 原始记录，按 (更新时间, 外部ID) 升序
+    @param {FinanceSyncState} state - 同步进度
+    @param {datetime} now - 写入时间
+    @return {dict} - {'counts': 各结果数量, 'stores': 涉及的门店ID}
+    """
+    now = now or datetime.utcnow()
+    counts = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'invalid': 0, 'unmatched': 0}
+    parsed = {}
+    for raw in records:
+        try:
+            record = parse_record(raw)
+        except (ValueError, TypeError) as e:
+            counts['invalid'] += 1
+            current_app.logger.warning(f"财务记录无效，已跳过 {raw.get('external_id')}: {str(e)}")
+            continue
+        # 同一批内同一外部ID以最后一次更新为准
+        parsed[record['external_id']] = record
+
+    phones = {record['client_phone'] for record in parsed.values() if record['client_phone']}
+    clients = {phone: (client_id, consultant_id) for phone, client_id, consultant_id in db.session.query(
+        Client.contact_info, Client.id, Client.assigned_consultant_id
+    ).filter(Client.contact_info.in_(phones))} if phones else {}
+    existing = {row.external_id: row for row in db.session.query(
+        Treatment.id, Treatment.external_id, Treatment.consultant_id, Treatment.created_at,
+        *[getattr(Treatment, field) for field in SYNCED_FIELDS]
+    ).filter(Treatment.external_id.in_(list(parsed)))} if parsed else {}
+
+    inserts, updates, type_deltas, revenue, paid_changed, stores = [], [], {}, [], [], set()
+    for external_id, record in parsed.items():
+        client_id, consultant_id = clients.get(record['client_phone'], (None, None))
+        if client_id is None:
+            counts['unmatched'] += 1
+        values = {
+            'client_id': client_id,
+            'store_id': record['store_id'],
+            'doctor_id': record['doctor_id'],
+            'type': record['type'],
+            'fee': record['fee'],
+            'paid_amount': record['paid_amount'],
+            'payment_status': _payment_status(record['fee'], record['paid_amount']),
+            'status': record['status'],
+            'appointment_date': record['appointment_date']
+        }
+        row = existing.get(external_id)
+        if row is None:
+            inserts.append(dict(values, external_id=external_id, consultant_id=consultant_id, created_at=now,
+                                updated_at=now))
+            type_deltas[values['type']] = type_deltas.get(values['type'], 0) + 1
+            revenue.append((None, _revenue(values, consultant_id, now)))
+            stores.add(values['store_id'])
+            continue
+        if all(getattr(row, field) == values[field] for field in SYNCED_FIELDS):
+            counts['unchanged'] += 1
+            continue
+        updates.append(dict(values, treatment_id=row.id, updated_at=now))
+        revenue.append((_revenue(row._mapping, row.consultant_id, row.created_at),
+                        _revenue(values, row.consultant_id, row.created_at)))
+        if row.type != values['type']:
+            type_deltas[row.type] = type_deltas.get(row.type, 0) - 1
+            type_deltas[values['type']] = type_deltas.get(values['type'], 0) + 1
+        if (row.paid_amount or 0) != values['paid_amount'] or row.client_id != client_id:
+            paid_changed.append(row.id)
+        stores.update((row.store_id, values['store_id']))
+
+    table = Treatment.__table__
+    if inserts:
+        db.session.execute(insert(table), inserts)
+        paid_changed.extend(treatment_id for treatment_id, in db.session.query(Treatment.id).filter(
+            Treatment.external_id.in_([row['external_id'] for row in inserts]), Treatment.paid_amount != 0
+        ))
+    if updates:
+        db.session.execute(update(table).where(table.c.id == bindparam('treatment_id')).values(
+            **{field: bindparam(field) for field in SYNCED_FIELDS + ('updated_at',)}
+        ), updates)
+    connection = db.session.connection()
+    record_bulk_treatment_types(connection, type_deltas)
+    apply_revenue_changes(connection, revenue)
+    if paid_changed:
+        record_payment_commissions(paid_changed, now)
+
+    # 游标推进到本批最后一条（含无效记录），与写入一同提交
+    last = records[-1]
+    state.watermark_at = _parse_time(last.get('updated_at'))
+    state.watermark_id = str(last.get('external_id') or '')
+    state.total_rows = (state.total_rows or 0) + len(records)
+    counts['inserted'], counts['updated'] = len(inserts), len(updates)
+    return {'counts': counts, 'stores': {store_id for store_id in stores if store_id is not None}}
+
+
+def sync_finance(source=None, max_batches=None):
+    """
+    从财务系统增量同步消费记录
+
+    @param {object} source - 数据源，为空时按配置创建
+    @param {int} max_batches - 最多同步的批数，为空表示同步到没有新记录为止
+    @return {dict} - {'source', 'batches', 'inserted', 'updated', 'unchanged', 'invalid', 'unmatched', 'watermark'}
+    """
+    source = source or make_source(current_app.config)
+    batch_size = current_app.config.get('FINANCE_SYNC_BATCH_SIZE', 1000)
+    state = db.session.get(FinanceSyncState, source.name)
+    if state is None:
+        state = FinanceSyncState(source=source.name, total_rows=0)
+        db.session.add(state)
+        db.session.commit()
+
+    summary = {'source': source.name, 'batches': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'invalid': 0,
+               'unmatched': 0}
+    try:
+        while max_batches is None or summary['batches'] < max_batches:
+            watermark = state.watermark
+            records = _retry(source.name, lambda: source.fetch(watermark, batch_size))
+            if not records:
+                break
+
+            started = time.perf_counter()
+
+            def write():
+                result = apply_batch(records, state)
+                db.session.commit()
+                return result
+            result = _retry(source.name, write)
+            elapsed = time.perf_counter() - started
+
+            observe_sync_batch(source.name, result['counts'], elapsed)
+            current_app.logger.info(f"财务同步 {source.name} 第{summary['batches'] + 1}批: {result['counts']}，"
+                                    f"耗时 {elapsed:.3f}s")
+            if result['stores']:
+                cache.invalidate_tags(*[f'bookings:store:{store_id}' for store_id in result['stores']])
+            summary['batches'] += 1
+            for key, count in result['counts'].items():
+                summary[key] += count
+    except Exception as e:
+        db.session.rollback()
+        state.last_run_at, state.last_status, state.last_error = datetime.utcnow(), 'failed', str(e)[:2000]
+        db.session.commit()
+        raise
+
+    state.last_run_at, state.last_status, state.last_error = datetime.utcnow(), 'success', None
+    db.session.commit()
+    summary['watermark'] = state.to_dict()['watermark_at']
+    return summary
@@ -0,0 +1,349 @@
+"""
+智能跟单提醒：按咨询师维护的客户跟进优先级
+
+优先级键 = 最后联系时间 + 情绪修正（情绪指数移动平均 × FOLLOW_UP_SENTIMENT_DAYS 天），
+键越小越应优先跟进：越久没联系、最近情绪越负面的客户越靠前。所有客户的键随时间
+同步"变老"，排序不随时间变化，因此只需在联系时间、情绪或归属变化时更新单个客户。
+
+每个咨询师一份优先级结构：进程内为带惰性删除的最小堆，使用Redis时为有序集合
+（多个worker共享）。首次访问时从数据库加载该咨询师的客户，之后由客户变更的提交
+事件增量维护；批量写入（不触发ORM事件）后调用 invalidate() 让其重新加载。
+取前N个为 O(N log M)。
+"""
+import heapq
+import threading
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import object_session
+from app import db
+from app.models import Client
+from app.utils.transaction import add_pending, on_commit
+
+EPOCH = datetime(1970, 1, 1)
+TRACKED_FIELDS = ('last_contact', 'sentiment_ema', 'assigned_consultant_id', 'is_orphan')
+
+
+class MemoryFollowUpBackend:
+    """
+    进程内优先级存储：每个咨询师一个最小堆，更新时压入新条目，旧条目在出堆时丢弃
+    """
+    def __init__(self):
+        self._entries = {}  # 咨询师ID -> {客户ID: 优先级键}
+        self._heaps = {}
+        self._lock = threading.Lock()
+
+    def is_loaded(self, consultant_id):
+        return consultant_id in self._entries
+
+    def load(self, consultant_id, items):
+        """
+        加载咨询师的全部客户；加载前已到达的增量更新优先
+
+        @param {int} consultant_id - 咨询师ID
+        @param {list} items - [(客户ID, 优先级键)]
+        """
+        with self._lock:
+            entries = self._entries.setdefault(consultant_id, {})
+            for client_id, key in items:
+                entries.setdefault(client_id, key)
+            self._heaps[consultant_id] = [(key, client_id) for client_id, key in entries.items()]
+            heapq.heapify(self._heaps[consultant_id])
+
+    def mark_loaded(self, consultant_id):
+        with self._lock:
+            self._entries.setdefault(consultant_id, {})
+            self._heaps.setdefault(consultant_id, [])
+
+    def update(self, consultant_id, client_id, key):
+        with self._lock:
+            entries = self._entries.get(consultant_id)
+            if entries is None:
+                return
+            entries[client_id] = key
+            heap = self._heaps[consultant_id]
+            heapq.heappush(heap, (key, client_id))
+            # 过期条目过多时重建，堆大小保持在有效条目的两倍以内
+            if len(heap) > 2 * len(entries) + 64:
+                self._heaps[consultant_id] = [(key, client_id) for client_id, key in entries.items()]
+                heapq.heapify(self._heaps[consultant_id])
+
+    def remove(self, consultant_id, client_id):
+        with self._lock:
+            entries = self._entries.get(consultant_id)
+            if entries is not None:
+                entries.pop(client_id, None)
+
+    def top(self, consultant_id, limit):
+        with self._lock:
+            entries = self._entries.get(consultant_id, {})
+            heap = self._heaps.get(consultant_id, [])
+            result, seen = [], set()
+            while heap and len(result) < limit:
+                key, client_id = heapq.heappop(heap)
+                if entries.get(client_id) != key or client_id in seen:
+                    continue
+                seen.add(client_id)
+                result.append((client_id, key))
+            for client_id, key in result:
+                heapq.heappush(heap, (key, client_id))
+            return result
+
+    def invalidate(self, consultant_id):
+        with self._lock:
+            self._entries.pop(consultant_id, None)
+            self._heaps.pop(consultant_id, None)
+
+
+class RedisFollowUpBackend:
+    """
+    Redis有序集合存储，成员为客户ID，分数为优先级键
+
+    @param {Redis} client - Redis客户端
+    @param {string} prefix - key前缀
+    """
+    def __init__(self, client, prefix='yayi:followup:'):
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, consultant_id):
+        return f'{self.prefix}{consultant_id}'
+
+    def _loaded_key(self, consultant_id):
+        return f'{self.prefix}{consultant_id}:loaded'
+
+    def is_loaded(self, consultant_id):
+        return bool(self.client.exists(self._loaded_key(consultant_id)))
+
+    def mark_loaded(self, consultant_id):
+        self.client.set(self._loaded_key(consultant_id), 1)
+
+    def load(self, consultant_id, items):
+        # NX：不覆盖标记加载后已到达的增量更新
+        pipe = self.client.pipeline(transaction=False)
+        for start in range(0, len(items), 1000):
+            pipe.zadd(self._key(consultant_id), dict(items[start:start + 1000]), nx=True)
+        pipe.execute()
+
+    def update(self, consultant_id, client_id, key):
+        if self.is_loaded(consultant_id):
+            self.client.zadd(self._key(consultant_id), {client_id: key})
+
+    def remove(self, consultant_id, client_id):
+        self.client.zrem(self._key(consultant_id), client_id)
+
+    def top(self, consultant_id, limit):
+        return [(int(client_id), score) for client_id, score in
+                self.client.zrange(self._key(consultant_id), 0, limit - 1, withscores=True)]
+
+    def invalidate(self, consultant_id):
+        self.client.delete(self._key(consultant_id), self._loaded_key(consultant_id))
+
+
+class FollowUpQueue:
+    """
+    咨询师客户跟进优先级
+    """
+    def __init__(self):
+        self.backend = MemoryFollowUpBackend()
+        self.sentiment_days = 14
+        self.sentiment_alpha = 0.3
+
+    def init_app(self, app, redis_client=None):
+        """
+        初始化跟进优先级
+
+        @param {Flask} app - Flask应用实例
+        @param {Redis} redis_client - Redis客户端，为空时使用进程内存储
+        """
+        self.sentiment_days = app.config.get('FOLLOW_UP_SENTIMENT_DAYS', 14)
+        self.sentiment_alpha = app.config.get('FOLLOW_UP_SENTIMENT_ALPHA', 0.3)
+        if redis_client is not None:
+            self.backend = RedisFollowUpBackend(redis_client, prefix=app.config.get('FOLLOW_UP_KEY_PREFIX',
+                                                                                    'yayi:followup:'))
+        else:
+            self.backend = MemoryFollowUpBackend()
+        app.extensions['follow_up_queue'] = self
+
+    def priority_key(self, last_contact, sentiment_ema=None, created_at=None):
+        """
+        计算优先级键（秒），越小越优先
+
+        @param {datetime} last_contact - 最后联系时间，为空时使用创建时间
+        @param {float} sentiment_ema - 情绪指数移动平均（-1.0 到 1.0）
+        @param {datetime} created_at - 客户创建时间
+        @return {float} - 优先级键
+        """
+        contact = last_contact or created_at
+        seconds = (contact - EPOCH).total_seconds() if contact else 0.0
+        return seconds + (sentiment_ema or 0.0) * self.sentiment_days * 86400
+
+    def _ensure_loaded(self, consultant_id):
+        if self.backend.is_loaded(consultant_id):
+            return
+        # 先标记再加载，加载期间提交的变更不会丢失；用新连接读取，不使用请求事务中较早的快照
+        self.backend.mark_loaded(consultant_id)
+        rows = _fresh_read(select(
+            Client.id, Client.last_contact, Client.sentiment_ema, Client.created_at
+        ).where(Client.assigned_consultant_id == consultant_id, Client.is_orphan == False))
+        self.backend.load(consultant_id, [
+            (client_id, self.priority_key(last_contact, sentiment_ema, created_at))
+            for client_id, last_contact, sentiment_ema, created_at in rows
+        ])
+
+    def top(self, consultant_id, limit=20):
+        """
+        优先级最高的N个客户
+
+        @param {int} consultant_id - 咨询师ID
+        @param {int} limit - 数量
+        @return {list} - [(客户ID, 优先级键)]
+        """
+        self._ensure_loaded(consultant_id)
+        return self.backend.top(consultant_id, limit)
+
+    def remove(self, consultant_id, client_id):
+        """
+        从咨询师的优先级结构中移除客户
+
+        @param {int} consultant_id - 咨询师ID
+        @param {int} client_id - 客户ID
+        """
+        self.backend.remove(consultant_id, client_id)
+
+    def invalidate(self, *consultant_ids):
+        """
+        丢弃咨询师的优先级结构，下次访问时从数据库重新加载
+
+        @param {int} consultant_ids - 咨询师ID
+        """
+        for consultant_id in consultant_ids:
+            if consultant_id is not None:
+                self.backend.invalidate(consultant_id)
+
+    def apply(self, changes):
+        """
+        应用已提交的客户变更
+
+        @param {dict} changes - {客户ID: (原咨询师ID, 现咨询师ID, 优先级键或None)}
+        """
+        for client_id, (old_consultant_id, consultant_id, key) in changes.items():
+            if old_consultant_id is not None and old_consultant_id != consultant_id:
+                self.backend.remove(old_consultant_id, client_id)
+            if consultant_id is None:
+                continue
+            if key is None:
+                self.backend.remove(consultant_id, client_id)
+            else:
+                self.backend.update(consultant_id, client_id, key)
+
+    def record_sentiment(self, client, score):
+        """
+        以新消息的情感分数更新客户的情绪指数移动平均（随客户一起提交）
+
+        @param {Client} client - 客户
+        @param {float} score - 情感分数（-1.0 到 1.0）
+        """
+        if score is None:
+            return
+        if client.sentiment_ema is None:
+            client.sentiment_ema = score
+        else:
+            client.sentiment_ema = self.sentiment_alpha * score + (1 - self.sentiment_alpha) * client.sentiment_ema
+
+
+follow_up_queue = FollowUpQueue()
+
+
+def _fresh_read(statement):
+    # 新连接即新事务，读到最新提交的数据（MySQL可重复读下请求事务的快照可能较早）
+    with db.engine.connect() as connection:
+        return connection.execute(statement).all()
+
+
+def get_follow_ups(consultant_id, limit=20):
+    """
+    咨询师最应优先跟进的客户
+
+    @param {int} consultant_id - 咨询师ID
+    @param {int} limit - 数量，最多 FOLLOW_UP_MAX_RESULTS
+    @return {list} - [{'client', 'days_since_contact', 'sentiment_ema', 'overdue_days'}]
+    """
+    limit = min(max(limit, 1), current_app.config.get('FOLLOW_UP_MAX_RESULTS', 100))
+    # 优先级结构可能含已不归该咨询师的客户（其他worker的变更、加载与移除交错、应用变更失败），
+    # 按最新数据核对归属，移除不符的条目后重新取
+    for _ in range(3):
+        ranked = follow_up_queue.top(consultant_id, limit)
+        ids = [client_id for client_id, _ in ranked]
+        owned = {client_id for client_id, in _fresh_read(select(Client.id).where(
+            Client.id.in_(ids), Client.assigned_consultant_id == consultant_id, Client.is_orphan == False
+        ))} if ids else set()
+        stale = [client_id for client_id in ids if client_id not in owned]
+        for client_id in stale:
+            follow_up_queue.remove(consultant_id, client_id)
+        if not stale:
+            break
+    ranked = [(client_id, key) for client_id, key in ranked if client_id in owned]
+    clients = {client.id: client for client in Client.query.filter(Client.id.in_(owned))} if owned else {}
+    now_seconds = (datetime.utcnow() - EPOCH).total_seconds()
+
+    result = []
+    for client_id, key in ranked:
+        client = clients.get(client_id)
+        if client is None:
+            continue
+        contact = client.last_contact or client.created_at
+        result.append({
+            'client': client,
+            'days_since_contact': (datetime.utcnow() - contact).days if contact else None,
+            'sentiment_ema': client.sentiment_ema,
+            # 按情绪修正后相当于多少天未联系
+            'overdue_days': round((now_seconds - key) / 86400, 1)
+        })
+    return result
+
+
+# 客户变更在提交后增量更新优先级，回滚则丢弃
+def _collect(target, old_consultant_id, consultant_id, key):
+    session = object_session(target)
+    if session is not None:
+        add_pending(session, 'follow_up_changes', (target.id, old_consultant_id, consultant_id, key))
+
+
+def _client_key(target):
+    if target.is_orphan:
+        return None
+    return follow_up_queue.priority_key(target.last_contact, target.sentiment_ema, target.created_at)
+
+
+@event.listens_for(Client, 'after_insert')
+def _collect_client_insert(mapper, connection, target):
+    _collect(target, None, target.assigned_consultant_id, _client_key(target))
+
+
+@event.listens_for(Client, 'after_update')
+def _collect_client_update(mapper, connection, target):
+    attrs = inspect(target).attrs
+    if not any(attrs[name].history.has_changes() for name in TRACKED_FIELDS):
+        return
+    history = attrs.assigned_consultant_id.history
+    old_consultant_id = history.deleted[0] if history.deleted else target.assigned_consultant_id
+    _collect(target, old_consultant_id, target.assigned_consultant_id, _client_key(target))
+
+
+@event.listens_for(Client, 'after_delete')
+def _collect_client_delete(mapper, connection, target):
+    _collect(target, target.assigned_consultant_id, None, None)
+
+
+@on_commit('follow_up_changes')
+def _apply_after_commit(items):
+    changes = {}
+    for client_id, old_consultant_id, consultant_id, key in items:
+        previous = changes.get(client_id)
+        # 同一事务内多次变更时保留最初的归属
+        changes[client_id] = (previous[0] if previous else old_consultant_id, consultant_id, key)
+    try:
+        follow_up_queue.apply(changes)
+    except Exception as e:
+        current_app.logger.error(f"更新跟进优先级失败: {str(e)}")
@@ -0,0 +1,300 @@
+"""
+门店地理位置索引服务
+
+进程内按经纬度网格划分门店，最近邻查询从所在网格向外逐圈扩展，找到k个结果且
+下一圈不可能更近时即停止，查询耗时只与附近门店数量有关。
+
+门店增删改在事务提交后增量更新索引；多进程部署时，其他进程的变更通过定期比对
+门店表的数量和最后更新时间发现，发现变化则重建本进程索引。
+"""
+import math
+import time
+import heapq
+import threading
+from datetime import datetime
+from sqlalchemy import event, func
+from sqlalchemy.orm import object_session
+from app import db
+from app.models import Store
+from app.utils.business_hours import parse_business_hours, is_open
+from app.utils.transaction import add_pending, on_commit
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """
+    计算两点间的大圆距离
+
+    @param {float} lat1 - 起点纬度
+    @param {float} lng1 - 起点经度
+    @param {float} lat2 - 终点纬度
+    @param {float} lng2 - 终点经度
+    @return {float} - 距离（公里）
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class StoreEntry:
+    """
+    索引中的门店条目
+
+    @param {dict} data - 门店字典（to_dict结果）
+    """
+    __slots__ = ('id', 'lat', 'lng', 'specialties', 'schedule', 'data')
+
+    def __init__(self, data):
+        self.id = data['id']
+        self.lat = data['latitude']
+        self.lng = data['longitude']
+        self.specialties = data.get('specialties') or ''
+        self.schedule = parse_business_hours(data.get('business_hours'))
+        self.data = data
+
+
+class StoreGeoIndex:
+    """
+    门店网格索引
+
+    @param {float} cell_degrees - 网格边长（度）
+    """
+    def __init__(self, cell_degrees=0.1):
+        self.cell_degrees = cell_degrees
+        self.columns = int(round(360 / cell_degrees))
+        self._cells = {}
+        self._entries = {}
+        # 已占用网格的行列范围（只增不减，用作扩展圈数的上限）
+        self._bounds = None
+        self._lock = threading.RLock()
+        self.version = None
+        self.checked_at = 0
+
+    def _cell(self, lat, lng):
+        row = int(math.floor((lat + 90) / self.cell_degrees))
+        col = int(math.floor((lng + 180) / self.cell_degrees)) % self.columns
+        return row, col
+
+    def __len__(self):
+        return len(self._entries)
+
+    def upsert(self, data):
+        """
+        添加或更新门店；非营业或无坐标的门店从索引中移除
+
+        @param {dict} data - 门店字典
+        """
+        with self._lock:
+            self.remove(data['id'])
+            if data.get('status') != 'active' or data.get('latitude') is None or data.get('longitude') is None:
+                return
+            entry = StoreEntry(data)
+            self._entries[entry.id] = entry
+            row, col = self._cell(entry.lat, entry.lng)
+            self._cells.setdefault((row, col), []).append(entry)
+            if self._bounds is None:
+                self._bounds = (row, row, col, col)
+            else:
+                min_row, max_row, min_col, max_col = self._bounds
+                self._bounds = (min(min_row, row), max(max_row, row), min(min_col, col), max(max_col, col))
+
+    def remove(self, store_id):
+        """
+        移除门店
+
+        @param {int} store_id - 门店ID
+        """
+        with self._lock:
+            entry = self._entries.pop(store_id, None)
+            if entry is None:
+                return
+            cell = self._cell(entry.lat, entry.lng)
+            bucket = [item for item in self._cells.get(cell, []) if item.id != store_id]
+            if bucket:
+                self._cells[cell] = bucket
+            else:
+                self._cells.pop(cell, None)
+
+    def _ring(self, row, col, radius):
+        if radius == 0:
+            yield row, col
+            return
+        for r in range(row - radius, row + radius + 1):
+            if r == row - radius or r == row + radius:
+                cols = range(col - radius, col + radius + 1)
+            else:
+                cols = (col - radius, col + radius)
+            for c in cols:
+                yield r, c % self.columns
+
+    def _ring_lower_bound_km(self, lat, radius):
+        # 第radius圈之外的点到查询点的最小可能距离（经度方向按该纬度带内最宽处估算）
+        degrees = radius * self.cell_degrees
+        max_lat = min(89.9, abs(lat) + degrees + self.cell_degrees)
+        return degrees * KM_PER_DEGREE * min(1.0, math.cos(math.radians(max_lat)))
+
+    def nearest(self, lat, lng, k=5, radius_km=None, predicate=None):
+        """
+        查询最近的k个门店
+
+        @param {float} lat - 纬度
+        @param {float} lng - 经度
+        @param {int} k - 返回数量
+        @param {float} radius_km - 最大距离（公里），为空表示不限
+        @param {function} predicate - 额外过滤条件，接收StoreEntry
+        @return {list} - [(距离公里, StoreEntry)]，按距离升序
+        """
+        with self._lock:
+            cells = self._cells
+            if not cells or k <= 0:
+                return []
+
+            row, col = self._cell(lat, lng)
+            min_row, max_row, min_col, max_col = self._bounds
+            max_radius = max(abs(row - min_row), abs(row - max_row),
+                             min(self.columns // 2, max(abs(col - min_col), abs(col - max_col))))
+            best = []  # 最大堆：(-距离, id, entry)
+            seen = set()
+
+            for radius in range(max_radius + 1):
+                for cell in self._ring(row, col, radius):
+                    if cell in seen:
+                        continue
+                    seen.add(cell)
+                    for entry in cells.get(cell, ()):
+                        distance = haversine_km(lat, lng, entry.lat, entry.lng)
+                        if radius_km is not None and distance > radius_km:
+                            continue
+                        if len(best) == k and distance >= -best[0][0]:
+                            continue
+                        if predicate and not predicate(entry):
+                            continue
+                        item = (-distance, entry.id, entry)
+                        if len(best) < k:
+                            heapq.heappush(best, item)
+                        else:
+                            heapq.heapreplace(best, item)
+
+                bound = self._ring_lower_bound_km(lat, radius)
+                if radius_km is not None and bound > radius_km:
+                    break
+                if len(best) == k and bound >= -best[0][0]:
+                    break
+
+            return sorted(((-item[0], item[2]) for item in best), key=lambda pair: pair[0])
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _store_table_version():
+    count, last_updated = db.session.query(func.count(Store.id), func.max(Store.updated_at)).one()
+    return count, last_updated
+
+
+def rebuild_store_index(cell_degrees=0.1):
+    """
+    从数据库全量重建门店索引
+
+    @param {float} cell_degrees - 网格边长（度）
+    @return {StoreGeoIndex} - 新索引
+    """
+    global _index
+    index = StoreGeoIndex(cell_degrees)
+    version = _store_table_version()
+    for store in Store.query.filter(Store.status == 'active', Store.latitude.isnot(None),
+                                    Store.longitude.isnot(None)).all():
+        index.upsert(store.to_dict())
+    index.version = version
+    index.checked_at = time.time()
+    _index = index
+    return index
+
+
+def get_store_index(cell_degrees=0.1, refresh_seconds=60):
+    """
+    获取门店索引，首次使用或发现其他进程修改了门店表时重建
+
+    @param {float} cell_degrees - 网格边长（度）
+    @param {int} refresh_seconds - 与数据库比对的间隔（秒）
+    @return {StoreGeoIndex} - 门店索引
+    """
+    index = _index
+    if index is not None and time.time() - index.checked_at < refresh_seconds:
+        return index
+
+    with _index_lock:
+        index = _index
+        if index is None or index.cell_degrees != cell_degrees:
+            return rebuild_store_index(cell_degrees)
+        if time.time() - index.checked_at >= refresh_seconds:
+            if _store_table_version() != index.version:
+                return rebuild_store_index(cell_degrees)
+            index.checked_at = time.time()
+        return index
+
+
+def find_nearby_stores(lat, lng, k=5, radius_km=None, specialty=None, open_now=False,
+                       cell_degrees=0.1, refresh_seconds=60):
+    """
+    查询附近门店
+
+    @param {float} lat - 纬度
+    @param {float} lng - 经度
+    @param {int} k - 返回数量
+    @param {float} radius_km - 最大距离（公里）
+    @param {string} specialty - 专长领域过滤
+    @param {bool} open_now - 是否只返回当前营业中的门店
+    @param {float} cell_degrees - 网格边长（度）
+    @param {int} refresh_seconds - 索引与数据库比对的间隔（秒）
+    @return {list} - 门店字典列表，含distance_km字段
+    """
+    now = datetime.now()
+
+    def predicate(entry):
+        if specialty and specialty not in entry.specialties:
+            return False
+        if open_now and not is_open(entry.schedule, now):
+            return False
+        return True
+
+    index = get_store_index(cell_degrees, refresh_seconds)
+    results = index.nearest(lat, lng, k, radius_km, predicate if (specialty or open_now) else None)
+    return [dict(entry.data, distance_km=round(distance, 3)) for distance, entry in results]
+
+
+def _collect_store_change(mapper, connection, target):
+    session = object_session(target)
+    if session is None:
+        return
+    add_pending(session, 'geo_store_changes', (target.id, target.to_dict()))
+
+
+def _collect_store_delete(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        add_pending(session, 'geo_store_changes', (target.id, None))
+
+
+event.listen(Store, 'after_insert', _collect_store_change)
+event.listen(Store, 'after_update', _collect_store_change)
+event.listen(Store, 'after_delete', _collect_store_delete)
+
+
+@on_commit('geo_store_changes')
+def _apply_store_changes(items):
+    index = _index
+    if index is None:
+        return
+    with index._lock:
+        for store_id, data in dict(items).items():
+            if data is None:
+                index.remove(store_id)
+            else:
+                index.upsert(data)
+
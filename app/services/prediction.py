@@ -0,0 +1,311 @@
+"""
+下次就诊预测服务
+
+离线训练：一次流式查询读出全部已完成治疗的 (客户, 类型, 就诊时间, 费用)，转成
+NumPy数组后整体计算：
+- 类型转移概率：同一客户相邻两次就诊 上次类型 -> 下次类型 的频数，按全局类型占比平滑
+- 各类型的就诊间隔中位数（以下次类型分组）和费用中位数
+模型参数以JSON保存在 prediction_models 表。
+
+批量评分：对每个客户，下次类型 = 转移概率与客户自身类型偏好加权后概率最大的类型；
+间隔 = 客户自身到该类型的平均间隔向该类型间隔中位数收缩后的值；预测日期 = 最近就诊 + 间隔。
+结果整表替换写入 visit_predictions，供回访营销（follow_up模板）使用。
+
+全部计算是向量化的，百万级治疗记录单核几十秒内完成，耗时主要在数据库读取。
+"""
+import json
+from datetime import datetime, date, timedelta
+import numpy as np
+from flask import current_app
+from sqlalchemy import func, insert, delete, and_
+from app import db
+from app.models import Client, Treatment, PredictionModel, VisitPrediction
+from app.utils.ai_helper import DeepSeekAI
+from app.utils.pagination import keyset_paginate
+
+UNKNOWN_TYPE = '其他'
+READ_BATCH_SIZE = 50000
+WRITE_BATCH_SIZE = 1000
+EPOCH = np.datetime64('1970-01-01T00:00:00', 's')
+
+
+def load_history():
+    """
+    读取全部已完成治疗，按客户和就诊时间排序
+
+    @return {dict} - {'client_ids', 'days'（就诊时间，距1970年的天数）, 'fees'（缺失为NaN）,
+                      'type_ids'（在types中的下标）, 'types'}
+    """
+    visit_time = func.coalesce(Treatment.appointment_date, Treatment.created_at)
+    statement = db.select(Treatment.client_id, Treatment.type, visit_time, Treatment.fee).where(
+        Treatment.status == 'completed',
+        Treatment.client_id.isnot(None)
+    ).execution_options(yield_per=READ_BATCH_SIZE)
+
+    type_index = {}
+    client_parts, type_parts, time_parts, fee_parts = [], [], [], []
+    for rows in db.session.execute(statement).partitions():
+        rows = [row for row in rows if row[2] is not None]
+        if not rows:
+            continue
+        client_parts.append(np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)))
+        type_parts.append(np.fromiter(
+            (type_index.setdefault(row[1] or UNKNOWN_TYPE, len(type_index)) for row in rows),
+            dtype=np.int64, count=len(rows)
+        ))
+        time_parts.append(np.array([row[2] for row in rows], dtype='datetime64[s]'))
+        fee_parts.append(np.fromiter((np.nan if row[3] is None else row[3] for row in rows),
+                                     dtype=np.float64, count=len(rows)))
+
+    if not client_parts:
+        return {'client_ids': np.zeros(0, dtype=np.int64), 'type_ids': np.zeros(0, dtype=np.int64),
+                'days': np.zeros(0), 'fees': np.zeros(0), 'types': []}
+
+    client_ids = np.concatenate(client_parts)
+    type_ids = np.concatenate(type_parts)
+    days = (np.concatenate(time_parts) - EPOCH).astype(np.float64) / 86400
+    fees = np.concatenate(fee_parts)
+    order = np.lexsort((days, client_ids))
+    return {
+        'client_ids': client_ids[order],
+        'type_ids': type_ids[order],
+        'days': days[order],
+        'fees': fees[order],
+        'types': list(type_index)
+    }
+
+
+def _visit_pairs(history, min_interval):
+    # 同一客户相邻两次就诊（间隔过短的视为同一次就诊，不计入）
+    client_ids, days = history['client_ids'], history['days']
+    gaps = np.diff(days)
+    valid = (client_ids[1:] == client_ids[:-1]) & (gaps >= min_interval)
+    return valid, gaps
+
+
+def train_model(history):
+    """
+    训练模型参数
+
+    @param {dict} history - load_history()的结果
+    @return {dict} - 模型参数
+    """
+    config = current_app.config
+    types = history['types']
+    type_count = len(types)
+    type_ids, fees = history['type_ids'], history['fees']
+    valid, gaps = _visit_pairs(history, config.get('PREDICTION_MIN_INTERVAL_DAYS', 1))
+    previous, following, gaps = type_ids[:-1][valid], type_ids[1:][valid], gaps[valid]
+
+    type_share = np.bincount(type_ids, minlength=type_count).astype(np.float64)
+    type_share /= max(type_share.sum(), 1)
+
+    # 每行按全局类型占比加一次平滑，没有样本的类型退化为全局占比
+    counts = np.bincount(previous * type_count + following, minlength=type_count * type_count)
+    counts = counts.reshape(type_count, type_count).astype(np.float64) + type_share
+    transitions = counts / counts.sum(axis=1, keepdims=True) if type_count else counts
+
+    default_interval = float(np.median(gaps)) if len(gaps) else \
+        float(config.get('PREDICTION_DEFAULT_INTERVAL_DAYS', 180))
+    interval_days, fee_medians = [], []
+    for type_id in range(type_count):
+        type_gaps = gaps[following == type_id]
+        interval_days.append(float(np.median(type_gaps)) if len(type_gaps) else default_interval)
+        type_fees = fees[(type_ids == type_id) & ~np.isnan(fees)]
+        fee_medians.append(float(np.median(type_fees)) if len(type_fees) else None)
+
+    return {
+        'types': types,
+        'type_share': type_share.tolist(),
+        'transitions': transitions.tolist(),
+        'interval_days': interval_days,
+        'fee_medians': fee_medians,
+        'default_interval_days': default_interval
+    }
+
+
+def score_history(history, params):
+    """
+    按模型参数为每个客户预测下次就诊
+
+    @param {dict} history - load_history()的结果
+    @param {dict} params - 模型参数
+    @return {dict} - 按客户排列的数组：client_ids、last_days、last_types（历史类型下标）、
+                     visit_counts、predicted_types（模型类型下标）、confidence、interval_days
+    """
+    config = current_app.config
+    weight = config.get('PREDICTION_TRANSITION_WEIGHT', 0.6)
+    prior = config.get('PREDICTION_INTERVAL_PRIOR', 3)
+    client_ids, type_ids, days = history['client_ids'], history['type_ids'], history['days']
+    row_count = len(client_ids)
+    if not row_count:
+        return None
+
+    # 历史类型下标映射到模型类型下标（模型中没有的类型为-1）
+    model_index = {name: index for index, name in enumerate(params['types'])}
+    type_map = np.array([model_index.get(name, -1) for name in history['types']], dtype=np.int64)
+    model_types = type_map[type_ids]
+    type_count = len(params['types'])
+    transitions = np.asarray(params['transitions'], dtype=np.float64).reshape(type_count, type_count)
+    type_share = np.asarray(params['type_share'], dtype=np.float64)
+
+    last = np.r_[np.flatnonzero(client_ids[1:] != client_ids[:-1]), row_count - 1]
+    first = np.r_[0, last[:-1] + 1]
+    visit_counts = last - first + 1
+    client_count = len(last)
+    row_client = np.repeat(np.arange(client_count), visit_counts)
+
+    # 下次类型：转移概率与客户自身类型偏好加权
+    last_model_types = model_types[last]
+    transition_rows = np.where((last_model_types >= 0)[:, None],
+                               transitions[np.maximum(last_model_types, 0)], type_share)
+    known = model_types >= 0
+    preference = np.bincount(row_client[known] * type_count + model_types[known],
+                             minlength=client_count * type_count).reshape(client_count, type_count).astype(np.float64)
+    preference_total = preference.sum(axis=1, keepdims=True)
+    scores = np.where(preference_total > 0,
+                      weight * transition_rows + (1 - weight) * preference / np.maximum(preference_total, 1),
+                      transition_rows)
+    predicted_types = scores.argmax(axis=1)
+    confidence = scores[np.arange(client_count), predicted_types]
+
+    # 间隔：客户自身到该类型的平均间隔向类型间隔中位数收缩，样本越多越贴近自身规律
+    valid, gaps = _visit_pairs(history, config.get('PREDICTION_MIN_INTERVAL_DAYS', 1))
+    valid &= model_types[1:] >= 0
+    gap_keys = row_client[1:][valid] * type_count + model_types[1:][valid]
+    picked = np.arange(client_count) * type_count + predicted_types
+    gap_counts = np.bincount(gap_keys, minlength=client_count * type_count)[picked]
+    gap_totals = np.bincount(gap_keys, weights=gaps[valid], minlength=client_count * type_count)[picked]
+    type_intervals = np.asarray(params['interval_days'], dtype=np.float64)[predicted_types]
+    interval_days = (gap_totals + prior * type_intervals) / (gap_counts + prior)
+
+    return {
+        'client_ids': client_ids[last],
+        'last_days': days[last],
+        'last_types': type_ids[last],
+        'visit_counts': visit_counts,
+        'predicted_types': predicted_types,
+        'confidence': confidence,
+        'interval_days': interval_days
+    }
+
+
+def _write_predictions(scores, history, params, model_id, now):
+    table = VisitPrediction.__table__
+    db.session.execute(delete(table))
+    if scores is None:
+        return 0
+
+    last_visits = (EPOCH + np.round(scores['last_days'] * 86400).astype('timedelta64[s]')).astype(datetime)
+    predicted_dates = (EPOCH + np.round((scores['last_days'] + scores['interval_days']) * 86400)
+                       .astype('timedelta64[s]')).astype('datetime64[D]').astype(date)
+    history_types, model_types, fee_medians = history['types'], params['types'], params['fee_medians']
+    client_count = len(scores['client_ids'])
+    for start in range(0, client_count, WRITE_BATCH_SIZE):
+        db.session.execute(insert(table), [{
+            'client_id': int(scores['client_ids'][i]),
+            'last_visit': last_visits[i],
+            'last_type': history_types[scores['last_types'][i]],
+            'visit_count': int(scores['visit_counts'][i]),
+            'predicted_type': model_types[scores['predicted_types'][i]],
+            'predicted_date': predicted_dates[i],
+            'interval_days': float(scores['interval_days'][i]),
+            'expected_fee': fee_medians[scores['predicted_types'][i]],
+            'confidence': float(scores['confidence'][i]),
+            'model_id': model_id,
+            'scored_at': now
+        } for i in range(start, min(start + WRITE_BATCH_SIZE, client_count))])
+    return client_count
+
+
+def predict_visits(retrain=True):
+    """
+    训练模型（可选）并为全部客户批量评分，建议每晚执行
+
+    @param {bool} retrain - 是否重新训练；没有已保存的模型时总是训练
+    @return {dict} - {'model_id', 'treatment_count', 'client_count', 'trained'}
+    """
+    now = datetime.utcnow()
+    history = load_history()
+    model = None if retrain else PredictionModel.query.order_by(PredictionModel.id.desc()).first()
+    try:
+        if model is None:
+            params = train_model(history)
+            model = PredictionModel(trained_at=now, treatment_count=len(history['client_ids']),
+                                    params=json.dumps(params, ensure_ascii=False))
+            db.session.add(model)
+            db.session.flush()
+            trained = True
+        else:
+            params = model.get_params()
+            trained = False
+
+        client_count = _write_predictions(score_history(history, params), history, params, model.id, now)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return {
+        'model_id': model.id,
+        'treatment_count': len(history['client_ids']),
+        'client_count': client_count,
+        'trained': trained
+    }
+
+
+def due_predictions(consultant_id=None, days=None, cursor=None, limit=20):
+    """
+    预测将在指定天数内（含已逾期）到访、且尚无待进行预约的客户，按预测日期排序
+
+    @param {int} consultant_id - 只查询该咨询师的客户，为空表示全部
+    @param {int} days - 覆盖的天数，默认 PREDICTION_DUE_DAYS
+    @param {string} cursor - 分页游标
+    @param {int} limit - 每页条数
+    @return {tuple} - (预测列表, 下一页游标或None)
+    """
+    if days is None:
+        days = current_app.config.get('PREDICTION_DUE_DAYS', 14)
+    query = VisitPrediction.query.join(Client, Client.id == VisitPrediction.client_id).filter(
+        VisitPrediction.predicted_date <= date.today() + timedelta(days=days),
+        ~db.session.query(Treatment.id).filter(and_(
+            Treatment.client_id == VisitPrediction.client_id,
+            Treatment.status == 'scheduled',
+            Treatment.appointment_date >= datetime.utcnow()
+        )).exists()
+    )
+    if consultant_id is not None:
+        query = query.filter(Client.assigned_consultant_id == consultant_id)
+    return keyset_paginate(query, VisitPrediction.predicted_date, VisitPrediction.client_id,
+                           descending=False, cursor=cursor, limit=limit)
+
+
+def follow_up_client_info(prediction, today=None):
+    """
+    组装回访营销（follow_up模板）所需的客户信息
+
+    @param {VisitPrediction} prediction - 预测结果
+    @param {date} today - 计算距上次就诊天数的基准日期，默认今天
+    @return {dict} - generate_marketing_content的client_info
+    """
+    today = today or date.today()
+    info = {
+        'name': prediction.client.name,
+        'last_treatment': prediction.last_type,
+        'next_treatment': prediction.predicted_type
+    }
+    if prediction.last_visit:
+        info['days_since_visit'] = (today - prediction.last_visit.date()).days
+    if prediction.predicted_date:
+        info['suggested_date'] = max(prediction.predicted_date, today).strftime('%m月%d日')
+    return info
+
+
+def follow_up_message(prediction):
+    """
+    根据预测结果生成回访文案
+
+    @param {VisitPrediction} prediction - 预测结果
+    @return {string} - 文案
+    """
+    return DeepSeekAI().generate_marketing_content(follow_up_client_info(prediction), template_type='follow_up')
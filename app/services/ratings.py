@@ -0,0 +1,170 @@
+"""
+评分服务
+
+每条评价写入 ratings 表，同时在同一事务内对医生、咨询师、门店的汇总行做原子增量
+（评价数+1，总分+评分；修改评价时只调整总分差值），读取评分时不再扫描全部评价。
+展示用的贝叶斯平均分 = (先验权重 × 先验均分 + 总分) / (先验权重 + 评价数)，
+避免评价很少的对象因一两条满分评价排在前面。
+"""
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import Rating, RatingAggregate, Doctor, Consultant
+from app.utils.sql import upsert_increment
+from app.utils.exceptions import ResourceExistsException
+
+SUBJECT_COLUMNS = (
+    ('doctor', Rating.doctor_id),
+    ('consultant', Rating.consultant_id),
+    ('store', Rating.store_id)
+)
+
+
+def bayesian_average(count, total):
+    """
+    计算贝叶斯平均分
+
+    @param {int} count - 评价数
+    @param {float} total - 评分总和
+    @return {float} - 平均分
+    """
+    prior_mean = current_app.config.get('RATING_PRIOR_MEAN', 4.0)
+    prior_weight = current_app.config.get('RATING_PRIOR_WEIGHT', 10)
+    return (prior_weight * prior_mean + total) / (prior_weight + count)
+
+
+def aggregate_dict(aggregate):
+    """
+    评分汇总的展示数据
+
+    @param {RatingAggregate} aggregate - 评分汇总，可为None
+    @return {dict} - 评价数、总分、平均分和贝叶斯平均分
+    """
+    count = aggregate.count if aggregate else 0
+    total = aggregate.total if aggregate else 0
+    return {
+        'rating_count': count,
+        'rating_total': total,
+        'avg_rating': round(total / count, 2) if count else 0,
+        'bayesian_rating': round(bayesian_average(count, total), 2)
+    }
+
+
+def get_aggregate(subject_type, subject_id):
+    """
+    获取评价对象的评分汇总
+
+    @param {string} subject_type - 对象类型（doctor/consultant/store）
+    @param {int} subject_id - 对象ID
+    @return {dict} - 评分汇总
+    """
+    return aggregate_dict(RatingAggregate.query.get((subject_type, subject_id)))
+
+
+def _subjects(rating):
+    return [(subject_type, getattr(rating, column.key)) for subject_type, column in SUBJECT_COLUMNS
+            if getattr(rating, column.key)]
+
+
+def _refresh_denormalized(rating):
+    # 医生/咨询师表上的rating字段用于列表展示，与汇总保持一致
+    connection = db.session.connection()
+    for subject_type, model in (('doctor', Doctor), ('consultant', Consultant)):
+        subject_id = getattr(rating, f'{subject_type}_id')
+        if not subject_id:
+            continue
+        aggregate = connection.execute(
+            db.select(RatingAggregate.count, RatingAggregate.total).where(
+                RatingAggregate.subject_type == subject_type, RatingAggregate.subject_id == subject_id)
+        ).first()
+        if aggregate is None:
+            continue
+        values = {'rating': round(bayesian_average(aggregate.count, aggregate.total), 2)}
+        if model is Doctor:
+            values['rating_count'] = aggregate.count
+        connection.execute(db.update(model).where(model.id == subject_id).values(**values))
+
+
+def submit_rating(treatment, score, comment=None):
+    """
+    提交或修改治疗评价，需在调用方提交事务
+
+    @param {Treatment} treatment - 治疗记录
+    @param {float} score - 评分（1-5）
+    @param {string} comment - 评价内容
+    @return {Rating} - 评价记录
+    """
+    connection = db.session.connection()
+    # 不加锁判断是否已评价：MySQL加锁读取不存在的行会加间隙锁，并发的首次评价会在INSERT时死锁
+    rating = Rating.query.filter_by(treatment_id=treatment.id).first()
+    if rating is not None:
+        # 已有评价时按主键加锁并刷新会话中的旧值，并发修改时按被替换的分数计算汇总增量
+        rating = Rating.query.filter_by(id=rating.id).with_for_update().populate_existing().one()
+
+    if rating is None:
+        rating = Rating(
+            treatment_id=treatment.id,
+            client_id=treatment.client_id,
+            doctor_id=treatment.doctor_id,
+            consultant_id=treatment.consultant_id,
+            store_id=treatment.store_id,
+            score=score,
+            comment=comment
+        )
+        try:
+            with db.session.begin_nested():
+                db.session.add(rating)
+        except IntegrityError:
+            raise ResourceExistsException("该治疗记录已评价，请刷新后重试")
+        count_delta, total_delta = 1, score
+    else:
+        count_delta, total_delta = 0, score - rating.score
+        rating.score = score
+        rating.comment = comment
+        rating.updated_at = datetime.utcnow()
+        db.session.flush()
+
+    for subject_type, subject_id in _subjects(rating):
+        upsert_increment(connection, RatingAggregate.__table__,
+                         {'subject_type': subject_type, 'subject_id': subject_id},
+                         {'count': count_delta, 'total': total_delta},
+                         {'updated_at': datetime.utcnow()})
+    _refresh_denormalized(rating)
+    return rating
+
+
+def rebuild_aggregates():
+    """
+    根据评价明细全量重建评分汇总，并同步医生/咨询师的评分字段
+
+    @return {dict} - 各类对象重建的汇总行数
+    """
+    RatingAggregate.query.delete()
+    result = {}
+    now = datetime.utcnow()
+    for subject_type, column in SUBJECT_COLUMNS:
+        rows = db.session.query(column, func.count(Rating.id), func.sum(Rating.score)).filter(
+            column.isnot(None)).group_by(column).all()
+        db.session.add_all([
+            RatingAggregate(subject_type=subject_type, subject_id=subject_id, count=count,
+                            total=total or 0, updated_at=now)
+            for subject_id, count, total in rows
+        ])
+        result[subject_type] = len(rows)
+    db.session.flush()
+
+    # 同步医生/咨询师表的评分字段，没有评价的恢复为默认值
+    aggregates = {(a.subject_type, a.subject_id): a for a in RatingAggregate.query.filter(
+        RatingAggregate.subject_type.in_(['doctor', 'consultant'])).all()}
+    for doctor in Doctor.query.all():
+        aggregate = aggregates.get(('doctor', doctor.id))
+        doctor.rating_count = aggregate.count if aggregate else 0
+        doctor.rating = round(bayesian_average(aggregate.count, aggregate.total), 2) if aggregate else 5.0
+    for consultant in Consultant.query.all():
+        aggregate = aggregates.get(('consultant', consultant.id))
+        consultant.rating = round(bayesian_average(aggregate.count, aggregate.total), 2) if aggregate else 5.0
+
+    db.session.commit()
+    return result
@@ -0,0 +1,127 @@
+"""
+营收统计服务
+
+报表只读按天的营收汇总表（daily_revenue_rollups），按日/周/月/季度和所选维度在数据库内
+再汇总一次，扫描行数取决于日期范围和门店数，与治疗明细表的大小无关。
+汇总表随治疗记录的增删改在同一事务中增量维护，可用 flask rebuild-rollups 全量重建。
+"""
+from datetime import date, timedelta
+from sqlalchemy import func
+from app import db
+from app.models import DailyRevenueRollup, Store, Doctor, Consultant, User
+from app.models.stats import UNKNOWN_DIMENSION_ID, UNKNOWN_TREATMENT_TYPE
+from app.utils.sql import period_expr, PERIODS
+from app.utils.exceptions import BadRequestException
+
+# 可分组的维度：参数名 -> 汇总表列名
+DIMENSIONS = {
+    'store': 'store_id',
+    'doctor': 'doctor_id',
+    'consultant': 'consultant_id',
+    'type': 'type'
+}
+MAX_RANGE_DAYS = 3 * 366
+
+
+def parse_date_range(start, end, default_days=30):
+    """
+    校验日期范围参数
+
+    @param {string} start - 开始日期（YYYY-MM-DD，含），为空时取结束日期前default_days天
+    @param {string} end - 结束日期（YYYY-MM-DD，含），为空时取今天
+    @param {int} default_days - 默认天数
+    @return {tuple} - (开始日期, 结束日期)
+    """
+    try:
+        end_day = date.fromisoformat(end) if end else date.today()
+        start_day = date.fromisoformat(start) if start else end_day - timedelta(days=default_days - 1)
+    except ValueError:
+        raise BadRequestException("日期格式应为YYYY-MM-DD")
+    if start_day > end_day:
+        raise BadRequestException("开始日期不能晚于结束日期")
+    if (end_day - start_day).days >= MAX_RANGE_DAYS:
+        raise BadRequestException("日期范围不能超过3年")
+    return start_day, end_day
+
+
+def _names(model, column, ids):
+    ids = [dimension_id for dimension_id in ids if dimension_id != UNKNOWN_DIMENSION_ID]
+    if not ids:
+        return {}
+    return dict(db.session.query(model.id, column).filter(model.id.in_(ids)))
+
+
+def get_revenue_report(start, end, period='day', group_by=(), store_id=None, doctor_id=None, consultant_id=None,
+                       treatment_type=None):
+    """
+    按周期和维度汇总营收
+
+    @param {date} start - 开始日期（含）
+    @param {date} end - 结束日期（含）
+    @param {string} period - 统计周期（day/week/month/quarter）
+    @param {list} group_by - 分组维度（store/doctor/consultant/type），为空时只按周期汇总
+    @param {int} store_id - 只统计该门店
+    @param {int} doctor_id - 只统计该医生
+    @param {int} consultant_id - 只统计该咨询师
+    @param {string} treatment_type - 只统计该治疗类型
+    @return {dict} - {'period', 'start', 'end', 'group_by', 'rows': 各周期各维度的数据, 'totals': 合计}
+    """
+    if period not in PERIODS:
+        raise BadRequestException(f"period应为{'/'.join(PERIODS)}之一")
+    unknown = [name for name in group_by if name not in DIMENSIONS]
+    if unknown:
+        raise BadRequestException(f"不支持的分组维度: {','.join(unknown)}")
+    group_by = [name for name in DIMENSIONS if name in group_by]
+
+    table = DailyRevenueRollup.__table__
+    bucket = period_expr(table.c.day, period, db.engine.dialect.name).label('period')
+    dimensions = [table.c[DIMENSIONS[name]] for name in group_by]
+    query = db.session.query(
+        bucket, *dimensions,
+        func.sum(table.c.treatment_count), func.sum(table.c.fee_amount), func.sum(table.c.paid_amount)
+    ).filter(table.c.day >= start, table.c.day <= end)
+    for column, value in (('store_id', store_id), ('doctor_id', doctor_id), ('consultant_id', consultant_id),
+                          ('type', treatment_type)):
+        if value is not None:
+            query = query.filter(table.c[column] == value)
+    rows = query.group_by(bucket, *dimensions).order_by(bucket, *dimensions).all()
+
+    names = {}
+    if 'store' in group_by:
+        names['store'] = _names(Store, Store.name, {row.store_id for row in rows})
+    if 'doctor' in group_by:
+        names['doctor'] = _names(Doctor, Doctor.name, {row.doctor_id for row in rows})
+    if 'consultant' in group_by:
+        consultant_ids = [consultant_id for consultant_id in {row.consultant_id for row in rows}
+                          if consultant_id != UNKNOWN_DIMENSION_ID]
+        names['consultant'] = dict(db.session.query(Consultant.id, User.username).join(
+            User, User.id == Consultant.user_id
+        ).filter(Consultant.id.in_(consultant_ids))) if consultant_ids else {}
+
+    items, totals = [], {'treatment_count': 0, 'fee_amount': 0.0, 'paid_amount': 0.0}
+    for row in rows:
+        item = {'period': row.period}
+        for index, name in enumerate(group_by):
+            value = row[index + 1]
+            if name == 'type':
+                item['type'] = value if value != UNKNOWN_TREATMENT_TYPE else None
+            else:
+                item[f'{name}_id'] = value if value != UNKNOWN_DIMENSION_ID else None
+                item[f'{name}_name'] = names[name].get(value)
+        count, fee, paid = row[-3:]
+        item.update({'treatment_count': int(count or 0), 'fee_amount': round(float(fee or 0), 2),
+                     'paid_amount': round(float(paid or 0), 2)})
+        items.append(item)
+        for key in totals:
+            totals[key] += item[key]
+    totals['fee_amount'] = round(totals['fee_amount'], 2)
+    totals['paid_amount'] = round(totals['paid_amount'], 2)
+
+    return {
+        'period': period,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'group_by': group_by,
+        'rows': items,
+        'totals': totals
+    }
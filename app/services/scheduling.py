@@ -0,0 +1,299 @@
+"""
+预约排班服务
+
+医生的可预约时间 = 门店营业时间 ∩ 医生出诊时间，按 SCHEDULE_SLOT_MINUTES 划分时间格。
+预约时在 appointment_slots 表中为每个占用的时间格插入一行，依靠唯一约束保证并发预约
+同一时段时只有一方成功，不需要先查后写。
+
+空闲时段查询一次取出整个医生名单在日期范围内的占用记录，为每位医生构建有序的
+忙碌区间索引，再与可预约区间做归并扫描。
+"""
+from bisect import bisect_right
+from datetime import datetime, timedelta, time as dt_time
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import AppointmentSlot, Doctor, Consultant, Store, Treatment
+from app.utils.business_hours import parse_business_hours
+from app.utils.exceptions import BadRequestException, ResourceExistsException
+
+
+def _slot_minutes():
+    return current_app.config.get('SCHEDULE_SLOT_MINUTES', 15)
+
+
+def _floor_to_slot(moment, slot_minutes):
+    minutes = moment.hour * 60 + moment.minute
+    floored = minutes - minutes % slot_minutes
+    return datetime.combine(moment.date(), dt_time()) + timedelta(minutes=floored)
+
+
+def slot_starts(start, duration_minutes, slot_minutes):
+    """
+    计算一段预约占用的时间格
+
+    @param {datetime} start - 开始时间
+    @param {int} duration_minutes - 时长（分钟）
+    @param {int} slot_minutes - 时间格长度（分钟）
+    @return {list} - 时间格开始时间列表
+    """
+    end = start + timedelta(minutes=duration_minutes)
+    current = _floor_to_slot(start, slot_minutes)
+    step = timedelta(minutes=slot_minutes)
+    slots = []
+    while current < end:
+        slots.append(current)
+        current += step
+    return slots
+
+
+def _intersect(first, second):
+    # 两组按开始时间排序的区间求交集
+    result = []
+    i = j = 0
+    while i < len(first) and j < len(second):
+        start = max(first[i][0], second[j][0])
+        end = min(first[i][1], second[j][1])
+        if start < end:
+            result.append((start, end))
+        if first[i][1] < second[j][1]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def _schedule_windows(schedule, day):
+    # 把某一天（含前一天跨夜延续）的营业时间展开为绝对时间区间
+    midnight = datetime.combine(day, dt_time())
+    windows = []
+    for start, end in schedule.get(day.weekday(), ()):
+        if start < end:
+            windows.append((midnight + timedelta(minutes=start), midnight + timedelta(minutes=end)))
+        else:
+            windows.append((midnight + timedelta(minutes=start), midnight + timedelta(days=1)))
+    for start, end in schedule.get((day.weekday() - 1) % 7, ()):
+        if start > end:
+            windows.append((midnight, midnight + timedelta(minutes=end)))
+    return sorted(windows)
+
+
+def availability_windows(store_hours, resource_hours, start_date, end_date):
+    """
+    计算日期范围内的可预约区间
+
+    @param {string} store_hours - 门店营业时间
+    @param {string} resource_hours - 医生/咨询师的工作时间，为空表示随门店
+    @param {date} start_date - 开始日期（含）
+    @param {date} end_date - 结束日期（含）
+    @return {list} - [(开始时间, 结束时间)]，按时间排序
+    """
+    default_hours = current_app.config.get('SCHEDULE_DEFAULT_HOURS', '09:00-18:00')
+    store_schedule = parse_business_hours(store_hours) or parse_business_hours(default_hours)
+    resource_schedule = parse_business_hours(resource_hours)
+
+    windows = []
+    day = start_date
+    while day <= end_date:
+        day_windows = _schedule_windows(store_schedule, day)
+        if resource_schedule is not None:
+            day_windows = _intersect(day_windows, _schedule_windows(resource_schedule, day))
+        windows.extend(day_windows)
+        day += timedelta(days=1)
+    return windows
+
+
+class BusyIndex:
+    """
+    单个资源的忙碌区间索引（合并后的有序区间，二分查找）
+
+    @param {list} slot_starts - 已占用的时间格开始时间
+    @param {int} slot_minutes - 时间格长度（分钟）
+    """
+    def __init__(self, slot_starts, slot_minutes):
+        step = timedelta(minutes=slot_minutes)
+        intervals = []
+        for start in sorted(slot_starts):
+            if intervals and intervals[-1][1] >= start:
+                intervals[-1][1] = max(intervals[-1][1], start + step)
+            else:
+                intervals.append([start, start + step])
+        self.starts = [interval[0] for interval in intervals]
+        self.intervals = intervals
+
+    def free_windows(self, windows):
+        """
+        从可预约区间中扣除忙碌区间
+
+        @param {list} windows - 按时间排序的可预约区间
+        @return {list} - 空闲区间
+        """
+        free = []
+        for start, end in windows:
+            position = max(bisect_right(self.starts, start) - 1, 0)
+            cursor = start
+            while position < len(self.intervals) and self.intervals[position][0] < end:
+                busy_start, busy_end = self.intervals[position]
+                if busy_end > cursor:
+                    if busy_start > cursor:
+                        free.append((cursor, busy_start))
+                    cursor = max(cursor, busy_end)
+                position += 1
+            if cursor < end:
+                free.append((cursor, end))
+        return free
+
+
+def _load_busy_indexes(resource_type, resource_ids, range_start, range_end, slot_minutes):
+    busy = {resource_id: [] for resource_id in resource_ids}
+    if not resource_ids:
+        return {}
+    rows = db.session.query(AppointmentSlot.resource_id, AppointmentSlot.slot_start).filter(
+        AppointmentSlot.resource_type == resource_type,
+        AppointmentSlot.resource_id.in_(resource_ids),
+        AppointmentSlot.slot_start >= range_start - timedelta(minutes=slot_minutes),
+        AppointmentSlot.slot_start < range_end
+    ).all()
+    for resource_id, slot_start in rows:
+        busy[resource_id].append(slot_start)
+    return {resource_id: BusyIndex(starts, slot_minutes) for resource_id, starts in busy.items()}
+
+
+def _candidate_starts(free_windows, duration_minutes, slot_minutes, not_before):
+    step = timedelta(minutes=slot_minutes)
+    duration = timedelta(minutes=duration_minutes)
+    starts = []
+    for window_start, window_end in free_windows:
+        current = _floor_to_slot(window_start, slot_minutes)
+        if current < window_start:
+            current += step
+        while current + duration <= window_end:
+            if current >= not_before:
+                starts.append(current)
+            current += step
+    return starts
+
+
+def find_free_slots(store, doctors, start_date, end_date, duration_minutes):
+    """
+    查询门店医生在日期范围内可预约的开始时间
+
+    @param {Store} store - 门店
+    @param {list} doctors - 医生列表
+    @param {date} start_date - 开始日期（含）
+    @param {date} end_date - 结束日期（含）
+    @param {int} duration_minutes - 预约时长（分钟）
+    @return {list} - [{'doctor_id', 'doctor_name', 'slots': [{'start', 'end'}]}]
+    """
+    slot_minutes = _slot_minutes()
+    range_start = datetime.combine(start_date, dt_time())
+    # 多取一天，覆盖跨夜营业延续到次日凌晨的时段
+    range_end = datetime.combine(end_date, dt_time()) + timedelta(days=2)
+    busy_indexes = _load_busy_indexes('doctor', [doctor.id for doctor in doctors],
+                                      range_start, range_end, slot_minutes)
+    now = datetime.now()
+    duration = timedelta(minutes=duration_minutes)
+
+    result = []
+    for doctor in doctors:
+        windows = availability_windows(store.business_hours, doctor.working_hours, start_date, end_date)
+        free = busy_indexes[doctor.id].free_windows(windows)
+        starts = _candidate_starts(free, duration_minutes, slot_minutes, now)
+        result.append({
+            'doctor_id': doctor.id,
+            'doctor_name': doctor.name,
+            'slots': [{'start': start.isoformat(), 'end': (start + duration).isoformat()} for start in starts]
+        })
+    return result
+
+
+def _resource_hours(resource_type, resource_id):
+    if resource_type == 'doctor':
+        resource = Doctor.query.get(resource_id)
+    else:
+        resource = Consultant.query.get(resource_id)
+    if resource is None:
+        raise BadRequestException("预约对象不存在")
+    store = Store.query.get(resource.store_id) if resource.store_id else None
+    return (store.business_hours if store else None), resource.working_hours
+
+
+def reserve(treatment, resource_type='doctor', resource_id=None):
+    """
+    为治疗记录占用时间格，需在调用方提交事务；时段冲突或不在可预约时间内时抛出异常
+
+    @param {Treatment} treatment - 治疗记录（需已flush取得ID）
+    @param {string} resource_type - 资源类型（doctor/consultant）
+    @param {int} resource_id - 资源ID，默认取治疗记录的医生
+    """
+    resource_id = resource_id or treatment.doctor_id
+    if not resource_id or not treatment.appointment_date:
+        return
+
+    slot_minutes = _slot_minutes()
+    duration = treatment.duration_minutes or current_app.config.get('SCHEDULE_DEFAULT_DURATION', 30)
+    start = treatment.appointment_date
+    end = start + timedelta(minutes=duration)
+
+    store_hours, resource_hours = _resource_hours(resource_type, resource_id)
+    windows = availability_windows(store_hours, resource_hours, (start - timedelta(days=1)).date(), end.date())
+    if not any(window_start <= start and end <= window_end for window_start, window_end in windows):
+        raise BadRequestException("预约时间不在可预约时间内")
+
+    try:
+        # 使用保存点，冲突时只回滚本次占用，由调用方决定是否回滚整个事务
+        with db.session.begin_nested():
+            db.session.add_all([
+                AppointmentSlot(resource_type=resource_type, resource_id=resource_id,
+                                slot_start=slot_start, treatment_id=treatment.id)
+                for slot_start in slot_starts(start, duration, slot_minutes)
+            ])
+    except IntegrityError:
+        raise ResourceExistsException("该时段已被预约，请选择其他时间")
+
+
+def release(treatment):
+    """
+    释放治疗记录占用的时间格，需在调用方提交事务
+
+    @param {Treatment} treatment - 治疗记录
+    """
+    if treatment.id is None:
+        return
+    AppointmentSlot.query.filter_by(treatment_id=treatment.id).delete(synchronize_session=False)
+
+
+def reschedule(treatment):
+    """
+    治疗记录改期或调整时长后重新占用时间格
+
+    @param {Treatment} treatment - 治疗记录
+    """
+    release(treatment)
+    if treatment.status != 'cancelled':
+        reserve(treatment)
+
+
+def backfill_reservations():
+    """
+    为尚未占用时段的未来预约补充占用记录（上线排班功能前创建的预约）
+
+    @return {dict} - 成功占用和冲突的预约数量
+    """
+    reserved_ids = db.session.query(AppointmentSlot.treatment_id).filter(AppointmentSlot.treatment_id.isnot(None))
+    treatments = Treatment.query.filter(
+        Treatment.status == 'scheduled',
+        Treatment.doctor_id.isnot(None),
+        Treatment.appointment_date >= datetime.now(),
+        Treatment.id.notin_(reserved_ids)
+    ).order_by(Treatment.appointment_date).all()
+
+    result = {'reserved': 0, 'conflicts': []}
+    for treatment in treatments:
+        try:
+            reserve(treatment)
+            result['reserved'] += 1
+        except (BadRequestException, ResourceExistsException) as e:
+            result['conflicts'].append({'treatment_id': treatment.id, 'reason': e.message})
+    db.session.commit()
+    return result
@@ -0,0 +1,213 @@
+"""
+客户RFM分群服务
+
+一条聚合查询按客户汇总已完成的治疗：最近一次就诊时间（R）、就诊次数（F）、
+累计实付金额（M），再用NumPy整体计算五分位阈值和1-5分的档位，按R/F/M高低组合
+划入8类客户群，结果批量写入 client_segments 表。
+
+全量计算重新确定阈值；增量计算只重算上次计算之后有治疗记录变化的客户，沿用上次
+的阈值，使同一批次内的评分可比。最近度会随时间推移变化，应每天至少全量计算一次。
+"""
+import json
+from datetime import datetime
+import numpy as np
+from flask import current_app
+from sqlalchemy import func, insert, delete
+from app import db
+from app.models import Client, Treatment, ClientSegment, SegmentRun, SEGMENT_LABELS
+from app.utils.cache import cache
+
+QUANTILES = (0.2, 0.4, 0.6, 0.8)
+
+# 按 (R高, F高, M高) 组成的三位二进制数索引分群
+SEGMENT_BY_INDEX = np.array([
+    'general_recover',    # R低 F低 M低
+    'important_recover',  # R低 F低 M高
+    'general_retain',     # R低 F高 M低
+    'important_retain',   # R低 F高 M高
+    'general_develop',    # R高 F低 M低
+    'important_develop',  # R高 F低 M高
+    'general_value',      # R高 F高 M低
+    'important_value'     # R高 F高 M高
+])
+
+
+def _batch_size():
+    return current_app.config.get('RFM_BATCH_SIZE', 1000)
+
+
+def _metrics_query():
+    visit_time = func.coalesce(Treatment.appointment_date, Treatment.created_at)
+    return db.session.query(
+        Treatment.client_id,
+        func.max(visit_time),
+        func.count(Treatment.id),
+        func.coalesce(func.sum(Treatment.paid_amount), 0)
+    ).filter(
+        Treatment.status == 'completed',
+        Treatment.client_id.isnot(None)
+    ).group_by(Treatment.client_id)
+
+
+def load_metrics(client_ids=None):
+    """
+    按客户汇总已完成治疗
+
+    @param {list} client_ids - 只汇总这些客户，为空表示全部
+    @return {list} - [(客户ID, 最近就诊时间, 次数, 金额)]
+    """
+    if client_ids is None:
+        return _metrics_query().all()
+    rows = []
+    batch_size = _batch_size()
+    for start in range(0, len(client_ids), batch_size):
+        rows.extend(_metrics_query().filter(Treatment.client_id.in_(client_ids[start:start + batch_size])).all())
+    return rows
+
+
+def _to_arrays(rows, now):
+    client_ids = np.array([row[0] for row in rows], dtype=np.int64)
+    last_visits = [row[1] for row in rows]
+    recency = np.array([max((now - visit).days, 0) if visit else 10 ** 6 for visit in last_visits], dtype=np.int64)
+    frequency = np.array([row[2] for row in rows], dtype=np.int64)
+    monetary = np.array([float(row[3] or 0) for row in rows], dtype=np.float64)
+    return client_ids, last_visits, recency, frequency, monetary
+
+
+def compute_thresholds(recency, frequency, monetary):
+    """
+    计算五分位阈值
+
+    @param {ndarray} recency - 最近度（天）
+    @param {ndarray} frequency - 频率
+    @param {ndarray} monetary - 金额
+    @return {dict} - {'recency': [...], 'frequency': [...], 'monetary': [...]}
+    """
+    return {
+        'recency': np.quantile(recency, QUANTILES).tolist(),
+        'frequency': np.quantile(frequency, QUANTILES).tolist(),
+        'monetary': np.quantile(monetary, QUANTILES).tolist()
+    }
+
+
+def score_rfm(recency, frequency, monetary, thresholds, high_score=3):
+    """
+    按阈值计算R/F/M评分和分群
+
+    评分 = 1 + 严格小于该值的阈值个数（并列值落在同一档）；最近度天数越少评分越高。
+
+    @param {ndarray} recency - 最近度（天）
+    @param {ndarray} frequency - 频率
+    @param {ndarray} monetary - 金额
+    @param {dict} thresholds - 分档阈值
+    @param {int} high_score - 不低于该分数视为"高"
+    @return {tuple} - (R评分, F评分, M评分, 分群名称数组)
+    """
+    r_scores = len(QUANTILES) + 1 - np.searchsorted(thresholds['recency'], recency, side='left')
+    f_scores = 1 + np.searchsorted(thresholds['frequency'], frequency, side='left')
+    m_scores = 1 + np.searchsorted(thresholds['monetary'], monetary, side='left')
+    index = ((r_scores >= high_score).astype(np.int64) << 2) \
+        | ((f_scores >= high_score).astype(np.int64) << 1) \
+        | (m_scores >= high_score).astype(np.int64)
+    return r_scores, f_scores, m_scores, SEGMENT_BY_INDEX[index]
+
+
+def _write_segments(rows, thresholds, now, stale_client_ids=None):
+    # stale_client_ids为空时替换全部分群，否则只替换这些客户（含已无完成治疗的客户）
+    table = ClientSegment.__table__
+    batch_size = _batch_size()
+    if stale_client_ids is None:
+        db.session.execute(delete(table))
+    else:
+        for start in range(0, len(stale_client_ids), batch_size):
+            db.session.execute(delete(table).where(table.c.client_id.in_(stale_client_ids[start:start + batch_size])))
+    if not rows:
+        return
+
+    client_ids, last_visits, recency, frequency, monetary = _to_arrays(rows, now)
+    r_scores, f_scores, m_scores, segments = score_rfm(
+        recency, frequency, monetary, thresholds, current_app.config.get('RFM_HIGH_SCORE', 3)
+    )
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(insert(table), [{
+            'client_id': int(client_ids[i]),
+            'last_visit': last_visits[i],
+            'recency_days': int(recency[i]),
+            'frequency': int(frequency[i]),
+            'monetary': float(monetary[i]),
+            'r_score': int(r_scores[i]),
+            'f_score': int(f_scores[i]),
+            'm_score': int(m_scores[i]),
+            'segment': str(segments[i]),
+            'computed_at': now
+        } for i in range(start, min(start + batch_size, len(rows)))])
+
+
+def compute_segments(full=False):
+    """
+    计算客户分群
+
+    @param {bool} full - 是否全量计算；没有历史批次时总是全量
+    @return {dict} - 批次信息
+    """
+    now = datetime.utcnow()
+    last_run = SegmentRun.query.filter(SegmentRun.finished_at.isnot(None)).order_by(SegmentRun.id.desc()).first()
+    thresholds = last_run.get_thresholds() if last_run else None
+    if thresholds is None:
+        full = True
+
+    if full:
+        rows = load_metrics()
+        if rows:
+            thresholds = compute_thresholds(*_to_arrays(rows, now)[2:])
+        mode, changed_ids = 'full', None
+    else:
+        changed_ids = [client_id for client_id, in db.session.query(Treatment.client_id).filter(
+            Treatment.updated_at >= last_run.started_at,
+            Treatment.client_id.isnot(None)
+        ).distinct()]
+        rows = load_metrics(changed_ids)
+        mode = 'incremental'
+
+    run = SegmentRun(mode=mode, started_at=now, thresholds=json.dumps(thresholds) if thresholds else None)
+    db.session.add(run)
+    try:
+        _write_segments(rows, thresholds, now, changed_ids)
+        run.client_count = len(rows)
+        run.finished_at = datetime.utcnow()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    cache.invalidate_tags('segments')
+    return run.to_dict()
+
+
+@cache.cached(ttl=300, key_prefix='segments:summary', tags=['segments'])
+def get_segment_summary(consultant_id=None):
+    """
+    各分群的客户数量和平均指标
+
+    @param {int} consultant_id - 只统计该咨询师的客户，为空表示全部
+    @return {list} - [{'segment', 'label', 'count', 'avg_frequency', 'avg_monetary'}]
+    """
+    query = db.session.query(
+        ClientSegment.segment,
+        func.count(ClientSegment.client_id),
+        func.avg(ClientSegment.frequency),
+        func.avg(ClientSegment.monetary)
+    )
+    if consultant_id is not None:
+        query = query.join(Client, Client.id == ClientSegment.client_id).filter(
+            Client.assigned_consultant_id == consultant_id
+        )
+    counts = {segment: (count, avg_f, avg_m) for segment, count, avg_f, avg_m in query.group_by(ClientSegment.segment)}
+
+    return [{
+        'segment': segment,
+        'label': label,
+        'count': counts.get(segment, (0, None, None))[0],
+        'avg_frequency': round(float(counts[segment][1]), 2) if segment in counts else None,
+        'avg_monetary': round(float(counts[segment][2]), 2) if segment in counts else None
+    } for segment, label in SEGMENT_LABELS.items()]
@@ -0,0 +1,99 @@
+"""
+咨询师团队查询
+
+团队为某咨询师及其全部下级（按闭包表 consultant_closure），客户列表和业绩统计都
+是一条按 ancestor_id 走索引的连接查询，与团队层级深浅无关。
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from app import db
+from app.models import (Client, Consultant, User, Treatment, ConsultantCounter, ConsultantDailyActivity,
+                        ConsultantClosure, CommissionEntry)
+
+
+def team_clients_query(consultant_id):
+    """
+    团队全部成员的客户查询（可继续过滤和分页）
+
+    @param {int} consultant_id - 团队负责人咨询师ID
+    @return {Query} - 客户查询
+    """
+    return Client.query.join(
+        ConsultantClosure, ConsultantClosure.descendant_id == Client.assigned_consultant_id
+    ).filter(ConsultantClosure.ancestor_id == consultant_id)
+
+
+def get_team_performance(consultant_id, days=30):
+    """
+    团队成员的客户数、最近days天的活跃客户数和消息数、负责治疗的实收金额和记账提成
+
+    @param {int} consultant_id - 团队负责人咨询师ID
+    @param {int} days - 统计天数
+    @return {dict} - {'members': [每位成员的统计], 'totals': 团队合计, 'period': 统计区间}
+    """
+    start = datetime.utcnow() - timedelta(days=days)
+    closure = ConsultantClosure
+
+    # 活动、实收金额和提成先按成员聚合，再与成员连接，避免连接后行数相乘
+    activity = db.session.query(
+        ConsultantDailyActivity.consultant_id.label('consultant_id'),
+        func.sum(ConsultantDailyActivity.contact_count).label('active_clients'),
+        func.sum(ConsultantDailyActivity.message_count).label('messages')
+    ).join(closure, closure.descendant_id == ConsultantDailyActivity.consultant_id).filter(
+        closure.ancestor_id == consultant_id, ConsultantDailyActivity.day >= start.date()
+    ).group_by(ConsultantDailyActivity.consultant_id).subquery()
+
+    revenue = db.session.query(
+        Treatment.consultant_id.label('consultant_id'),
+        func.count(Treatment.id).label('treatments'),
+        func.sum(Treatment.paid_amount).label('paid_amount')
+    ).join(closure, closure.descendant_id == Treatment.consultant_id).filter(
+        closure.ancestor_id == consultant_id,
+        Treatment.status == 'completed',
+        func.coalesce(Treatment.appointment_date, Treatment.created_at) >= start
+    ).group_by(Treatment.consultant_id).subquery()
+
+    commission = db.session.query(
+        CommissionEntry.consultant_id.label('consultant_id'),
+        func.sum(CommissionEntry.amount).label('amount')
+    ).join(closure, closure.descendant_id == CommissionEntry.consultant_id).filter(
+        closure.ancestor_id == consultant_id, CommissionEntry.created_at >= start
+    ).group_by(CommissionEntry.consultant_id).subquery()
+
+    rows = db.session.query(
+        Consultant.id, User.username, Consultant.type, Consultant.supervisor_id, closure.depth,
+        ConsultantCounter.client_count, ConsultantCounter.orphan_count,
+        activity.c.active_clients, activity.c.messages, revenue.c.treatments, revenue.c.paid_amount,
+        commission.c.amount
+    ).select_from(closure).join(
+        Consultant, Consultant.id == closure.descendant_id
+    ).outerjoin(User, User.id == Consultant.user_id).outerjoin(
+        ConsultantCounter, ConsultantCounter.consultant_id == Consultant.id
+    ).outerjoin(activity, activity.c.consultant_id == Consultant.id).outerjoin(
+        revenue, revenue.c.consultant_id == Consultant.id
+    ).outerjoin(commission, commission.c.consultant_id == Consultant.id).filter(closure.ancestor_id == consultant_id).order_by(closure.depth, Consultant.id).all()
+
+    members = [{
+        'consultant_id': member_id,
+        'username': username,
+        'type': member_type,
+        'supervisor_id': supervisor_id,
+        'depth': depth,
+        'total_clients': client_count or 0,
+        'orphan_clients': orphan_count or 0,
+        'active_clients': int(active or 0),
+        'messages': int(messages or 0),
+        'completed_treatments': int(treatments or 0),
+        'paid_amount': round(float(paid or 0), 2),
+        'commission': round(float(earned or 0), 2)
+    } for member_id, username, member_type, supervisor_id, depth, client_count, orphan_count,
+        active, messages, treatments, paid, earned in rows]
+
+    totals = {key: sum(member[key] for member in members) for key in (
+        'total_clients', 'orphan_clients', 'active_clients', 'messages', 'completed_treatments', 'paid_amount',
+        'commission'
+    )}
+    totals['paid_amount'] = round(totals['paid_amount'], 2)
+    totals['commission'] = round(totals['commission'], 2)
+    totals['member_count'] = len(members)
+    return {'members': members, 'totals': totals, 'period': f"最近{days}天"}
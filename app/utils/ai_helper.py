@@ -134,9 +134,15 @@ class DeepSeekAI:
             # 此处为模拟实现，实际需要调用DeepSeek API
             # 正式开发时需替换为实际API调用
             
+            # 有下次就诊预测时给出具体的项目和建议日期
+            if client_info.get('next_treatment') and client_info.get('suggested_date'):
+                follow_up_advice = f"建议您在{client_info['suggested_date']}前后预约{client_info['next_treatment']}，可以随时联系我们！"
+            else:
+                follow_up_advice = "建议进行复查，可以随时预约！"
+            
             templates = {
                 'promotion': f"尊敬的{client_info.get('name', '顾客')}，感谢您对我们的信任！我们近期推出了{client_info.get('interest', '牙齿美白')}优惠活动，前20名预约可享受8折优惠，期待您的光临！",
-                'follow_up': f"尊敬的{client_info.get('name', '顾客')}，距离您上次的{client_info.get('last_treatment', '口腔检查')}已经过去了{client_info.get('days_since_visit', 90)}天，建议进行复查，可以随时预约！",
+                'follow_up': f"尊敬的{client_info.get('name', '顾客')}，距离您上次的{client_info.get('last_treatment', '口腔检查')}已经过去了{client_info.get('days_since_visit', 90)}天，{follow_up_advice}",
                 'birthday': f"亲爱的{client_info.get('name', '顾客')}，祝您生日快乐！作为我们尊贵的客户，我们为您准备了生日专属礼遇，本月内到店可享受指定项目7折优惠，期待您的到来！"
             }
             
@@ -0,0 +1,154 @@
+"""
+门店营业时间解析
+
+门店的营业时间有两种录入方式：
+- API写入的JSON对象，如 {"mon": "09:00-18:00", "sat": ["09:00-12:00", "14:00-17:00"], "sun": "closed"}
+- 后台表单录入的文本，如 "09:00-18:00" 或 "周一至周五 09:00-18:00，周六 10:00-16:00"
+
+解析结果为 {星期(0=周一): [(开始分钟, 结束分钟), ...]}，结束早于开始表示跨夜营业。
+"""
+import re
+import json
+
+_DAY_ALIASES = {
+    'mon': 0, 'monday': 0, 'tue': 1, 'tuesday': 1, 'wed': 2, 'wednesday': 2,
+    'thu': 3, 'thursday': 3, 'fri': 4, 'friday': 4, 'sat': 5, 'saturday': 5,
+    'sun': 6, 'sunday': 6
+}
+_CN_DAYS = {'一': 0, '二': 1, '三': 2, '四': 3, '五': 4, '六': 5, '日': 6, '天': 6, '七': 6}
+_GROUP_ALIASES = {
+    'daily': range(7), 'everyday': range(7), '每天': range(7), '每日': range(7), '全周': range(7),
+    'weekday': range(5), 'weekdays': range(5), '工作日': range(5),
+    'weekend': (5, 6), 'weekends': (5, 6), '周末': (5, 6)
+}
+_CLOSED_WORDS = ('closed', 'close', '休息', '闭店', '不营业', '停诊')
+
+_RANGE_RE = re.compile(r'(\d{1,2})[:：](\d{2})\s*[-~～至到]\s*(\d{1,2})[:：](\d{2})')
+_CN_DAY_RE = re.compile(r'(?:周|星期|礼拜)([一二三四五六日天七])(?:\s*[至到\-~～]\s*(?:周|星期|礼拜)?([一二三四五六日天七]))?')
+
+
+def _parse_ranges(text):
+    ranges = []
+    for start_h, start_m, end_h, end_m in _RANGE_RE.findall(text):
+        start = int(start_h) * 60 + int(start_m)
+        end = int(end_h) * 60 + int(end_m)
+        if start != end:
+            ranges.append((start, min(end, 24 * 60)))
+    return ranges
+
+
+def _day_span(first, last):
+    if first <= last:
+        return list(range(first, last + 1))
+    return list(range(first, 7)) + list(range(0, last + 1))
+
+
+def _parse_day_key(key):
+    key = str(key).strip().lower()
+    if key in _DAY_ALIASES:
+        return [_DAY_ALIASES[key]]
+    if key in _GROUP_ALIASES:
+        return list(_GROUP_ALIASES[key])
+    if '-' in key and all(part.strip() in _DAY_ALIASES for part in key.split('-', 1)):
+        first, last = (part.strip() for part in key.split('-', 1))
+        return _day_span(_DAY_ALIASES[first], _DAY_ALIASES[last])
+    match = _CN_DAY_RE.fullmatch(key)
+    if match:
+        first = _CN_DAYS[match.group(1)]
+        last = _CN_DAYS[match.group(2)] if match.group(2) else first
+        return _day_span(first, last)
+    return []
+
+
+def _parse_mapping(data):
+    schedule = {}
+    for key, value in data.items():
+        values = value if isinstance(value, (list, tuple)) else [value]
+        ranges = []
+        for item in values:
+            if item is None or any(word in str(item).lower() for word in _CLOSED_WORDS):
+                continue
+            ranges.extend(_parse_ranges(str(item)))
+        for day in _parse_day_key(key):
+            schedule[day] = ranges
+    return schedule
+
+
+def _parse_text(text):
+    schedule = {}
+    # 按中英文逗号、分号、换行切分为若干段，每段为“星期范围 + 时间段”
+    for segment in re.split(r'[，,；;\n]+', text):
+        segment = segment.strip()
+        if not segment:
+            continue
+        ranges = [] if any(word in segment.lower() for word in _CLOSED_WORDS) else _parse_ranges(segment)
+
+        days = []
+        for match in _CN_DAY_RE.finditer(segment):
+            first = _CN_DAYS[match.group(1)]
+            last = _CN_DAYS[match.group(2)] if match.group(2) else first
+            days.extend(_day_span(first, last))
+        for word, group in _GROUP_ALIASES.items():
+            if word in segment.lower():
+                days.extend(group)
+
+        if not days:
+            # 未注明星期的时间段视为每天营业；已有的具体星期设置优先
+            for day in range(7):
+                schedule.setdefault(day, []).extend(ranges)
+        else:
+            for day in days:
+                schedule[day] = list(ranges)
+    return schedule
+
+
+def parse_business_hours(raw):
+    """
+    解析营业时间
+
+    @param {string|dict} raw - 营业时间（JSON字符串、字典或文本）
+    @return {dict|None} - {星期: [(开始分钟, 结束分钟)]}，无法解析时返回None
+    """
+    if not raw:
+        return None
+
+    data = raw
+    if isinstance(raw, str):
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            data = raw
+
+    if isinstance(data, dict):
+        schedule = _parse_mapping(data)
+    elif isinstance(data, str):
+        schedule = _parse_text(data)
+    else:
+        return None
+    return schedule or None
+
+
+def is_open(schedule, moment):
+    """
+    判断给定时刻是否在营业时间内
+
+    @param {dict} schedule - parse_business_hours的解析结果
+    @param {datetime} moment - 时刻（门店当地时间）
+    @return {bool} - 是否营业
+    """
+    if not schedule:
+        return False
+
+    minute = moment.hour * 60 + moment.minute
+    weekday = moment.weekday()
+    for start, end in schedule.get(weekday, ()):
+        if start < end and start <= minute < end:
+            return True
+        if start > end and minute >= start:
+            return True
+
+    # 前一天跨夜营业延续到当天凌晨
+    for start, end in schedule.get((weekday - 1) % 7, ()):
+        if start > end and minute < end:
+            return True
+    return False
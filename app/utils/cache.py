@@ -0,0 +1,498 @@
+"""
+应用缓存模块
+
+两级结构：进程内LRU（短TTL）在前，Redis在后；未配置或无法连接Redis时使用纯内存后端
+（测试和单机部署）。支持函数/视图缓存装饰器、按标签失效（如失效所有带 store:5 标签的
+缓存）、防击穿（同一key只回源一次）以及命中率统计。
+
+多进程部署时，其他进程的本地LRU最多在 CACHE_LOCAL_TTL 秒内读到旧值。
+"""
+import time
+import pickle
+import hashlib
+import threading
+import logging
+from collections import OrderedDict, Counter, defaultdict
+from functools import wraps
+from flask import request, make_response
+from flask_login import current_user
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import object_session
+from app.utils.metrics import observe_cache
+from app.utils.transaction import add_pending, on_commit
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+
+class MemoryBackend:
+    """
+    内存缓存后端，超过容量时按LRU淘汰；过期、删除或淘汰的key同时从标签集合中移除
+
+    @param {int} maxsize - 最大key数
+    """
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # key -> (过期时间, 值, 标签)
+        self._tags = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def _remove(self, key):
+        item = self._data.pop(key, None)
+        if item is None:
+            return
+        for tag in item[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def _store(self, key, value, ttl, tags):
+        self._remove(key)
+        self._data[key] = (time.time() + ttl if ttl else None, value, tuple(tags))
+        for tag in tags:
+            self._tags[tag].add(key)
+        while len(self._data) > self.maxsize:
+            self._remove(next(iter(self._data)))
+
+    def _alive(self, key):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if item[0] is not None and item[0] < time.time():
+            self._remove(key)
+            return None
+        return item
+
+    def get(self, key):
+        with self._lock:
+            item = self._alive(key)
+            if item is None:
+                return MISSING
+            self._data.move_to_end(key)
+            return item[1]
+
+    def set(self, key, value, ttl, tags=()):
+        with self._lock:
+            self._store(key, value, ttl, tags)
+
+    def add(self, key, value, ttl):
+        """仅在key不存在时写入，返回是否写入成功"""
+        with self._lock:
+            if self._alive(key) is not None:
+                return False
+            self._store(key, value, ttl, ())
+            return True
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._remove(key)
+
+    def invalidate_tags(self, *tags):
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._tags.clear()
+
+
+class RedisBackend:
+    """
+    Redis缓存后端，值以pickle序列化，标签以集合记录其下的key
+
+    @param {Redis} client - Redis客户端
+    @param {string} prefix - key前缀
+    @param {int} tag_ttl - 标签集合的过期时间（秒）
+    """
+    def __init__(self, client, prefix='yayi:cache:', tag_ttl=86400):
+        self.client = client
+        self.prefix = prefix
+        self.tag_ttl = tag_ttl
+
+    def _key(self, key):
+        return self.prefix + key
+
+    def _tag_key(self, tag):
+        return self.prefix + 'tag:' + tag
+
+    def get(self, key):
+        raw = self.client.get(self._key(key))
+        if raw is None:
+            return MISSING
+        return pickle.loads(raw)
+
+    def set(self, key, value, ttl, tags=()):
+        pipe = self.client.pipeline(transaction=False)
+        pipe.set(self._key(key), pickle.dumps(value), ex=ttl or None)
+        for tag in tags:
+            pipe.sadd(self._tag_key(tag), key)
+            pipe.expire(self._tag_key(tag), max(self.tag_ttl, ttl or 0))
+        pipe.execute()
+
+    def add(self, key, value, ttl):
+        return bool(self.client.set(self._key(key), pickle.dumps(value), ex=ttl, nx=True))
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self._key(key) for key in keys])
+
+    def invalidate_tags(self, *tags):
+        for tag in tags:
+            tag_key = self._tag_key(tag)
+            keys = self.client.smembers(tag_key)
+            pipe = self.client.pipeline(transaction=False)
+            if keys:
+                pipe.delete(*[self._key(key.decode() if isinstance(key, bytes) else key) for key in keys])
+            pipe.delete(tag_key)
+            pipe.execute()
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + '*'):
+            self.client.delete(key)
+
+
+class Cache:
+    """
+    两级缓存
+
+    @param {string} name - 缓存名称（用于指标标签）
+    """
+    def __init__(self, name='app'):
+        self.name = name
+        self.backend = MemoryBackend()
+        self.default_ttl = 300
+        self.local_ttl = 5
+        self.local_maxsize = 1024
+        self.lock_timeout = 10
+        self.lock_wait = 5
+        self.stats_counter = Counter()
+        self._local = OrderedDict()
+        self._local_lock = threading.Lock()
+        self._key_locks = [threading.Lock() for _ in range(64)]
+
+    def init_app(self, app):
+        """
+        根据配置初始化缓存后端
+
+        @param {Flask} app - Flask应用实例
+        """
+        self.default_ttl = app.config.get('CACHE_DEFAULT_TTL', 300)
+        self.local_ttl = app.config.get('CACHE_LOCAL_TTL', 5)
+        self.local_maxsize = app.config.get('CACHE_LOCAL_MAXSIZE', 1024)
+        self.backend = self._create_backend(app)
+        self._local.clear()
+        app.extensions['cache'] = self
+
+    def _create_backend(self, app):
+        memory_maxsize = app.config.get('CACHE_MEMORY_MAXSIZE', 10000)
+        if app.config.get('CACHE_BACKEND', 'memory') != 'redis':
+            return MemoryBackend(memory_maxsize)
+
+        try:
+            import redis
+            redis_config = app.config['CACHE_REDIS_CONFIG']
+            client = redis.Redis(socket_timeout=1, socket_connect_timeout=1, **redis_config)
+            client.ping()
+        except Exception as e:
+            logger.warning(f"Redis不可用，缓存退化为内存后端: {str(e)}")
+            return MemoryBackend(memory_maxsize)
+        return RedisBackend(client, prefix=app.config.get('CACHE_KEY_PREFIX', 'yayi:cache:'))
+
+    @property
+    def redis(self):
+        """
+        当前使用的Redis客户端，未使用Redis后端时为None（供其他需要共享状态的模块复用）
+        """
+        return self.backend.client if isinstance(self.backend, RedisBackend) else None
+
+    # 本地LRU
+    def _local_get(self, key):
+        with self._local_lock:
+            item = self._local.get(key)
+            if item is None:
+                return MISSING
+            expires_at, value, tags = item
+            if expires_at < time.time():
+                del self._local[key]
+                return MISSING
+            self._local.move_to_end(key)
+            return value
+
+    def _local_set(self, key, value, ttl, tags):
+        local_ttl = min(self.local_ttl, ttl) if ttl else self.local_ttl
+        with self._local_lock:
+            self._local[key] = (time.time() + local_ttl, value, frozenset(tags))
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_maxsize:
+                self._local.popitem(last=False)
+
+    def _record(self, level, hit):
+        self.stats_counter[f'{level}_{"hits" if hit else "misses"}'] += 1
+        observe_cache(self.name, level, hit)
+
+    def get(self, key, default=None):
+        """
+        读取缓存，依次查询本地LRU和后端
+
+        @param {string} key - 缓存key
+        @param {any} default - 未命中时的返回值
+        @return {any} - 缓存值
+        """
+        value = self._get(key)
+        return default if value is MISSING else value
+
+    def _get(self, key):
+        value = self._local_get(key)
+        self._record('local', value is not MISSING)
+        if value is not MISSING:
+            return value
+
+        try:
+            item = self.backend.get(key)
+        except Exception as e:
+            logger.error(f"读取缓存失败: {str(e)}")
+            item = MISSING
+        self._record('remote', item is not MISSING)
+        if item is MISSING:
+            return MISSING
+
+        # 后端中连同标签一起保存，保证本地副本同样可按标签失效
+        tags, value = item
+        self._local_set(key, value, self.local_ttl, tags)
+        return value
+
+    def set(self, key, value, ttl=None, tags=()):
+        """
+        写入缓存
+
+        @param {string} key - 缓存key
+        @param {any} value - 缓存值（需可pickle）
+        @param {int} ttl - 过期时间（秒），默认 CACHE_DEFAULT_TTL
+        @param {list} tags - 标签列表
+        """
+        ttl = ttl or self.default_ttl
+        try:
+            self.backend.set(key, (tuple(tags), value), ttl, tags)
+        except Exception as e:
+            logger.error(f"写入缓存失败: {str(e)}")
+        self._local_set(key, value, ttl, tags)
+
+    def delete(self, *keys):
+        with self._local_lock:
+            for key in keys:
+                self._local.pop(key, None)
+        try:
+            self.backend.delete(*keys)
+        except Exception as e:
+            logger.error(f"删除缓存失败: {str(e)}")
+
+    def invalidate_tags(self, *tags):
+        """
+        失效带有指定标签的所有缓存
+
+        @param {string} tags - 标签，如 'stores'、'store:5'
+        """
+        tags = set(tags)
+        with self._local_lock:
+            stale = [key for key, item in self._local.items() if item[2] & tags]
+            for key in stale:
+                del self._local[key]
+        try:
+            self.backend.invalidate_tags(*tags)
+        except Exception as e:
+            logger.error(f"按标签失效缓存失败: {str(e)}")
+
+    def clear(self):
+        with self._local_lock:
+            self._local.clear()
+        self.backend.clear()
+
+    def _key_lock(self, key):
+        # 分段锁：按key哈希映射到固定数量的锁上，避免锁对象无限增长
+        return self._key_locks[hash(key) % len(self._key_locks)]
+
+    def get_or_set(self, key, loader, ttl=None, tags=()):
+        """
+        读取缓存，未命中时调用loader回源并写入；同一key并发未命中时只回源一次
+
+        @param {string} key - 缓存key
+        @param {function} loader - 回源函数
+        @param {int} ttl - 过期时间（秒）
+        @param {list} tags - 标签列表
+        @return {any} - 缓存值
+        """
+        value = self._get(key)
+        if value is not MISSING:
+            return value
+
+        # 进程内：同一key只允许一个线程回源
+        with self._key_lock(key):
+            value = self._get(key)
+            if value is not MISSING:
+                return value
+
+            # 跨进程：抢占回源锁
+            lock_key = 'lock:' + key
+            try:
+                acquired = self.backend.add(lock_key, 1, self.lock_timeout)
+            except Exception:
+                acquired = True
+            if acquired:
+                return self._load(key, loader, ttl, tags, lock_key)
+
+        # 其他进程正在回源：释放分段锁后再等待其写入，不阻塞映射到同一分段锁的其他key
+        deadline = time.time() + self.lock_wait
+        while time.time() < deadline:
+            time.sleep(0.05)
+            try:
+                item = self.backend.get(key)
+            except Exception:
+                break
+            if item is not MISSING:
+                item_tags, value = item
+                self._local_set(key, value, ttl or self.default_ttl, item_tags)
+                return value
+
+        # 等待超时，自行回源
+        with self._key_lock(key):
+            value = self._get(key)
+            if value is not MISSING:
+                return value
+            return self._load(key, loader, ttl, tags)
+
+    def _load(self, key, loader, ttl, tags, lock_key=None):
+        try:
+            value = loader()
+            self.set(key, value, ttl, tags)
+        finally:
+            if lock_key is not None:
+                try:
+                    self.backend.delete(lock_key)
+                except Exception:
+                    pass
+        return value
+
+    def stats(self):
+        """
+        命中统计
+
+        @return {dict} - 各层命中/未命中次数及命中率
+        """
+        result = dict(self.stats_counter)
+        for level in ('local', 'remote'):
+            hits = self.stats_counter[f'{level}_hits']
+            total = hits + self.stats_counter[f'{level}_misses']
+            result[f'{level}_hit_rate'] = round(hits / total, 4) if total else None
+        return result
+
+    def cached(self, ttl=None, key_prefix=None, tags=None):
+        """
+        函数缓存装饰器，以参数生成缓存key
+
+        @param {int} ttl - 过期时间（秒）
+        @param {string} key_prefix - key前缀，默认为函数的模块和名称
+        @param {list|function} tags - 标签列表，或以函数参数计算标签的函数
+        @return {function} - 装饰器
+        """
+        def decorator(f):
+            prefix = key_prefix or f'{f.__module__}.{f.__qualname__}'
+
+            def make_key(*args, **kwargs):
+                if not args and not kwargs:
+                    return prefix
+                digest = hashlib.md5(repr((args, sorted(kwargs.items()))).encode()).hexdigest()
+                return f'{prefix}:{digest}'
+
+            @wraps(f)
+            def decorated(*args, **kwargs):
+                key_tags = tags(*args, **kwargs) if callable(tags) else (tags or ())
+                return self.get_or_set(make_key(*args, **kwargs), lambda: f(*args, **kwargs), ttl, key_tags)
+
+            decorated.make_key = make_key
+            decorated.invalidate = lambda *args, **kwargs: self.delete(make_key(*args, **kwargs))
+            decorated.uncached = f
+            return decorated
+        return decorator
+
+    def cached_view(self, ttl=None, tags=None, vary_on_user=True):
+        """
+        视图缓存装饰器，仅缓存GET请求的成功响应
+
+        @param {int} ttl - 过期时间（秒）
+        @param {list|function} tags - 标签列表，或以视图参数计算标签的函数
+        @param {bool} vary_on_user - 是否按登录用户区分缓存
+        @return {function} - 装饰器
+        """
+        def decorator(f):
+            prefix = f'view:{f.__module__}.{f.__qualname__}'
+
+            @wraps(f)
+            def decorated(*args, **kwargs):
+                if request.method != 'GET':
+                    return f(*args, **kwargs)
+
+                user_part = ''
+                if vary_on_user:
+                    user_part = str(current_user.get_id()) if current_user.is_authenticated else 'anon'
+                key = f'{prefix}:{user_part}:{request.full_path}'
+                key_tags = tags(*args, **kwargs) if callable(tags) else (tags or ())
+
+                cached_response = self.get(key)
+                if cached_response is not None:
+                    body, status, content_type = cached_response
+                    return make_response(body, status, {'Content-Type': content_type})
+
+                response = make_response(f(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    self.set(key, (response.get_data(), response.status_code, response.content_type), ttl, key_tags)
+                return response
+            return decorated
+        return decorator
+
+
+cache = Cache()
+
+
+def invalidate_on_commit(model, tags_fn, track=()):
+    """
+    注册模型变更后的缓存失效：模型增删改时收集标签，事务提交后统一失效，回滚则丢弃
+
+    @param {Model} model - SQLAlchemy模型类
+    @param {function} tags_fn - 以模型实例计算标签列表的函数
+    @param {tuple} track - 标签依赖的属性名，修改前加载旧值（active_history），供 attribute_values 取旧值
+    """
+    def collect(mapper, connection, target):
+        session = object_session(target)
+        if session is not None:
+            add_pending(session, 'cache_invalidate_tags', tags_fn(target))
+
+    for name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(model, name, collect)
+    for name in track:
+        event.listen(getattr(model, name), 'set', lambda target, value, oldvalue, initiator: None, active_history=True)
+
+
+def attribute_values(target, name):
+    """
+    模型属性的当前值和本次flush中被替换的旧值（如门店变更时新旧门店的缓存都需失效）
+
+    @param {Model} target - 模型实例
+    @param {string} name - 属性名
+    @return {list} - 去重后的非空值
+    """
+    values = [getattr(target, name), *inspect(target).attrs[name].history.deleted]
+    return [value for value in dict.fromkeys(values) if value is not None]
+
+
+@on_commit('cache_invalidate_tags')
+def _invalidate_after_commit(items):
+    tags = set().union(*items)
+    if tags:
+        cache.invalidate_tags(*tags)
@@ -0,0 +1,259 @@
+"""
+运行时指标模块，以Prometheus文本格式导出
+
+在gunicorn多进程部署时，需在启动前设置环境变量 PROMETHEUS_MULTIPROC_DIR，
+各worker的指标写入该目录，由 /metrics 汇总导出（参见 gunicorn.conf.py）。
+
+/metrics 只允许 METRICS_ALLOWED_IPS 中的来源地址访问；配置了 METRICS_TOKEN 时还需携带
+Authorization: Bearer <令牌>。经同机反向代理转发的公网请求来源地址为本机，此时应配置
+令牌或在代理上屏蔽该路径。
+"""
+import os
+import hmac
+import time
+import ipaddress
+from flask import request, g, Response, current_app
+from sqlalchemy import event
+from prometheus_client import (CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+                               CONTENT_TYPE_LATEST, generate_latest, multiprocess)
+
+# 请求耗时分桶（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_COUNT = Counter(
+    'yayi_http_requests_total', 'HTTP请求总数',
+    ['blueprint', 'endpoint', 'method', 'status']
+)
+REQUEST_LATENCY = Histogram(
+    'yayi_http_request_duration_seconds', 'HTTP请求耗时',
+    ['blueprint', 'endpoint', 'method', 'status'], buckets=LATENCY_BUCKETS
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'yayi_http_requests_in_flight', '正在处理的HTTP请求数',
+    multiprocess_mode='livesum'
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    'yayi_db_pool_checkout_wait_seconds', '从连接池获取数据库连接的等待时间',
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    'yayi_db_pool_checked_out', '已借出的数据库连接数',
+    multiprocess_mode='livesum'
+)
+CACHE_REQUESTS = Counter(
+    'yayi_cache_requests_total', '缓存访问次数',
+    ['cache', 'level', 'result']
+)
+QUEUE_DEPTH = Gauge(
+    'yayi_background_queue_depth', '后台队列积压长度',
+    ['queue'], multiprocess_mode='livesum'
+)
+NOTIFY_LATENCY = Histogram(
+    'yayi_notify_latency_seconds', '事件发生到推送给在线连接的耗时',
+    ['event'], buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+SYNC_ROWS = Counter(
+    'yayi_sync_rows_total', '外部系统同步处理的记录数',
+    ['source', 'result']
+)
+SYNC_BATCH_LATENCY = Histogram(
+    'yayi_sync_batch_duration_seconds', '外部系统同步每批耗时',
+    ['source'], buckets=LATENCY_BUCKETS
+)
+SYNC_RETRIES = Counter(
+    'yayi_sync_retries_total', '外部系统同步重试次数',
+    ['source']
+)
+
+
+def observe_cache(cache_name, level, hit):
+    """
+    记录一次缓存访问
+
+    @param {string} cache_name - 缓存名称
+    @param {string} level - 缓存层级，如local/remote
+    @param {bool} hit - 是否命中
+    """
+    CACHE_REQUESTS.labels(cache_name, level, 'hit' if hit else 'miss').inc()
+
+
+def set_queue_depth(queue_name, depth):
+    """
+    更新后台队列积压长度
+
+    @param {string} queue_name - 队列名称
+    @param {int} depth - 当前积压长度
+    """
+    QUEUE_DEPTH.labels(queue_name).set(depth)
+
+
+def observe_notify_latency(event, seconds):
+    """
+    记录一次实时推送的端到端耗时
+
+    @param {string} event - 事件类型
+    @param {float} seconds - 耗时（秒）
+    """
+    NOTIFY_LATENCY.labels(event).observe(seconds)
+
+
+def observe_sync_batch(source, counts, seconds):
+    """
+    记录一批外部系统同步的结果
+
+    @param {string} source - 数据源名称
+    @param {dict} counts - 结果 -> 记录数，如 inserted/updated/unchanged/invalid
+    @param {float} seconds - 本批耗时（秒）
+    """
+    for result, count in counts.items():
+        if count:
+            SYNC_ROWS.labels(source, result).inc(count)
+    SYNC_BATCH_LATENCY.labels(source).observe(seconds)
+
+
+def observe_sync_retry(source):
+    """
+    记录一次外部系统同步重试
+
+    @param {string} source - 数据源名称
+    """
+    SYNC_RETRIES.labels(source).inc()
+
+
+def _request_labels(status_code):
+    """
+    生成请求指标的标签，未匹配路由统一归为unmatched，避免标签基数膨胀
+    """
+    return (
+        request.blueprint or '',
+        request.endpoint or 'unmatched',
+        request.method,
+        str(status_code)
+    )
+
+
+def _before_request():
+    g._metrics_start = time.perf_counter()
+    g._metrics_recorded = False
+    REQUESTS_IN_FLIGHT.inc()
+
+
+def _after_request(response):
+    start = g.get('_metrics_start')
+    if start is not None:
+        labels = _request_labels(response.status_code)
+        REQUEST_COUNT.labels(*labels).inc()
+        REQUEST_LATENCY.labels(*labels).observe(time.perf_counter() - start)
+        g._metrics_recorded = True
+    return response
+
+
+def _teardown_request(exc):
+    start = g.get('_metrics_start')
+    if start is None:
+        return
+    # 未经过after_request的请求（如未处理异常）按500计
+    if not g.get('_metrics_recorded'):
+        labels = _request_labels(500)
+        REQUEST_COUNT.labels(*labels).inc()
+        REQUEST_LATENCY.labels(*labels).observe(time.perf_counter() - start)
+    REQUESTS_IN_FLIGHT.dec()
+
+
+def _instrument_pool(pool):
+    """
+    包装连接池的connect方法，统计获取连接的等待时间
+    """
+    original_connect = pool.connect
+
+    def timed_connect():
+        start = time.perf_counter()
+        try:
+            return original_connect()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+
+    pool.connect = timed_connect
+    event.listen(pool, 'checkout', lambda *args: DB_POOL_CHECKED_OUT.inc())
+    event.listen(pool, 'checkin', lambda *args: DB_POOL_CHECKED_OUT.dec())
+
+
+def instrument_engine(engine):
+    """
+    为数据库引擎的连接池添加指标，连接池重建(dispose)后自动重新挂载
+
+    @param {Engine} engine - SQLAlchemy引擎
+    """
+    _instrument_pool(engine.pool)
+
+    @event.listens_for(engine, 'engine_disposed')
+    def _reinstrument(conn_engine):
+        _instrument_pool(conn_engine.pool)
+
+
+def _metrics_registry():
+    """
+    获取导出用的注册表，多进程模式下汇总所有worker的指标
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def _parse_networks(values):
+    if isinstance(values, str):
+        values = values.split(',')
+    return [ipaddress.ip_network(value.strip(), strict=False) for value in values or () if value.strip()]
+
+
+def _metrics_access_error():
+    # 返回拒绝原因和状态码，允许访问时返回None
+    networks = current_app.extensions.get('metrics_allowed_networks')
+    if networks:
+        try:
+            address = ipaddress.ip_address(request.remote_addr or '')
+        except ValueError:
+            return '来源地址不允许访问', 403
+        if not any(address in network for network in networks):
+            return '来源地址不允许访问', 403
+
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        auth_header = request.headers.get('Authorization', '')
+        supplied = auth_header[7:] if auth_header.startswith('Bearer ') else ''
+        if not hmac.compare_digest(supplied.encode(), token.encode()):
+            return '缺少或错误的指标访问令牌', 401
+    return None
+
+
+def metrics_view():
+    """
+    Prometheus指标导出接口（限制来源地址，可选令牌认证）
+    """
+    error = _metrics_access_error()
+    if error:
+        message, status_code = error
+        return Response(message, status=status_code, mimetype='text/plain')
+    return Response(generate_latest(_metrics_registry()), mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_metrics(app, db):
+    """
+    初始化指标采集
+
+    @param {Flask} app - Flask应用实例
+    @param {SQLAlchemy} db - 数据库扩展实例
+    """
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.extensions['metrics_allowed_networks'] = _parse_networks(app.config.get('METRICS_ALLOWED_IPS'))
+    app.add_url_rule(app.config.get('METRICS_PATH', '/metrics'), 'metrics', metrics_view)
+
+    with app.app_context():
+        instrument_engine(db.engine)
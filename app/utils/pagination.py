@@ -0,0 +1,115 @@
+"""
+键集（游标）分页工具
+
+按"排序列 + 主键"定位上一页最后一行，下一页用 WHERE 条件直接跳到该位置之后，
+配合 (过滤列, 排序列) 复合索引时，任意深度的翻页都只扫描一页的数据，不受 OFFSET
+影响。排序列可为空，NULL 视为最小值（与 MySQL/SQLite 的排序一致）。
+"""
+import json
+import base64
+from datetime import datetime, date
+from sqlalchemy import and_, or_
+from app.utils.exceptions import BadRequestException
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+    return value
+
+
+def encode_cursor(sort_value, row_id):
+    """
+    生成游标
+
+    @param {any} sort_value - 最后一行的排序列值
+    @param {int} row_id - 最后一行的主键
+    @return {string} - URL安全的游标字符串
+    """
+    raw = json.dumps([_encode_value(sort_value), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    解析游标
+
+    @param {string} cursor - 游标字符串
+    @return {tuple} - (排序列值, 主键)
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return _decode_value(sort_value), int(row_id)
+    except (ValueError, TypeError):
+        raise BadRequestException("无效的分页游标")
+
+
+def _after(column, id_column, value, row_id, descending):
+    # 排序位置在(value, row_id)之后的行
+    if descending:
+        if value is None:
+            return and_(column.is_(None), id_column < row_id)
+        return or_(column < value, and_(column == value, id_column < row_id), column.is_(None))
+    if value is None:
+        return or_(column.isnot(None), and_(column.is_(None), id_column > row_id))
+    return or_(column > value, and_(column == value, id_column > row_id))
+
+
+def keyset_paginate(query, column, id_column, descending=True, cursor=None, limit=20):
+    """
+    键集分页查询
+
+    @param {Query} query - 已加好过滤条件的查询
+    @param {Column} column - 排序列
+    @param {Column} id_column - 主键列（排序值相同时的次序）
+    @param {bool} descending - 是否降序
+    @param {string} cursor - 上一页返回的游标，为空表示第一页
+    @param {int} limit - 每页条数
+    @return {tuple} - (本页数据, 下一页游标或None)
+    """
+    if cursor:
+        value, row_id = decode_cursor(cursor)
+        query = query.filter(_after(column, id_column, value, row_id, descending))
+
+    if descending:
+        query = query.order_by(column.desc(), id_column.desc())
+    else:
+        query = query.order_by(column.asc(), id_column.asc())
+
+    # 多取一行判断是否还有下一页
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, column.key), getattr(last, id_column.key))
+
+
+def parse_sort(value, allowed, default):
+    """
+    解析排序参数，"-字段名" 表示降序
+
+    @param {string} value - 排序参数
+    @param {dict} allowed - 允许的字段名 -> 列
+    @param {string} default - 默认排序参数
+    @return {tuple} - (排序列, 是否降序)
+    """
+    value = value or default
+    descending = value.startswith('-')
+    name = value.lstrip('-')
+    if name not in allowed:
+        raise BadRequestException(f"不支持的排序字段: {name}")
+    return allowed[name], descending
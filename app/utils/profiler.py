@@ -0,0 +1,497 @@
+"""
+请求性能分析工具
+
+管理员在请求上携带 X-Profile 请求头或 _profile 查询参数时，该请求会在cProfile
+和栈采样器下运行，结果（pstats文件和火焰图可用的折叠栈文件）保存在容量有限的
+磁盘环形缓冲区中，可在管理后台下载。
+
+另有常驻的低开销采样器，每个worker一个后台线程，按端点聚合滚动时间窗口内的
+折叠栈，用于观察真实负载下的CPU分布。
+
+gevent worker（猴子补丁后 threading 为协程实现）下，采样线程使用补丁前的原生线程，
+否则协程忙于计算时采样线程得不到调度；采样目标按greenlet登记，挂起的greenlet取其
+gr_frame，正在运行的greenlet取所在系统线程的当前栈帧。cProfile按系统线程挂钩，会把同一线程上
+其他协程的执行一并记入，且并发的两个分析请求互相覆盖钩子，因此gevent下请求分析只做栈采样。
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import cProfile
+import threading
+import logging
+from collections import Counter, deque
+from datetime import datetime
+import jwt
+from flask import request, g, current_app
+from flask_login import current_user
+
+logger = logging.getLogger(__name__)
+
+PROFILE_KINDS = {
+    'pstats': '.pstats',
+    'collapsed': '.collapsed',
+}
+
+
+def gevent_patched():
+    """
+    当前进程的threading是否已被gevent猴子补丁
+    """
+    if 'gevent.monkey' not in sys.modules:
+        return False
+    from gevent import monkey
+    return monkey.is_module_patched('threading')
+
+
+def _native(module, name):
+    # gevent补丁后取回标准库的原始实现
+    if gevent_patched():
+        from gevent import monkey
+        return monkey.get_original(module, name)
+    return getattr(__import__(module), name)
+
+
+def _start_native_thread(target, name):
+    if gevent_patched():
+        _native('_thread', 'start_new_thread')(target, ())
+    else:
+        threading.Thread(target=target, name=name, daemon=True).start()
+
+
+def current_task():
+    """
+    当前执行单元：gevent下为当前greenlet，否则为线程ID
+
+    @return {tuple} - (执行单元, 所在系统线程ID)
+    """
+    if gevent_patched():
+        import greenlet
+        return greenlet.getcurrent(), _native('_thread', 'get_ident')()
+    thread_id = threading.get_ident()
+    return thread_id, thread_id
+
+
+def task_frame(task, thread_id, frames):
+    """
+    执行单元的当前栈帧：挂起的greenlet取gr_frame，正在运行的取所在系统线程的栈帧
+
+    @param {object} task - current_task返回的执行单元
+    @param {int} thread_id - 所在系统线程ID
+    @param {dict} frames - sys._current_frames()的结果
+    @return {frame|None} - 栈帧
+    """
+    if getattr(task, 'dead', False):
+        return None
+    frame = getattr(task, 'gr_frame', None)
+    return frame if frame is not None else frames.get(thread_id)
+
+
+def collapse_frame(frame):
+    """
+    将栈帧转换为折叠栈格式（根在前，以分号分隔）
+
+    @param {frame} frame - 栈顶帧
+    @return {string} - 折叠栈字符串
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        module = frame.f_globals.get('__name__', '?')
+        names.append(f'{module}:{code.co_name}')
+        frame = frame.f_back
+    names.reverse()
+    return ';'.join(names)
+
+
+class StackSampler:
+    """
+    单执行单元栈采样器，在后台原生线程中按固定间隔采集目标线程（或greenlet）的调用栈
+
+    @param {object} task - 目标执行单元（见 current_task）
+    @param {int} thread_id - 目标所在系统线程ID
+    @param {float} interval - 采样间隔（秒）
+    """
+    def __init__(self, task, thread_id, interval=0.001):
+        self.task = task
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = False
+        self._done = _native('_thread', 'allocate_lock')()
+
+    def start(self):
+        self._done.acquire()
+        _start_native_thread(self._run, 'request-stack-sampler')
+
+    def stop(self):
+        # 等待采样线程退出后再读取结果
+        self._stopped = True
+        self._done.acquire()
+        self._done.release()
+        return self.stacks
+
+    def _run(self):
+        sleep = _native('time', 'sleep')
+        try:
+            while not self._stopped:
+                sleep(self.interval)
+                frame = task_frame(self.task, self.thread_id, sys._current_frames())
+                if frame is not None:
+                    self.stacks[collapse_frame(frame)] += 1
+        finally:
+            self._done.release()
+
+
+class ProfileStore:
+    """
+    性能分析结果的磁盘环形缓冲区，超过容量时删除最旧的记录
+
+    @param {string} directory - 存储目录
+    @param {int} max_entries - 最大保留记录数
+    """
+    def __init__(self, directory, max_entries=50):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def _path(self, entry_id, suffix):
+        return os.path.join(self.directory, entry_id + suffix)
+
+    def save(self, profile, stacks, meta):
+        """
+        保存一次分析结果
+
+        @param {cProfile.Profile|None} profile - cProfile分析器
+        @param {Counter} stacks - 折叠栈采样计数
+        @param {dict} meta - 元数据（端点、耗时等）
+        @return {string} - 记录ID
+        """
+        entry_id = f"{datetime.utcnow().strftime('%Y%m%d%H%M%S%f')}-{uuid.uuid4().hex[:6]}"
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            if profile is not None:
+                profile.dump_stats(self._path(entry_id, PROFILE_KINDS['pstats']))
+            with open(self._path(entry_id, PROFILE_KINDS['collapsed']), 'w', encoding='utf-8') as f:
+                f.write(format_collapsed(stacks))
+            meta = dict(meta, id=entry_id, has_pstats=profile is not None)
+            with open(self._path(entry_id, '.json'), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+            self._evict()
+        return entry_id
+
+    def _evict(self):
+        entries = self.list()
+        for meta in entries[self.max_entries:]:
+            for suffix in list(PROFILE_KINDS.values()) + ['.json']:
+                try:
+                    os.remove(self._path(meta['id'], suffix))
+                except FileNotFoundError:
+                    pass
+
+    def list(self):
+        """
+        列出已保存的分析记录，按时间倒序
+
+        @return {list} - 元数据列表
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding='utf-8') as f:
+                    entries.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        entries.sort(key=lambda meta: meta['id'], reverse=True)
+        return entries
+
+    def file_path(self, entry_id, kind):
+        """
+        获取分析结果文件路径，记录不存在时返回None
+
+        @param {string} entry_id - 记录ID
+        @param {string} kind - 文件类型，pstats或collapsed
+        @return {string|None} - 文件路径
+        """
+        suffix = PROFILE_KINDS.get(kind)
+        if suffix is None or os.path.basename(entry_id) != entry_id:
+            return None
+        path = self._path(entry_id, suffix)
+        return path if os.path.exists(path) else None
+
+
+class ContinuousSampler:
+    """
+    常驻栈采样器
+
+    只采样正在处理请求的线程（gevent下为greenlet），按端点聚合到滚动时间窗口中。
+    每次采样后根据实际耗时调整休眠时间，使采样开销不超过 max_overhead。
+
+    @param {float} interval - 最小采样间隔（秒）
+    @param {int} window_seconds - 单个窗口时长（秒）
+    @param {int} window_count - 保留的窗口数量
+    @param {float} max_overhead - 采样开销上限（占墙钟时间比例）
+    """
+    def __init__(self, interval=0.02, window_seconds=60, window_count=60, max_overhead=0.01):
+        self.interval = interval
+        self.window_seconds = window_seconds
+        self.max_overhead = max_overhead
+        self.windows = deque(maxlen=window_count)
+        self.sample_count = 0
+        self.sampling_time = 0.0
+        self._active = {}
+        # 采样线程写窗口、管理页读窗口都持有该锁；gevent下也须是原生锁
+        self._lock = _native('_thread', 'allocate_lock')()
+        self._pid = None
+        self._generation = 0
+
+    def ensure_started(self):
+        """
+        在当前进程中启动采样线程（fork出的worker各自启动一次）
+        """
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            self._active = {}
+            self.windows.clear()
+            self._generation += 1
+            generation = self._generation
+            _start_native_thread(lambda: self._run(generation), 'continuous-stack-sampler')
+
+    def stop(self):
+        self._generation += 1
+        self._pid = None
+
+    @property
+    def mode(self):
+        """采样对象：greenlet（gevent worker）或 thread"""
+        return 'greenlet' if gevent_patched() else 'thread'
+
+    def bind(self, task, thread_id, endpoint):
+        self._active[task] = (endpoint, thread_id)
+
+    def unbind(self, task):
+        self._active.pop(task, None)
+
+    def _current_window(self, now):
+        window_start = now - now % self.window_seconds
+        if not self.windows or self.windows[-1][0] != window_start:
+            self.windows.append((window_start, {}))
+        return self.windows[-1][1]
+
+    def _run(self, generation):
+        sleep = _native('time', 'sleep')
+        delay = self.interval
+        while True:
+            sleep(delay)
+            if generation != self._generation:
+                return
+            started = time.perf_counter()
+            active = list(self._active.items())
+            if active:
+                frames = sys._current_frames()
+                samples = [(endpoint, task_frame(task, thread_id, frames))
+                           for task, (endpoint, thread_id) in active]
+                with self._lock:
+                    window = self._current_window(time.time())
+                    for endpoint, frame in samples:
+                        if frame is None:
+                            continue
+                        stacks = window.setdefault(endpoint, Counter())
+                        stacks[collapse_frame(frame)] += 1
+                        self.sample_count += 1
+            cost = time.perf_counter() - started
+            self.sampling_time += cost
+            delay = max(self.interval, cost / self.max_overhead)
+
+    def collapsed(self, endpoint=None, minutes=None):
+        """
+        聚合最近若干分钟的折叠栈
+
+        @param {string|None} endpoint - 端点名称，为空时聚合全部端点并以端点名作为根帧
+        @param {int|None} minutes - 时间范围（分钟），为空时使用全部保留窗口
+        @return {Counter} - 折叠栈采样计数
+        """
+        since = time.time() - minutes * 60 if minutes else 0
+        # 在锁内复制，采样线程同时在向当前窗口写入新的栈
+        with self._lock:
+            windows = [{name: dict(stacks) for name, stacks in window.items()}
+                       for window_start, window in self.windows if window_start + self.window_seconds >= since]
+        result = Counter()
+        for window in windows:
+            for name, stacks in window.items():
+                if endpoint is None:
+                    for stack, count in stacks.items():
+                        result[f'{name};{stack}'] += count
+                elif name == endpoint:
+                    result.update(stacks)
+        return result
+
+    def endpoint_totals(self, minutes=None):
+        """
+        统计各端点的采样数，按采样数倒序
+
+        @param {int|None} minutes - 时间范围（分钟）
+        @return {list} - [(端点, 采样数)]
+        """
+        totals = Counter()
+        for stack, count in self.collapsed(minutes=minutes).items():
+            totals[stack.split(';', 1)[0]] += count
+        return totals.most_common()
+
+
+def format_collapsed(stacks):
+    """
+    将折叠栈计数格式化为flamegraph.pl可读取的文本
+
+    @param {Counter} stacks - 折叠栈采样计数
+    @return {string} - 每行“栈 计数”
+    """
+    return ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common())
+
+
+def get_profile_store():
+    """
+    获取当前应用的性能分析存储
+    """
+    return current_app.extensions['profile_store']
+
+
+def _is_admin_request():
+    """
+    判断当前请求是否来自管理员（会话登录或JWT令牌）
+    """
+    if current_user.is_authenticated:
+        return current_user.role == 'admin'
+
+    auth_header = request.headers.get('Authorization', '')
+    if not auth_header.startswith('Bearer '):
+        return False
+    try:
+        data = jwt.decode(auth_header.split(' ')[1], current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
+    except jwt.InvalidTokenError:
+        return False
+
+    # 以数据库中的角色为准，令牌中的角色可能已过期
+    from app.models import User
+    user = User.query.get(data.get('user_id'))
+    return user is not None and user.role == 'admin'
+
+
+def _profile_mode():
+    """
+    解析请求的分析模式：sample仅栈采样，其余值同时使用cProfile和栈采样
+    """
+    value = request.headers.get('X-Profile') or request.args.get('_profile')
+    if not value or value == '0':
+        return None
+    return 'sample' if value == 'sample' else 'full'
+
+
+def get_continuous_sampler():
+    """
+    获取当前应用的常驻采样器，未启用时返回None
+    """
+    return current_app.extensions.get('continuous_sampler')
+
+
+def _bind_continuous_sampler():
+    sampler = get_continuous_sampler()
+    if sampler is not None and request.endpoint:
+        sampler.ensure_started()
+        task, thread_id = current_task()
+        sampler.bind(task, thread_id, request.endpoint)
+
+
+def _unbind_continuous_sampler(exc):
+    sampler = get_continuous_sampler()
+    if sampler is not None:
+        sampler.unbind(current_task()[0])
+
+
+def _before_request():
+    mode = _profile_mode()
+    if mode is None or not _is_admin_request():
+        return
+
+    if mode == 'full' and gevent_patched():
+        # 所有协程共用一个系统线程，cProfile无法只记录本请求，退化为按协程的栈采样
+        mode = 'sample'
+    task, thread_id = current_task()
+    sampler = StackSampler(task, thread_id, current_app.config['PROFILE_SAMPLE_INTERVAL'])
+    profile = cProfile.Profile() if mode == 'full' else None
+    g._profiling = (profile, sampler, time.perf_counter())
+    sampler.start()
+    if profile is not None:
+        profile.enable()
+
+
+def _after_request(response):
+    profiling = g.pop('_profiling', None)
+    if profiling is None:
+        return response
+
+    profile, sampler, start = profiling
+    if profile is not None:
+        profile.disable()
+    stacks = sampler.stop()
+    elapsed = time.perf_counter() - start
+
+    try:
+        entry_id = get_profile_store().save(profile, stacks, {
+            'endpoint': request.endpoint,
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'status': response.status_code,
+            'duration_ms': round(elapsed * 1000, 2),
+            'samples': sum(stacks.values()),
+            'created_at': datetime.utcnow().isoformat()
+        })
+        response.headers['X-Profile-Id'] = entry_id
+    except OSError as e:
+        logger.error(f"保存性能分析结果失败: {str(e)}")
+    return response
+
+
+def _teardown_request(exc):
+    # 异常导致after_request未执行时，确保采样线程退出
+    profiling = g.pop('_profiling', None)
+    if profiling is not None:
+        profile, sampler, start = profiling
+        if profile is not None:
+            profile.disable()
+        sampler.stop()
+
+
+def init_profiler(app):
+    """
+    初始化按需性能分析
+
+    @param {Flask} app - Flask应用实例
+    """
+    directory = app.config.get('PROFILE_DIR') or os.path.join(app.instance_path, 'profiles')
+    app.extensions['profile_store'] = ProfileStore(directory, app.config.get('PROFILE_MAX_ENTRIES', 50))
+    app.config.setdefault('PROFILE_SAMPLE_INTERVAL', 0.001)
+
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+    if app.config.get('PROFILER_SAMPLING_ENABLED'):
+        app.extensions['continuous_sampler'] = ContinuousSampler(
+            interval=app.config.get('PROFILER_SAMPLING_INTERVAL', 0.02),
+            window_seconds=app.config.get('PROFILER_WINDOW_SECONDS', 60),
+            window_count=app.config.get('PROFILER_WINDOW_COUNT', 60),
+            max_overhead=app.config.get('PROFILER_MAX_OVERHEAD', 0.01)
+        )
+        app.before_request(_bind_continuous_sampler)
+        app.teardown_request(_unbind_continuous_sampler)
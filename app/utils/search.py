@@ -0,0 +1,65 @@
+"""
+搜索键工具
+
+为支持前缀索引查找，客户写入时预先计算：
+- 手机号倒序：后几位查询转为倒序后的前缀匹配
+- 姓名拼音首字母：如"张三丰" -> "zsf"
+"""
+import re
+
+_DIGITS = re.compile(r'\D')
+_LETTERS = re.compile(r'[a-z]+')
+
+
+def reverse_phone(phone):
+    """
+    手机号倒序（仅保留数字）
+
+    @param {string} phone - 手机号
+    @return {string|None} - 倒序后的数字串
+    """
+    digits = _DIGITS.sub('', phone or '')
+    return digits[::-1] or None
+
+
+def pinyin_initials(name, max_length=64):
+    """
+    姓名的拼音首字母，非汉字字符中的字母和数字原样保留（小写）
+
+    未安装pypinyin时只保留字母和数字
+
+    @param {string} name - 姓名
+    @param {int} max_length - 最大长度
+    @return {string|None} - 首字母串
+    """
+    if not name:
+        return None
+    try:
+        from pypinyin import lazy_pinyin, Style
+        parts = lazy_pinyin(name, style=Style.FIRST_LETTER, errors='default')
+    except ImportError:
+        parts = [name]
+    initials = []
+    for part in parts:
+        part = part.lower()
+        if len(part) == 1 and part.isalnum():
+            initials.append(part)
+        else:
+            # 非汉字片段（如英文名）保留字母和数字
+            initials.extend(char for char in part if char.isascii() and char.isalnum())
+    return ''.join(initials)[:max_length] or None
+
+
+def classify_query(query):
+    """
+    判断搜索词类型
+
+    @param {string} query - 搜索词
+    @return {string} - phone（纯数字）、initials（纯字母）或name
+    """
+    compact = query.replace(' ', '').replace('-', '')
+    if compact.isdigit():
+        return 'phone'
+    if compact.isascii() and _LETTERS.fullmatch(compact.lower()):
+        return 'initials'
+    return 'name'
@@ -0,0 +1,89 @@
+"""
+数据库方言相关的SQL辅助函数
+
+线上使用MySQL，本地/测试可使用SQLite，这里屏蔽两者在upsert和日期格式化上的差异。
+"""
+from sqlalchemy import func, cast, Integer
+
+
+def upsert_increment(connection, table, keys, increments, values=None):
+    """
+    按唯一键插入一行，已存在时对计数列做增量更新（原子操作，无需先查后写）
+
+    @param {Connection} connection - 数据库连接（可在flush事件中直接使用）
+    @param {Table} table - 目标表
+    @param {dict} keys - 唯一键列及其值
+    @param {dict} increments - 计数列及其增量
+    @param {dict} values - 其他需要覆盖写入的列
+    """
+    values = values or {}
+    row = {**keys, **increments, **values}
+    dialect = connection.dialect.name
+
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table).values(**row)
+        update = {name: table.c[name] + stmt.inserted[name] for name in increments}
+        update.update({name: stmt.inserted[name] for name in values})
+        stmt = stmt.on_duplicate_key_update(**update)
+    else:
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table).values(**row)
+        update = {name: table.c[name] + stmt.excluded[name] for name in increments}
+        update.update({name: stmt.excluded[name] for name in values})
+        stmt = stmt.on_conflict_do_update(index_elements=list(keys), set_=update)
+
+    connection.execute(stmt)
+
+
+def month_expr(column, dialect):
+    """
+    生成将日期列格式化为 YYYY-MM 的SQL表达式
+
+    @param {Column} column - 日期时间列
+    @param {string} dialect - 数据库方言名称
+    @return {ColumnElement} - SQL表达式
+    """
+    if dialect == 'mysql':
+        return func.date_format(column, '%Y-%m')
+    if dialect == 'postgresql':
+        return func.to_char(column, 'YYYY-MM')
+    return func.strftime('%Y-%m', column)
+
+
+PERIODS = ('day', 'week', 'month', 'quarter')
+
+
+def period_expr(column, period, dialect):
+    """
+    生成将日期列归入统计周期的SQL表达式，结果为字符串：
+    day 为 YYYY-MM-DD，week 为所在周周一的 YYYY-MM-DD，month 为 YYYY-MM，quarter 为 YYYY-Qn
+
+    @param {Column} column - 日期列
+    @param {string} period - 统计周期（day/week/month/quarter）
+    @param {string} dialect - 数据库方言名称
+    @return {ColumnElement} - SQL表达式
+    """
+    if period == 'month':
+        return month_expr(column, dialect)
+    if dialect == 'mysql':
+        if period == 'day':
+            return func.date_format(column, '%Y-%m-%d')
+        if period == 'week':
+            return func.date_format(func.subdate(column, func.weekday(column)), '%Y-%m-%d')
+        return func.concat(func.year(column), '-Q', func.quarter(column))
+    if dialect == 'postgresql':
+        if period == 'day':
+            return func.to_char(column, 'YYYY-MM-DD')
+        if period == 'week':
+            return func.to_char(func.date_trunc('week', column), 'YYYY-MM-DD')
+        return func.to_char(column, 'YYYY-"Q"Q')
+    if period == 'day':
+        return func.strftime('%Y-%m-%d', column)
+    if period == 'week':
+        # %w 以周日为0，换算为距周一的天数
+        return func.date(column, func.printf('-%d days', (cast(func.strftime('%w', column), Integer) + 6) % 7))
+    return func.printf('%s-Q%d', func.strftime('%Y', column), (cast(func.strftime('%m', column), Integer) + 2) / 3)
@@ -0,0 +1,202 @@
+"""
+服务器推送事件（SSE）模块
+
+进程内按频道维护订阅者队列；使用Redis时，事件经Redis发布订阅转发到所有worker，
+各worker再分发给本进程的连接。订阅者处理过慢时丢弃其最旧的事件，不阻塞发布方。
+"""
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from flask import Response, stream_with_context
+
+logger = logging.getLogger(__name__)
+
+
+def format_event(event, data, event_id=None):
+    """
+    格式化一条SSE消息
+
+    @param {string} event - 事件名称
+    @param {any} data - 事件数据（JSON序列化）
+    @param {string} event_id - 事件ID
+    @return {string} - SSE文本
+    """
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    lines.extend(f'data: {line}' for line in payload.splitlines() or [''])
+    return '\n'.join(lines) + '\n\n'
+
+
+class EventBroker:
+    """
+    事件发布订阅中心
+
+    @param {string} prefix - Redis频道前缀
+    """
+    def __init__(self, prefix='yayi:events:'):
+        self.prefix = prefix
+        self.redis = None
+        self.heartbeat = 15
+        self.max_queue = 100
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._listener_pid = None
+
+    def init_app(self, app, redis_client=None):
+        """
+        初始化事件中心
+
+        @param {Flask} app - Flask应用实例
+        @param {Redis} redis_client - Redis客户端，为空时只在进程内分发
+        """
+        self.redis = redis_client
+        self.prefix = app.config.get('SSE_CHANNEL_PREFIX', self.prefix)
+        self.heartbeat = app.config.get('SSE_HEARTBEAT_SECONDS', 15)
+        self.max_queue = app.config.get('SSE_MAX_QUEUE', 100)
+        app.extensions['sse'] = self
+
+    def _ensure_listener(self):
+        # 监听线程按进程启动（gunicorn预加载后fork出的worker需要各自启动）
+        if self.redis is None or self._listener_pid == os.getpid():
+            return
+        with self._lock:
+            if self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+            thread = threading.Thread(target=self._listen, name='sse-listener', daemon=True)
+            thread.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(self.prefix + '*')
+                for message in pubsub.listen():
+                    channel = message['channel']
+                    if isinstance(channel, bytes):
+                        channel = channel.decode()
+                    data = json.loads(message['data'])
+                    self._dispatch(channel[len(self.prefix):], data['event'], data['data'])
+            except Exception as e:
+                logger.error(f"SSE事件订阅中断，稍后重连: {str(e)}")
+                time.sleep(1)
+
+    def publish(self, channel, event, data):
+        """
+        发布事件
+
+        @param {string} channel - 频道
+        @param {string} event - 事件名称
+        @param {any} data - 事件数据
+        """
+        if self.redis is not None:
+            try:
+                self.redis.publish(self.prefix + channel,
+                                   json.dumps({'event': event, 'data': data}, ensure_ascii=False, default=str))
+                return
+            except Exception as e:
+                logger.error(f"发布SSE事件失败，改为进程内分发: {str(e)}")
+        self._dispatch(channel, event, data)
+
+    def _dispatch(self, channel, event, data):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscriber in subscribers:
+            while True:
+                try:
+                    subscriber.put_nowait((event, data))
+                    break
+                except queue.Full:
+                    try:
+                        subscriber.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def subscribe(self, *channels):
+        """
+        订阅频道
+
+        @param {string} channels - 频道列表
+        @return {Queue} - 事件队列
+        """
+        self._ensure_listener()
+        subscriber = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            for channel in channels:
+                self._subscribers.setdefault(channel, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber, *channels):
+        """
+        取消订阅
+
+        @param {Queue} subscriber - subscribe返回的事件队列
+        @param {string} channels - 频道列表
+        """
+        with self._lock:
+            for channel in channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscriber)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def subscriber_count(self, channel):
+        """
+        本进程内某频道的连接数
+
+        @param {string} channel - 频道
+        @return {int} - 连接数
+        """
+        with self._lock:
+            return len(self._subscribers.get(channel, ()))
+
+    def stream(self, channels, initial_events=()):
+        """
+        生成SSE事件流
+
+        @param {list} channels - 订阅的频道
+        @param {list} initial_events - 连接建立后立即发送的(事件名称, 数据)
+        @return {generator} - SSE文本生成器
+        """
+        subscriber = self.subscribe(*channels)
+
+        def generate():
+            try:
+                yield 'retry: 3000\n\n'
+                for event, data in initial_events:
+                    yield format_event(event, data)
+                while True:
+                    try:
+                        event, data = subscriber.get(timeout=self.heartbeat)
+                    except queue.Empty:
+                        yield ': ping\n\n'
+                        continue
+                    yield format_event(event, data)
+            finally:
+                self.unsubscribe(subscriber, *channels)
+
+        return generate()
+
+    def response(self, channels, initial_events=()):
+        """
+        生成SSE响应
+
+        @param {list} channels - 订阅的频道
+        @param {list} initial_events - 连接建立后立即发送的(事件名称, 数据)
+        @return {Response} - 流式响应
+        """
+        return Response(
+            stream_with_context(self.stream(channels, initial_events)),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+
+broker = EventBroker()
@@ -0,0 +1,67 @@
+"""
+事务提交后才生效的待处理项
+
+模型事件中收集的变更（缓存失效标签、内存索引更新等）要等数据库事务真正提交后才能生效。
+保存点释放同样会触发 after_commit，保存点回滚同样会触发 after_soft_rollback，因此每项都
+记下收集时所在的保存点：保存点释放时不生效；保存点回滚只丢弃在该保存点（含其内层保存点）
+中收集的项；最外层事务提交后全部生效，最外层事务回滚则全部丢弃。
+"""
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_handlers = {}
+
+
+def on_commit(key):
+    """
+    注册待处理项的生效函数（装饰器）
+
+    @param {string} key - 待处理项在 session.info 中的键
+    @return {function} - 装饰器，被装饰函数以按收集顺序排列的待处理项列表调用
+    """
+    def decorator(handler):
+        _handlers[key] = handler
+        return handler
+    return decorator
+
+
+def add_pending(session, key, item):
+    """
+    登记一项提交后才生效的待处理项
+
+    @param {Session} session - 数据库会话
+    @param {string} key - 待处理项在 session.info 中的键（须已用 on_commit 注册）
+    @param {any} item - 待处理项
+    """
+    session.info.setdefault(key, []).append((session.get_nested_transaction(), item))
+
+
+def _within(transaction, savepoint):
+    while transaction is not None:
+        if transaction is savepoint:
+            return True
+        transaction = transaction.parent
+    return False
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_pending(session):
+    # 保存点释放：待最外层事务提交后再生效
+    if session.get_nested_transaction() is not None:
+        return
+    for key, handler in _handlers.items():
+        entries = session.info.pop(key, None)
+        if entries:
+            handler([item for _, item in entries])
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_pending(session, previous_transaction):
+    if previous_transaction.nested:
+        for key in _handlers:
+            entries = session.info.get(key)
+            if entries:
+                entries[:] = [entry for entry in entries if not _within(entry[0], previous_transaction)]
+    elif not session.in_transaction():
+        for key in _handlers:
+            session.info.pop(key, None)
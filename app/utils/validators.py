@@ -26,6 +26,25 @@ def validate_phone(phone):
     return bool(re.match(pattern, phone))
 
 
+_PHONE_SEPARATORS = re.compile(r"[\s\-()]")
+_PHONE_PATTERN = re.compile(r"(?:\+?86)?(1[3-9]\d{9})")
+
+
+def normalize_phone(raw):
+    """
+    规范化手机号：去除空格、连字符和+86前缀，兼容表格中按数字存储的号码
+    
+    @param {any} raw - 原始手机号
+    @return {string|None} - 规范化后的手机号，不合法时为None
+    """
+    if raw is None:
+        return None
+    if isinstance(raw, float) and raw.is_integer():
+        raw = int(raw)
+    match = _PHONE_PATTERN.fullmatch(_PHONE_SEPARATORS.sub('', str(raw)))
+    return match.group(1) if match else None
+
+
 def validate_password(password):
     """
     验证密码强度
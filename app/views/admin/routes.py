@@ -1,19 +1,27 @@
 """
 管理员路由
 """
-from flask import render_template, redirect, url_for, flash, request, jsonify, current_app
+from flask import render_template, redirect, url_for, flash, request, jsonify, current_app, send_file, abort, Response
 from flask_login import login_required, current_user
 from app import db
 from app.models import User, Client, Consultant, Store, Doctor, Treatment, KnowledgeArticle, KnowledgeQA
 from app.views.admin import admin
+from app.utils.profiler import get_profile_store, get_continuous_sampler, format_collapsed, gevent_patched
+from app.services.clients import list_clients
+from app.services.assignment import assign_clients
+from app.utils.exceptions import APIException
+from app.services.dashboard import (get_dashboard_snapshot, get_consultant_ranking,
+                                    get_signup_stats, get_treatment_type_stats)
 import json
 from datetime import datetime
 from sqlalchemy import func
+from functools import wraps
 
 def check_admin_role(f):
     """
     检查用户是否为管理员角色
     """
+    @wraps(f)
     @login_required
     def decorated(*args, **kwargs):
         if current_user.role != 'admin':
@@ -28,31 +36,10 @@ def index():
     """
     管理员首页
     """
-    # 统计数据
-    user_count = User.query.count()
-    client_count = Client.query.count()
-    consultant_count = Consultant.query.count()
-    store_count = Store.query.count()
-    
-    # 待审核咨询师数量
-    pending_consultants = Consultant.query.filter_by(verified=False).count()
-    
-    # 待审核知识库内容
-    pending_articles = KnowledgeArticle.query.filter_by(status='pending').count()
-    pending_qa = KnowledgeQA.query.filter_by(status='pending').count()
-    
-    # 孤儿客户数量
-    orphan_clients = Client.query.filter_by(is_orphan=True).count()
-    
-    return render_template('admin/index.html',
-                          user_count=user_count,
-                          client_count=client_count,
-                          consultant_count=consultant_count,
-                          store_count=store_count,
-                          pending_consultants=pending_consultants,
-                          pending_articles=pending_articles,
-                          pending_qa=pending_qa,
-                          orphan_clients=orphan_clients)
+    # 统计数据（一次查询获取全部计数，短时缓存）
+    snapshot = get_dashboard_snapshot()
+    
+    return render_template('admin/index.html', **snapshot)
 
 @admin.route('/users')
 @check_admin_role
@@ -255,6 +242,7 @@ def add_doctor():
             specialty=data.get('specialty'),
             bio=data.get('bio'),
             store_id=data.get('store_id'),
+            working_hours=data.get('working_hours') or None,
             status='available'
         )
         
@@ -286,6 +274,7 @@ def doctor_detail(doctor_id):
         doctor.specialty = data.get('specialty')
         doctor.bio = data.get('bio')
         doctor.store_id = data.get('store_id')
+        doctor.working_hours = data.get('working_hours') or None
         doctor.status = data.get('status')
         
         db.session.commit()
@@ -304,8 +293,13 @@ def orphan_clients():
     """
     孤儿客户管理
     """
-    clients = Client.query.filter_by(is_orphan=True).all()
-    return render_template('admin/orphan_clients.html', clients=clients)
+    query = Client.query.filter_by(is_orphan=True)
+    try:
+        clients, next_cursor = list_clients(query, request.args, current_app.config.get('CLIENTS_PER_PAGE', 20))
+    except APIException as e:
+        flash(e.message, 'warning')
+        return redirect(url_for('admin.orphan_clients'))
+    return render_template('admin/orphan_clients.html', clients=clients, next_cursor=next_cursor)
 
 @admin.route('/orphan_clients/reassign/<int:client_id>', methods=['POST'])
 @check_admin_role
@@ -332,6 +326,17 @@ def reassign_client(client_id):
     
     return redirect(url_for('admin.orphan_clients'))
 
+@admin.route('/orphan_clients/auto_assign', methods=['POST'])
+@check_admin_role
+def auto_assign_clients():
+    """
+    自动分配全部孤儿客户和未分配客户
+    """
+    result = assign_clients()
+    flash(f"已自动分配{result['assigned']}位客户（待分配{result['candidates']}位）", 'success')
+    
+    return redirect(url_for('admin.orphan_clients'))
+
 @admin.route('/knowledge/review')
 @check_admin_role
 def knowledge_review():
@@ -393,28 +398,65 @@ def stats():
     """
     统计数据
     """
-    # 用户增长统计
-    user_stats = db.session.query(
-        func.date_format(User.created_at, '%Y-%m').label('month'),
-        func.count(User.id).label('count')
-    ).group_by('month').order_by('month').all()
+    # 用户增长统计（读取月度汇总表）
+    user_stats = get_signup_stats()
     
     # 客户分配统计
-    consultant_stats = db.session.query(
-        Consultant.id,
-        User.username,
-        func.count(Client.id).label('client_count')
-    ).join(User, User.id == Consultant.user_id).outerjoin(
-        Client, Client.assigned_consultant_id == Consultant.id
-    ).group_by(Consultant.id).order_by(db.desc('client_count')).limit(10).all()
-    
-    # 治疗项目统计
-    treatment_stats = db.session.query(
-        Treatment.type,
-        func.count(Treatment.id).label('count')
-    ).group_by(Treatment.type).order_by(db.desc('count')).all()
+    consultant_stats = get_consultant_ranking(10)
+    
+    # 治疗项目统计（读取治疗类型汇总表）
+    treatment_stats = get_treatment_type_stats()
     
     return render_template('admin/stats.html',
                           user_stats=user_stats,
                           consultant_stats=consultant_stats,
-                          treatment_stats=treatment_stats) 
\ No newline at end of file
+                          treatment_stats=treatment_stats) 
+
+@admin.route('/profiles')
+@check_admin_role
+def profiles():
+    """
+    请求性能分析记录列表
+    """
+    entries = get_profile_store().list()
+    
+    # 常驻采样器的端点采样统计
+    sampler = get_continuous_sampler()
+    minutes = request.args.get('minutes', 15, type=int)
+    endpoint_totals = sampler.endpoint_totals(minutes) if sampler else []
+    
+    return render_template('admin/profiles.html',
+                          entries=entries,
+                          sampling_enabled=sampler is not None,
+                          sampling_mode='greenlet' if gevent_patched() else 'thread',
+                          endpoint_totals=endpoint_totals,
+                          minutes=minutes)
+
+@admin.route('/profiles/flamegraph')
+@check_admin_role
+def download_flamegraph():
+    """
+    下载常驻采样器聚合的折叠栈（可按端点和时间范围过滤）
+    """
+    sampler = get_continuous_sampler()
+    if sampler is None:
+        abort(404)
+    
+    endpoint = request.args.get('name') or None
+    minutes = request.args.get('minutes', type=int)
+    stacks = sampler.collapsed(endpoint=endpoint, minutes=minutes)
+    
+    filename = f"{endpoint or 'all'}-{minutes or 'all'}m.collapsed"
+    return Response(format_collapsed(stacks), mimetype='text/plain',
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+@admin.route('/profiles/<entry_id>/<kind>')
+@check_admin_role
+def download_profile(entry_id, kind):
+    """
+    下载性能分析结果（pstats或折叠栈文件）
+    """
+    path = get_profile_store().file_path(entry_id, kind)
+    if not path:
+        abort(404)
+    return send_file(path, as_attachment=True, download_name=f'{entry_id}.{kind}')
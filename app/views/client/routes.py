@@ -7,6 +7,7 @@ from app import db
 from app.models import Store, Doctor, Client, Treatment, Message
 from app.views.client import client
 from app.utils.ai_helper import DeepSeekAI
+from app.services.catalog import get_active_stores
 import json
 
 @client.route('/')
@@ -31,8 +32,7 @@ def store_map():
     """
     门店地图
     """
-    stores = Store.query.filter_by(status='active').all()
-    store_data = [store.to_dict() for store in stores]
+    store_data = get_active_stores()
     return render_template('client/map.html', stores=store_data)
 
 @client.route('/store/<int:store_id>')
@@ -4,9 +4,14 @@
 from flask import render_template, redirect, url_for, flash, request, jsonify, current_app
 from flask_login import login_required, current_user
 from app import db
-from app.models import User, Client, Consultant, Store, Message, GroupMessage, KnowledgeArticle, KnowledgeQA, Treatment
+from app.models import User, Client, Consultant, Store, Message, GroupMessage, KnowledgeArticle, KnowledgeQA, Treatment, ClientSegment
 from app.views.consultant import consultant
 from app.utils.ai_helper import DeepSeekAI
+from app.services.catalog import get_approved_knowledge
+from app.services.clients import list_clients
+from app.services.segmentation import get_segment_summary
+from app.services.claims import claim_client
+from app.utils.exceptions import APIException
 from app.api.authentication import token_required
 import json
 from datetime import datetime, timedelta
@@ -126,32 +131,18 @@ def client_list():
         flash('请先完善个人资料', 'warning')
         return redirect(url_for('consultant.edit_profile'))
     
-    # 获取查询参数
-    search = request.args.get('search', '')
-    status = request.args.get('status', '')
-    
-    # 构建查询
+    # 数据库端过滤并键集分页
     query = Client.query.filter_by(assigned_consultant_id=consultant_profile.id)
-    
-    # 搜索条件
-    if search:
-        query = query.filter(
-            or_(
-                Client.name.like(f'%{search}%'),
-                Client.contact_info.like(f'%{search}%')
-            )
-        )
-    
-    # 状态筛选
-    if status:
-        query = query.filter_by(status=status)
-    
-    # 执行查询
-    clients = query.order_by(Client.last_contact.desc()).all()
+    try:
+        clients, next_cursor = list_clients(query, request.args, current_app.config.get('CLIENTS_PER_PAGE', 20))
+    except APIException as e:
+        flash(e.message, 'warning')
+        return redirect(url_for('consultant.client_list'))
     
     return render_template('consultant/client_list.html',
                           consultant=consultant_profile,
-                          clients=clients)
+                          clients=clients,
+                          next_cursor=next_cursor)
 
 @consultant.route('/clients/new', methods=['GET', 'POST'])
 @login_required
@@ -187,12 +178,8 @@ def add_client():
                     return redirect(url_for('consultant.client_list'))
                 else:
                     # 如果客户已被其他咨询师认领，根据业务规则处理
-                    if existing_client.is_orphan:
-                        # 如果是"孤儿客户"，可以认领
-                        existing_client.assigned_consultant_id = consultant_profile.id
-                        existing_client.is_orphan = False
-                        existing_client.last_contact = datetime.utcnow()
-                        db.session.commit()
+                    if existing_client.is_orphan and claim_client(existing_client.id, consultant_profile.id):
+                        # 如果是"孤儿客户"，可以认领（并发认领时只有一人成功）
                         flash('成功认领孤儿客户', 'success')
                         return redirect(url_for('consultant.client_list'))
                     else:
@@ -394,6 +381,12 @@ def group_messages():
                 target_clients.extend(clients)
             # 去重
             target_clients = list(set(target_clients))
+        elif new_group_message.target_type == 'segment' and new_group_message.target_tags:
+            segments = [segment.strip() for segment in new_group_message.target_tags.split(',')]
+            target_clients = Client.query.filter(
+                Client.assigned_consultant_id == consultant_profile.id,
+                Client.segment.has(ClientSegment.segment.in_(segments))
+            ).all()
         
         # 发送个人消息给每个目标客户
         for client in target_clients:
@@ -431,7 +424,8 @@ def group_messages():
     
     return render_template('consultant/group_messages.html',
                           group_messages=group_messages,
-                          tags=list(all_tags))
+                          tags=list(all_tags),
+                          segments=get_segment_summary(consultant_profile.id))
 
 @consultant.route('/knowledge')
 @login_required
@@ -440,11 +434,7 @@ def knowledge():
     """
     知识库
     """
-    articles = KnowledgeArticle.query.filter_by(status='approved').order_by(
-        KnowledgeArticle.created_at.desc()).all()
-    
-    qa_list = KnowledgeQA.query.filter_by(status='approved').order_by(
-        KnowledgeQA.use_count.desc()).all()
+    articles, qa_list = get_approved_knowledge()
     
     return render_template('consultant/knowledge.html',
                           articles=articles,
@@ -548,11 +538,12 @@ def appointment_list():
     # 构建查询
     query = Treatment.query.filter_by(consultant_id=consultant_profile.id)
     
-    # 日期筛选
+    # 日期筛选（半开区间，可使用 consultant_id + appointment_date 索引）
     if date:
         try:
-            filter_date = datetime.strptime(date, '%Y-%m-%d').date()
-            query = query.filter(func.date(Treatment.appointment_date) == filter_date)
+            filter_date = datetime.strptime(date, '%Y-%m-%d')
+            query = query.filter(Treatment.appointment_date >= filter_date,
+                                 Treatment.appointment_date < filter_date + timedelta(days=1))
         except ValueError:
             pass
     
@@ -560,12 +551,15 @@ def appointment_list():
     if status:
         query = query.filter_by(status=status)
     
-    # 执行查询
-    appointments = query.order_by(Treatment.appointment_date).all()
+    # 执行分页查询
+    page = request.args.get('page', 1, type=int)
+    pagination = query.order_by(Treatment.appointment_date).paginate(
+        page=page, per_page=current_app.config.get('APPOINTMENTS_PER_PAGE', 20), error_out=False)
     
     return render_template('consultant/appointment_list.html',
                           consultant=consultant_profile,
-                          appointments=appointments)
+                          appointments=pagination.items,
+                          pagination=pagination)
 
 @consultant.route('/messages')
 @login_required
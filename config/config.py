@@ -1,6 +1,6 @@
 import os
 from datetime import timedelta
-from config.database import MYSQL_CONFIG
+from config.database import MYSQL_CONFIG, REDIS_CONFIG
 
 class Config:
     """基本配置类"""
@@ -18,6 +18,119 @@ class Config:
     # 分页配置
     CLIENTS_PER_PAGE = 20
     CONSULTANTS_PER_PAGE = 20
+    APPOINTMENTS_PER_PAGE = 20
+    EXPORT_BATCH_SIZE = 1000  # 流式导出每批从服务端游标读取的行数
+    
+    # 运行时指标配置
+    METRICS_ENABLED = True
+    METRICS_PATH = '/metrics'
+    # 允许抓取指标的来源地址（IP或网段，逗号分隔），为空表示不限制；默认本机和内网
+    METRICS_ALLOWED_IPS = os.environ.get('METRICS_ALLOWED_IPS',
+                                         '127.0.0.1/32,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16')
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # 设置后抓取时需携带 Authorization: Bearer <令牌>
+    
+    # 按需性能分析配置
+    PROFILE_DIR = os.environ.get('PROFILE_DIR')  # 默认为instance/profiles
+    PROFILE_MAX_ENTRIES = 50
+    PROFILE_SAMPLE_INTERVAL = 0.001  # 栈采样间隔（秒）
+    
+    # 缓存配置
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'redis')  # redis 或 memory
+    CACHE_REDIS_CONFIG = REDIS_CONFIG
+    CACHE_KEY_PREFIX = 'yayi:cache:'
+    CACHE_DEFAULT_TTL = 300
+    CACHE_LOCAL_TTL = 5  # 进程内LRU的最长保留时间（秒）
+    CACHE_LOCAL_MAXSIZE = 1024
+    CACHE_MEMORY_MAXSIZE = 10000  # 内存后端（未使用Redis时）的最大key数，超出按LRU淘汰
+    
+    # 管理后台统计缓存时间（秒），审核类变更会立即失效
+    DASHBOARD_CACHE_TTL = 30
+    
+    # 门店地理索引配置
+    GEO_INDEX_CELL_DEGREES = 0.1  # 网格边长（度），约11公里
+    GEO_INDEX_REFRESH_SECONDS = 60  # 与数据库比对门店变更的间隔
+    
+    # 预约排班配置
+    SCHEDULE_SLOT_MINUTES = 15  # 时间格长度（分钟）
+    SCHEDULE_DEFAULT_DURATION = 30  # 默认预约时长（分钟）
+    SCHEDULE_DEFAULT_HOURS = '09:00-18:00'  # 门店未设置营业时间时使用
+    SCHEDULE_MAX_RANGE_DAYS = 31  # 空闲时段单次最多查询天数
+    
+    # 预约日历配置
+    CALENDAR_MAX_RANGE_DAYS = 42  # 月视图含前后补齐的最多6周
+    CALENDAR_MAX_EVENTS = 500
+    
+    # 实时推送配置
+    SSE_HEARTBEAT_SECONDS = 15
+    SSE_MAX_QUEUE = 100  # 每个连接最多积压的事件数
+    
+    # 排队叫号配置
+    QUEUE_SNAPSHOT_INTERVAL = 5  # 队列快照写入间隔（秒）
+    
+    # 到店签到配置
+    CHECKIN_QUEUE_MAXSIZE = 10000  # 进程内待推送签到的上限，超出时在请求内直接处理
+    CHECKIN_BATCH_SIZE = 200  # 后台线程每批处理的签到数
+    CHECKIN_DEDUP_SECONDS = 60  # 同一客户重复扫码的去重时间
+    CHECKIN_INDEX_TTL = 300  # 签到路由索引缓存时间（秒）
+    CHECKIN_SAVE_ATTEMPTS = 10  # 签到保存失败后的最多尝试次数（失败后重新入队并退避）
+    
+    # 客户批量导入配置
+    CLIENT_IMPORT_CHUNK_SIZE = 1000  # 每块查重和插入的行数
+    CLIENT_IMPORT_MAX_ROWS = 100000
+    CLIENT_IMPORT_DEFAULT_PASSWORD = '123456'  # 与单个添加客户的默认密码一致
+    
+    # RFM客户分群配置
+    RFM_HIGH_SCORE = 3  # R/F/M评分不低于该值（1-5）视为"高"
+    RFM_BATCH_SIZE = 1000
+    
+    # 下次就诊预测配置
+    PREDICTION_TRANSITION_WEIGHT = 0.6  # 类型转移概率与客户自身偏好的混合权重
+    PREDICTION_INTERVAL_PRIOR = 3  # 客户自身平均间隔向类型间隔中位数收缩的先验次数
+    PREDICTION_MIN_INTERVAL_DAYS = 1  # 短于该间隔的相邻就诊（同日多项）不计入间隔统计
+    PREDICTION_DEFAULT_INTERVAL_DAYS = 180  # 没有间隔样本时的默认间隔
+    PREDICTION_DUE_DAYS = 14  # 待回访列表默认覆盖的天数
+    
+    # 跟进优先级配置
+    FOLLOW_UP_SENTIMENT_DAYS = 14  # 情绪指数为-1时相当于多少天未联系
+    FOLLOW_UP_SENTIMENT_ALPHA = 0.3  # 情绪指数移动平均中新消息的权重
+    FOLLOW_UP_MAX_RESULTS = 100
+    
+    # 客户自动分配配置
+    ASSIGNMENT_AFTER_ORPHAN_SWEEP = True  # 孤儿客户检查后自动重新分配
+    ASSIGNMENT_SPECIALTY_WEIGHT = 3.0
+    ASSIGNMENT_PROXIMITY_WEIGHT = 2.0
+    ASSIGNMENT_RATING_WEIGHT = 1.0
+    ASSIGNMENT_LOAD_WEIGHT = 2.0  # 负载达到平均值时的扣分
+    ASSIGNMENT_LOAD_SLACK = 0.1  # 单个咨询师最多超出平均负载的比例
+    ASSIGNMENT_DISTANCE_SCALE_KM = 10  # 门店距离得分减半的距离
+    
+    # 孤儿客户认领配置
+    ORPHAN_CLAIM_FEE = 0  # 每次认领的费用，0表示免费认领
+    ORPHAN_CLAIM_MAX_BATCH = 500  # 单次批量认领的最大客户数
+    
+    # 提成配置
+    COMMISSION_CLAIM_RATE = 0.10  # 孤儿客户被认领时，认领对价提成给原兼职咨询师的比例
+    COMMISSION_CONSUMPTION_RATES = {'parttime': 0.05, 'fulltime': 0.0}  # 按咨询师类型的客户消费提成比例
+    
+    # 财务系统同步配置
+    FINANCE_SYNC_SOURCE = os.environ.get('FINANCE_SYNC_SOURCE', 'file')  # file：目录投递文件；database：直连财务库
+    FINANCE_SYNC_DIR = os.environ.get('FINANCE_SYNC_DIR')  # 文件投递目录，默认 instance/finance
+    FINANCE_SYNC_DATABASE_URL = os.environ.get('FINANCE_SYNC_DATABASE_URL')
+    FINANCE_SYNC_TABLE = 'finance_records'
+    FINANCE_SYNC_BATCH_SIZE = 1000  # 每批（每个事务）同步的记录数
+    FINANCE_SYNC_MAX_RETRIES = 3
+    FINANCE_SYNC_BACKOFF_SECONDS = 1.0  # 首次重试等待时间，之后每次翻倍
+    
+    # 评分配置（贝叶斯平均的先验）
+    RATING_PRIOR_MEAN = 4.0
+    RATING_PRIOR_WEIGHT = 10
+    
+    # 常驻采样分析配置
+    PROFILER_SAMPLING_ENABLED = True
+    PROFILER_SAMPLING_INTERVAL = 0.02  # 最小采样间隔（秒）
+    PROFILER_MAX_OVERHEAD = 0.01  # 采样开销上限（约1%）
+    PROFILER_WINDOW_SECONDS = 60
+    PROFILER_WINDOW_COUNT = 60  # 保留最近1小时
     
     @staticmethod
     def init_app(app):
@@ -31,6 +144,8 @@ class DevelopmentConfig(Config):
 class TestingConfig(Config):
     """测试环境配置"""
     TESTING = True
+    PROFILER_SAMPLING_ENABLED = False
+    CACHE_BACKEND = 'memory'
     SQLALCHEMY_DATABASE_URI = f"mysql+pymysql://{MYSQL_CONFIG['user']}:{MYSQL_CONFIG['password']}@{MYSQL_CONFIG['host']}:{MYSQL_CONFIG['port']}/{MYSQL_CONFIG['database']}_test"
 
 class ProductionConfig(Config):
@@ -0,0 +1,26 @@
+"""
+gunicorn配置文件
+
+启动方式：gunicorn -c gunicorn.conf.py run:app
+"""
+import os
+import shutil
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', '4'))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent')
+
+# Prometheus多进程模式：各worker的指标写入同一目录，由/metrics汇总
+prometheus_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/yayi_prometheus')
+
+
+def on_starting(server):
+    """主进程启动时清空上一次运行残留的指标文件"""
+    shutil.rmtree(prometheus_dir, ignore_errors=True)
+    os.makedirs(prometheus_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """worker退出时清理其实时(live)类指标"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,30 @@
+"""add client list indexes
+
+Revision ID: 0a7c3e9b5d21
+Revises: f2b8d4e6a1c9
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a7c3e9b5d21'
+down_revision = 'f2b8d4e6a1c9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('clients', schema=None) as batch_op:
+        batch_op.create_index('ix_clients_consultant_last_contact', ['assigned_consultant_id', 'last_contact'], unique=False)
+        batch_op.create_index('ix_clients_orphan_last_contact', ['is_orphan', 'last_contact'], unique=False)
+        batch_op.create_index('ix_clients_last_contact', ['last_contact'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('clients', schema=None) as batch_op:
+        batch_op.drop_index('ix_clients_last_contact')
+        batch_op.drop_index('ix_clients_orphan_last_contact')
+        batch_op.drop_index('ix_clients_consultant_last_contact')
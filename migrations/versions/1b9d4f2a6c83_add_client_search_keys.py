@@ -0,0 +1,38 @@
+"""add client search keys
+
+Revision ID: 1b9d4f2a6c83
+Revises: 0a7c3e9b5d21
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1b9d4f2a6c83'
+down_revision = '0a7c3e9b5d21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('clients', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('phone_reversed', sa.String(length=20), nullable=True))
+        batch_op.add_column(sa.Column('name_initials', sa.String(length=64), nullable=True))
+        batch_op.create_index('ix_clients_contact_info', ['contact_info'], unique=False)
+        batch_op.create_index('ix_clients_phone_reversed', ['phone_reversed'], unique=False)
+        batch_op.create_index('ix_clients_name', ['name'], unique=False)
+        batch_op.create_index('ix_clients_name_initials', ['name_initials'], unique=False)
+
+    # 已有客户的搜索键需在部署后执行 flask rebuild-client-search 生成（依赖pypinyin）
+
+
+def downgrade():
+    with op.batch_alter_table('clients', schema=None) as batch_op:
+        batch_op.drop_index('ix_clients_name_initials')
+        batch_op.drop_index('ix_clients_name')
+        batch_op.drop_index('ix_clients_phone_reversed')
+        batch_op.drop_index('ix_clients_contact_info')
+        batch_op.drop_column('name_initials')
+        batch_op.drop_column('phone_reversed')
@@ -0,0 +1,59 @@
+"""add client segments
+
+Revision ID: 2c4e6a8b0d17
+Revises: 1b9d4f2a6c83
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c4e6a8b0d17'
+down_revision = '1b9d4f2a6c83'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('client_segments',
+    sa.Column('client_id', sa.Integer(), nullable=False),
+    sa.Column('last_visit', sa.DateTime(), nullable=True),
+    sa.Column('recency_days', sa.Integer(), nullable=True),
+    sa.Column('frequency', sa.Integer(), nullable=False),
+    sa.Column('monetary', sa.Float(), nullable=False),
+    sa.Column('r_score', sa.SmallInteger(), nullable=False),
+    sa.Column('f_score', sa.SmallInteger(), nullable=False),
+    sa.Column('m_score', sa.SmallInteger(), nullable=False),
+    sa.Column('segment', sa.String(length=32), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('client_id')
+    )
+    with op.batch_alter_table('client_segments', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_client_segments_segment'), ['segment'], unique=False)
+
+    op.create_table('segment_runs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('mode', sa.String(length=20), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('client_count', sa.Integer(), nullable=True),
+    sa.Column('thresholds', sa.Text(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    with op.batch_alter_table('treatments', schema=None) as batch_op:
+        batch_op.create_index('ix_treatments_updated_at', ['updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('treatments', schema=None) as batch_op:
+        batch_op.drop_index('ix_treatments_updated_at')
+
+    op.drop_table('segment_runs')
+    with op.batch_alter_table('client_segments', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_client_segments_segment'))
+
+    op.drop_table('client_segments')
@@ -0,0 +1,52 @@
+"""add visit predictions
+
+Revision ID: 3d5f7b9c1e28
+Revises: 2c4e6a8b0d17
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d5f7b9c1e28'
+down_revision = '2c4e6a8b0d17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('prediction_models',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('trained_at', sa.DateTime(), nullable=False),
+    sa.Column('treatment_count', sa.Integer(), nullable=True),
+    sa.Column('params', sa.Text(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('visit_predictions',
+    sa.Column('client_id', sa.Integer(), nullable=False),
+    sa.Column('last_visit', sa.DateTime(), nullable=True),
+    sa.Column('last_type', sa.String(length=64), nullable=True),
+    sa.Column('visit_count', sa.Integer(), nullable=False),
+    sa.Column('predicted_type', sa.String(length=64), nullable=True),
+    sa.Column('predicted_date', sa.Date(), nullable=True),
+    sa.Column('interval_days', sa.Float(), nullable=True),
+    sa.Column('expected_fee', sa.Float(), nullable=True),
+    sa.Column('confidence', sa.Float(), nullable=True),
+    sa.Column('model_id', sa.Integer(), nullable=True),
+    sa.Column('scored_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['model_id'], ['prediction_models.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('client_id')
+    )
+    with op.batch_alter_table('visit_predictions', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_visit_predictions_predicted_date'), ['predicted_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('visit_predictions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_visit_predictions_predicted_date'))
+
+    op.drop_table('visit_predictions')
+    op.drop_table('prediction_models')
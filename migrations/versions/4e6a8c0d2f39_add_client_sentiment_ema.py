@@ -0,0 +1,26 @@
+"""add client sentiment ema
+
+Revision ID: 4e6a8c0d2f39
+Revises: 3d5f7b9c1e28
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e6a8c0d2f39'
+down_revision = '3d5f7b9c1e28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('clients', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('sentiment_ema', sa.Float(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('clients', schema=None) as batch_op:
+        batch_op.drop_column('sentiment_ema')
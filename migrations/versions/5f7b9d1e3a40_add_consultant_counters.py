@@ -0,0 +1,54 @@
+"""add consultant counters
+
+Revision ID: 5f7b9d1e3a40
+Revises: 4e6a8c0d2f39
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f7b9d1e3a40'
+down_revision = '4e6a8c0d2f39'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('consultant_counters',
+    sa.Column('consultant_id', sa.Integer(), nullable=False),
+    sa.Column('client_count', sa.Integer(), nullable=False),
+    sa.Column('orphan_count', sa.Integer(), nullable=False),
+    sa.Column('reconciled_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['consultant_id'], ['consultants.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('consultant_id')
+    )
+    with op.batch_alter_table('consultant_counters', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_consultant_counters_client_count'), ['client_count'], unique=False)
+
+    op.create_table('consultant_daily_activity',
+    sa.Column('consultant_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('contact_count', sa.Integer(), nullable=False),
+    sa.Column('message_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['consultant_id'], ['consultants.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('consultant_id', 'day')
+    )
+
+    # 以现有数据初始化客户数；按天活动由 flask reconcile-consultant-counters 补齐
+    op.execute("""
+        INSERT INTO consultant_counters (consultant_id, client_count, orphan_count)
+        SELECT consultants.id, COUNT(clients.id), COALESCE(SUM(CASE WHEN clients.is_orphan THEN 1 ELSE 0 END), 0)
+        FROM consultants LEFT JOIN clients ON clients.assigned_consultant_id = consultants.id
+        GROUP BY consultants.id
+    """)
+
+
+def downgrade():
+    op.drop_table('consultant_daily_activity')
+    with op.batch_alter_table('consultant_counters', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_consultant_counters_client_count'))
+
+    op.drop_table('consultant_counters')
@@ -0,0 +1,43 @@
+"""add client claims
+
+Revision ID: 6a8c0e2f4b51
+Revises: 5f7b9d1e3a40
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a8c0e2f4b51'
+down_revision = '5f7b9d1e3a40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('client_claims',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('client_id', sa.Integer(), nullable=False),
+    sa.Column('consultant_id', sa.Integer(), nullable=False),
+    sa.Column('previous_consultant_id', sa.Integer(), nullable=True),
+    sa.Column('fee', sa.Float(), nullable=False),
+    sa.Column('source', sa.String(length=16), nullable=False),
+    sa.Column('claimed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['consultant_id'], ['consultants.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['previous_consultant_id'], ['consultants.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('client_claims', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_client_claims_client_id'), ['client_id'], unique=False)
+        batch_op.create_index('ix_client_claims_consultant_claimed', ['consultant_id', 'claimed_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('client_claims', schema=None) as batch_op:
+        batch_op.drop_index('ix_client_claims_consultant_claimed')
+        batch_op.drop_index(batch_op.f('ix_client_claims_client_id'))
+
+    op.drop_table('client_claims')
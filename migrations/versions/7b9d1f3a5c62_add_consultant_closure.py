@@ -0,0 +1,52 @@
+"""add consultant closure
+
+Revision ID: 7b9d1f3a5c62
+Revises: 6a8c0e2f4b51
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b9d1f3a5c62'
+down_revision = '6a8c0e2f4b51'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('consultant_closure',
+    sa.Column('ancestor_id', sa.Integer(), nullable=False),
+    sa.Column('descendant_id', sa.Integer(), nullable=False),
+    sa.Column('depth', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['ancestor_id'], ['consultants.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['descendant_id'], ['consultants.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+    )
+    with op.batch_alter_table('consultant_closure', schema=None) as batch_op:
+        batch_op.create_index('ix_consultant_closure_descendant_depth', ['descendant_id', 'depth'], unique=False)
+
+    # 以现有指导关系逐层初始化闭包表（存在环时沿环回到上级本人即停止）
+    bind = op.get_bind()
+    bind.execute(sa.text(
+        "INSERT INTO consultant_closure (ancestor_id, descendant_id, depth) SELECT id, id, 0 FROM consultants"
+    ))
+    total = bind.execute(sa.text("SELECT COUNT(*) FROM consultants")).scalar()
+    for depth in range(total):
+        inserted = bind.execute(sa.text("""
+            INSERT INTO consultant_closure (ancestor_id, descendant_id, depth)
+            SELECT consultant_closure.ancestor_id, consultants.id, :next_depth
+            FROM consultant_closure JOIN consultants ON consultants.supervisor_id = consultant_closure.descendant_id
+            WHERE consultant_closure.depth = :depth AND consultants.id <> consultant_closure.ancestor_id
+        """), {'depth': depth, 'next_depth': depth + 1}).rowcount
+        if not inserted:
+            break
+
+
+def downgrade():
+    with op.batch_alter_table('consultant_closure', schema=None) as batch_op:
+        batch_op.drop_index('ix_consultant_closure_descendant_depth')
+
+    op.drop_table('consultant_closure')
@@ -0,0 +1,68 @@
+"""add commission ledger
+
+Revision ID: 8c0e2a4b6d73
+Revises: 7b9d1f3a5c62
+Create Date: 2026-10-20 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c0e2a4b6d73'
+down_revision = '7b9d1f3a5c62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('commission_entries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('consultant_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=16), nullable=False),
+    sa.Column('source_type', sa.String(length=16), nullable=False),
+    sa.Column('source_id', sa.Integer(), nullable=False),
+    sa.Column('sequence', sa.Integer(), nullable=False),
+    sa.Column('client_id', sa.Integer(), nullable=True),
+    sa.Column('base_amount', sa.Float(), nullable=False),
+    sa.Column('rate', sa.Float(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('month', sa.String(length=7), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['consultant_id'], ['consultants.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('source_type', 'source_id', 'sequence', name='uq_commission_entries_source')
+    )
+    with op.batch_alter_table('commission_entries', schema=None) as batch_op:
+        batch_op.create_index('ix_commission_entries_consultant_month', ['consultant_id', 'month'], unique=False)
+        batch_op.create_index('ix_commission_entries_month', ['month'], unique=False)
+
+    op.create_table('commission_statements',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('consultant_id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.String(length=7), nullable=False),
+    sa.Column('entry_count', sa.Integer(), nullable=False),
+    sa.Column('claim_amount', sa.Float(), nullable=False),
+    sa.Column('consumption_amount', sa.Float(), nullable=False),
+    sa.Column('total_amount', sa.Float(), nullable=False),
+    sa.Column('generated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['consultant_id'], ['consultants.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('consultant_id', 'month', name='uq_commission_statements_consultant_month')
+    )
+    with op.batch_alter_table('commission_statements', schema=None) as batch_op:
+        batch_op.create_index('ix_commission_statements_month', ['month'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('commission_statements', schema=None) as batch_op:
+        batch_op.drop_index('ix_commission_statements_month')
+
+    op.drop_table('commission_statements')
+    with op.batch_alter_table('commission_entries', schema=None) as batch_op:
+        batch_op.drop_index('ix_commission_entries_month')
+        batch_op.drop_index('ix_commission_entries_consultant_month')
+
+    op.drop_table('commission_entries')
@@ -0,0 +1,40 @@
+"""add finance sync
+
+Revision ID: 9d1f3b5c7e84
+Revises: 8c0e2a4b6d73
+Create Date: 2026-10-21 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d1f3b5c7e84'
+down_revision = '8c0e2a4b6d73'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('treatments', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('external_id', sa.String(length=64), nullable=True))
+        batch_op.create_index(batch_op.f('ix_treatments_external_id'), ['external_id'], unique=True)
+
+    op.create_table('finance_sync_state',
+    sa.Column('source', sa.String(length=32), nullable=False),
+    sa.Column('watermark_at', sa.DateTime(), nullable=True),
+    sa.Column('watermark_id', sa.String(length=64), nullable=True),
+    sa.Column('total_rows', sa.Integer(), nullable=False),
+    sa.Column('last_run_at', sa.DateTime(), nullable=True),
+    sa.Column('last_status', sa.String(length=16), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.PrimaryKeyConstraint('source')
+    )
+
+
+def downgrade():
+    op.drop_table('finance_sync_state')
+    with op.batch_alter_table('treatments', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_treatments_external_id'))
+        batch_op.drop_column('external_id')
@@ -0,0 +1,45 @@
+"""add stats rollup tables
+
+Revision ID: a1c4e7d2b9f0
+Revises: 3f563ffc5d68
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1c4e7d2b9f0'
+down_revision = '3f563ffc5d68'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('monthly_signup_rollups',
+        sa.Column('month', sa.String(length=7), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('month')
+    )
+    op.create_table('treatment_type_rollups',
+        sa.Column('type', sa.String(length=64), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('type')
+    )
+
+    # 用现有明细数据初始化汇总表
+    op.execute(
+        "INSERT INTO monthly_signup_rollups (month, count) "
+        "SELECT DATE_FORMAT(created_at, '%Y-%m'), COUNT(*) FROM users "
+        "WHERE created_at IS NOT NULL GROUP BY DATE_FORMAT(created_at, '%Y-%m')"
+    )
+    op.execute(
+        "INSERT INTO treatment_type_rollups (type, count) "
+        "SELECT COALESCE(type, ''), COUNT(*) FROM treatments GROUP BY COALESCE(type, '')"
+    )
+
+
+def downgrade():
+    op.drop_table('treatment_type_rollups')
+    op.drop_table('monthly_signup_rollups')
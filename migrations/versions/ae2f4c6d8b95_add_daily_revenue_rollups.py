@@ -0,0 +1,69 @@
+"""add daily revenue rollups
+
+Revision ID: ae2f4c6d8b95
+Revises: 9d1f3b5c7e84
+Create Date: 2026-10-22 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ae2f4c6d8b95'
+down_revision = '9d1f3b5c7e84'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    rollups = op.create_table('daily_revenue_rollups',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('store_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('doctor_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('consultant_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('type', sa.String(length=64), nullable=False),
+    sa.Column('treatment_count', sa.Integer(), nullable=False),
+    sa.Column('fee_amount', sa.Float(), nullable=False),
+    sa.Column('paid_amount', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'store_id', 'doctor_id', 'consultant_id', 'type')
+    )
+    with op.batch_alter_table('daily_revenue_rollups', schema=None) as batch_op:
+        batch_op.create_index('ix_daily_revenue_rollups_consultant_day', ['consultant_id', 'day'], unique=False)
+        batch_op.create_index('ix_daily_revenue_rollups_doctor_day', ['doctor_id', 'day'], unique=False)
+        batch_op.create_index('ix_daily_revenue_rollups_store_day', ['store_id', 'day'], unique=False)
+
+    # 根据已有治疗记录回填（不含已取消的治疗）
+    treatments = sa.table('treatments',
+        sa.column('id', sa.Integer), sa.column('store_id', sa.Integer), sa.column('doctor_id', sa.Integer),
+        sa.column('consultant_id', sa.Integer), sa.column('type', sa.String), sa.column('status', sa.String),
+        sa.column('fee', sa.Float), sa.column('paid_amount', sa.Float),
+        sa.column('appointment_date', sa.DateTime), sa.column('created_at', sa.DateTime)
+    )
+    day = sa.func.date(sa.func.coalesce(treatments.c.appointment_date, treatments.c.created_at))
+    dimensions = [
+        day,
+        sa.func.coalesce(treatments.c.store_id, 0),
+        sa.func.coalesce(treatments.c.doctor_id, 0),
+        sa.func.coalesce(treatments.c.consultant_id, 0),
+        sa.func.coalesce(treatments.c.type, '')
+    ]
+    op.execute(rollups.insert().from_select(
+        ['day', 'store_id', 'doctor_id', 'consultant_id', 'type', 'treatment_count', 'fee_amount', 'paid_amount'],
+        sa.select(
+            *dimensions, sa.func.count(treatments.c.id),
+            sa.func.round(sa.func.coalesce(sa.func.sum(treatments.c.fee), 0), 2),
+            sa.func.round(sa.func.coalesce(sa.func.sum(treatments.c.paid_amount), 0), 2)
+        ).where(
+            sa.or_(treatments.c.status.is_(None), treatments.c.status != 'cancelled'), day.isnot(None)
+        ).group_by(*dimensions)
+    ))
+
+
+def downgrade():
+    with op.batch_alter_table('daily_revenue_rollups', schema=None) as batch_op:
+        batch_op.drop_index('ix_daily_revenue_rollups_store_day')
+        batch_op.drop_index('ix_daily_revenue_rollups_doctor_day')
+        batch_op.drop_index('ix_daily_revenue_rollups_consultant_day')
+
+    op.drop_table('daily_revenue_rollups')
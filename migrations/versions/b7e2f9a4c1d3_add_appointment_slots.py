@@ -0,0 +1,51 @@
+"""add appointment slots
+
+Revision ID: b7e2f9a4c1d3
+Revises: a1c4e7d2b9f0
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2f9a4c1d3'
+down_revision = 'a1c4e7d2b9f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('treatments', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('duration_minutes', sa.Integer(), nullable=True, server_default='30'))
+
+    with op.batch_alter_table('doctors', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('working_hours', sa.Text(), nullable=True))
+
+    op.create_table('appointment_slots',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('resource_type', sa.String(length=20), nullable=False),
+        sa.Column('resource_id', sa.Integer(), nullable=False),
+        sa.Column('slot_start', sa.DateTime(), nullable=False),
+        sa.Column('treatment_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['treatment_id'], ['treatments.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('resource_type', 'resource_id', 'slot_start', name='uq_appointment_slot')
+    )
+    with op.batch_alter_table('appointment_slots', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_appointment_slots_treatment_id'), ['treatment_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('appointment_slots', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_appointment_slots_treatment_id'))
+
+    op.drop_table('appointment_slots')
+
+    with op.batch_alter_table('doctors', schema=None) as batch_op:
+        batch_op.drop_column('working_hours')
+
+    with op.batch_alter_table('treatments', schema=None) as batch_op:
+        batch_op.drop_column('duration_minutes')
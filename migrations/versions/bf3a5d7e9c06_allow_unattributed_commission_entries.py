@@ -0,0 +1,27 @@
+"""allow unattributed commission entries
+
+Revision ID: bf3a5d7e9c06
+Revises: ae2f4c6d8b95
+Create Date: 2026-10-23 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'bf3a5d7e9c06'
+down_revision = 'ae2f4c6d8b95'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('commission_entries', schema=None) as batch_op:
+        batch_op.alter_column('consultant_id', existing_type=sa.Integer(), nullable=True)
+
+
+def downgrade():
+    op.execute("DELETE FROM commission_entries WHERE consultant_id IS NULL")
+    with op.batch_alter_table('commission_entries', schema=None) as batch_op:
+        batch_op.alter_column('consultant_id', existing_type=sa.Integer(), nullable=False)
@@ -0,0 +1,33 @@
+"""add queue snapshots
+
+Revision ID: c3d8a5f1e6b2
+Revises: b7e2f9a4c1d3
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3d8a5f1e6b2'
+down_revision = 'b7e2f9a4c1d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('queue_snapshots',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('store_id', sa.Integer(), nullable=False),
+        sa.Column('queue_date', sa.Date(), nullable=False),
+        sa.Column('state', sa.Text(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['store_id'], ['stores.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('store_id', 'queue_date', name='uq_queue_snapshot_store_date')
+    )
+
+
+def downgrade():
+    op.drop_table('queue_snapshots')
@@ -0,0 +1,61 @@
+"""add ratings and rating aggregates
+
+Revision ID: d9f1b3c7a2e4
+Revises: c3d8a5f1e6b2
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9f1b3c7a2e4'
+down_revision = 'c3d8a5f1e6b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ratings',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('treatment_id', sa.Integer(), nullable=False),
+        sa.Column('client_id', sa.Integer(), nullable=True),
+        sa.Column('doctor_id', sa.Integer(), nullable=True),
+        sa.Column('consultant_id', sa.Integer(), nullable=True),
+        sa.Column('store_id', sa.Integer(), nullable=True),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.Column('comment', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ),
+        sa.ForeignKeyConstraint(['consultant_id'], ['consultants.id'], ),
+        sa.ForeignKeyConstraint(['doctor_id'], ['doctors.id'], ),
+        sa.ForeignKeyConstraint(['store_id'], ['stores.id'], ),
+        sa.ForeignKeyConstraint(['treatment_id'], ['treatments.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('treatment_id')
+    )
+    with op.batch_alter_table('ratings', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_ratings_doctor_id'), ['doctor_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_ratings_consultant_id'), ['consultant_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_ratings_store_id'), ['store_id'], unique=False)
+
+    op.create_table('rating_aggregates',
+        sa.Column('subject_type', sa.String(length=20), nullable=False),
+        sa.Column('subject_id', sa.Integer(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.Column('total', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('subject_type', 'subject_id')
+    )
+
+
+def downgrade():
+    op.drop_table('rating_aggregates')
+    with op.batch_alter_table('ratings', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ratings_store_id'))
+        batch_op.drop_index(batch_op.f('ix_ratings_consultant_id'))
+        batch_op.drop_index(batch_op.f('ix_ratings_doctor_id'))
+
+    op.drop_table('ratings')
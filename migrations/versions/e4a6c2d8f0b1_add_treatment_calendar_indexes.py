@@ -0,0 +1,30 @@
+"""add treatment calendar indexes
+
+Revision ID: e4a6c2d8f0b1
+Revises: d9f1b3c7a2e4
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a6c2d8f0b1'
+down_revision = 'd9f1b3c7a2e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('treatments', schema=None) as batch_op:
+        batch_op.create_index('ix_treatments_consultant_appointment', ['consultant_id', 'appointment_date'], unique=False)
+        batch_op.create_index('ix_treatments_doctor_appointment', ['doctor_id', 'appointment_date'], unique=False)
+        batch_op.create_index('ix_treatments_store_appointment', ['store_id', 'appointment_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('treatments', schema=None) as batch_op:
+        batch_op.drop_index('ix_treatments_store_appointment')
+        batch_op.drop_index('ix_treatments_doctor_appointment')
+        batch_op.drop_index('ix_treatments_consultant_appointment')
@@ -0,0 +1,41 @@
+"""add check ins
+
+Revision ID: f2b8d4e6a1c9
+Revises: e4a6c2d8f0b1
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b8d4e6a1c9'
+down_revision = 'e4a6c2d8f0b1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('check_ins',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('client_id', sa.Integer(), nullable=True),
+    sa.Column('store_id', sa.Integer(), nullable=False),
+    sa.Column('checked_in_at', sa.DateTime(), nullable=False),
+    sa.Column('notified_at', sa.DateTime(), nullable=True),
+    sa.Column('notified_users', sa.String(length=256), nullable=True),
+    sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ),
+    sa.ForeignKeyConstraint(['store_id'], ['stores.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('check_ins', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_check_ins_client_id'), ['client_id'], unique=False)
+        batch_op.create_index('ix_check_ins_store_checked_in', ['store_id', 'checked_in_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('check_ins', schema=None) as batch_op:
+        batch_op.drop_index('ix_check_ins_store_checked_in')
+        batch_op.drop_index(batch_op.f('ix_check_ins_client_id'))
+
+    op.drop_table('check_ins')